@@ -1,6 +1,8 @@
 import os
 from celery import Celery
 
+from gestion_caisses import metriques
+
 # Définir le module de paramètres Django par défaut
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'caisses_femmes.settings')
 
@@ -13,6 +15,9 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Charger automatiquement les tâches depuis tous les fichiers tasks.py
 app.autodiscover_tasks()
 
+# Durées et échecs des tâches exposés par /metrics
+metriques.connecter_celery()
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -60,6 +60,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Routage des lectures de rapports vers la réplique (lecture de ses propres écritures par requête)
+    'gestion_caisses.middleware.RoutageMiddleware',
+    # Avant le reste pour mesurer toutes les requêtes SQL (session, authentification, vue)
+    'gestion_caisses.middleware.SQLInstrumentationMiddleware',
+    # Écritures d'audit regroupées par requête (comptées par l'instrumentation SQL)
+    'gestion_caisses.middleware.AuditTamponMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -67,6 +73,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Profilage cProfile à la demande (jeton signé du superutilisateur connecté ou règle d'URL de l'admin)
+    'gestion_caisses.middleware.ProfilageMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -103,6 +111,24 @@ DATABASES = {
     }
 }
 
+# Réplique en lecture des rapports, exports et tableaux de bord (voir gestion_caisses/routage.py).
+# En local: REPORTING_DB_NAME=chemin d'une copie du fichier SQLite
+if config('REPORTING_DB_NAME', default=''):
+    DATABASES['reporting'] = {
+        'ENGINE': config('REPORTING_DB_ENGINE', default='django.db.backends.sqlite3'),
+        'NAME': config('REPORTING_DB_NAME'),
+        'USER': config('REPORTING_DB_USER', default=''),
+        'PASSWORD': config('REPORTING_DB_PASSWORD', default=''),
+        'HOST': config('REPORTING_DB_HOST', default=''),
+        'PORT': config('REPORTING_DB_PORT', default=''),
+    }
+
+DATABASE_ROUTERS = ['gestion_caisses.routage.RouteurRapports']
+RAPPORTS_BASE = 'reporting'
+# Au-delà de ce retard (secondes), les rapports sont lus sur la base principale
+RAPPORTS_RETARD_MAX = config('RAPPORTS_RETARD_MAX', default=30, cast=int)
+RAPPORTS_VERIFICATION_INTERVALLE = config('RAPPORTS_VERIFICATION_INTERVALLE', default=10, cast=int)  # secondes
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -206,6 +232,22 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Listes à plat (une requête .values() au lieu des sérialiseurs DRF), voir gestion_caisses/plats.py
+LISTES_PLATES = config('LISTES_PLATES', default=True, cast=bool)
+
+# Rendu / lecture JSON rapides (orjson si installé) pour toute l'API, voir gestion_caisses/rendus.py
+API_JSON_RAPIDE = config('API_JSON_RAPIDE', default=False, cast=bool)
+if API_JSON_RAPIDE:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'gestion_caisses.rendus.JSONRapideRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'gestion_caisses.rendus.JSONRapideParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -285,8 +327,94 @@ LOGGING = {
         'handlers': ['file'],
         'level': 'INFO',
     },
+    'loggers': {
+        # Statistiques SQL par requête (SQLInstrumentationMiddleware)
+        'gestion_caisses.sql': {
+            'handlers': ['file'],
+            'level': config('SQL_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
 }
 
+# Instrumentation SQL par requête et budgets de requêtes par endpoint
+SQL_INSTRUMENTATION = config('SQL_INSTRUMENTATION', default=True, cast=bool)
+SQL_BUDGETS_ALERTE = config('SQL_BUDGETS_ALERTE', default=DEBUG, cast=bool)
+SQL_BUDGETS_REQUETES = {}
+
+# Cache partagé entre les workers web et Celery (compteurs de la cloche, versions des ETag...):
+# Redis dès que REDIS_URL est défini, sinon LocMem (un cache par processus, développement uniquement).
+# CACHE_BACKEND / CACHE_LOCATION remplacent ce choix.
+CACHE_REDIS_URL = config('REDIS_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default=(
+            'django.core.cache.backends.redis.RedisCache' if CACHE_REDIS_URL
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        )),
+        'LOCATION': config('CACHE_LOCATION', default=CACHE_REDIS_URL or 'gestion-caisses'),
+    }
+}
+
+# GET conditionnels (ETag / 304, voir conditionnel.py): les versions des caisses doivent être partagées
+# par tous les processus, donc désactivés par défaut avec un cache local (LocMem, DummyCache)
+GET_CONDITIONNEL = config('GET_CONDITIONNEL', cast=bool, default=CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache',
+))
+
+# Flux des compteurs de notifications (SSE / long-poll, voir views.notifications_flux)
+NOTIFICATIONS_FLUX_INTERVALLE = config('NOTIFICATIONS_FLUX_INTERVALLE', default=1.0, cast=float)  # secondes
+NOTIFICATIONS_FLUX_DUREE = config('NOTIFICATIONS_FLUX_DUREE', default=300, cast=int)  # secondes
+NOTIFICATIONS_LONG_POLL_ATTENTE = config('NOTIFICATIONS_LONG_POLL_ATTENTE', default=25, cast=int)  # secondes
+
+# Journal d'audit: 'direct' (bulk_create en fin de requête) ou 'celery' (tâche enregistrer_audits après commit)
+AUDIT_MODE = config('AUDIT_MODE', default='direct')
+
+# Hiérarchie géographique /api/geo/tree/: durée de fraîcheur côté client (revalidation par ETag ensuite)
+GEO_ARBRE_MAX_AGE = config('GEO_ARBRE_MAX_AGE', default=86400, cast=int)  # secondes
+
+# Synchronisation hors ligne /api/sync/: nombre maximal d'objets par réponse
+SYNC_LIMITE = config('SYNC_LIMITE', default=1000, cast=int)
+
+# Écritures hors ligne: durée de conservation des clés d'idempotence (secondes), taille des lots /api/outbox/
+IDEMPOTENCE_DUREE = config('IDEMPOTENCE_DUREE', default=604800, cast=int)
+OUTBOX_TAILLE_MAX = config('OUTBOX_TAILLE_MAX', default=200, cast=int)
+
+# Tâches planifiées exclusives (voir gestion_caisses/planification.py): durée du bail VerrouTache
+# (secondes, prolongé à chaque point de reprise) si le worker meurt; PostgreSQL utilise un verrou consultatif
+TACHES_VERROU_DUREE = config('TACHES_VERROU_DUREE', default=3600, cast=int)
+
+# Points de solde quotidiens (voir gestion_caisses/soldes.py): conservés ce nombre de jours,
+# ceux de fin de mois toujours
+SOLDES_JOURS_CONSERVES = config('SOLDES_JOURS_CONSERVES', default=400, cast=int)
+
+# Vérification d'intégrité du grand livre (voir gestion_caisses/integrite.py): processus en
+# parallèle (0 = nombre de cœurs, 1 = dans le processus appelant)
+INTEGRITE_PROCESSUS = config('INTEGRITE_PROCESSUS', default=0, cast=int)
+
+# Métriques Prometheus /metrics (voir gestion_caisses/metriques.py)
+METRIQUES_ACTIVES = config('METRIQUES_ACTIVES', default=True, cast=bool)
+# 'memoire' (un processus), 'repertoire' (fichiers par processus) ou 'redis' (hash partagé)
+METRIQUES_MODE = config('METRIQUES_MODE', default='memoire')
+METRIQUES_REPERTOIRE = config('METRIQUES_REPERTOIRE', default=str(BASE_DIR / 'metriques'))
+METRIQUES_REDIS_URL = config('METRIQUES_REDIS_URL', default=config('REDIS_URL', default='redis://localhost:6379/0'))
+METRIQUES_INTERVALLE = config('METRIQUES_INTERVALLE', default=1.0, cast=float)  # secondes
+# Adresses autorisées à lire /metrics (REMOTE_ADDR, jamais X-Forwarded-For): boucle locale par défaut.
+# Ajouter l'adresse du serveur Prometheus, pas un réseau entier: derrière nginx, toutes les requêtes
+# publiques arrivent depuis l'adresse privée du proxy (nginx.conf refuse aussi /metrics).
+METRIQUES_RESEAUX = config(
+    'METRIQUES_RESEAUX',
+    default='127.0.0.0/8,::1/128',
+    cast=lambda v: [s.strip() for s in v.split(',') if s.strip()]
+)
+# Jeton exigé en plus (« Authorization: Bearer <jeton> », bearer_token côté Prometheus); vide = adresse seule
+METRIQUES_JETON = config('METRIQUES_JETON', default='')
+
+# Profilage à la demande des requêtes (voir gestion_caisses/profilage.py)
+PROFILAGE_REQUETES = config('PROFILAGE_REQUETES', default=True, cast=bool)
+PROFILAGE_DUREE_JETON = config('PROFILAGE_DUREE_JETON', default=3600, cast=int)  # secondes
+PROFILAGE_INTERVALLE = config('PROFILAGE_INTERVALLE', default=0.005, cast=float)  # échantillonnage des piles (s)
+
 # Create logs directory if it doesn't exist
 os.makedirs(BASE_DIR / 'logs', exist_ok=True)
 
@@ -364,4 +492,16 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'gestion_caisses.tasks.cloturer_exercices_automatiquement',
         'schedule': 86400.0,  # Tous les jours
     },
+    'purger-cles-idempotence': {
+        'task': 'gestion_caisses.tasks.purger_cles_idempotence',
+        'schedule': 86400.0,  # Tous les jours
+    },
+    'enregistrer-points-soldes': {
+        'task': 'gestion_caisses.tasks.enregistrer_points_soldes',
+        'schedule': 86400.0,  # Tous les jours (rattrape les jours manqués)
+    },
+    'verifier-integrite': {
+        'task': 'gestion_caisses.tasks.verifier_integrite',
+        'schedule': 86400.0,  # Tous les jours (caisses modifiées seulement)
+    },
 }
@@ -11,6 +11,13 @@ DATABASES = {
     }
 }
 
+# Réplique locale des rapports: copie du fichier SQLite (voir gestion_caisses/routage.py)
+if config('REPORTING_DB_NAME', default=''):
+    DATABASES['reporting'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': config('REPORTING_DB_NAME'),
+    }
+
 # Configuration des fichiers statiques pour SQLite
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
@@ -21,6 +21,12 @@ LOGGING = {
     'disable_existing_loggers': True,
 }
 
+# Base en mémoire invisible des processus du pool: vérification d'intégrité dans le processus de test
+INTEGRITE_PROCESSUS = 1
+
+# Un seul processus: le cache LocMem suffit aux versions des GET conditionnels
+GET_CONDITIONNEL = True
+
 # Configuration des tests
 TEST_RUNNER = 'django.test.runner.DiscoverRunner'
 
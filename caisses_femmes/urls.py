@@ -20,7 +20,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
 from django.views.generic import TemplateView
-from gestion_caisses import honeypot_views
+from gestion_caisses import honeypot_views, views as gestion_caisses_views
 
 urlpatterns = [
     # Redirection de la racine vers /gestion-caisses/login/
@@ -40,6 +40,9 @@ urlpatterns = [
     # Cette route doit être APRÈS l'inclusion de gestion_caisses.urls pour ne pas capturer les URLs personnalisées
     path('gestion-caisses/admin/', admin.site.urls),
 
+    # Métriques Prometheus (réseaux internes uniquement)
+    path('metrics', gestion_caisses_views.metriques_view, name='metriques'),
+
     # Service Worker à la racine pour PWA (scope global)
     path('sw.js', TemplateView.as_view(template_name='pwa/sw.js', content_type='application/javascript'), name='service_worker'),
 ]
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from django.utils.html import format_html
+from django.conf import settings
+from django.utils.html import format_html, format_html_join
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django import forms
@@ -24,12 +25,17 @@ from .models import (
     VirementBancaire, AuditLog, Notification, PresidentGeneral, Parametre,
     CaisseGenerale, CaisseGeneraleMouvement,
     TransfertCaisse, AdminDashboard,
-    SalaireAgent, FichePaie, ExerciceCaisse, FKMBoard
+    SalaireAgent, FichePaie, ExerciceCaisse, FKMBoard,
+    RegleProfilage, ProfileRecord, TaskRun, BalanceCheckpoint,
+    VerificationIntegrite, ResultatIntegrite, VerrouTache
 )
 from .models import SeanceReunion, Cotisation, Depense, RapportActivite
-from .utils import create_credentials_pdf_response, create_agent_credentials_pdf_response
+from .documents import create_credentials_pdf_response, create_agent_credentials_pdf_response
 from .services import PretService
 from .permissions import AgentAdminMixin, AgentPermissions
+from . import profilage
+from .audit import journaliser_audit
+from .recherche import RechercheNormaliseeAdminMixin
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import HttpResponse, JsonResponse
 from django.contrib import messages
@@ -437,7 +443,7 @@ class CotisationInline(admin.TabularInline):
 
 
 # Dashboard des prêts
-class PretDashboardAdmin(DatePickerAdminMixin, admin.ModelAdmin):
+class PretDashboardAdmin(RechercheNormaliseeAdminMixin, DatePickerAdminMixin, admin.ModelAdmin):
     """Dashboard des prêts avec statistiques détaillées"""
     change_list_template = 'admin/gestion_caisses/pret_dashboard/change_list.html'
     change_form_template = 'admin/gestion_caisses/pret/change_form.html'
@@ -458,6 +464,8 @@ class PretDashboardAdmin(DatePickerAdminMixin, admin.ModelAdmin):
         'numero_pret', 'membre__nom', 'membre__prenoms', 'membre__numero_carte_electeur',
         'caisse__nom_association', 'caisse__code'
     ]
+    # Mêmes champs, via les colonnes normalisées (sans accents) et leur index
+    recherche_chemins = ('', 'membre', 'caisse')
     
     ordering = ['-date_demande']
     list_per_page = 50
@@ -807,6 +815,7 @@ class PretDashboardAdmin(DatePickerAdminMixin, admin.ModelAdmin):
         """Surcharge de la méthode delete pour tracer l'utilisateur qui supprime"""
         # Marquer l'utilisateur actuel pour l'audit
         obj._current_user = request.user
+        obj._current_ip = request.META.get('REMOTE_ADDR')
         super().delete_model(request, obj)
 
     def delete_queryset(self, request, queryset):
@@ -816,6 +825,7 @@ class PretDashboardAdmin(DatePickerAdminMixin, admin.ModelAdmin):
         for obj in queryset:
             try:
                 obj._current_user = request.user
+                obj._current_ip = request.META.get('REMOTE_ADDR')
                 obj.delete()
                 deleted_count += 1
             except Exception as e:
@@ -835,6 +845,7 @@ class PretDashboardAdmin(DatePickerAdminMixin, admin.ModelAdmin):
         for pret in to_delete:
             try:
                 pret._current_user = request.user
+                pret._current_ip = request.META.get('REMOTE_ADDR')
                 pret.delete()
                 deleted_count += 1
             except Exception as e:
@@ -1620,7 +1631,7 @@ class AgentAdmin(DatePickerAdminMixin, admin.ModelAdmin):
         agent.save()
         
         # Créer un log d'audit
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=request.user,
             action='CREATION',
             modele='User',
@@ -2032,7 +2043,7 @@ class CaisseAdmin(AgentAdminMixin, DatePickerAdminMixin, admin.ModelAdmin):
         )
 
         # Log d'audit
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=request.user,
             action='CREATION',
             modele='User',
@@ -2539,3 +2550,273 @@ class FichePaieAdmin(admin.ModelAdmin):
         if hasattr(request.user, 'profil_agent'):
             return qs.filter(salaire__agent=request.user.profil_agent)
         return qs.none()
+
+
+class SuperutilisateurSeulementMixin:
+    """Restreint l'accès d'un modèle d'administration aux superutilisateurs"""
+
+    def has_module_permission(self, request):
+        return request.user.is_superuser
+
+    def has_view_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+    def has_add_permission(self, request):
+        return request.user.is_superuser
+
+    def has_change_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+
+@admin.register(RegleProfilage)
+class RegleProfilageAdmin(SuperutilisateurSeulementMixin, admin.ModelAdmin):
+    list_display = ['motif_url', 'actif', 'nombre_restant', 'date_expiration', 'nombre_profils', 'cree_par', 'date_creation']
+    list_filter = ['actif']
+    list_editable = ['actif', 'nombre_restant']
+    readonly_fields = ['cree_par', 'date_creation']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('cree_par').annotate(_nombre_profils=Count('profils'))
+
+    def nombre_profils(self, obj):
+        return obj._nombre_profils
+    nombre_profils.short_description = "Profils"
+    nombre_profils.admin_order_field = '_nombre_profils'
+
+    def save_model(self, request, obj, form, change):
+        if not obj.cree_par:
+            obj.cree_par = request.user
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(TaskRun)
+class TaskRunAdmin(SuperutilisateurSeulementMixin, admin.ModelAdmin):
+    list_display = ['date_debut', 'nom', 'statut', 'duree_ms', 'lignes_traitees', 'date_fin']
+    list_filter = ['statut', 'nom', 'date_debut']
+    search_fields = ['nom']
+    ordering = ['-date_debut']
+    list_per_page = 50
+    readonly_fields = [
+        'nom', 'statut', 'date_debut', 'date_fin', 'duree_ms', 'lignes_traitees',
+        'point_reprise', 'resultat', 'erreur',
+    ]
+
+    def has_add_permission(self, request):
+        # Les exécutions sont inscrites par planification.tache_exclusive
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(VerrouTache)
+class VerrouTacheAdmin(SuperutilisateurSeulementMixin, admin.ModelAdmin):
+    list_display = ['nom', 'detenteur', 'expiration']
+    search_fields = ['nom']
+    ordering = ['nom']
+    readonly_fields = ['nom', 'detenteur', 'expiration']
+
+    def has_add_permission(self, request):
+        # Les baux sont pris par planification.verrou; supprimer une ligne libère un bail bloqué
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(VerificationIntegrite)
+class VerificationIntegriteAdmin(SuperutilisateurSeulementMixin, admin.ModelAdmin):
+    list_display = [
+        'date_debut', 'statut', 'incrementale', 'caisses_verifiees', 'caisses_ignorees',
+        'caisses_en_anomalie', 'anomalies', 'processus', 'duree_ms', 'utilisateur',
+    ]
+    list_filter = ['statut', 'incrementale', 'date_debut']
+    ordering = ['-date_debut']
+    list_per_page = 50
+    list_select_related = ['utilisateur']
+    readonly_fields = [
+        'statut', 'incrementale', 'date_debut', 'date_fin', 'duree_ms', 'processus', 'caisses_verifiees',
+        'caisses_ignorees', 'caisses_en_anomalie', 'anomalies', 'utilisateur', 'erreur',
+    ]
+
+    def has_add_permission(self, request):
+        # Les vérifications sont lancées par verifier_integrite_view ou la tâche verifier_integrite
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ResultatIntegrite)
+class ResultatIntegriteAdmin(SuperutilisateurSeulementMixin, admin.ModelAdmin):
+    list_display = ['verification', 'caisse', 'statut', 'nombre_anomalies', 'mouvements', 'prets', 'duree_ms']
+    list_filter = ['statut', 'verification']
+    search_fields = ['caisse__nom_association', 'caisse__code']
+    ordering = ['-id']
+    list_per_page = 50
+    list_select_related = ['verification', 'caisse']
+    readonly_fields = [
+        'verification', 'caisse', 'statut', 'version_journal', 'fond_disponible', 'mouvements', 'prets',
+        'nombre_anomalies', 'anomalies', 'duree_ms',
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BalanceCheckpoint)
+class BalanceCheckpointAdmin(SuperutilisateurSeulementMixin, admin.ModelAdmin):
+    list_display = ['date', 'caisse', 'solde', 'mouvement_id', 'date_creation']
+    list_filter = ['date']
+    search_fields = ['caisse__nom_association', 'caisse__code']
+    ordering = ['-date']
+    list_per_page = 50
+    list_select_related = ['caisse']
+    readonly_fields = ['caisse', 'date', 'solde', 'mouvement_id', 'date_creation']
+
+    def has_add_permission(self, request):
+        # Les points sont écrits par la tâche enregistrer_points_soldes (soldes.py)
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ProfileRecord)
+class ProfileRecordAdmin(SuperutilisateurSeulementMixin, admin.ModelAdmin):
+    list_display = ['date_creation', 'methode', 'chemin', 'endpoint', 'statut_http',
+                    'duree_totale_ms', 'duree_db_ms', 'nombre_requetes', 'declencheur', 'utilisateur']
+    list_filter = ['declencheur', 'methode', 'endpoint', 'date_creation']
+    search_fields = ['chemin', 'endpoint']
+    ordering = ['-date_creation']
+    list_per_page = 50
+    list_select_related = ['utilisateur']
+    exclude = ['fonctions_principales', 'requetes_sql', 'piles_repliees']
+    readonly_fields = [
+        'chemin', 'methode', 'endpoint', 'statut_http', 'declencheur', 'regle', 'utilisateur',
+        'duree_totale_ms', 'duree_db_ms', 'nombre_requetes', 'date_creation',
+        'tableau_fonctions', 'tableau_requetes', 'lien_piles', 'statistiques',
+    ]
+    fieldsets = (
+        ('Requête', {
+            'fields': ('chemin', 'methode', 'endpoint', 'statut_http', 'declencheur', 'regle', 'utilisateur', 'date_creation')
+        }),
+        ('Mesures', {
+            'fields': ('duree_totale_ms', 'duree_db_ms', 'nombre_requetes', 'lien_piles')
+        }),
+        ('Fonctions les plus coûteuses (temps cumulé)', {
+            'fields': ('tableau_fonctions',)
+        }),
+        ('Requêtes SQL', {
+            'fields': ('tableau_requetes',),
+            'classes': ('collapse',)
+        }),
+        ('Sortie pstats', {
+            'fields': ('statistiques',),
+            'classes': ('collapse',)
+        }),
+    )
+
+    def has_add_permission(self, request):
+        # Les profils sont produits par ProfilageMiddleware
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('changelist'):
+            # La liste n'a pas besoin des colonnes volumineuses
+            qs = qs.defer('fonctions_principales', 'requetes_sql', 'piles_repliees', 'statistiques')
+        return qs
+
+    def tableau_fonctions(self, obj):
+        lignes = format_html_join(
+            '',
+            '<tr><td style="text-align:right">{}</td><td style="text-align:right">{}</td>'
+            '<td style="text-align:right">{}</td><td><code>{}</code></td></tr>',
+            (
+                (f"{ligne['temps_cumule_ms']:.1f}", f"{ligne['temps_propre_ms']:.1f}", ligne['appels'], ligne['fonction'])
+                for ligne in obj.fonctions_principales
+            ),
+        )
+        return format_html(
+            '<table><thead><tr><th>Cumulé (ms)</th><th>Propre (ms)</th><th>Appels</th><th>Fonction</th></tr></thead>'
+            '<tbody>{}</tbody></table>',
+            lignes,
+        )
+    tableau_fonctions.short_description = "Fonctions"
+
+    def tableau_requetes(self, obj):
+        lignes = format_html_join(
+            '',
+            '<tr><td style="text-align:right">{}</td><td style="text-align:right">{}</td><td><code>{}</code></td></tr>',
+            ((i, f"{requete['duree_ms']:.2f}", requete['sql']) for i, requete in enumerate(obj.requetes_sql, 1)),
+        )
+        return format_html(
+            '<table><thead><tr><th>#</th><th>Durée (ms)</th><th>SQL</th></tr></thead><tbody>{}</tbody></table>',
+            lignes,
+        )
+    tableau_requetes.short_description = "Requêtes"
+
+    def lien_piles(self, obj):
+        if not obj.pk:
+            return '-'
+        url = reverse('admin:gestion_caisses_profilerecord_piles', args=[obj.pk])
+        return format_html(
+            '<a href="{}">Télécharger les piles repliées</a> (flamegraph.pl, speedscope.app)', url
+        )
+    lien_piles.short_description = "Flame graph"
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                'jeton/',
+                self.admin_site.admin_view(self.generer_jeton),
+                name='gestion_caisses_profilerecord_jeton',
+            ),
+            path(
+                '<int:object_id>/piles/',
+                self.admin_site.admin_view(self.telecharger_piles),
+                name='gestion_caisses_profilerecord_piles',
+            ),
+        ]
+        return custom_urls + urls
+
+    def changelist_view(self, request, extra_context=None):
+        if request.user.is_superuser:
+            messages.info(request, format_html(
+                'Profiler une requête: <a href="{}">obtenir un jeton</a> puis ajouter <code>?{}=&lt;jeton&gt;</code> '
+                "à l'URL, ou créer une règle de profilage.",
+                reverse('admin:gestion_caisses_profilerecord_jeton'), profilage.PARAMETRE,
+            ))
+        return super().changelist_view(request, extra_context)
+
+    def generer_jeton(self, request):
+        """Émet un jeton de profilage signé pour le superutilisateur connecté"""
+        if not request.user.is_superuser:
+            return HttpResponse(status=403)
+        duree = getattr(settings, 'PROFILAGE_DUREE_JETON', 3600)
+        return JsonResponse({
+            'parametre': profilage.PARAMETRE,
+            'jeton': profilage.generer_jeton(request.user),
+            'valide_secondes': duree,
+        })
+
+    def telecharger_piles(self, request, object_id):
+        """Télécharge les piles repliées d'un profil (une pile par ligne, durée en microsecondes)"""
+        # admin_view n'exige que is_staff (agents compris): même restriction que la fiche du profil
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        record = get_object_or_404(ProfileRecord, pk=object_id)
+        response = HttpResponse(record.piles_repliees, content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="profil_{record.pk}.folded"'
+        return response
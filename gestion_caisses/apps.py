@@ -10,3 +10,12 @@ class GestionCaissesConfig(AppConfig):
         # Enregistrer les signaux sans effectuer de requêtes BD ici
         # (évite: RuntimeWarning "Accessing the database during app initialization is discouraged")
         import gestion_caisses.signals
+        from django.db.models.signals import post_migrate
+        post_migrate.connect(_installer_index_recherche, sender=self)
+
+
+def _installer_index_recherche(using, **kwargs):
+    """Recrée les index de recherche supprimés par une reconstruction de table (SQLite)"""
+    from django.db import connections
+    from .recherche import installer_index
+    installer_index(connections[using])
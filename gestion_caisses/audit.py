@@ -0,0 +1,119 @@
+"""
+Écriture groupée du journal d'audit.
+
+``journaliser_audit`` prend les mêmes arguments que ``AuditLog.objects.create``. À l'intérieur
+d'un ``tampon_audit`` (ouvert pour chaque requête HTTP par ``AuditTamponMiddleware`` et pour
+les tâches Celery), les entrées sont accumulées puis insérées en un seul ``bulk_create`` à la
+fermeture du tampon, au lieu d'un INSERT par entrée.
+
+Les entrées écrites dans un bloc ``transaction.atomic`` ouvert après le tampon ne rejoignent
+le tampon qu'au commit de ce bloc (``transaction.on_commit``): une opération annulée ne laisse
+pas de trace d'audit, comme avec des INSERT directs.
+
+``AUDIT_MODE = 'celery'`` confie l'insertion à la tâche ``enregistrer_audits`` après commit
+(exécution directe si Celery ou le broker ne sont pas disponibles).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_tampon_courant = ContextVar('tampon_audit', default=None)
+
+
+class TamponAudit:
+    """Entrées d'audit en attente d'écriture pour une requête ou une tâche"""
+
+    def __init__(self):
+        self.entrees = []
+        self.profondeur = _profondeur_atomic()
+        self.ouvert = True
+
+
+def _profondeur_atomic():
+    return len(getattr(connection, 'atomic_blocks', []))
+
+
+def journaliser_audit(**champs):
+    """Ajoute une entrée au journal d'audit (mêmes arguments que ``AuditLog.objects.create``)"""
+    from .models import AuditLog
+
+    # Construire l'instance tout de suite: une valeur invalide échoue chez l'appelant, comme avant
+    entree = AuditLog(**champs)
+    tampon = _tampon_courant.get()
+    if tampon is None:
+        entree.save()
+        return
+
+    if _profondeur_atomic() > tampon.profondeur:
+        transaction.on_commit(lambda: _ajouter(tampon, entree))
+    else:
+        tampon.entrees.append(entree)
+
+
+def _ajouter(tampon, entree):
+    if tampon.ouvert:
+        tampon.entrees.append(entree)
+    else:
+        # Transaction validée après la fermeture du tampon
+        ecrire_audits([entree])
+
+
+def ecrire_audits(entrees):
+    """Insère les entrées en un seul INSERT (ou les confie à Celery en mode « celery »)"""
+    if not entrees:
+        return
+    from .models import AuditLog
+
+    if getattr(settings, 'AUDIT_MODE', 'direct') == 'celery':
+        lignes = [
+            {
+                'utilisateur_id': entree.utilisateur_id,
+                'action': entree.action,
+                'modele': entree.modele,
+                'objet_id': entree.objet_id,
+                'details': entree.details,
+                'ip_adresse': entree.ip_adresse,
+            }
+            for entree in entrees
+        ]
+        transaction.on_commit(lambda: _envoyer(lignes, entrees))
+        return
+
+    AuditLog.objects.bulk_create(entrees)
+
+
+def _envoyer(lignes, entrees):
+    try:
+        from .tasks import enregistrer_audits
+        enregistrer_audits.delay(lignes)
+    except Exception as e:
+        logger.warning(f"Écriture directe de {len(entrees)} entrée(s) d'audit: {e}")
+        from .models import AuditLog
+        AuditLog.objects.bulk_create(entrees)
+
+
+@contextmanager
+def tampon_audit():
+    """Regroupe les écritures d'audit du bloc (utilisable aussi comme décorateur)"""
+    if _tampon_courant.get() is not None:
+        # Tampon déjà ouvert par l'appelant: c'est lui qui écrira
+        yield
+        return
+
+    tampon = TamponAudit()
+    jeton = _tampon_courant.set(tampon)
+    try:
+        yield
+    finally:
+        _tampon_courant.reset(jeton)
+        tampon.ouvert = False
+        try:
+            ecrire_audits(tampon.entrees)
+        except Exception as e:
+            # Ne jamais faire échouer la requête à cause de l'audit
+            logger.exception(f"Erreur lors de l'écriture du journal d'audit ({len(tampon.entrees)} entrée(s)): {e}")
@@ -0,0 +1,145 @@
+"""
+Champs à la demande des sérialiseurs (``?fields=`` / ``?expand=``) pour les lectures de l'API.
+
+- ``?fields=id,nom_association,presidente.nom_complet``: seuls les champs listés sont rendus;
+  la notation pointée restreint un objet imbriqué. Les champs non demandés sont retirés du
+  sérialiseur avant le rendu: les sérialiseurs imbriqués et les ``SerializerMethodField``
+  correspondants ne sont jamais évalués.
+- ``?expand=presidente,caisse.region``: développe les relations déclarées dans
+  ``champs_extensibles``. Avec ``?fields=``, une relation extensible demandée sans être
+  développée est rendue par son identifiant.
+
+Sans ``?fields=``, la représentation est inchangée. Les vues (``ChampsDynamiquesVueMixin``)
+retirent de leur queryset les ``select_related`` / ``prefetch_related`` devenus inutiles.
+"""
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+PARAMETRE_CHAMPS = 'fields'
+PARAMETRE_EXTENSION = 'expand'
+
+
+def analyser(valeur):
+    """``'a,b.c,b.d'`` → ``{'a': {}, 'b': {'c': {}, 'd': {}}}`` (None si le paramètre est absent)"""
+    if valeur is None:
+        return None
+    arbre = {}
+    for chemin in valeur.split(','):
+        noeud = arbre
+        for nom in filter(None, (partie.strip() for partie in chemin.split('.'))):
+            noeud = noeud.setdefault(nom, {})
+    return arbre
+
+
+def forme_demandee(request):
+    """(champs, extension) demandés par une lecture, ou None si la représentation complète est attendue"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    champs = analyser(request.query_params.get(PARAMETRE_CHAMPS))
+    if champs is None:
+        return None
+    return champs, analyser(request.query_params.get(PARAMETRE_EXTENSION)) or {}
+
+
+class ChampsDynamiquesMixin:
+    """
+    Mixin de sérialiseur appliquant ``?fields=`` / ``?expand=`` de la requête du contexte.
+
+    - ``champs_extensibles``: champs imbriqués développés seulement à la demande (sous ``?fields=``);
+    - ``relations_par_champ``: relations lues par les champs calculés (``SerializerMethodField``),
+      pour que la vue conserve leurs ``select_related`` / ``prefetch_related``.
+    """
+    champs_extensibles = ()
+    relations_par_champ = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        forme = forme_demandee(self.context.get('request'))
+        if forme is not None:
+            self.restreindre(*forme)
+
+    def restreindre(self, champs, extension):
+        demandes = set(champs) | set(extension)
+        for nom in list(self.fields):
+            if nom not in demandes:
+                self.fields.pop(nom)
+
+        for nom in self.champs_extensibles:
+            if nom not in self.fields:
+                continue
+            sous_champs, sous_extension = champs.get(nom), extension.get(nom)
+            if not sous_champs and sous_extension is None:
+                # Demandé sans être développé: identifiant(s) seulement
+                plusieurs = isinstance(self.fields[nom], serializers.ListSerializer)
+                self.fields[nom] = serializers.PrimaryKeyRelatedField(read_only=True, many=plusieurs)
+                continue
+            imbrique = self.fields[nom]
+            imbrique = getattr(imbrique, 'child', imbrique)
+            if sous_champs and isinstance(imbrique, ChampsDynamiquesMixin):
+                imbrique.restreindre(sous_champs, sous_extension or {})
+
+    def relations_utilisees(self):
+        """Premiers segments des relations lues par les champs restants"""
+        relations = set()
+        for nom, champ in self.fields.items():
+            if champ.write_only:
+                continue
+            if nom in self.relations_par_champ:
+                relations.update(self.relations_par_champ[nom])
+            elif champ.source != '*':
+                relations.add(champ.source.split('.')[0])
+        return relations
+
+
+def _chemins_select(arbre, prefixe=''):
+    for nom, enfants in arbre.items():
+        chemin = f'{prefixe}{nom}'
+        if enfants:
+            yield from _chemins_select(enfants, f'{chemin}__')
+        else:
+            yield chemin
+
+
+def restreindre_chargements(queryset, relations):
+    """Ne garde que les ``select_related`` / ``prefetch_related`` qui partent d'une des relations"""
+    select = queryset.query.select_related
+    if isinstance(select, dict):
+        chemins = [chemin for chemin in _chemins_select(select) if chemin.split('__')[0] in relations]
+        queryset = queryset.select_related(None)
+        if chemins:
+            queryset = queryset.select_related(*chemins)
+
+    lookups = queryset._prefetch_related_lookups
+    if lookups:
+        gardes = [
+            lookup for lookup in lookups
+            if (lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup).split('__')[0] in relations
+        ]
+        queryset = queryset.prefetch_related(None)
+        if gardes:
+            queryset = queryset.prefetch_related(*gardes)
+    return queryset
+
+
+class ChampsDynamiquesVueMixin:
+    """Mixin de ViewSet: queryset limité aux relations des champs demandés par ``?fields=``"""
+
+    def champs_serialises(self):
+        """Noms des champs rendus par la requête courante, ou None pour la représentation complète"""
+        if not hasattr(self, '_champs_serialises'):
+            self._champs_serialises = None
+            self._relations_serialisees = None
+            if forme_demandee(self.request) is not None:
+                serializer = self.get_serializer()
+                if isinstance(serializer, ChampsDynamiquesMixin):
+                    self._champs_serialises = set(serializer.fields)
+                    self._relations_serialisees = serializer.relations_utilisees()
+        return self._champs_serialises
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.champs_serialises() is None:
+            return queryset
+        return restreindre_chargements(queryset, self._relations_serialisees)
@@ -0,0 +1,119 @@
+"""
+Compteurs de la cloche (notifications non lues, demandes de prêt en attente, prêts en attente).
+
+Chaque compteur est calculé en une requête puis servi depuis le cache. Les clés embarquent
+deux numéros de version: celui de l'utilisateur (incrémenté quand une de ses notifications
+change) et celui des prêts (incrémenté quand un prêt change). Incrémenter une version rend
+les anciennes valeurs inaccessibles, et sert aussi de signal de changement au flux
+``notifications_flux`` (SSE / long-poll).
+
+En production multi-processus, le cache doit être partagé (Redis) pour que les
+invalidations soient vues par tous les workers.
+"""
+import time
+
+from django.core.cache import cache
+
+
+PREFIXE = 'gestion_caisses:compteurs'
+STATUTS_PRET_EN_ATTENTE = ('EN_ATTENTE_ADMIN', 'EN_ATTENTE')
+TYPES_DEMANDE_PRET = ('DEMANDE_PRET', 'ATTENTE_PRET')
+# Filet de sécurité: une valeur n'est jamais servie plus d'une heure sans recalcul
+DUREE_CACHE = 3600
+
+
+def _cle_version_utilisateur(user_id):
+    return f'{PREFIXE}:version:utilisateur:{user_id}'
+
+
+_CLE_VERSION_PRETS = f'{PREFIXE}:version:prets'
+
+
+def _incrementer(cle):
+    try:
+        cache.incr(cle)
+    except ValueError:
+        # Clé absente (expirée ou jamais créée): repartir d'une valeur qui ne peut pas avoir été servie
+        cache.set(cle, time.time_ns(), None)
+
+
+def versions(user_id):
+    """(version utilisateur, version prêts), initialisées si besoin"""
+    cles = [_cle_version_utilisateur(user_id), _CLE_VERSION_PRETS]
+    valeurs = cache.get_many(cles)
+    for cle in cles:
+        if cle not in valeurs:
+            cache.add(cle, time.time_ns(), None)
+            valeurs[cle] = cache.get(cle)
+    return valeurs[cles[0]], valeurs[cles[1]]
+
+
+def version(user_id):
+    """Empreinte de l'état des compteurs d'un utilisateur (change à chaque invalidation)"""
+    return '{}-{}'.format(*versions(user_id))
+
+
+def signaler_utilisateurs(user_ids):
+    """Invalide les compteurs des utilisateurs dont les notifications ont changé"""
+    for user_id in set(user_ids):
+        _incrementer(_cle_version_utilisateur(user_id))
+
+
+def signaler_prets():
+    """Invalide les compteurs dépendant du statut des prêts"""
+    _incrementer(_CLE_VERSION_PRETS)
+
+
+def compter_non_lues(user_id):
+    from .models import Notification
+    return Notification.objects.filter(destinataire_id=user_id, statut='NON_LU').count()
+
+
+def compter_demandes_pret_en_attente(user_id):
+    """Nombre de prêts distincts en attente pour lesquels l'utilisateur a été notifié"""
+    from .models import Notification
+    return (
+        Notification.objects
+        .filter(
+            destinataire_id=user_id,
+            type_notification__in=TYPES_DEMANDE_PRET,
+            pret__statut__in=STATUTS_PRET_EN_ATTENTE,
+        )
+        .values('pret_id').distinct().count()
+    )
+
+
+def compter_prets_en_attente():
+    from .models import Pret
+    return Pret.objects.filter(statut__in=STATUTS_PRET_EN_ATTENTE).count()
+
+
+def etat(user, noms=None):
+    """Compteurs de la cloche pour un utilisateur, lus en un seul accès au cache
+
+    ``noms``: compteurs à calculer (tous par défaut), pour ne pas recalculer les autres sur un cache froid.
+    """
+    version_utilisateur, version_prets = versions(user.pk)
+    calculs = {
+        f'{PREFIXE}:non_lues:{user.pk}:{version_utilisateur}':
+            ('non_lues', lambda: compter_non_lues(user.pk)),
+        f'{PREFIXE}:demandes:{user.pk}:{version_utilisateur}:{version_prets}':
+            ('demandes_pret_en_attente', lambda: compter_demandes_pret_en_attente(user.pk)),
+    }
+    if user.is_superuser:
+        calculs[f'{PREFIXE}:prets_en_attente:{version_prets}'] = ('prets_en_attente', compter_prets_en_attente)
+
+    if noms is not None:
+        calculs = {cle: calcul for cle, calcul in calculs.items() if calcul[0] in noms}
+
+    en_cache = cache.get_many(list(calculs))
+    manquants = {}
+    resultat = {'version': f'{version_utilisateur}-{version_prets}', 'prets_en_attente': 0}
+    for cle, (nom, calcul) in calculs.items():
+        if cle in en_cache:
+            resultat[nom] = en_cache[cle]
+        else:
+            resultat[nom] = manquants[cle] = calcul()
+    if manquants:
+        cache.set_many(manquants, DUREE_CACHE)
+    return resultat
@@ -0,0 +1,181 @@
+"""
+GET conditionnels (ETag / Last-Modified) pilotés par des versions de données par caisse.
+
+Chaque caisse possède dans le cache une version: l'horodatage (ns) de sa dernière modification,
+mis à jour par les signaux post_save / post_delete des modèles qui lui sont rattachés
+(membres, prêts, échéances, mouvements, cotisations...). Une version globale suit l'ensemble
+des caisses et sert au périmètre administrateur.
+
+L'ETag d'une réponse est calculé à partir des versions des caisses du périmètre de l'utilisateur,
+du chemin, des paramètres de la requête et de la date du jour: un ``If-None-Match`` à jour est
+donc servi en 304 avant l'exécution des querysets coûteux. ``Last-Modified`` correspond à la
+modification la plus récente du périmètre.
+
+Les mises à jour en masse (``QuerySet.update``) ne déclenchent pas de signal: elles doivent
+appeler ``signaler_caisses`` explicitement.
+
+Les versions doivent être vues par tous les processus (workers web, Celery): sans cache partagé
+(``GET_CONDITIONNEL`` faux, par défaut avec un cache LocMem), un worker servirait des 304 sur des
+versions périmées. Les validateurs ne sont alors ni calculés ni envoyés.
+"""
+from functools import wraps
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+
+PREFIXE = 'gestion_caisses:versions'
+_CLE_GLOBALE = f'{PREFIXE}:global'
+
+
+def _cle_caisse(caisse_id):
+    return f'{PREFIXE}:caisse:{caisse_id}'
+
+
+def actif():
+    """GET conditionnels servis uniquement si les versions sont dans un cache partagé"""
+    return getattr(settings, 'GET_CONDITIONNEL', False)
+
+
+def signaler_caisses(caisse_ids):
+    """Marque les caisses (et le périmètre global) comme modifiées maintenant"""
+    if not actif():
+        return
+    cles = [_cle_caisse(caisse_id) for caisse_id in set(caisse_ids) if caisse_id is not None]
+    cles.append(_CLE_GLOBALE)
+    maintenant = time.time_ns()
+    anciennes = cache.get_many(cles)
+    # Versions strictement croissantes, même si les horloges des workers divergent légèrement
+    cache.set_many({cle: max(maintenant, anciennes.get(cle, 0) + 1) for cle in cles}, None)
+
+
+def versions(caisse_ids=None):
+    """Versions des caisses demandées (ou version globale si ``caisse_ids`` est None), initialisées si besoin"""
+    cles = [_CLE_GLOBALE] if caisse_ids is None else [_cle_caisse(caisse_id) for caisse_id in caisse_ids]
+    valeurs = cache.get_many(cles)
+    manquantes = [cle for cle in cles if cle not in valeurs]
+    if manquantes:
+        # Version inconnue (cache vidé): considérer le périmètre comme modifié maintenant
+        maintenant = time.time_ns()
+        for cle in manquantes:
+            cache.add(cle, maintenant, None)
+        valeurs.update(cache.get_many(manquantes))
+    return [valeurs.get(cle, 0) for cle in cles]
+
+
+def caisses_du_perimetre(user):
+    """None pour un administrateur (toutes les caisses), sinon identifiants triés des caisses accessibles"""
+    if user.is_superuser:
+        return None
+    from .views import get_user_caisses
+    identifiants = sorted(get_user_caisses(user).values_list('id', flat=True))
+    # Sans caisse rattachée, certaines vues ne filtrent pas: se rabattre sur la version globale
+    return identifiants or None
+
+
+def validateurs(request, caisse_ids=None):
+    """(ETag, horodatage de dernière modification) d'une requête GET pour un périmètre de caisses"""
+    valeurs = versions(caisse_ids)
+    parametres = '&'.join(f'{cle}={valeur}' for cle, valeur in sorted(request.GET.lists()))
+    empreinte = hashlib.sha1('|'.join([
+        str(request.user.pk),
+        request.path,
+        parametres,
+        request.META.get('HTTP_ACCEPT', ''),
+        timezone.localdate().isoformat(),
+        ','.join(map(str, caisse_ids or [])),
+        ','.join(map(str, valeurs)),
+    ]).encode()).hexdigest()[:24]
+    return f'"{empreinte}"', max(valeurs) / 1e9
+
+
+def appliquer_validateurs(response, etag, derniere_modification):
+    """Ajoute ETag / Last-Modified et impose la revalidation à chaque affichage"""
+    if not response.has_header('ETag'):
+        response['ETag'] = etag
+    if not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(derniere_modification)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class NonModifie(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+    default_detail = ''
+
+
+class GetConditionnelMixin:
+    """
+    Mixin de ViewSet DRF: ETag / Last-Modified sur les lectures, 304 sur ``If-None-Match`` /
+    ``If-Modified-Since`` à jour, vérifié après authentification et permissions mais avant
+    l'exécution de l'action.
+
+    - ``actions_conditionnelles``: actions concernées (les PDF, qui dépendent aussi des paramètres
+      globaux, en sont exclus par défaut);
+    - ``parametre_caisse``: paramètre de filtre restreignant la réponse à une caisse
+      (l'ETag ne dépend alors que de cette caisse);
+    - ``caisse_depuis_pk``: les actions de détail portent sur la caisse identifiée par ``pk``.
+    """
+    actions_conditionnelles = ('list', 'retrieve')
+    parametre_caisse = None
+    caisse_depuis_pk = False
+
+    def caisses_concernees(self, request):
+        perimetre = caisses_du_perimetre(request.user)
+        if self.caisse_depuis_pk and self.detail:
+            valeur = str(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, ''))
+        elif self.parametre_caisse:
+            valeur = request.query_params.get(self.parametre_caisse)
+        else:
+            valeur = None
+        if valeur and valeur.isdigit() and (perimetre is None or int(valeur) in perimetre):
+            return [int(valeur)]
+        return perimetre
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._validateurs = None
+        if not actif() or request.method not in ('GET', 'HEAD') or self.action not in self.actions_conditionnelles:
+            return
+        etag, derniere = validateurs(request, self.caisses_concernees(request))
+        self._validateurs = (etag, derniere)
+        if get_conditional_response(request, etag=etag, last_modified=int(derniere)) is not None:
+            raise NonModifie()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NonModifie):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        valeurs = getattr(self, '_validateurs', None)
+        if valeurs and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            appliquer_validateurs(response, *valeurs)
+        return response
+
+
+def get_conditionnel(vue):
+    """Équivalent de ``GetConditionnelMixin`` pour une vue fonction (à placer sous ``login_required``)"""
+
+    @wraps(vue)
+    def enveloppe(request, *args, **kwargs):
+        if not actif() or request.method not in ('GET', 'HEAD') or not request.user.is_authenticated:
+            return vue(request, *args, **kwargs)
+        etag, derniere = validateurs(request, caisses_du_perimetre(request.user))
+        response = get_conditional_response(request, etag=etag, last_modified=int(derniere))
+        if response is None:
+            response = vue(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return appliquer_validateurs(response, etag, derniere)
+
+    return enveloppe
@@ -1,4 +1,4 @@
-from .utils import get_parametres_application
+from .parametres import get_parametres_application
 
 
 def app_params(request):
@@ -4,7 +4,7 @@ Décorateurs pour l'audit automatique des actions utilisateur
 from functools import wraps
 from django.http import HttpRequest
 from django.contrib.auth.models import User
-from .models import AuditLog
+from .audit import journaliser_audit
 import json
 
 def audit_action(action_type, model_name=None, get_object_id=None, get_details=None):
@@ -50,7 +50,7 @@ def audit_action(action_type, model_name=None, get_object_id=None, get_details=N
                 })
                 
                 # Créer l'entrée d'audit
-                AuditLog.objects.create(
+                journaliser_audit(
                     utilisateur=user,
                     action=action_type,
                     modele=model_name or 'Unknown',
@@ -92,7 +92,7 @@ def audit_api_action(action_type, model_name=None):
                         request_data = {}
                 
                 # Créer l'entrée d'audit
-                AuditLog.objects.create(
+                journaliser_audit(
                     utilisateur=user,
                     action=action_type,
                     modele=model_name or 'API',
@@ -0,0 +1,50 @@
+"""
+Génération des documents (PDF ReportLab, classeurs Excel openpyxl) chargée à la première utilisation.
+
+Les générateurs vivent dans utils.py et echeances_utils.py, qui importent ReportLab au
+chargement. Les vues, l'admin et les modèles importent les fonctions de ce module: chaque
+fonction n'importe son module de rendu qu'au premier appel, si bien qu'un processus qui ne
+produit aucun document (worker gunicorn ou Celery) ne charge jamais ReportLab ni openpyxl.
+"""
+from importlib import import_module
+import time
+
+from . import metriques
+
+
+def _differee(module, nom):
+    """Fonction déléguant à ``module.nom``, importé au premier appel (durée de rendu mesurée)"""
+    def fonction(*args, **kwargs):
+        debut = time.perf_counter()
+        try:
+            return getattr(import_module(module, __package__), nom)(*args, **kwargs)
+        finally:
+            metriques.DOCUMENT_DUREE.observer(time.perf_counter() - debut, generateur=nom)
+    fonction.__name__ = fonction.__qualname__ = nom
+    fonction.__doc__ = f"Voir {module.lstrip('.')}.{nom} (importé au premier appel)."
+    return fonction
+
+
+# Prêts et remboursements
+generate_pret_octroi_pdf = _differee('.utils', 'generate_pret_octroi_pdf')
+generate_remboursement_pdf = _differee('.utils', 'generate_remboursement_pdf')
+generate_remboursement_complet_pdf = _differee('.utils', 'generate_remboursement_complet_pdf')
+generate_prets_evaluation_pdf = _differee('.utils', 'generate_prets_evaluation_pdf')
+generate_prets_par_motif_pdf = _differee('.utils', 'generate_prets_par_motif_pdf')
+generate_echeances_retard_pdf = _differee('.echeances_utils', 'generate_echeances_retard_pdf')
+
+# Membres, agents et caisses
+generate_membres_liste_pdf = _differee('.utils', 'generate_membres_liste_pdf')
+generate_membre_individual_pdf = _differee('.utils', 'generate_membre_individual_pdf')
+generate_membres_systeme_pdf = _differee('.utils', 'generate_membres_systeme_pdf')
+generate_agents_systeme_pdf = _differee('.utils', 'generate_agents_systeme_pdf')
+generate_partage_fonds_pdf = _differee('.utils', 'generate_partage_fonds_pdf')
+generate_fiche_paie_pdf = _differee('.utils', 'generate_fiche_paie_pdf')
+create_credentials_pdf_response = _differee('.utils', 'create_credentials_pdf_response')
+create_agent_credentials_pdf_response = _differee('.utils', 'create_agent_credentials_pdf_response')
+
+# Rapports et guide
+generate_rapport_pdf = _differee('.utils', 'generate_rapport_pdf')
+export_rapport_excel = _differee('.utils', 'export_rapport_excel')
+export_rapport_csv = _differee('.utils', 'export_rapport_csv')
+generate_application_guide_pdf = _differee('.utils', 'generate_application_guide_pdf')
@@ -0,0 +1,117 @@
+"""
+Hiérarchie géographique complète (Région → Préfecture → Commune → Canton → Village → Quartier)
+servie en un seul document par ``/api/geo/tree/``.
+
+L'arbre est construit en six requêtes, puis conservé dans le cache partagé et en mémoire du
+processus. La clé embarque un numéro de version incrémenté par les signaux post_save /
+post_delete des modèles géographiques (même principe que ``compteurs``); l'ETag en est dérivé,
+ce qui permet aux clients de revalider avec un simple 304.
+"""
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+
+
+PREFIXE = 'gestion_caisses:geo'
+_CLE_VERSION = f'{PREFIXE}:version'
+# Les données changent quelques fois par an: l'invalidation se fait par version
+DUREE_CACHE = 24 * 3600
+
+# (paramètre de requête, nom du modèle, champ parent, clé des enfants dans le noeud)
+NIVEAUX = (
+    ('region', 'Region', None, 'prefectures'),
+    ('prefecture', 'Prefecture', 'region_id', 'communes'),
+    ('commune', 'Commune', 'prefecture_id', 'cantons'),
+    ('canton', 'Canton', 'commune_id', 'villages'),
+    ('village', 'Village', 'canton_id', 'quartiers'),
+    ('quartier', 'Quartier', 'village_id', None),
+)
+
+# Copie locale au processus: (version, arbre en JSON, index des noeuds), remplacée d'un bloc
+_local = (None, None, None)
+
+
+def version():
+    valeur = cache.get(_CLE_VERSION)
+    if valeur is None:
+        cache.add(_CLE_VERSION, time.time_ns(), None)
+        valeur = cache.get(_CLE_VERSION)
+    return valeur
+
+
+def invalider():
+    """Rend obsolètes l'arbre en cache et les ETag déjà distribués"""
+    try:
+        cache.incr(_CLE_VERSION)
+    except ValueError:
+        cache.set(_CLE_VERSION, time.time_ns(), None)
+
+
+def construire_arbre():
+    """Arbre complet sous forme de listes de noeuds imbriqués ``{id, nom, code, <enfants>}``"""
+    from . import models
+
+    arbre = []
+    parents, cle_parent = {}, None
+    for _parametre, nom_modele, champ_parent, cle_enfants in NIVEAUX:
+        modele = getattr(models, nom_modele)
+        champs = ['id', 'nom', 'code'] + ([champ_parent] if champ_parent else [])
+        noeuds = {}
+        for ligne in modele.objects.order_by('nom', 'id').values_list(*champs):
+            noeud = {'id': ligne[0], 'nom': ligne[1], 'code': ligne[2]}
+            if cle_enfants:
+                noeud[cle_enfants] = []
+            if champ_parent is None:
+                arbre.append(noeud)
+            elif ligne[3] in parents:
+                parents[ligne[3]][cle_parent].append(noeud)
+            noeuds[ligne[0]] = noeud
+        parents, cle_parent = noeuds, cle_enfants
+    return arbre
+
+
+def _indexer(noeuds, profondeur=0, index=None):
+    """{(niveau, id): noeud} pour servir les sous-arbres sans parcours"""
+    index = {} if index is None else index
+    parametre, _modele, _parent, cle_enfants = NIVEAUX[profondeur]
+    for noeud in noeuds:
+        index[(parametre, noeud['id'])] = noeud
+        if cle_enfants:
+            _indexer(noeud[cle_enfants], profondeur + 1, index)
+    return index
+
+
+def _charger():
+    """(arbre sérialisé en JSON, index des noeuds) depuis la mémoire du processus, le cache partagé ou la base"""
+    global _local
+    courante = version()
+    local = _local
+    if local[0] == courante:
+        return local[1], local[2]
+    cle = f'{PREFIXE}:arbre:{courante}'
+    contenu = cache.get(cle)
+    if contenu is None:
+        contenu = json.dumps(construire_arbre(), ensure_ascii=False, separators=(',', ':'))
+        cache.set(cle, contenu, DUREE_CACHE)
+    index = _indexer(json.loads(contenu))
+    _local = (courante, contenu, index)
+    return contenu, index
+
+
+def etag(niveau=None, identifiant=None):
+    """ETag fort de l'arbre (ou d'un sous-arbre), calculé sans accès à la base"""
+    empreinte = hashlib.sha1(f'{version()}:{niveau}:{identifiant}'.encode()).hexdigest()[:20]
+    return f'"{empreinte}"'
+
+
+def document(niveau=None, identifiant=None):
+    """Contenu JSON de l'arbre complet ou du sous-arbre d'un noeud (None si le noeud n'existe pas)"""
+    contenu, index = _charger()
+    if niveau is None:
+        return contenu
+    noeud = index.get((niveau, identifiant))
+    if noeud is None:
+        return None
+    return json.dumps(noeud, ensure_ascii=False, separators=(',', ':'))
@@ -0,0 +1,88 @@
+"""
+Écritures rejouables sans double effet (cotisations, remboursements).
+
+Le client joint à l'écriture une clé unique: en-tête ``Idempotency-Key``, ou ``cle`` de chaque
+opération d'un lot ``/api/outbox/``. La clé est inscrite dans la même transaction que l'écriture:
+
+- à la première réception, l'opération est exécutée et sa réponse conservée avec la clé;
+- un renvoi (réponse perdue, file hors ligne renvoyée) reçoit la réponse conservée, sans nouvelle
+  écriture (en-tête ``Idempotent-Replay: true``); un renvoi concurrent attend le premier;
+- la même clé avec un contenu différent est refusée (422) sans rien écrire.
+
+Une opération en échec n'inscrit pas sa clé: le client peut corriger et renvoyer. Les clés
+expirent après ``IDEMPOTENCE_DUREE`` secondes (tâche ``purger_cles_idempotence``).
+"""
+from datetime import timedelta
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+
+EN_TETE = 'HTTP_IDEMPOTENCY_KEY'
+LONGUEUR_MAX = 100
+
+
+class ConflitIdempotence(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "Cette clé d'idempotence a déjà été utilisée pour une autre requête."
+    default_code = 'conflit_idempotence'
+
+
+def empreinte(operation, donnees):
+    contenu = json.dumps([operation, donnees], sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(contenu.encode()).hexdigest()
+
+
+def executer(utilisateur, cle, operation, donnees, fonction):
+    """Exécute ``fonction() -> (statut, corps)`` une seule fois par clé; renvoie ``(statut, corps, rejoue)``.
+
+    ``fonction`` signale un échec par une exception: l'écriture et la clé sont alors annulées.
+    """
+    from .models import CleIdempotence
+
+    if not isinstance(cle, str) or not cle or len(cle) > LONGUEUR_MAX:
+        raise ValidationError({'cle': f"Clé d'idempotence obligatoire ({LONGUEUR_MAX} caractères au plus)."})
+    signature = empreinte(operation, donnees)
+    maintenant = timezone.now()
+
+    with transaction.atomic():
+        CleIdempotence.objects.filter(utilisateur=utilisateur, cle=cle, date_expiration__lte=maintenant).delete()
+        try:
+            # Inscrite avant l'écriture: un renvoi concurrent bloque sur la contrainte d'unicité
+            with transaction.atomic():
+                enregistrement = CleIdempotence.objects.create(
+                    utilisateur=utilisateur, cle=cle, operation=operation, empreinte=signature, statut_http=0,
+                    date_expiration=maintenant + timedelta(seconds=getattr(settings, 'IDEMPOTENCE_DUREE', 604800)),
+                )
+        except IntegrityError:
+            existant = CleIdempotence.objects.get(utilisateur=utilisateur, cle=cle)
+            if existant.empreinte != signature:
+                raise ConflitIdempotence()
+            return existant.statut_http, existant.reponse, True
+
+        statut, corps = fonction()
+        enregistrement.statut_http, enregistrement.reponse = statut, corps
+        enregistrement.save(update_fields=['statut_http', 'reponse'])
+    return statut, corps, False
+
+
+def reponse_idempotente(request, operation, fonction, donnees=None):
+    """Réponse DRF d'une écriture, rejouable si la requête porte l'en-tête ``Idempotency-Key``"""
+    cle = request.META.get(EN_TETE)
+    if not cle:
+        statut, corps = fonction()
+        return Response(corps, status=statut)
+    if donnees is None:
+        donnees = request.data.dict() if hasattr(request.data, 'dict') else request.data
+    statut, corps, rejoue = executer(request.user, cle, operation, donnees, fonction)
+    response = Response(corps, status=statut)
+    if rejoue:
+        response['Idempotent-Replay'] = 'true'
+    return response
@@ -0,0 +1,132 @@
+"""
+Instrumentation SQL par requête HTTP.
+
+- ``CollecteurSQL`` s'accroche à ``execute_wrapper`` sur toutes les bases (``sur_toutes_les_bases``:
+  principale et réplique de rapports) et mesure le nombre de requêtes, le temps passé en base,
+  la requête la plus lente et les requêtes dupliquées.
+- ``BUDGETS_REQUETES`` associe un endpoint (``CaisseViewSet.list``, ``DashboardViewSet.stats``...)
+  au nombre maximal de requêtes SQL toléré. Les budgets sont vérifiés dans les tests
+  (``BudgetRequetesMixin``) et, si ``SQL_BUDGETS_ALERTE`` est actif, journalisés en production.
+"""
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+# Budgets par défaut (nombre maximal de requêtes SQL par appel), complétés/écrasés par settings.SQL_BUDGETS_REQUETES
+BUDGETS_REQUETES = {
+    'CaisseViewSet.list': 8,
+    'MembreViewSet.list': 6,
+    'NotificationViewSet.non_lues': 4,
+    'DashboardViewSet.stats': 20,
+}
+
+
+def definir_budget(endpoint, maximum):
+    """Déclare (ou remplace) le budget de requêtes d'un endpoint."""
+    BUDGETS_REQUETES[endpoint] = maximum
+
+
+def budget_pour(endpoint):
+    """Budget applicable à un endpoint (None si aucun budget déclaré)."""
+    surcharges = getattr(settings, 'SQL_BUDGETS_REQUETES', None) or {}
+    if endpoint in surcharges:
+        return surcharges[endpoint]
+    return BUDGETS_REQUETES.get(endpoint)
+
+
+def nom_endpoint(request):
+    """Nom stable de l'endpoint servi: ``ViewSet.action`` pour DRF, nom de fonction sinon."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    vue = match.func
+    classe = getattr(vue, 'cls', None) or getattr(vue, 'view_class', None)
+    if classe is None:
+        return getattr(vue, '__name__', match.view_name)
+    actions = getattr(vue, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f"{classe.__name__}.{action}"
+
+
+@contextmanager
+def sur_toutes_les_bases(wrapper):
+    """Installe ``wrapper`` sur la connexion de chaque alias de ``DATABASES`` (lectures routées vers la réplique comprises)"""
+    with ExitStack() as pile:
+        for alias in connections:
+            pile.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield wrapper
+
+
+class CollecteurSQL:
+    """Wrapper d'exécution SQL accumulant les statistiques d'une requête HTTP (ou d'un bloc de code)."""
+
+    def __init__(self, detail=False):
+        self.nombre = 0
+        self.duree = 0.0
+        self.plus_lente = ('', 0.0)
+        self.instructions = Counter()
+        # Liste ordonnée des requêtes (sql, paramètres, durée) conservée uniquement sur demande
+        self.requetes = [] if detail else None
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duree = time.perf_counter() - debut
+            self.nombre += 1
+            self.duree += duree
+            self.instructions[sql] += 1
+            if duree > self.plus_lente[1]:
+                self.plus_lente = (sql, duree)
+            if self.requetes is not None:
+                self.requetes.append({
+                    'sql': sql,
+                    'params': repr(params)[:500],
+                    'duree_ms': round(duree * 1000, 3),
+                })
+
+    @property
+    def doublons(self):
+        """Nombre d'exécutions redondantes d'une même instruction SQL (symptôme d'un N+1)."""
+        return sum(n - 1 for n in self.instructions.values() if n > 1)
+
+    @property
+    def instruction_la_plus_repetee(self):
+        if not self.instructions:
+            return ('', 0)
+        return self.instructions.most_common(1)[0]
+
+    def resume(self):
+        sql_lente, duree_lente = self.plus_lente
+        sql_repetee, repetitions = self.instruction_la_plus_repetee
+        return {
+            'requetes': self.nombre,
+            'duree_db_ms': round(self.duree * 1000, 2),
+            'plus_lente_ms': round(duree_lente * 1000, 2),
+            'plus_lente_sql': sql_lente[:300],
+            'doublons': self.doublons,
+            'plus_repetee_sql': sql_repetee[:300] if repetitions > 1 else '',
+            'plus_repetee_nombre': repetitions if repetitions > 1 else 0,
+        }
+
+
+class BudgetRequetesMixin:
+    """Mixin de TestCase: vérifie qu'une réponse respecte le budget SQL de son endpoint."""
+
+    def assertRespecteBudget(self, response, endpoint=None):
+        request = response.wsgi_request
+        collecteur = getattr(request, 'collecteur_sql', None)
+        self.assertIsNotNone(collecteur, "SQLInstrumentationMiddleware n'est pas actif.")
+        endpoint = endpoint or nom_endpoint(request)
+        budget = budget_pour(endpoint)
+        self.assertIsNotNone(budget, f"Aucun budget de requêtes déclaré pour {endpoint}.")
+        self.assertLessEqual(
+            collecteur.nombre, budget,
+            f"{endpoint}: {collecteur.nombre} requêtes SQL pour un budget de {budget} "
+            f"(instruction la plus répétée: {collecteur.instruction_la_plus_repetee})"
+        )
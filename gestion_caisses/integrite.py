@@ -0,0 +1,319 @@
+"""
+Vérification d'intégrité du grand livre (``verifier_integrite_view``, tâche ``verifier_integrite``).
+
+Pour chaque caisse, ``verifier_caisse`` rejoue les ``MouvementFond`` dans l'ordre d'écriture et
+signale:
+
+- ``CALCUL_MOUVEMENT``: ``solde_apres`` différent de ``solde_avant`` ± ``montant`` (même règle de
+  signe que ``MouvementFond.save``);
+- ``CHAINE_SOLDES``: ``solde_avant`` différent du ``solde_apres`` du mouvement précédent
+  (modification du solde hors mouvement: fond initial, écriture concurrente sans verrou...);
+- ``FOND_DISPONIBLE``: ``fond_disponible`` différent du solde du dernier mouvement
+  (``fond_initial`` sans mouvement);
+- ``REMBOURSEMENTS_PRET``: ``montant_rembourse`` d'un prêt différent du principal de ses
+  mouvements REMBOURSEMENT (``montant`` moins ``interet_rembourse``);
+- ``ECHEANCES_PRET``: paiements saisis sur les échéances différents des montants encaissés
+  (prêts dont au moins une échéance porte un paiement), ``ECHEANCE_STATUT``: échéance payée
+  partiellement marquée PAYE ou payée au-delà de son montant.
+
+La caisse générale est vérifiée à part: chaîne de ``CaisseGeneraleMouvement``, ``solde_reserve``
+et ``solde_total_caisses`` (somme des ``fond_disponible``).
+
+Les caisses sont réparties entre ``INTEGRITE_PROCESSUS`` processus (nombre de cœurs par défaut),
+un par tranche de ``MOUVEMENTS_PAR_PROCESSUS`` mouvements à rejouer. Chaque processus est démarré
+à neuf (``spawn``) avec sa propre connexion: la connexion du processus principal, qui peut porter
+le verrou de la tâche, n'est jamais partagée. Les résultats (``ResultatIntegrite``) sont écrits par
+lots au fil de l'eau. En mode incrémental, une caisse n'est revérifiée que si son journal de
+synchronisation a avancé ou si son ``fond_disponible`` a changé depuis son dernier résultat; les
+écritures en masse qui ne passent pas par le journal demandent une vérification complète.
+"""
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from decimal import Decimal
+import logging
+import multiprocessing
+import os
+import time
+import traceback
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+
+
+CREDITS = {'ALIMENTATION', 'REMBOURSEMENT', 'RECEPTION_CAISSE', 'RECEPTION_GENERALE'}
+CREDITS_RESERVE = {'ENTREE'}
+# Anomalies détaillées par caisse (toutes sont comptées)
+ANOMALIES_MAX = 50
+# Résultats écrits par lot
+TAILLE_LOT = 50
+# Un processus de plus par tranche de mouvements à rejouer (démarrer un processus coûte ~0,5 s)
+MOUVEMENTS_PAR_PROCESSUS = 100000
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _instantane():
+    """Lectures cohérentes entre elles (soldes, mouvements, prêts) malgré les écritures concurrentes"""
+    externe = not connection.in_atomic_block
+    with transaction.atomic():
+        # Instantané unique pour toute la transaction (seulement possible avant sa première requête)
+        if externe and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+        yield
+
+
+class _Anomalies:
+    def __init__(self):
+        self.nombre = 0
+        self.details = []
+
+    def noter(self, type_anomalie, message, **details):
+        self.nombre += 1
+        if len(self.details) < ANOMALIES_MAX:
+            self.details.append({'type': type_anomalie, 'message': message, **details})
+
+
+def _rejouer(lignes, credits, anomalies):
+    """Vérifie la chaîne (id, type, montant, solde_avant, solde_apres); renvoie (dernier solde, nombre)"""
+    precedent, nombre = None, 0
+    for pk, type_mouvement, montant, solde_avant, solde_apres in lignes:
+        nombre += 1
+        attendu = solde_avant + montant if type_mouvement in credits else solde_avant - montant
+        if solde_apres != attendu:
+            anomalies.noter(
+                'CALCUL_MOUVEMENT', f"Mouvement {pk} ({type_mouvement}): solde après incohérent",
+                mouvement=pk, attendu=attendu, constate=solde_apres,
+            )
+        if precedent is not None and solde_avant != precedent:
+            anomalies.noter(
+                'CHAINE_SOLDES', f"Mouvement {pk}: solde avant différent du solde après du mouvement précédent",
+                mouvement=pk, attendu=precedent, constate=solde_avant,
+            )
+        precedent = solde_apres
+    return precedent, nombre
+
+
+def verifier_caisse(caisse_id):
+    """Vérifie une caisse (exécuté dans un processus du pool); None si la caisse n'existe plus"""
+    from .models import Caisse, Echeance, MouvementFond, Pret
+
+    debut = time.perf_counter()
+    anomalies = _Anomalies()
+    with _instantane():
+        caisse = Caisse.objects.filter(pk=caisse_id).values('fond_initial', 'fond_disponible').first()
+        if caisse is None:
+            return None
+
+        encaisse, principal = defaultdict(Decimal), defaultdict(Decimal)
+
+        def lignes():
+            mouvements = (
+                MouvementFond.objects.filter(caisse_id=caisse_id).order_by('pk')
+                .values_list('pk', 'type_mouvement', 'montant', 'solde_avant', 'solde_apres', 'pret_id', 'interet_rembourse')
+            )
+            for pk, type_mouvement, montant, solde_avant, solde_apres, pret_id, interet in mouvements.iterator(chunk_size=2000):
+                if type_mouvement == 'REMBOURSEMENT' and pret_id:
+                    encaisse[pret_id] += montant
+                    principal[pret_id] += montant - interet
+                yield pk, type_mouvement, montant, solde_avant, solde_apres
+
+        dernier_solde, nombre_mouvements = _rejouer(lignes(), CREDITS, anomalies)
+        attendu = dernier_solde if dernier_solde is not None else caisse['fond_initial']
+        if caisse['fond_disponible'] != attendu:
+            anomalies.noter(
+                'FOND_DISPONIBLE', "Fond disponible différent du solde du dernier mouvement",
+                attendu=attendu, constate=caisse['fond_disponible'],
+            )
+
+        prets = dict(
+            (pk, (numero, montant_rembourse))
+            for pk, numero, montant_rembourse in Pret.objects.filter(caisse_id=caisse_id).order_by('pk')
+            .values_list('pk', 'numero_pret', 'montant_rembourse')
+        )
+        for pk, (numero, montant_rembourse) in prets.items():
+            if (montant_rembourse or 0) != principal.get(pk, 0):
+                anomalies.noter(
+                    'REMBOURSEMENTS_PRET', f"Prêt {numero}: montant remboursé différent des remboursements enregistrés",
+                    pret=pk, attendu=principal.get(pk, Decimal('0')), constate=montant_rembourse,
+                )
+
+        echeances = (
+            Echeance.objects.filter(pret__caisse_id=caisse_id).order_by().values('pret_id').annotate(
+                paye=Sum('montant_paye'),
+                incoherentes=Count('pk', filter=(
+                    Q(statut='PAYE', montant_paye__lt=F('montant_echeance'))
+                    | Q(montant_paye__gt=F('montant_echeance'))
+                )),
+            )
+        )
+        for ligne in echeances:
+            pret_id, numero = ligne['pret_id'], prets.get(ligne['pret_id'], ('?',))[0]
+            if ligne['paye'] and ligne['paye'] != encaisse.get(pret_id, 0):
+                anomalies.noter(
+                    'ECHEANCES_PRET', f"Prêt {numero}: paiements des échéances différents des montants encaissés",
+                    pret=pret_id, attendu=encaisse.get(pret_id, Decimal('0')), constate=ligne['paye'],
+                )
+            if ligne['incoherentes']:
+                anomalies.noter(
+                    'ECHEANCE_STATUT', f"Prêt {numero}: {ligne['incoherentes']} échéance(s) au paiement incohérent avec le statut",
+                    pret=pret_id,
+                )
+
+    return {
+        'caisse_id': caisse_id,
+        'statut': 'ANOMALIE' if anomalies.nombre else 'OK',
+        'fond_disponible': caisse['fond_disponible'],
+        'mouvements': nombre_mouvements,
+        'prets': len(prets),
+        'nombre_anomalies': anomalies.nombre,
+        'anomalies': anomalies.details,
+        'duree_ms': round((time.perf_counter() - debut) * 1000),
+    }
+
+
+def verifier_caisse_generale():
+    """Réserve (chaîne de ses mouvements) et somme des caisses de la caisse générale"""
+    from .models import Caisse, CaisseGenerale, CaisseGeneraleMouvement
+
+    debut = time.perf_counter()
+    anomalies = _Anomalies()
+    with _instantane():
+        generale = CaisseGenerale.objects.order_by('pk').first()
+        mouvements = (
+            CaisseGeneraleMouvement.objects.order_by('pk')
+            .values_list('pk', 'type_mouvement', 'montant', 'solde_avant', 'solde_apres')
+        )
+        dernier_solde, nombre_mouvements = _rejouer(mouvements.iterator(chunk_size=2000), CREDITS_RESERVE, anomalies)
+        total_caisses = Caisse.objects.aggregate(total=Sum('fond_disponible'))['total'] or Decimal('0')
+
+    solde_reserve = generale.solde_reserve if generale else Decimal('0')
+    if dernier_solde is not None and solde_reserve != dernier_solde:
+        anomalies.noter(
+            'FOND_DISPONIBLE', "Solde de réserve différent du solde du dernier mouvement de la caisse générale",
+            attendu=dernier_solde, constate=solde_reserve,
+        )
+    if generale and generale.solde_total_caisses != total_caisses:
+        anomalies.noter(
+            'TOTAL_CAISSES', "Somme des caisses de la caisse générale différente de la somme des fonds disponibles",
+            attendu=total_caisses, constate=generale.solde_total_caisses,
+        )
+    return {
+        'caisse_id': None,
+        'statut': 'ANOMALIE' if anomalies.nombre else 'OK',
+        'fond_disponible': solde_reserve,
+        'mouvements': nombre_mouvements,
+        'nombre_anomalies': anomalies.nombre,
+        'anomalies': anomalies.details,
+        'duree_ms': round((time.perf_counter() - debut) * 1000),
+    }
+
+
+def caisses_a_verifier(incrementale=True):
+    """({caisse_id: version du journal}, nombre de caisses inchangées depuis leur dernier résultat)"""
+    from .models import Caisse, JournalSync, ResultatIntegrite
+
+    versions = dict(
+        JournalSync.objects.order_by().values('caisse_id').annotate(version=Max('version'))
+        .values_list('caisse_id', 'version')
+    )
+    caisses = dict(Caisse.objects.values_list('pk', 'fond_disponible'))
+    a_verifier = {pk: versions.get(pk, 0) for pk in caisses}
+    if not incrementale:
+        return a_verifier, 0
+
+    derniers = ResultatIntegrite.objects.filter(caisse__isnull=False).order_by().values('caisse_id').annotate(
+        dernier=Max('pk')
+    ).values_list('dernier', flat=True)
+    inchangees = {
+        caisse_id
+        for caisse_id, version, fond_disponible in ResultatIntegrite.objects.filter(pk__in=list(derniers))
+        .values_list('caisse_id', 'version_journal', 'fond_disponible')
+        if caisse_id in caisses and version >= a_verifier[caisse_id] and fond_disponible == caisses[caisse_id]
+    }
+    return {pk: version for pk, version in a_verifier.items() if pk not in inchangees}, len(inchangees)
+
+
+def _initialiser_processus():
+    import django
+
+    django.setup()
+
+
+def _executer(caisse_ids, processus):
+    """Résultats de ``verifier_caisse`` dans l'ordre où ils sont obtenus"""
+    if processus > 1:
+        try:
+            executeur = ProcessPoolExecutor(
+                max_workers=processus, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_initialiser_processus,
+            )
+            futures = [executeur.submit(verifier_caisse, caisse_id) for caisse_id in caisse_ids]
+        except (OSError, AssertionError, NotImplementedError) as e:
+            # Processus enfants interdits (worker démon...): vérification dans ce processus
+            logger.warning(f"Vérification d'intégrité sans pool de processus: {e}")
+        else:
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                executeur.shutdown(cancel_futures=True)
+            return
+    for caisse_id in caisse_ids:
+        yield verifier_caisse(caisse_id)
+
+
+def _ecrire(verification, resultats, versions):
+    from .models import ResultatIntegrite
+
+    ResultatIntegrite.objects.bulk_create([
+        ResultatIntegrite(verification=verification, version_journal=versions.get(resultat['caisse_id'], 0), **resultat)
+        for resultat in resultats
+    ])
+    for resultat in resultats:
+        verification.anomalies += resultat['nombre_anomalies']
+        if resultat['caisse_id'] is not None:
+            verification.caisses_verifiees += 1
+            verification.caisses_en_anomalie += bool(resultat['nombre_anomalies'])
+    verification.save(update_fields=['caisses_verifiees', 'caisses_en_anomalie', 'anomalies'])
+
+
+def verifier(incrementale=True, processus=None, utilisateur_id=None):
+    """Vérifie les caisses (modifiées seulement si ``incrementale``) et la caisse générale"""
+    from .models import MouvementFond, VerificationIntegrite
+
+    verification = VerificationIntegrite.objects.create(incrementale=incrementale, utilisateur_id=utilisateur_id)
+    depart = time.perf_counter()
+    try:
+        versions, verification.caisses_ignorees = caisses_a_verifier(incrementale)
+        processus = processus or getattr(settings, 'INTEGRITE_PROCESSUS', 0) or os.cpu_count() or 1
+        if processus > 1:
+            mouvements = MouvementFond.objects.filter(caisse_id__in=list(versions)) if incrementale else MouvementFond.objects
+            processus = min(processus, len(versions), -(-mouvements.count() // MOUVEMENTS_PAR_PROCESSUS))
+        verification.processus = max(1, processus)
+        verification.save(update_fields=['caisses_ignorees', 'processus'])
+
+        lot = []
+        for resultat in _executer(list(versions), verification.processus):
+            if resultat is None:
+                continue
+            lot.append(resultat)
+            if len(lot) >= TAILLE_LOT:
+                _ecrire(verification, lot, versions)
+                lot = []
+        lot.append(verifier_caisse_generale())
+        _ecrire(verification, lot, versions)
+    except Exception:
+        verification.statut, verification.erreur = 'ECHEC', traceback.format_exc()
+        raise
+    else:
+        verification.statut = 'TERMINEE'
+    finally:
+        verification.date_fin = timezone.now()
+        verification.duree_ms = round((time.perf_counter() - depart) * 1000)
+        verification.save()
+    return verification
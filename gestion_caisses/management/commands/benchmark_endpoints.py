@@ -0,0 +1,214 @@
+from contextlib import redirect_stdout
+from datetime import datetime
+import io
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+
+from gestion_caisses.instrumentation import sur_toutes_les_bases
+from gestion_caisses.models import Caisse, Membre, Pret, Cotisation, MouvementFond, ExerciceCaisse
+
+
+TYPES_RAPPORT = [
+    'general', 'financier', 'prets', 'membres', 'echeances',
+    'cotisations_general', 'cotisations_par_membre', 'depenses',
+]
+TACHES = ['calculer_statistiques_caisses', 'verifier_prets_en_retard', 'verifier_fonds_insuffisants']
+
+
+class CompteurRequetes:
+    """Wrapper d'exécution SQL comptant les requêtes (sans la limite du journal DEBUG)."""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le temps de réponse et le nombre de requêtes SQL des endpoints critiques "
+        "(et des tâches Celery) puis écrit les résultats en JSON pour comparer les versions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repetitions', type=int, default=3, help='Nombre de mesures par scénario (par défaut 3)')
+        parser.add_argument('--sortie', type=str, default=None,
+                            help='Fichier JSON de sortie (par défaut benchmark_YYYYMMDD_HHMM.json)')
+        parser.add_argument('--scenarios', type=str, default='',
+                            help='Filtre: noms (ou préfixes) de scénarios séparés par des virgules')
+        parser.add_argument('--comparer', type=str, default=None,
+                            help='Fichier JSON d\'une exécution précédente pour afficher les écarts')
+        parser.add_argument('--sans-taches', action='store_true', help='Ne pas mesurer les tâches Celery')
+
+    def handle(self, *args, **options):
+        repetitions = max(1, options['repetitions'])
+        filtres = [f.strip() for f in options['scenarios'].split(',') if f.strip()]
+        sortie = options['sortie'] or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M')}.json"
+
+        if not Caisse.objects.exists():
+            raise CommandError('Base vide: lancez d\'abord `manage.py seed_scale`.')
+
+        # Le client de test s'annonce comme « testserver »
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            resultats = self.executer(repetitions, filtres, options['sans_taches'])
+
+        rapport = {
+            'meta': {
+                'date': datetime.now().isoformat(timespec='seconds'),
+                'base': connection.vendor,
+                'repetitions': repetitions,
+                'volumes': {
+                    'caisses': Caisse.objects.count(),
+                    'membres': Membre.objects.count(),
+                    'prets': Pret.objects.count(),
+                    'cotisations': Cotisation.objects.count(),
+                    'mouvements': MouvementFond.objects.count(),
+                },
+            },
+            'resultats': resultats,
+        }
+        with open(sortie, 'w', encoding='utf-8') as fichier:
+            json.dump(rapport, fichier, ensure_ascii=False, indent=2)
+
+        precedents = self.charger_precedents(options['comparer'])
+        for resultat in resultats:
+            self.afficher(resultat, precedents.get(resultat['nom']))
+        self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {sortie}"))
+
+    # ------------------------------------------------------------------
+
+    def scenarios(self, sans_taches):
+        """Liste des scénarios (nom, fonction exécutant une mesure et renvoyant (statut, taille))."""
+        caisse = Caisse.objects.order_by('pk').first()
+        exercice = ExerciceCaisse.objects.filter(caisse=caisse).order_by('-date_debut').first()
+        base = '/gestion-caisses/api'
+
+        scenarios = [
+            ('caisses_liste', self.requete(f'{base}/caisses/')),
+            ('caisses_detail', self.requete(f'{base}/caisses/{caisse.pk}/')),
+            ('dashboard_stats', self.requete(f'{base}/dashboard/stats/')),
+            ('prets_liste', self.requete(f'{base}/prets/')),
+            ('membres_liste', self.requete(f'{base}/membres/')),
+            ('rapports_global_general', self.requete('/gestion-caisses/api/rapports-global/?type=general')),
+        ]
+        for type_rapport in TYPES_RAPPORT:
+            scenarios.append((
+                f'rapports_caisse_{type_rapport}',
+                self.requete(f'/gestion-caisses/api/rapports-caisse/?type={type_rapport}'),
+            ))
+        if exercice:
+            scenarios.append(('partage_preview', self.requete(f'{base}/exercices-caisse/{exercice.pk}/partage-preview/')))
+        scenarios += [
+            ('pdf_rapport_general', self.requete('/gestion-caisses/api/rapports-caisse/?type=general&format=pdf')),
+            ('pdf_membres_systeme', self.requete('/gestion-caisses/api/rapports-caisse/?type=membres_systeme_pdf')),
+            ('pdf_agents_systeme', self.requete('/gestion-caisses/api/rapports-caisse/?type=agents_systeme_pdf')),
+            ('pdf_rapport_caisse', self.requete(f'/gestion-caisses/api/rapport-pdf/?type=general&caisse_id={caisse.pk}')),
+        ]
+        if not sans_taches:
+            for nom_tache in TACHES:
+                scenarios.append((f'tache_{nom_tache}', self.tache(nom_tache)))
+        return scenarios
+
+    def requete(self, url):
+        def executer():
+            reponse = self.client.get(url)
+            contenu = b''.join(reponse.streaming_content) if reponse.streaming else reponse.content
+            return reponse.status_code, len(contenu)
+        executer.cible = url
+        return executer
+
+    def tache(self, nom_tache):
+        def executer():
+            # Import tardif: le module des tâches dépend de Celery
+            from gestion_caisses import tasks
+            with redirect_stdout(io.StringIO()):
+                getattr(tasks, nom_tache)()
+            return 'OK', 0
+        executer.cible = f'tasks.{nom_tache}'
+        return executer
+
+    def executer(self, repetitions, filtres, sans_taches):
+        resultats = []
+        # Tout est annulé à la fin: les tâches et vues mesurées ne modifient pas la base de référence
+        with transaction.atomic():
+            admin, _ = User.objects.get_or_create(
+                username='benchmark', defaults={'is_superuser': True, 'is_staff': True}
+            )
+            self.client = Client()
+            self.client.force_login(admin)
+
+            for nom, executer in self.scenarios(sans_taches):
+                if filtres and not any(nom.startswith(f) for f in filtres):
+                    continue
+                resultats.append(self.mesurer(nom, executer, repetitions))
+            transaction.set_rollback(True)
+        return resultats
+
+    def mesurer(self, nom, executer, repetitions):
+        durees, requetes = [], []
+        statut, taille, erreur = None, 0, None
+        for _ in range(repetitions):
+            compteur = CompteurRequetes()
+            try:
+                with transaction.atomic():
+                    with sur_toutes_les_bases(compteur):
+                        debut = time.perf_counter()
+                        statut, taille = executer()
+                        durees.append((time.perf_counter() - debut) * 1000)
+                    requetes.append(compteur.total)
+                    transaction.set_rollback(True)
+            except ImportError as exc:
+                erreur = f'dépendance manquante: {exc}'
+                break
+            except Exception as exc:
+                erreur = f'{exc.__class__.__name__}: {exc}'
+                break
+
+        resultat = {'nom': nom, 'cible': executer.cible, 'statut': statut, 'taille_octets': taille}
+        if durees:
+            resultat.update({
+                'temps_ms': {
+                    'min': round(min(durees), 2),
+                    'mediane': round(statistics.median(durees), 2),
+                    'max': round(max(durees), 2),
+                },
+                'requetes': max(requetes),
+            })
+        if erreur:
+            resultat['erreur'] = erreur
+        return resultat
+
+    # ------------------------------------------------------------------
+
+    def charger_precedents(self, chemin):
+        if not chemin:
+            return {}
+        try:
+            with open(chemin, encoding='utf-8') as fichier:
+                return {r['nom']: r for r in json.load(fichier).get('resultats', [])}
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Impossible de lire {chemin}: {exc}')
+
+    def afficher(self, resultat, precedent=None):
+        if 'temps_ms' not in resultat:
+            self.stdout.write(self.style.WARNING(f"{resultat['nom']:<36} ignoré ({resultat.get('erreur')})"))
+            return
+        ligne = (
+            f"{resultat['nom']:<36} {resultat['temps_ms']['mediane']:>10.1f} ms "
+            f"{resultat['requetes']:>6} req  [{resultat['statut']}]"
+        )
+        if precedent and 'temps_ms' in precedent:
+            avant = precedent['temps_ms']['mediane'] or 0.001
+            ecart = (resultat['temps_ms']['mediane'] - avant) / avant * 100
+            ligne += f"  ({ecart:+.0f}% temps, {resultat['requetes'] - precedent['requetes']:+d} req)"
+        self.stdout.write(ligne)
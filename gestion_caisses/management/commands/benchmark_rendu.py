@@ -0,0 +1,70 @@
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from gestion_caisses import rendus
+from gestion_caisses.models import Caisse, Echeance
+from gestion_caisses.rendus import JSONRapideParser, JSONRapideRenderer
+from gestion_caisses.serializers import CaisseListSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le rendu / la lecture JSON de DRF et de JSONRapideRenderer (orjson si installé) "
+        "sur un rapport d'échéances et une liste de caisses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repetitions', type=int, default=5, help='Nombre de mesures par cas (par défaut 5)')
+        parser.add_argument('--echeances', type=int, default=5000, help="Lignes du rapport d'échéances (par défaut 5000)")
+        parser.add_argument('--caisses', type=int, default=500, help='Caisses de la liste (par défaut 500)')
+
+    def handle(self, *args, **options):
+        repetitions = max(1, options['repetitions'])
+        if not Echeance.objects.exists():
+            raise CommandError('Base vide: lancez d\'abord `manage.py seed_scale`.')
+
+        # Rapport: valeurs brutes (Decimal, date) comme les constructeurs de rapports
+        rapport = list(
+            Echeance.objects.order_by('date_echeance', 'pk').values(
+                'id', 'pret__numero_pret', 'pret__membre__nom', 'pret__membre__prenoms',
+                'pret__caisse__nom_association', 'numero_echeance', 'montant_echeance',
+                'montant_paye', 'date_echeance', 'date_paiement', 'statut',
+            )[:options['echeances']]
+        )
+        caisses = (
+            Caisse.objects.select_related(
+                'region', 'prefecture', 'commune', 'canton', 'village', 'agent',
+                'presidente', 'secretaire', 'tresoriere',
+            ).annotate(exercice_count=Count('exercices')).order_by('pk')[:options['caisses']]
+        )
+        # Liste: sortie de sérialiseur (Decimal déjà en chaînes, dates formatées)
+        liste = CaisseListSerializer(caisses, many=True).data
+
+        moteur = 'orjson' if rendus.orjson is not None else 'json (orjson absent)'
+        self.stdout.write(f"JSONRapideRenderer: {moteur}")
+        for nom, donnees in [(f'rapport_echeances ({len(rapport)})', rapport), (f'caisses_liste ({len(liste)})', liste)]:
+            for etiquette, renderer, parser in [
+                ('DRF', JSONRenderer(), JSONParser()),
+                ('rapide', JSONRapideRenderer(), JSONRapideParser()),
+            ]:
+                contenu = renderer.render(donnees, 'application/json')
+                rendu = self.mesurer(lambda: renderer.render(donnees, 'application/json'), repetitions)
+                lecture = self.mesurer(lambda: parser.parse(io.BytesIO(contenu), 'application/json', {}), repetitions)
+                self.stdout.write(
+                    f"{nom:<28} {etiquette:<7} rendu {rendu:8.2f} ms  lecture {lecture:8.2f} ms  "
+                    f"{len(contenu) / 1024:8.1f} Ko"
+                )
+
+    def mesurer(self, fonction, repetitions):
+        durees = []
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            fonction()
+            durees.append((time.perf_counter() - debut) * 1000)
+        return statistics.median(durees)
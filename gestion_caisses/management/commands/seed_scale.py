@@ -0,0 +1,433 @@
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+import random
+import time as chrono
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from gestion_caisses.recherche import normaliser
+from gestion_caisses.synchronisation import reconstruire_journal
+from gestion_caisses.models import (
+    Region, Prefecture, Commune, Canton, Village, Agent, Caisse, Membre,
+    ExerciceCaisse, SeanceReunion, Cotisation, Pret, Echeance, MouvementFond,
+    CaisseGenerale, add_months_to_date,
+)
+
+
+# Préfixes servant à reconnaître (et supprimer avec --reset) les données générées
+PREFIXE_CODE = 'SCL'
+PREFIXE_CAISSE = f'FKM{PREFIXE_CODE}'
+PREFIXE_MATRICULE = f'AGT{PREFIXE_CODE}'
+PREFIXE_PRET = f'PRT{PREFIXE_CODE}'
+
+NOMS = [
+    'Abalo', 'Adjo', 'Agbeko', 'Akakpo', 'Amegah', 'Ayivi', 'Bawa', 'Dogbe', 'Essowe',
+    'Gbadoe', 'Kodjo', 'Koffi', 'Kpatcha', 'Lawson', 'Mensah', 'Nabine', 'Sossou', 'Tchalla',
+]
+PRENOMS = [
+    'Akouélé', 'Ama', 'Abla', 'Afi', 'Dédé', 'Enyonam', 'Essi', 'Kafui', 'Mawuena',
+    'Sena', 'Yawa', 'Adjoa', 'Pélagie', 'Rébecca', 'Sika', 'Mawulolo',
+]
+MOTIFS = ['Commerce', 'Agriculture', 'Élevage', 'Scolarité', 'Santé', 'Artisanat']
+
+# Répartition des statuts de prêt (statut, poids)
+STATUTS_PRET = [
+    ('EN_COURS', 35), ('REMBOURSE', 30), ('EN_RETARD', 8), ('EN_ATTENTE', 10),
+    ('EN_ATTENTE_ADMIN', 5), ('VALIDE', 5), ('REJETE', 7),
+]
+STATUTS_DECAISSES = {'EN_COURS', 'REMBOURSE', 'EN_RETARD'}
+
+
+@contextmanager
+def dates_explicites(*champs):
+    """Désactive temporairement auto_now_add pour pouvoir insérer des dates historiques."""
+    etats = [(champ, champ.auto_now_add) for champ in champs]
+    for champ, _ in etats:
+        champ.auto_now_add = False
+    try:
+        yield
+    finally:
+        for champ, valeur in etats:
+            champ.auto_now_add = valeur
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données national à grande échelle (bulk_create), "
+        "déterministe à partir d'une graine, pour les tests de charge et les benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='Graine du générateur aléatoire (par défaut 42)')
+        parser.add_argument('--regions', type=int, default=5, help='Nombre de régions (par défaut 5)')
+        parser.add_argument('--agents', type=int, default=100, help="Nombre d'agents (par défaut 100)")
+        parser.add_argument('--caisses', type=int, default=1000, help='Nombre de caisses (par défaut 1000)')
+        parser.add_argument('--membres', type=int, default=30000, help='Nombre total de membres (par défaut 30000)')
+        parser.add_argument('--cotisations', type=int, default=200000, help='Nombre total de cotisations (par défaut 200000)')
+        parser.add_argument('--prets', type=int, default=50000, help='Nombre total de prêts (par défaut 50000)')
+        parser.add_argument('--mois', type=int, default=12, help='Nombre de mois d\'historique / séances par caisse (par défaut 12)')
+        parser.add_argument('--date-reference', type=str, default=None,
+                            help="Date de fin de l'historique (YYYY-MM-DD, par défaut aujourd'hui)")
+        parser.add_argument('--batch-size', type=int, default=2000, help='Taille des lots bulk_create (par défaut 2000)')
+        parser.add_argument('--caisses-par-lot', type=int, default=50,
+                            help='Nombre de caisses traitées par transaction (par défaut 50)')
+        parser.add_argument('--reset', action='store_true', help='Supprime les données générées précédemment avant de générer')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.nb_mois = max(1, options['mois'])
+        if options['date_reference']:
+            try:
+                self.date_reference = datetime.strptime(options['date_reference'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Format de --date-reference invalide (YYYY-MM-DD).')
+        else:
+            self.date_reference = timezone.now().date()
+        self.date_debut = add_months_to_date(self.date_reference.replace(day=1), -(self.nb_mois - 1))
+
+        nb_caisses = options['caisses']
+        if nb_caisses < 1 or options['agents'] < 1 or options['regions'] < 1:
+            raise CommandError('Il faut au moins une région, un agent et une caisse.')
+
+        if options['reset']:
+            self.supprimer_donnees()
+        elif Caisse.objects.filter(code__startswith=PREFIXE_CAISSE).exists():
+            raise CommandError('Des données seed_scale existent déjà. Relancez avec --reset pour les régénérer.')
+
+        debut = chrono.perf_counter()
+        with transaction.atomic():
+            villages = self.creer_territoire(options['regions'])
+            agents = self.creer_agents(options['agents'])
+
+        self.compteurs = {'membres': 0, 'cotisations': 0, 'prets': 0, 'echeances': 0, 'mouvements': 0}
+        membres_par_caisse = self.repartir(options['membres'], nb_caisses)
+        cotisations_par_caisse = self.repartir(options['cotisations'], nb_caisses)
+        prets_par_caisse = self.repartir(options['prets'], nb_caisses)
+
+        taille_lot = max(1, options['caisses_par_lot'])
+        for depart in range(0, nb_caisses, taille_lot):
+            indices = range(depart, min(depart + taille_lot, nb_caisses))
+            with transaction.atomic():
+                self.creer_lot_caisses(indices, villages, agents, membres_par_caisse,
+                                       cotisations_par_caisse, prets_par_caisse)
+            self.stdout.write(f"  {indices.stop}/{nb_caisses} caisses générées...")
+
+        CaisseGenerale.get_instance().recalculer_total_caisses()
+        # Objets insérés par bulk_create (sans signal): les inscrire au journal de synchronisation
+        reconstruire_journal()
+
+        duree = chrono.perf_counter() - debut
+        resume = ', '.join(f"{valeur} {nom}" for nom, valeur in self.compteurs.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Terminé en {duree:.1f}s: {nb_caisses} caisses, {resume}."
+        ))
+
+    # ------------------------------------------------------------------
+    # Outils
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def repartir(total, nb_parts):
+        """Répartit un total en nb_parts entiers aussi égaux que possible."""
+        base, reste = divmod(max(0, total), nb_parts)
+        return [base + (1 if i < reste else 0) for i in range(nb_parts)]
+
+    def telephone(self):
+        return f"9{self.rng.randint(0, 9999999):07d}"
+
+    def moment(self, jour, heure=10):
+        """Datetime aware à une heure donnée d'un jour (avec quelques minutes aléatoires)."""
+        return timezone.make_aware(datetime.combine(jour, time(heure, self.rng.randint(0, 59))))
+
+    def supprimer_donnees(self):
+        self.stdout.write('Suppression des données seed_scale existantes...')
+        with transaction.atomic():
+            # Les suppressions en cascade emportent membres, prêts, cotisations, mouvements...
+            caisses = Caisse.objects.filter(code__startswith=PREFIXE_CAISSE)
+            Caisse.objects.filter(pk__in=caisses).update(presidente=None, secretaire=None, tresoriere=None)
+            caisses.delete()
+            Agent.objects.filter(matricule__startswith=PREFIXE_MATRICULE).delete()
+            Region.objects.filter(code__startswith=PREFIXE_CODE).delete()
+
+    # ------------------------------------------------------------------
+    # Référentiels
+    # ------------------------------------------------------------------
+
+    def creer_territoire(self, nb_regions):
+        """Crée la hiérarchie Région → Préfecture → Commune → Canton → Village."""
+        regions = Region.objects.bulk_create([
+            Region(nom=f'Région {PREFIXE_CODE} {i + 1:02d}', code=f'{PREFIXE_CODE}R{i + 1:03d}')
+            for i in range(nb_regions)
+        ])
+        prefectures = Prefecture.objects.bulk_create([
+            Prefecture(nom=f'Préfecture {r.code}-{j + 1}', code=f'{PREFIXE_CODE}P{i * 4 + j + 1:05d}', region=r)
+            for i, r in enumerate(regions) for j in range(4)
+        ])
+        communes = Commune.objects.bulk_create([
+            Commune(nom=f'Commune {p.code}-{j + 1}', code=f'{PREFIXE_CODE}C{i * 2 + j + 1:05d}', prefecture=p)
+            for i, p in enumerate(prefectures) for j in range(2)
+        ])
+        cantons = Canton.objects.bulk_create([
+            Canton(nom=f'Canton {c.code}-{j + 1}', code=f'{PREFIXE_CODE}T{i * 2 + j + 1:05d}', commune=c)
+            for i, c in enumerate(communes) for j in range(2)
+        ])
+        villages = Village.objects.bulk_create([
+            Village(nom=f'Village {t.code}-{j + 1}', code=f'{PREFIXE_CODE}V{i * 3 + j + 1:05d}', canton=t)
+            for i, t in enumerate(cantons) for j in range(3)
+        ])
+        # Rattacher explicitement les parents pour éviter des requêtes lors de la création des caisses
+        for village in villages:
+            canton = village.canton
+            commune = canton.commune
+            village.chaine = (village, canton, commune, commune.prefecture, commune.prefecture.region)
+        self.stdout.write(f"Territoire: {len(regions)} régions, {len(villages)} villages.")
+        return villages
+
+    def creer_agents(self, nb_agents):
+        agents = Agent.objects.bulk_create([
+            Agent(
+                nom=self.rng.choice(NOMS), prenoms=self.rng.choice(PRENOMS),
+                date_naissance=date(1975 + i % 25, 1 + i % 12, 1 + i % 28),
+                adresse='Lomé', numero_telephone=self.telephone(),
+                matricule=f'{PREFIXE_MATRICULE}{i + 1:06d}',
+                date_embauche=self.date_debut, possede_carte_electeur=False,
+            )
+            for i in range(nb_agents)
+        ], batch_size=self.batch_size)
+        self.stdout.write(f"{len(agents)} agents créés.")
+        return agents
+
+    # ------------------------------------------------------------------
+    # Caisses et activité
+    # ------------------------------------------------------------------
+
+    def creer_lot_caisses(self, indices, villages, agents, membres_par_caisse,
+                          cotisations_par_caisse, prets_par_caisse):
+        rng = self.rng
+        caisses = []
+        for i in indices:
+            village, canton, commune, prefecture, region = villages[i % len(villages)].chaine
+            fond_initial = Decimal(rng.randrange(500000, 3000001, 50000))
+            code, nom_association = f'{PREFIXE_CAISSE}{i + 1:06d}', f'Caisse {PREFIXE_CODE} {i + 1:06d}'
+            caisses.append(Caisse(
+                code=code, nom_association=nom_association, recherche=normaliser(nom_association, code),
+                agent=agents[i % len(agents)], village=village, canton=canton, commune=commune,
+                prefecture=prefecture, region=region, statut='ACTIVE',
+                fond_initial=fond_initial, fond_disponible=fond_initial,
+            ))
+        Caisse.objects.bulk_create(caisses, batch_size=self.batch_size)
+
+        # Membres (les trois premiers de chaque caisse forment le bureau)
+        membres = []
+        for caisse, i in zip(caisses, indices):
+            for k in range(membres_par_caisse[i]):
+                role = ['PRESIDENTE', 'SECRETAIRE', 'TRESORIERE'][k] if k < 3 else 'MEMBRE'
+                nom, prenoms = rng.choice(NOMS), rng.choice(PRENOMS)
+                membres.append(Membre(
+                    nom=nom, prenoms=prenoms, recherche=normaliser(nom, prenoms),
+                    date_naissance=date(1960 + rng.randint(0, 40), rng.randint(1, 12), rng.randint(1, 28)),
+                    adresse=caisse.village.nom, numero_telephone=self.telephone(),
+                    possede_carte_electeur=False, role=role, caisse=caisse,
+                ))
+        Membre.objects.bulk_create(membres, batch_size=self.batch_size)
+        self.compteurs['membres'] += len(membres)
+        membres_par_id = {}
+        for membre in membres:
+            membres_par_id.setdefault(membre.caisse_id, []).append(membre)
+        for caisse in caisses:
+            bureau = membres_par_id.get(caisse.pk, [])[:3]
+            caisse.presidente, caisse.secretaire, caisse.tresoriere = (bureau + [None, None, None])[:3]
+        Caisse.objects.bulk_update(caisses, ['presidente', 'secretaire', 'tresoriere'], batch_size=self.batch_size)
+
+        # Exercice en cours et séances mensuelles
+        ExerciceCaisse.objects.bulk_create([
+            ExerciceCaisse(caisse=c, date_debut=self.date_debut,
+                           date_fin=add_months_to_date(self.date_debut, 12), statut='EN_COURS')
+            for c in caisses
+        ], batch_size=self.batch_size)
+        jours_seance = [add_months_to_date(self.date_debut, m).replace(day=5) for m in range(self.nb_mois)]
+        jours_seance = [j for j in jours_seance if j <= self.date_reference] or [self.date_debut]
+        seances = SeanceReunion.objects.bulk_create([
+            SeanceReunion(caisse=c, date_seance=j, titre=f'Séance {j.strftime("%Y-%m")}')
+            for c in caisses for j in jours_seance
+        ], batch_size=self.batch_size)
+        seances_par_caisse = {}
+        for seance in seances:
+            seances_par_caisse.setdefault(seance.caisse_id, []).append(seance)
+
+        # Événements financiers par caisse: (moment, type, montant, intérêt, description, pret)
+        evenements = {c.pk: [] for c in caisses}
+        cotisations = []
+        for caisse, i in zip(caisses, indices):
+            membres_caisse = membres_par_id.get(caisse.pk)
+            if not membres_caisse:
+                continue
+            for _ in range(cotisations_par_caisse[i]):
+                membre = rng.choice(membres_caisse)
+                seance = rng.choice(seances_par_caisse[caisse.pk])
+                prix_tempon = Decimal(rng.choice([500, 1000, 1500, 2000]))
+                solidarite = Decimal(rng.choice([200, 300, 500]))
+                fondation = Decimal(rng.choice([0, 100]))
+                penalite = Decimal(rng.choice([0, 0, 0, 100, 200]))
+                total = prix_tempon + solidarite + fondation + penalite
+                quand = self.moment(seance.date_seance)
+                cotisations.append(Cotisation(
+                    membre=membre, caisse=caisse, seance=seance, date_cotisation=quand,
+                    prix_tempon=prix_tempon, frais_solidarite=solidarite, frais_fondation=fondation,
+                    penalite_emprunt_retard=penalite, montant_total=total,
+                    description='Cotisation générée (seed_scale)',
+                ))
+                evenements[caisse.pk].append((
+                    quand, 'ALIMENTATION', total, Decimal('0'),
+                    f"Cotisation séance {seance.date_seance} de {membre.nom_complet}", None,
+                ))
+        with dates_explicites(Cotisation._meta.get_field('date_cotisation')):
+            Cotisation.objects.bulk_create(cotisations, batch_size=self.batch_size)
+        self.compteurs['cotisations'] += len(cotisations)
+
+        prets, plans = self.generer_prets(caisses, indices, membres_par_id, prets_par_caisse)
+        with dates_explicites(Pret._meta.get_field('date_demande')):
+            Pret.objects.bulk_create(prets, batch_size=self.batch_size)
+        self.compteurs['prets'] += len(prets)
+
+        echeances = []
+        for pret, plan in zip(prets, plans):
+            if plan is None:
+                continue
+            evenements[pret.caisse_id].append((
+                pret.date_decaissement, 'DECAISSEMENT', pret.montant_accord, Decimal('0'),
+                f"Décaissement du prêt {pret.numero_pret}", pret,
+            ))
+            for echeance in plan:
+                echeance.pret = pret
+                echeances.append(echeance)
+                if echeance.date_paiement:
+                    evenements[pret.caisse_id].append((
+                        echeance.date_paiement, 'REMBOURSEMENT', echeance.montant_paye, echeance.part_interet,
+                        f"Remboursement échéance {echeance.numero_echeance} du prêt {pret.numero_pret}", pret,
+                    ))
+        Echeance.objects.bulk_create(echeances, batch_size=self.batch_size)
+        self.compteurs['echeances'] += len(echeances)
+
+        self.creer_mouvements(caisses, evenements)
+
+    def generer_prets(self, caisses, indices, membres_par_id, prets_par_caisse):
+        """Construit les prêts et, pour ceux décaissés, leur plan d'échéances (non sauvegardé)."""
+        rng = self.rng
+        statuts = [s for s, _ in STATUTS_PRET]
+        poids = [p for _, p in STATUTS_PRET]
+        jours_historique = max(1, (self.date_reference - self.date_debut).days)
+        prets, plans = [], []
+        for caisse, i in zip(caisses, indices):
+            membres_caisse = membres_par_id.get(caisse.pk)
+            if not membres_caisse:
+                continue
+            for _ in range(prets_par_caisse[i]):
+                statut = rng.choices(statuts, poids)[0]
+                montant = Decimal(rng.randrange(10000, 200001, 5000))
+                jour_demande = self.date_debut + timedelta(days=rng.randint(0, jours_historique))
+                numero_pret = f'{PREFIXE_PRET}{self.compteurs["prets"] + len(prets) + 1:09d}'
+                pret = Pret(
+                    numero_pret=numero_pret, recherche=normaliser(numero_pret),
+                    membre=rng.choice(membres_caisse), caisse=caisse,
+                    montant_demande=montant, taux_interet=Decimal(rng.choice([0, 2, 5, 10])),
+                    duree_mois=rng.choice([3, 6, 9, 12]), date_demande=self.moment(jour_demande, 9),
+                    statut=statut, motif=rng.choice(MOTIFS),
+                )
+                plan = None
+                if statut in STATUTS_DECAISSES:
+                    plan = self.planifier_remboursements(pret, jour_demande)
+                elif statut == 'VALIDE':
+                    pret.montant_accord = montant
+                    pret.date_validation = self.moment(jour_demande + timedelta(days=2), 11)
+                elif statut == 'REJETE':
+                    pret.motif_rejet = 'Dossier incomplet'
+                prets.append(pret)
+                plans.append(plan)
+        return prets, plans
+
+    def planifier_remboursements(self, pret, jour_demande):
+        """Renseigne les dates/montants d'un prêt décaissé et renvoie ses échéances."""
+        pret.montant_accord = pret.montant_demande
+        pret.date_validation = self.moment(jour_demande + timedelta(days=2), 11)
+        jour_decaissement = jour_demande + timedelta(days=3)
+        pret.date_decaissement = self.moment(jour_decaissement, 12)
+        pret.date_fin_pret = add_months_to_date(jour_decaissement, pret.duree_mois)
+        interet = (pret.montant_accord * pret.taux_interet / Decimal('100')).quantize(Decimal('1'))
+        principal_echeance = (pret.montant_accord / pret.duree_mois).quantize(Decimal('1'))
+        interet_echeance = (interet / pret.duree_mois).quantize(Decimal('1'))
+
+        dates_echeances = [add_months_to_date(jour_decaissement, n) for n in range(1, pret.duree_mois + 1)]
+        # Un prêt en retard a laissé impayée sa dernière échéance arrivée à terme
+        nb_echues = sum(1 for jour in dates_echeances if jour <= self.date_reference)
+        echeances = []
+        for numero, jour_echeance in enumerate(dates_echeances, start=1):
+            # La dernière échéance absorbe les arrondis: principal et intérêts payés en entier
+            principal, part_interet = (
+                (principal_echeance, interet_echeance) if numero < pret.duree_mois else
+                (pret.montant_accord - principal_echeance * (numero - 1), interet - interet_echeance * (numero - 1))
+            )
+            echeance = Echeance(numero_echeance=numero, montant_echeance=principal + part_interet,
+                                date_echeance=jour_echeance)
+            # Part d'intérêt du paiement (reportée sur le mouvement REMBOURSEMENT)
+            echeance.part_interet = part_interet
+            echue = numero <= nb_echues
+            if pret.statut == 'REMBOURSE':
+                payee = True
+            elif pret.statut == 'EN_RETARD':
+                payee = numero < nb_echues
+            else:
+                payee = echue
+            if payee:
+                echeance.statut = 'PAYE'
+                echeance.montant_paye = echeance.montant_echeance
+                echeance.date_paiement = self.moment(min(jour_echeance, self.date_reference), 15)
+                pret.montant_rembourse += principal
+                pret.nombre_echeances_payees += 1
+            elif echue:
+                echeance.statut = 'EN_RETARD'
+            echeances.append(echeance)
+        pret.nombre_echeances = len(echeances)
+        if pret.statut == 'REMBOURSE':
+            pret.date_remboursement_complet = echeances[-1].date_paiement
+        return echeances
+
+    def creer_mouvements(self, caisses, evenements):
+        """Rejoue les événements dans l'ordre chronologique pour produire une chaîne de soldes cohérente."""
+        mouvements = []
+        for caisse in caisses:
+            solde = caisse.fond_initial
+            for quand, type_mouvement, montant, interet, description, pret in sorted(evenements[caisse.pk], key=lambda e: e[0]):
+                solde_avant = solde
+                solde = solde + montant if type_mouvement in ('ALIMENTATION', 'REMBOURSEMENT') else solde - montant
+                mouvements.append(MouvementFond(
+                    caisse=caisse, type_mouvement=type_mouvement, montant=montant,
+                    solde_avant=solde_avant, solde_apres=solde, interet_rembourse=interet, pret=pret,
+                    date_mouvement=quand, description=description,
+                ))
+            caisse.fond_disponible = solde
+        with dates_explicites(MouvementFond._meta.get_field('date_mouvement')):
+            MouvementFond.objects.bulk_create(mouvements, batch_size=self.batch_size)
+        self.compteurs['mouvements'] += len(mouvements)
+
+        # Totaux dénormalisés de la caisse, cohérents avec les prêts générés (remboursements: principal seul)
+        totaux = {}
+        for mouvement in mouvements:
+            if mouvement.type_mouvement == 'DECAISSEMENT':
+                totaux.setdefault(mouvement.caisse_id, [Decimal('0'), Decimal('0')])[0] += mouvement.montant
+            elif mouvement.type_mouvement == 'REMBOURSEMENT':
+                totaux.setdefault(mouvement.caisse_id, [Decimal('0'), Decimal('0')])[1] += (
+                    mouvement.montant - mouvement.interet_rembourse
+                )
+        for caisse in caisses:
+            caisse.montant_total_prets, caisse.montant_total_remboursements = totaux.get(
+                caisse.pk, [Decimal('0'), Decimal('0')]
+            )
+        Caisse.objects.bulk_update(
+            caisses, ['fond_disponible', 'montant_total_prets', 'montant_total_remboursements'],
+            batch_size=self.batch_size,
+        )
@@ -0,0 +1,420 @@
+"""
+Métriques d'exploitation au format texte Prometheus, servies par ``/metrics`` (réseaux internes).
+
+- ``gestion_caisses_http_duree_secondes``: histogramme par vue, méthode et statut HTTP, avec
+  ``gestion_caisses_sql_requetes_total`` / ``gestion_caisses_sql_duree_secondes_total`` par vue
+  (mesurés par ``SQLInstrumentationMiddleware``, donc absents si ``SQL_INSTRUMENTATION = False``);
+- ``gestion_caisses_tache_duree_secondes`` (par tâche et état) et ``gestion_caisses_tache_echecs_total``:
+  signaux Celery branchés par ``connecter_celery`` (caisses_femmes/celery.py);
+- ``gestion_caisses_document_duree_secondes``: rendu PDF / Excel par générateur (documents.py);
+- ``gestion_caisses_operations_total`` / ``gestion_caisses_operations_montant_total``: cotisations,
+  remboursements et transferts enregistrés, comptés après commit (signals.py);
+- ``gestion_caisses_celery_file_attente``: longueur des files Celery, lue à la collecte (broker Redis).
+
+L'accès à ``/metrics`` est réservé aux adresses de ``METRIQUES_RESEAUX`` (boucle locale par défaut)
+et, si ``METRIQUES_JETON`` est défini, aux requêtes portant ce jeton (``Authorization: Bearer``).
+
+Plusieurs processus (workers gunicorn, Celery) sont agrégés selon ``METRIQUES_MODE``:
+
+- ``memoire``: processus courant seulement (runserver, worker unique);
+- ``repertoire``: chaque processus écrit ses totaux dans ``METRIQUES_REPERTOIRE/<pid>.json`` et
+  ``/metrics`` additionne les fichiers (vider le répertoire au redémarrage du service);
+- ``redis``: chaque processus ajoute ses écarts au hash ``METRIQUES_CLE_REDIS`` (``HINCRBYFLOAT``).
+
+Dans les deux derniers modes, les valeurs sont regroupées en mémoire et écrites au plus
+``METRIQUES_INTERVALLE`` secondes après la mesure, hors du chemin de la requête.
+"""
+from collections import defaultdict
+import atexit
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TYPE_CONTENU = 'text/plain; version=0.0.4; charset=utf-8'
+PREFIXE = 'gestion_caisses_'
+SEUILS_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIQUES = {}
+
+
+class Metrique:
+    type = None
+
+    def __init__(self, nom, aide, etiquettes=()):
+        self.nom, self.aide, self.etiquettes = PREFIXE + nom, aide, tuple(etiquettes)
+        METRIQUES[self.nom] = self
+
+    @property
+    def nom_expose(self):
+        return self.nom
+
+    def _valeurs(self, etiquettes):
+        return [str(etiquettes[nom]) for nom in self.etiquettes]
+
+    def series(self):
+        """Série stockée -> noms des étiquettes de ses échantillons"""
+        raise NotImplementedError
+
+
+class Compteur(Metrique):
+    type = 'counter'
+
+    @property
+    def nom_expose(self):
+        return f'{self.nom}_total'
+
+    def inc(self, valeur=1, **etiquettes):
+        _ajouter([((f'{self.nom}_total', self._valeurs(etiquettes)), valeur)])
+
+    def series(self):
+        return {f'{self.nom}_total': self.etiquettes}
+
+
+class Histogramme(Metrique):
+    type = 'histogram'
+
+    def __init__(self, nom, aide, etiquettes=(), seuils=SEUILS_DUREE):
+        super().__init__(nom, aide, etiquettes)
+        self.seuils = tuple(seuils)
+
+    def observer(self, valeur, **etiquettes):
+        valeurs = self._valeurs(etiquettes)
+        # Compteurs cumulés: chaque seuil atteint est incrémenté
+        increments = [
+            ((f'{self.nom}_bucket', valeurs + [_nombre(seuil)]), 1) for seuil in self.seuils if valeur <= seuil
+        ]
+        increments += [
+            ((f'{self.nom}_bucket', valeurs + ['+Inf']), 1),
+            ((f'{self.nom}_sum', valeurs), valeur),
+            ((f'{self.nom}_count', valeurs), 1),
+        ]
+        _ajouter(increments)
+
+    def series(self):
+        return {
+            f'{self.nom}_bucket': self.etiquettes + ('le',),
+            f'{self.nom}_sum': self.etiquettes,
+            f'{self.nom}_count': self.etiquettes,
+        }
+
+
+class Jauge(Metrique):
+    """Valeur lue au moment de la collecte: ``fonction() -> {(valeurs d'étiquettes...): valeur}``"""
+    type = 'gauge'
+
+    def __init__(self, nom, aide, etiquettes=(), fonction=None):
+        super().__init__(nom, aide, etiquettes)
+        self.fonction = fonction
+
+    def series(self):
+        return {self.nom: self.etiquettes}
+
+
+def _nombre(valeur):
+    return repr(float(valeur))
+
+
+# Stockage des valeurs (clé JSON ``[série, [étiquettes...]]`` -> valeur cumulée)
+
+class _Memoire:
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.valeurs = defaultdict(float)
+
+    def ajouter(self, increments):
+        with self.verrou:
+            for cle, valeur in increments:
+                self.valeurs[cle] += valeur
+
+    def lire(self):
+        with self.verrou:
+            return dict(self.valeurs)
+
+
+class _Differe(_Memoire):
+    """Valeurs regroupées en mémoire, écrites par un minuteur au plus ``intervalle`` secondes après"""
+
+    def __init__(self, intervalle):
+        super().__init__()
+        self.intervalle = intervalle
+        self.minuteur = None
+
+    def ajouter(self, increments):
+        super().ajouter(increments)
+        with self.verrou:
+            if self.minuteur is None:
+                self.minuteur = threading.Timer(self.intervalle, self.vider)
+                self.minuteur.daemon = True
+                self.minuteur.start()
+
+    def vider(self):
+        with self.verrou:
+            if self.minuteur is not None:
+                self.minuteur.cancel()
+                self.minuteur = None
+        try:
+            self.ecrire()
+        except Exception as e:
+            # Ne jamais faire échouer une requête ou une tâche à cause des métriques
+            logger.exception(f"Erreur lors de l'écriture des métriques: {e}")
+
+
+class _Repertoire(_Differe):
+    """Un fichier de totaux par processus, additionnés à la collecte"""
+
+    def __init__(self, repertoire, intervalle):
+        super().__init__(intervalle)
+        self.repertoire = repertoire
+        os.makedirs(repertoire, exist_ok=True)
+        self.chemin = os.path.join(repertoire, f'{os.getpid()}.json')
+
+    def ecrire(self):
+        with self.verrou:
+            contenu = json.dumps(self.valeurs)
+        temporaire = f'{self.chemin}.tmp'
+        with open(temporaire, 'w') as fichier:
+            fichier.write(contenu)
+        # Remplacement atomique: la collecte ne lit jamais un fichier à moitié écrit
+        os.replace(temporaire, self.chemin)
+
+    def lire(self):
+        self.vider()
+        totaux = defaultdict(float)
+        for nom in os.listdir(self.repertoire):
+            if not nom.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.repertoire, nom)) as fichier:
+                    valeurs = json.load(fichier)
+            except (OSError, ValueError):
+                continue
+            for cle, valeur in valeurs.items():
+                totaux[cle] += valeur
+        return dict(totaux)
+
+
+class _Redis(_Differe):
+    """Écarts du processus ajoutés à un hash Redis partagé"""
+
+    def __init__(self, url, cle, intervalle):
+        import redis
+
+        super().__init__(intervalle)
+        self.client = redis.Redis.from_url(url)
+        self.cle = cle
+
+    def ecrire(self):
+        with self.verrou:
+            ecarts, self.valeurs = self.valeurs, defaultdict(float)
+        if not ecarts:
+            return
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            for cle, valeur in ecarts.items():
+                pipeline.hincrbyfloat(self.cle, cle, valeur)
+            pipeline.execute()
+        except Exception:
+            # Redis indisponible: réessayer au prochain envoi
+            with self.verrou:
+                for cle, valeur in ecarts.items():
+                    self.valeurs[cle] += valeur
+            raise
+
+    def lire(self):
+        self.vider()
+        return {cle.decode(): float(valeur) for cle, valeur in self.client.hgetall(self.cle).items()}
+
+
+_stockage_courant = (None, None)
+_verrou_stockage = threading.Lock()
+
+
+def _stockage():
+    """Stockage du processus courant (recréé après un fork ou un changement de configuration)"""
+    global _stockage_courant
+    if not getattr(settings, 'METRIQUES_ACTIVES', True):
+        return None
+    mode = getattr(settings, 'METRIQUES_MODE', 'memoire')
+    intervalle = getattr(settings, 'METRIQUES_INTERVALLE', 1.0)
+    configuration = (os.getpid(), mode, getattr(settings, 'METRIQUES_REPERTOIRE', None),
+                     getattr(settings, 'METRIQUES_REDIS_URL', None))
+    if _stockage_courant[0] == configuration:
+        return _stockage_courant[1]
+    with _verrou_stockage:
+        if _stockage_courant[0] != configuration:
+            if mode == 'repertoire':
+                stockage = _Repertoire(settings.METRIQUES_REPERTOIRE, intervalle)
+            elif mode == 'redis':
+                stockage = _Redis(
+                    settings.METRIQUES_REDIS_URL,
+                    getattr(settings, 'METRIQUES_CLE_REDIS', 'gestion_caisses:metriques'), intervalle,
+                )
+            else:
+                stockage = _Memoire()
+            _stockage_courant = (configuration, stockage)
+    return _stockage_courant[1]
+
+
+@atexit.register
+def _vider_a_la_sortie():
+    stockage = _stockage_courant[1]
+    if isinstance(stockage, _Differe):
+        stockage.vider()
+
+
+def _ajouter(increments):
+    try:
+        stockage = _stockage()
+        if stockage is not None:
+            stockage.ajouter([(json.dumps(cle), valeur) for cle, valeur in increments])
+    except Exception as e:
+        logger.exception(f"Erreur lors de l'enregistrement des métriques: {e}")
+
+
+# Mesures de l'application
+
+HTTP_DUREE = Histogramme(
+    'http_duree_secondes', "Durée de traitement des requêtes HTTP", ('vue', 'methode', 'statut'),
+)
+SQL_REQUETES = Compteur('sql_requetes', "Requêtes SQL exécutées par les requêtes HTTP", ('vue',))
+SQL_DUREE = Compteur('sql_duree_secondes', "Temps passé en base par les requêtes HTTP", ('vue',))
+TACHE_DUREE = Histogramme(
+    'tache_duree_secondes', "Durée des tâches Celery", ('tache', 'etat'),
+    seuils=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0),
+)
+TACHE_ECHECS = Compteur('tache_echecs', "Tâches Celery terminées en erreur", ('tache',))
+DOCUMENT_DUREE = Histogramme('document_duree_secondes', "Durée de rendu des documents PDF / Excel", ('generateur',))
+OPERATIONS = Compteur('operations', "Opérations enregistrées (cotisation, remboursement, transfert)", ('type',))
+OPERATIONS_MONTANT = Compteur('operations_montant', "Montant des opérations enregistrées (FCFA)", ('type',))
+
+
+def _longueurs_files():
+    url = getattr(settings, 'CELERY_BROKER_URL', '') or ''
+    if not url.startswith(('redis://', 'rediss://')):
+        return {}
+    try:
+        import redis
+    except ImportError:
+        return {}
+
+    client = redis.Redis.from_url(url, socket_timeout=1)
+    return {(file,): client.llen(file) for file in getattr(settings, 'METRIQUES_FILES_CELERY', ['celery'])}
+
+
+CELERY_FILE = Jauge('celery_file_attente', "Tâches en attente dans les files Celery", ('file',), _longueurs_files)
+
+
+def observer_requete(vue, methode, statut, duree, collecteur):
+    """Mesures d'une requête HTTP (appelé par SQLInstrumentationMiddleware)"""
+    vue = vue or 'inconnue'
+    HTTP_DUREE.observer(duree, vue=vue, methode=methode, statut=statut)
+    SQL_REQUETES.inc(collecteur.nombre, vue=vue)
+    SQL_DUREE.inc(collecteur.duree, vue=vue)
+
+
+def noter_operation(type_operation, montant):
+    OPERATIONS.inc(type=type_operation)
+    OPERATIONS_MONTANT.inc(float(montant or 0), type=type_operation)
+
+
+# Tâches Celery
+
+_debuts_taches = {}
+
+
+def _tache_debut(task_id=None, **kwargs):
+    _debuts_taches[task_id] = time.perf_counter()
+
+
+def _tache_fin(task_id=None, task=None, state=None, **kwargs):
+    debut = _debuts_taches.pop(task_id, None)
+    if debut is not None and task is not None:
+        TACHE_DUREE.observer(time.perf_counter() - debut, tache=task.name, etat=state or 'INCONNU')
+
+
+def _tache_echec(sender=None, **kwargs):
+    TACHE_ECHECS.inc(tache=getattr(sender, 'name', 'inconnue'))
+
+
+def connecter_celery():
+    """Branche les mesures des tâches sur les signaux Celery (à appeler par l'application Celery)"""
+    from celery.signals import task_failure, task_postrun, task_prerun
+
+    task_prerun.connect(_tache_debut, weak=False, dispatch_uid='metriques_tache_debut')
+    task_postrun.connect(_tache_fin, weak=False, dispatch_uid='metriques_tache_fin')
+    task_failure.connect(_tache_echec, weak=False, dispatch_uid='metriques_tache_echec')
+
+
+# Exposition
+
+def _echapper(valeur):
+    return valeur.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _ligne(serie, noms, valeurs, valeur):
+    etiquettes = ','.join(f'{nom}="{_echapper(v)}"' for nom, v in zip(noms, valeurs))
+    return f'{serie}{{{etiquettes}}} {valeur!r}' if etiquettes else f'{serie} {valeur!r}'
+
+
+def exposer():
+    """Texte d'exposition Prometheus de toutes les métriques (agrégées selon METRIQUES_MODE)"""
+    stockage = _stockage()
+    par_serie = defaultdict(dict)
+    if stockage is not None:
+        for cle, valeur in stockage.lire().items():
+            serie, valeurs = json.loads(cle)
+            par_serie[serie][tuple(valeurs)] = valeur
+
+    lignes = []
+    for metrique in METRIQUES.values():
+        if isinstance(metrique, Jauge):
+            try:
+                par_serie[metrique.nom] = {
+                    tuple(str(v) for v in valeurs): valeur for valeurs, valeur in metrique.fonction().items()
+                }
+            except Exception as e:
+                lignes.append(f'# {metrique.nom} indisponible: {_echapper(str(e))}')
+                continue
+        lignes.append(f'# HELP {metrique.nom_expose} {metrique.aide}')
+        lignes.append(f'# TYPE {metrique.nom_expose} {metrique.type}')
+        for serie, noms in metrique.series().items():
+            echantillons = par_serie.get(serie, {})
+            ordre = None
+            if serie.endswith('_bucket'):
+                # Seuils jamais atteints: présents à 0 pour chaque combinaison d'étiquettes observée
+                for valeurs in par_serie.get(f'{metrique.nom}_count', {}):
+                    for seuil in (*map(_nombre, metrique.seuils), '+Inf'):
+                        echantillons.setdefault((*valeurs, seuil), 0.0)
+                ordre = lambda valeurs: (valeurs[:-1], float(valeurs[-1]))
+            for valeurs in sorted(echantillons, key=ordre):
+                lignes.append(_ligne(serie, noms, valeurs, echantillons[valeurs]))
+    return '\n'.join(lignes) + '\n'
+
+
+def adresse_autorisee(adresse):
+    """Adresse cliente dans ``METRIQUES_RESEAUX`` (boucle locale par défaut)"""
+    try:
+        ip = ipaddress.ip_address(adresse or '')
+    except ValueError:
+        return False
+    reseaux = getattr(settings, 'METRIQUES_RESEAUX', None) or ['127.0.0.0/8', '::1/128']
+    return any(ip in ipaddress.ip_network(reseau.strip(), strict=False) for reseau in reseaux if reseau.strip())
+
+
+def acces_autorise(request):
+    """Adresse autorisée et, si ``METRIQUES_JETON`` est défini, jeton ``Bearer`` correspondant"""
+    if not adresse_autorisee(request.META.get('REMOTE_ADDR')):
+        return False
+    jeton = getattr(settings, 'METRIQUES_JETON', '')
+    if not jeton:
+        return True
+    schema, _sep, fourni = request.headers.get('Authorization', '').partition(' ')
+    return schema.lower() == 'bearer' and hmac.compare_digest(fourni.strip().encode(), jeton.encode())
@@ -0,0 +1,178 @@
+import cProfile
+import logging
+import pstats
+import sys
+import time
+
+from django.conf import settings
+
+from .audit import tampon_audit
+from .instrumentation import CollecteurSQL, budget_pour, nom_endpoint, sur_toutes_les_bases
+from . import metriques, profilage, routage
+
+
+logger = logging.getLogger('gestion_caisses.sql')
+logger_profilage = logging.getLogger('gestion_caisses.profilage')
+
+
+class RoutageMiddleware:
+    """
+    Porte l'état du routeur de bases pour la requête (voir routage.py): après une écriture,
+    les lectures de rapports de la même requête restent sur la base principale.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routage.requete():
+            return self.get_response(request)
+
+
+class SQLInstrumentationMiddleware:
+    """
+    Mesure, pour chaque requête HTTP, le nombre de requêtes SQL, le temps passé en base,
+    l'instruction la plus lente et les doublons.
+
+    Les mesures sont journalisées (format « verbose »), exposées dans l'en-tête
+    ``Server-Timing`` et comparées au budget de l'endpoint lorsque ``SQL_BUDGETS_ALERTE`` est actif.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'SQL_INSTRUMENTATION', True):
+            return self.get_response(request)
+
+        collecteur = CollecteurSQL()
+        request.collecteur_sql = collecteur
+        debut = time.perf_counter()
+        with sur_toutes_les_bases(collecteur):
+            response = self.get_response(request)
+        duree_totale = (time.perf_counter() - debut) * 1000
+
+        endpoint = nom_endpoint(request)
+        response['Server-Timing'] = (
+            f'db;dur={collecteur.duree * 1000:.1f};desc="{collecteur.nombre} requetes", '
+            f'app;dur={duree_totale:.1f}'
+        )
+        self.journaliser(request, endpoint, collecteur, duree_totale)
+        metriques.observer_requete(endpoint, request.method, response.status_code, duree_totale / 1000, collecteur)
+        return response
+
+    def journaliser(self, request, endpoint, collecteur, duree_totale):
+        resume = collecteur.resume()
+        message = (
+            f"{request.method} {request.path} vue={endpoint} requetes={resume['requetes']} "
+            f"db={resume['duree_db_ms']}ms total={duree_totale:.1f}ms "
+            f"plus_lente={resume['plus_lente_ms']}ms doublons={resume['doublons']}"
+        )
+        if resume['doublons']:
+            message += f" repetee={resume['plus_repetee_nombre']}x[{resume['plus_repetee_sql'][:120]}]"
+
+        budget = budget_pour(endpoint) if endpoint else None
+        if budget is not None and collecteur.nombre > budget and getattr(settings, 'SQL_BUDGETS_ALERTE', False):
+            logger.warning(f"Budget SQL dépassé ({collecteur.nombre}/{budget}) - {message}")
+        else:
+            logger.info(message)
+
+
+class ProfilageMiddleware:
+    """
+    Exécute la requête sous ``cProfile`` lorsqu'un superutilisateur le demande
+    (``?_profil=<jeton signé>``) ou qu'une ``RegleProfilage`` active correspond au chemin,
+    puis enregistre un ``ProfileRecord`` (son identifiant est renvoyé dans ``X-Profil-Id``).
+
+    Placé après ``AuthenticationMiddleware``: le jeton n'est accepté que pour le
+    superutilisateur authentifié à qui il a été émis (``request.user``).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'PROFILAGE_REQUETES', True):
+            return self.get_response(request)
+
+        declencheur, utilisateur, regle_id = self.declencheur(request)
+        if declencheur is None:
+            return self.get_response(request)
+
+        collecteur = CollecteurSQL(detail=True)
+        profileur = cProfile.Profile()
+        echantillonneur = profilage.EchantillonneurPiles(
+            sys._getframe(), getattr(settings, 'PROFILAGE_INTERVALLE', 0.005)
+        )
+        debut = time.perf_counter()
+        try:
+            profileur.enable()
+        except ValueError:
+            # Un autre profileur est déjà actif sur ce thread
+            return self.get_response(request)
+        echantillonneur.start()
+        try:
+            with sur_toutes_les_bases(collecteur):
+                response = self.get_response(request)
+        finally:
+            profileur.disable()
+            echantillonneur.arreter()
+        duree_totale = (time.perf_counter() - debut) * 1000
+
+        record = self.enregistrer(request, response, declencheur, utilisateur, regle_id,
+                                  profileur, echantillonneur, collecteur, duree_totale)
+        if record is not None:
+            response['X-Profil-Id'] = str(record.pk)
+        return response
+
+    def declencheur(self, request):
+        """(type de déclencheur, utilisateur, règle) ou (None, None, None) si pas de profilage."""
+        jeton = request.GET.get(profilage.PARAMETRE)
+        if jeton:
+            utilisateur = profilage.utilisateur_du_jeton(jeton, getattr(request, 'user', None))
+            if utilisateur is not None:
+                return 'JETON', utilisateur, None
+            return None, None, None
+        regle_id = profilage.regle_pour(request.path)
+        if regle_id is not None and profilage.consommer_regle(regle_id):
+            return 'REGLE', None, regle_id
+        return None, None, None
+
+    def enregistrer(self, request, response, declencheur, utilisateur, regle_id, profileur, echantillonneur,
+                    collecteur, duree_totale):
+        from .models import ProfileRecord
+
+        try:
+            stats = pstats.Stats(profileur).stats
+            if utilisateur is None and getattr(request, 'user', None) is not None and request.user.is_authenticated:
+                utilisateur = request.user
+            return ProfileRecord.objects.create(
+                chemin=request.get_full_path()[:500],
+                methode=request.method,
+                endpoint=nom_endpoint(request) or '',
+                statut_http=response.status_code,
+                declencheur=declencheur,
+                regle_id=regle_id,
+                utilisateur=utilisateur,
+                duree_totale_ms=round(duree_totale, 2),
+                duree_db_ms=round(collecteur.duree * 1000, 2),
+                nombre_requetes=collecteur.nombre,
+                fonctions_principales=profilage.fonctions_principales(stats),
+                requetes_sql=collecteur.requetes,
+                piles_repliees=echantillonneur.piles_repliees(),
+                statistiques=profilage.sortie_pstats(profileur),
+            )
+        except Exception as e:
+            logger_profilage.error(f"Impossible d'enregistrer le profil de {request.path}: {e}")
+            return None
+
+
+class AuditTamponMiddleware:
+    """Regroupe les écritures du journal d'audit d'une requête en un seul INSERT (voir audit.py)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with tampon_audit():
+            return self.get_response(request)
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_caisses', '0032_increase_carte_electeur_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['date_action'], name='gestion_cai_date_ac_0ab8b1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='echeance',
+            index=models.Index(fields=['statut', 'date_echeance'], name='gestion_cai_statut_4e9f21_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mouvementfond',
+            index=models.Index(fields=['caisse', 'date_mouvement'], name='gestion_cai_caisse__59b51b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mouvementfond',
+            index=models.Index(fields=['pret', 'type_mouvement'], name='gestion_cai_pret_id_777564_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['destinataire', 'statut'], name='gestion_cai_destina_a184a3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('statut', 'NON_LU')), fields=['destinataire', '-date_creation'], name='notification_non_lue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pret',
+            index=models.Index(fields=['caisse', 'statut'], name='gestion_cai_caisse__e1f1cf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pret',
+            index=models.Index(fields=['membre', 'statut'], name='gestion_cai_membre__0116cf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pret',
+            index=models.Index(condition=models.Q(('statut', 'EN_COURS')), fields=['date_demande'], name='pret_en_cours_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_caisses', '0033_indexes_requetes_frequentes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegleProfilage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motif_url', models.CharField(help_text='Expression régulière testée sur le chemin, ex: ^/gestion-caisses/api/rapports-caisse/', max_length=255, verbose_name="Motif d'URL")),
+                ('actif', models.BooleanField(default=True, verbose_name='Actif')),
+                ('nombre_restant', models.PositiveIntegerField(default=10, help_text='Nombre de requêtes encore à profiler avant désactivation', verbose_name='Profils restants')),
+                ('date_expiration', models.DateTimeField(blank=True, null=True, verbose_name="Date d'expiration")),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Créée par')),
+            ],
+            options={
+                'verbose_name': 'Règle de profilage',
+                'verbose_name_plural': 'Règles de profilage',
+                'ordering': ['-date_creation'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfileRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chemin', models.CharField(max_length=500, verbose_name='Chemin')),
+                ('methode', models.CharField(max_length=10, verbose_name='Méthode')),
+                ('endpoint', models.CharField(blank=True, max_length=200, verbose_name='Vue')),
+                ('statut_http', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Statut HTTP')),
+                ('declencheur', models.CharField(choices=[('JETON', 'Paramètre signé'), ('REGLE', "Règle d'URL")], max_length=10, verbose_name='Déclencheur')),
+                ('duree_totale_ms', models.FloatField(verbose_name='Durée totale (ms)')),
+                ('duree_db_ms', models.FloatField(default=0, verbose_name='Durée base de données (ms)')),
+                ('nombre_requetes', models.PositiveIntegerField(default=0, verbose_name='Requêtes SQL')),
+                ('fonctions_principales', models.JSONField(default=list, verbose_name='Fonctions (temps cumulé)')),
+                ('requetes_sql', models.JSONField(default=list, verbose_name='Requêtes SQL exécutées')),
+                ('piles_repliees', models.TextField(blank=True, verbose_name='Piles repliées (flame graph)')),
+                ('statistiques', models.TextField(blank=True, verbose_name='Statistiques pstats')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+                ('regle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='profils', to='gestion_caisses.regleprofilage', verbose_name='Règle')),
+            ],
+            options={
+                'verbose_name': 'Profil de requête',
+                'verbose_name_plural': 'Profils de requêtes',
+                'ordering': ['-date_creation'],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_caisses', '0034_profilage_requetes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=50, unique=True, verbose_name='Nom')),
+                ('valeur', models.BigIntegerField(default=0, verbose_name='Dernière valeur attribuée')),
+            ],
+            options={
+                'verbose_name': 'Séquence',
+                'verbose_name_plural': 'Séquences',
+                'ordering': ['nom'],
+            },
+        ),
+    ]
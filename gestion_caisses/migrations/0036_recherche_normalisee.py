@@ -0,0 +1,108 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:56
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Copie figée de l'état du code à cette migration (recherche.py peut évoluer ensuite)
+CHAMPS_RECHERCHE = {
+    'Caisse': ('nom_association', 'code'),
+    'Membre': ('nom', 'prenoms', 'numero_carte_electeur'),
+    'Pret': ('numero_pret',),
+}
+TABLES_INDEXEES = ('gestion_caisses_membre', 'gestion_caisses_pret', 'gestion_caisses_caisse')
+
+
+def normaliser(*valeurs):
+    texte = ' '.join(str(valeur) for valeur in valeurs if valeur)
+    texte = ''.join(c for c in unicodedata.normalize('NFKD', texte) if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^0-9A-Z]+', ' ', texte.upper()).split())
+
+
+def remplir_recherche(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    for nom_modele, champs in CHAMPS_RECHERCHE.items():
+        modele = apps.get_model('gestion_caisses', nom_modele)
+        lot = []
+        for objet in modele.objects.using(alias).only('pk', *champs).iterator(chunk_size=2000):
+            objet.recherche = normaliser(*(getattr(objet, champ) for champ in champs))
+            lot.append(objet)
+            if len(lot) >= 2000:
+                modele.objects.using(alias).bulk_update(lot, ['recherche'])
+                lot = []
+        modele.objects.using(alias).bulk_update(lot, ['recherche'])
+
+
+def creer_index(apps, schema_editor):
+    connexion = schema_editor.connection
+    with connexion.cursor() as cursor:
+        if connexion.vendor == 'postgresql':
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for table in TABLES_INDEXEES:
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {table}_recherche_trgm '
+                    f'ON {table} USING gin (recherche gin_trgm_ops)'
+                )
+        elif connexion.vendor == 'sqlite':
+            for table in TABLES_INDEXEES:
+                fts = f'{table}_fts'
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"recherche, content='{table}', content_rowid='id', tokenize='trigram')"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                    f"INSERT INTO {fts}(rowid, recherche) VALUES (new.id, new.recherche); END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                    f"INSERT INTO {fts}({fts}, rowid, recherche) VALUES ('delete', old.id, old.recherche); END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF recherche ON {table} BEGIN "
+                    f"INSERT INTO {fts}({fts}, rowid, recherche) VALUES ('delete', old.id, old.recherche); "
+                    f"INSERT INTO {fts}(rowid, recherche) VALUES (new.id, new.recherche); END"
+                )
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def retirer_index(apps, schema_editor):
+    connexion = schema_editor.connection
+    with connexion.cursor() as cursor:
+        for table in TABLES_INDEXEES:
+            if connexion.vendor == 'postgresql':
+                cursor.execute(f'DROP INDEX IF EXISTS {table}_recherche_trgm')
+            elif connexion.vendor == 'sqlite':
+                fts = f'{table}_fts'
+                for suffixe in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffixe}')
+                cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_caisses', '0035_sequences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='caisse',
+            name='recherche',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='membre',
+            name='recherche',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='pret',
+            name='recherche',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(remplir_recherche, migrations.RunPython.noop),
+        migrations.RunPython(creer_index, retirer_index),
+    ]
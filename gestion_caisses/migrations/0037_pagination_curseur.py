@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_caisses', '0036_recherche_normalisee'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='gestion_cai_date_ac_0ab8b1_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cotisation',
+            name='gestion_cai_date_co_646b2f_idx',
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['date_action', 'id'], name='auditlog_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cotisation',
+            index=models.Index(fields=['date_cotisation', 'id'], name='cotisation_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='echeance',
+            index=models.Index(fields=['date_echeance', 'id'], name='echeance_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mouvementfond',
+            index=models.Index(fields=['date_mouvement', 'id'], name='mouvement_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['destinataire', 'date_creation', 'id'], name='notification_dest_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:07
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+# Copie figée de l'état du code à cette migration (synchronisation.py peut évoluer ensuite)
+CLE_SEQUENCE = 'sync_journal'
+TAILLE_LOT = 2000
+MODELES = {
+    'membre': ('Membre', 'caisse_id'),
+    'pret': ('Pret', 'caisse_id'),
+    'echeance': ('Echeance', 'pret__caisse_id'),
+    'cotisation': ('Cotisation', 'caisse_id'),
+    'seance': ('SeanceReunion', 'caisse_id'),
+    'mouvement': ('MouvementFond', 'caisse_id'),
+}
+
+
+def remplir_journal(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    JournalSync = apps.get_model('gestion_caisses', 'JournalSync')
+    Sequence = apps.get_model('gestion_caisses', 'Sequence')
+
+    def inserer(lignes):
+        if lignes:
+            JournalSync.objects.using(alias).bulk_create(
+                lignes, update_conflicts=True, unique_fields=['modele', 'objet_id'],
+                update_fields=['caisse_id', 'version', 'operation'],
+            )
+
+    version = max(
+        Sequence.objects.using(alias).filter(nom=CLE_SEQUENCE).values_list('valeur', flat=True).first() or 0,
+        JournalSync.objects.using(alias).aggregate(derniere=Max('version'))['derniere'] or 0,
+    )
+    for cle, (nom_modele, chemin) in MODELES.items():
+        modele = apps.get_model('gestion_caisses', nom_modele)
+        objets = (
+            modele.objects.using(alias).filter(**{f'{chemin}__isnull': False})
+            .values_list('pk', chemin).order_by('pk')
+        )
+        lot = []
+        for objet_id, caisse_id in objets.iterator(chunk_size=TAILLE_LOT):
+            version += 1
+            lot.append(JournalSync(modele=cle, objet_id=objet_id, caisse_id=caisse_id, version=version, operation='U'))
+            if len(lot) >= TAILLE_LOT:
+                inserer(lot)
+                lot = []
+        inserer(lot)
+    Sequence.objects.using(alias).update_or_create(nom=CLE_SEQUENCE, defaults={'valeur': version})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_caisses', '0037_pagination_curseur'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalSync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modele', models.CharField(max_length=20, verbose_name='Modèle')),
+                ('objet_id', models.PositiveBigIntegerField(verbose_name="ID de l'objet")),
+                ('caisse_id', models.PositiveBigIntegerField(verbose_name='ID de la caisse')),
+                ('version', models.BigIntegerField(verbose_name='Version')),
+                ('operation', models.CharField(choices=[('U', 'Création / modification'), ('D', 'Suppression')], default='U', max_length=1, verbose_name='Opération')),
+                ('date_modification', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+            ],
+            options={
+                'verbose_name': 'Journal de synchronisation',
+                'verbose_name_plural': 'Journal de synchronisation',
+                'indexes': [models.Index(fields=['caisse_id', 'version'], name='journal_sync_caisse_idx')],
+                'constraints': [models.UniqueConstraint(fields=('modele', 'objet_id'), name='journal_sync_objet_unique')],
+            },
+        ),
+        migrations.RunPython(remplir_journal, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:12
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_caisses', '0038_journal_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CleIdempotence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=100, verbose_name='Clé')),
+                ('operation', models.CharField(max_length=30, verbose_name='Opération')),
+                ('empreinte', models.CharField(max_length=64, verbose_name='Empreinte de la requête')),
+                ('statut_http', models.PositiveSmallIntegerField(verbose_name='Statut HTTP')),
+                ('reponse', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Réponse')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('date_expiration', models.DateTimeField(db_index=True, verbose_name="Date d'expiration")),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': "Clé d'idempotence",
+                'verbose_name_plural': "Clés d'idempotence",
+                'constraints': [models.UniqueConstraint(fields=('utilisateur', 'cle'), name='cle_idempotence_unique')],
+            },
+        ),
+    ]
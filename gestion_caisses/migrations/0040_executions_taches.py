@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:32
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_caisses', '0039_cles_idempotence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=100, verbose_name='Tâche')),
+                ('statut', models.CharField(choices=[('EN_COURS', 'En cours'), ('SUCCES', 'Succès'), ('ECHEC', 'Échec'), ('INTERROMPUE', 'Interrompue'), ('IGNOREE', 'Ignorée (exécution précédente en cours)'), ('REPORTEE', 'Reportée (exécution précédente en cours)')], default='EN_COURS', max_length=12, verbose_name='Statut')),
+                ('date_debut', models.DateTimeField(verbose_name='Début')),
+                ('date_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('duree_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Durée (ms)')),
+                ('lignes_traitees', models.PositiveIntegerField(default=0, verbose_name='Lignes traitées')),
+                ('point_reprise', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Point de reprise')),
+                ('resultat', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Résultat')),
+                ('erreur', models.TextField(blank=True, verbose_name='Erreur')),
+            ],
+            options={
+                'verbose_name': 'Exécution de tâche',
+                'verbose_name_plural': 'Exécutions de tâches',
+                'indexes': [models.Index(fields=['nom', '-date_debut'], name='task_run_nom_idx')],
+            },
+        ),
+    ]
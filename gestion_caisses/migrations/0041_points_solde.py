@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_caisses', '0040_executions_taches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('solde', models.DecimalField(decimal_places=2, max_digits=15, verbose_name='Solde en fin de journée')),
+                ('mouvement_id', models.BigIntegerField(blank=True, null=True, verbose_name='Dernier mouvement')),
+                ('date_creation', models.DateTimeField(auto_now=True, verbose_name='Calculé le')),
+                ('caisse', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='points_solde', to='gestion_caisses.caisse', verbose_name='Caisse')),
+            ],
+            options={
+                'verbose_name': 'Point de solde',
+                'verbose_name_plural': 'Points de solde',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('caisse', 'date'), name='point_solde_caisse_date_unique'), models.UniqueConstraint(condition=models.Q(('caisse__isnull', True)), fields=('date',), name='point_solde_reserve_date_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:50
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_caisses', '0041_points_solde'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerificationIntegrite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statut', models.CharField(choices=[('EN_COURS', 'En cours'), ('TERMINEE', 'Terminée'), ('ECHEC', 'Échec')], default='EN_COURS', max_length=10, verbose_name='Statut')),
+                ('incrementale', models.BooleanField(default=True, verbose_name='Incrémentale')),
+                ('date_debut', models.DateTimeField(auto_now_add=True, verbose_name='Début')),
+                ('date_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('duree_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Durée (ms)')),
+                ('processus', models.PositiveSmallIntegerField(default=1, verbose_name='Processus')),
+                ('caisses_verifiees', models.PositiveIntegerField(default=0, verbose_name='Caisses vérifiées')),
+                ('caisses_ignorees', models.PositiveIntegerField(default=0, verbose_name='Caisses inchangées (ignorées)')),
+                ('caisses_en_anomalie', models.PositiveIntegerField(default=0, verbose_name='Caisses en anomalie')),
+                ('anomalies', models.PositiveIntegerField(default=0, verbose_name='Anomalies')),
+                ('erreur', models.TextField(blank=True, verbose_name='Erreur')),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Lancée par')),
+            ],
+            options={
+                'verbose_name': "Vérification d'intégrité",
+                'verbose_name_plural': "Vérifications d'intégrité",
+                'ordering': ['-date_debut'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResultatIntegrite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statut', models.CharField(choices=[('OK', 'Conforme'), ('ANOMALIE', 'Anomalie')], max_length=10, verbose_name='Statut')),
+                ('version_journal', models.BigIntegerField(default=0, verbose_name='Version du journal')),
+                ('fond_disponible', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='Solde vérifié')),
+                ('mouvements', models.PositiveIntegerField(default=0, verbose_name='Mouvements rejoués')),
+                ('prets', models.PositiveIntegerField(default=0, verbose_name='Prêts contrôlés')),
+                ('nombre_anomalies', models.PositiveIntegerField(default=0, verbose_name='Anomalies')),
+                ('anomalies', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Détail des anomalies')),
+                ('duree_ms', models.PositiveIntegerField(default=0, verbose_name='Durée (ms)')),
+                ('caisse', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resultats_integrite', to='gestion_caisses.caisse', verbose_name='Caisse')),
+                ('verification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resultats', to='gestion_caisses.verificationintegrite', verbose_name='Vérification')),
+            ],
+            options={
+                'verbose_name': "Résultat d'intégrité",
+                'verbose_name_plural': "Résultats d'intégrité",
+                'indexes': [models.Index(fields=['caisse', '-id'], name='resultat_integrite_caisse_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_caisses', '0042_verifications_integrite'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerrouTache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=100, unique=True, verbose_name='Tâche')),
+                ('detenteur', models.CharField(blank=True, max_length=32, verbose_name='Détenteur')),
+                ('expiration', models.DateTimeField(blank=True, null=True, verbose_name='Expiration')),
+            ],
+            options={
+                'verbose_name': 'Verrou de tâche',
+                'verbose_name_plural': 'Verrous de tâches',
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:27
+
+from decimal import Decimal, InvalidOperation
+import re
+
+from django.db import migrations, models
+
+
+# Les remboursements antérieurs n'inscrivaient la part d'intérêt que dans la description:
+# "Remboursement du prêt ... (principal: X FCFA, intérêt: Y FCFA)"
+INTERET = re.compile(r"intér[eê]t:\s*(\d[\d\s]*(?:[.,]\d+)?)", re.IGNORECASE)
+TAILLE_LOT = 2000
+
+
+def reprendre_interets(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    MouvementFond = apps.get_model('gestion_caisses', 'MouvementFond')
+
+    lot = []
+    remboursements = (
+        MouvementFond.objects.using(alias).filter(type_mouvement='REMBOURSEMENT', description__icontains='intér')
+        .only('pk', 'montant', 'description').order_by('pk')
+    )
+    for mouvement in remboursements.iterator(chunk_size=TAILLE_LOT):
+        correspondance = INTERET.search(mouvement.description or '')
+        if not correspondance:
+            continue
+        try:
+            interet = Decimal(correspondance.group(1).replace(' ', '').replace(',', '.'))
+        except InvalidOperation:
+            continue
+        if 0 < interet <= mouvement.montant:
+            mouvement.interet_rembourse = interet
+            lot.append(mouvement)
+        if len(lot) >= TAILLE_LOT:
+            MouvementFond.objects.using(alias).bulk_update(lot, ['interet_rembourse'])
+            lot = []
+    if lot:
+        MouvementFond.objects.using(alias).bulk_update(lot, ['interet_rembourse'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_caisses', '0043_verrous_taches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mouvementfond',
+            name='interet_rembourse',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Intérêt remboursé'),
+        ),
+        migrations.RunPython(reprendre_interets, migrations.RunPython.noop),
+    ]
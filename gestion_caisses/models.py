@@ -3,10 +3,13 @@
 # pyright: reportMissingTypeStubs=false, reportUnknownMemberType=false, reportAttributeAccessIssue=false, reportUnknownVariableType=false, reportMissingImports=false
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.db.models import Sum
+from .recherche import RechercheMixin
+import itertools
 import unicodedata
 import uuid
 import random
@@ -41,17 +44,20 @@ def generate_fkm_code_from_name(model_cls, name_source, field_name='code', prefi
     if len(base_letters) < length:
         base_letters = (base_letters + [random.choice(string.ascii_uppercase) for _ in range(length - len(base_letters))])
 
-    # Tenter plusieurs combinaisons pour trouver une valeur unique si nécessaire
+    candidates = []
     for _ in range(max_attempts):
-        chosen = ''.join(random.choice(base_letters) for _ in range(length))
-        candidate = f"{prefix}{chosen}"
-
-        # Vérifier l'unicité uniquement si le champ est unique dans le modèle
-        field = model_cls._meta.get_field(field_name)
-        if getattr(field, 'unique', False):
-            if not model_cls.objects.filter(**{field_name: candidate}).exists():
-                return candidate
-        else:
+        candidate = f"{prefix}{''.join(random.choice(base_letters) for _ in range(length))}"
+        if candidate not in candidates:
+            candidates.append(candidate)
+
+    # Vérifier l'unicité uniquement si le champ est unique dans le modèle,
+    # en une seule requête pour tous les candidats
+    field = model_cls._meta.get_field(field_name)
+    if not getattr(field, 'unique', False):
+        return candidates[0]
+    pris = set(model_cls.objects.filter(**{f'{field_name}__in': candidates}).values_list(field_name, flat=True))
+    for candidate in candidates:
+        if candidate not in pris:
             return candidate
 
     # En dernier recours, ajouter un suffixe numérique
@@ -92,6 +98,303 @@ def assert_exercice_ouvert(caisse):
     return True
 
 
+class SuiviModificationsMixin:
+    """Mémorise les valeurs chargées depuis la base pour savoir, sans requête, quels champs ont changé.
+
+    Un ``save()`` sans ``update_fields`` sur une instance chargée n'écrit que les champs modifiés
+    (aucun UPDATE si rien n'a changé).
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._memoriser_etat()
+        return instance
+
+    def _memoriser_etat(self, champs=None):
+        valeurs = self.__dict__
+        etat = valeurs.setdefault('_etat_charge', {})
+        for field in self._meta.concrete_fields:
+            if field.attname in valeurs and (champs is None or field.name in champs or field.attname in champs):
+                etat[field.attname] = valeurs[field.attname]
+
+    def champs_modifies(self):
+        """{attname: valeur chargée} des champs modifiés depuis le chargement, None si l'instance n'a pas été chargée"""
+        etat = self.__dict__.get('_etat_charge')
+        if etat is None:
+            return None
+        valeurs = self.__dict__
+        return {
+            field.attname: etat.get(field.attname)
+            for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in valeurs
+            and (field.attname not in etat or valeurs[field.attname] != etat[field.attname])
+        }
+
+    def save(self, *args, **kwargs):
+        if not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert') and not self._state.adding:
+            modifies = self.champs_modifies()
+            if modifies is not None:
+                # Les champs auto_now doivent rester rafraîchis à chaque sauvegarde
+                kwargs['update_fields'] = list(modifies) + [
+                    field.attname for field in self._meta.concrete_fields
+                    if getattr(field, 'auto_now', False) and field.attname not in modifies
+                ]
+        super().save(*args, **kwargs)
+        self._memoriser_etat(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._memoriser_etat(fields)
+
+
+class Sequence(models.Model):
+    """Compteur nommé, alloué atomiquement (codes de caisse, matricules d'agent, numéros de prêt)"""
+    nom = models.CharField(max_length=50, unique=True, verbose_name="Nom")
+    valeur = models.BigIntegerField(default=0, verbose_name="Dernière valeur attribuée")
+
+    class Meta:
+        verbose_name = "Séquence"
+        verbose_name_plural = "Séquences"
+        ordering = ['nom']
+
+    def __str__(self) -> str:
+        return f"{self.nom} = {self.valeur}"
+
+    @classmethod
+    def allouer(cls, nom, nombre=1, initial=None):
+        """Réserve ``nombre`` valeurs consécutives de la séquence et renvoie la première.
+
+        - Une seule instruction ``UPDATE ... RETURNING`` lorsque la base le permet (PostgreSQL,
+          SQLite >= 3.35); sinon ``UPDATE`` avec ``F()`` puis lecture dans la même transaction.
+          Dans les deux cas le verrou posé par l'UPDATE sérialise les workers concurrents.
+        - ``initial``: fonction renvoyant la dernière valeur déjà utilisée, appelée uniquement
+          à la création de la séquence (reprise des numéros existants).
+        """
+        from django.db import IntegrityError, transaction
+
+        if nombre < 1:
+            raise ValueError("Le nombre de valeurs à allouer doit être positif.")
+        for _ in range(2):
+            valeur = cls._incrementer(nom, nombre)
+            if valeur is not None:
+                return valeur - nombre + 1
+            try:
+                with transaction.atomic():
+                    cls.objects.create(nom=nom, valeur=initial() if initial else 0)
+            except IntegrityError:
+                # Créée entre-temps par un autre worker
+                pass
+        raise RuntimeError(f"Impossible d'allouer la séquence {nom}.")
+
+    @classmethod
+    def _incrementer(cls, nom, nombre):
+        """Nouvelle valeur de la séquence après incrément, ou None si elle n'existe pas encore"""
+        from django.db import connections, router, transaction
+        from django.db.models import F
+
+        alias = router.db_for_write(cls)
+        connexion = connections[alias]
+        if connexion.vendor == 'postgresql' or (
+            connexion.vendor == 'sqlite' and connexion.Database.sqlite_version_info >= (3, 35)
+        ):
+            table = connexion.ops.quote_name(cls._meta.db_table)
+            with connexion.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {table} SET valeur = valeur + %s WHERE nom = %s RETURNING valeur",
+                    [nombre, nom],
+                )
+                ligne = cursor.fetchone()
+            return ligne[0] if ligne else None
+
+        with transaction.atomic(using=alias):
+            if not cls.objects.using(alias).filter(nom=nom).update(valeur=F('valeur') + nombre):
+                return None
+            return cls.objects.using(alias).filter(nom=nom).values_list('valeur', flat=True).get()
+
+
+def dernier_suffixe_numerique(valeurs, prefixe):
+    """Plus grand suffixe numérique parmi les valeurs commençant par ``prefixe`` (0 si aucun)"""
+    dernier = 0
+    for valeur in valeurs:
+        suffixe = valeur[len(prefixe):]
+        if valeur.startswith(prefixe) and suffixe.isdigit():
+            dernier = max(dernier, int(suffixe))
+    return dernier
+
+
+
+class JournalSync(models.Model):
+    """Dernier changement de chaque objet synchronisé avec l'application hors ligne (voir synchronisation.py)"""
+    OPERATION_CHOICES = [
+        ('U', 'Création / modification'),
+        ('D', 'Suppression'),
+    ]
+
+    modele = models.CharField(max_length=20, verbose_name="Modèle")
+    objet_id = models.PositiveBigIntegerField(verbose_name="ID de l'objet")
+    # Pas de clé étrangère: les suppressions doivent rester inscrites après celle de la caisse
+    caisse_id = models.PositiveBigIntegerField(verbose_name="ID de la caisse")
+    version = models.BigIntegerField(verbose_name="Version")
+    operation = models.CharField(max_length=1, choices=OPERATION_CHOICES, default='U', verbose_name="Opération")
+    date_modification = models.DateTimeField(auto_now=True, verbose_name="Date de modification")
+
+    class Meta:
+        verbose_name = "Journal de synchronisation"
+        verbose_name_plural = "Journal de synchronisation"
+        constraints = [
+            models.UniqueConstraint(fields=['modele', 'objet_id'], name='journal_sync_objet_unique'),
+        ]
+        indexes = [
+            # Changements d'une caisse depuis une marque
+            models.Index(fields=['caisse_id', 'version'], name='journal_sync_caisse_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.modele} #{self.objet_id} ({self.operation}) v{self.version}"
+
+
+class CleIdempotence(models.Model):
+    """Résultat d'une écriture rejouable (clé ``Idempotency-Key``), conservé jusqu'à expiration (voir idempotence.py)"""
+    utilisateur = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', verbose_name="Utilisateur")
+    cle = models.CharField(max_length=100, verbose_name="Clé")
+    operation = models.CharField(max_length=30, verbose_name="Opération")
+    empreinte = models.CharField(max_length=64, verbose_name="Empreinte de la requête")
+    statut_http = models.PositiveSmallIntegerField(verbose_name="Statut HTTP")
+    reponse = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="Réponse")
+    date_creation = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+    date_expiration = models.DateTimeField(db_index=True, verbose_name="Date d'expiration")
+
+    class Meta:
+        verbose_name = "Clé d'idempotence"
+        verbose_name_plural = "Clés d'idempotence"
+        constraints = [
+            models.UniqueConstraint(fields=['utilisateur', 'cle'], name='cle_idempotence_unique'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.operation} {self.cle} ({self.statut_http})"
+
+
+class TaskRun(models.Model):
+    """Exécution d'une tâche planifiée sous verrou (voir planification.py)"""
+    STATUT_CHOICES = [
+        ('EN_COURS', 'En cours'),
+        ('SUCCES', 'Succès'),
+        ('ECHEC', 'Échec'),
+        ('INTERROMPUE', 'Interrompue'),
+        ('IGNOREE', 'Ignorée (exécution précédente en cours)'),
+        ('REPORTEE', 'Reportée (exécution précédente en cours)'),
+    ]
+
+    nom = models.CharField(max_length=100, verbose_name="Tâche")
+    statut = models.CharField(max_length=12, choices=STATUT_CHOICES, default='EN_COURS', verbose_name="Statut")
+    date_debut = models.DateTimeField(verbose_name="Début")
+    date_fin = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+    duree_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name="Durée (ms)")
+    lignes_traitees = models.PositiveIntegerField(default=0, verbose_name="Lignes traitées")
+    # Position du dernier lot traité: reprise par l'exécution suivante si celle-ci échoue
+    point_reprise = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Point de reprise")
+    resultat = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Résultat")
+    erreur = models.TextField(blank=True, verbose_name="Erreur")
+
+    class Meta:
+        verbose_name = "Exécution de tâche"
+        verbose_name_plural = "Exécutions de tâches"
+        indexes = [
+            models.Index(fields=['nom', '-date_debut'], name='task_run_nom_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.nom} {self.date_debut:%d/%m/%Y %H:%M} ({self.get_statut_display()})"
+
+
+class VerrouTache(models.Model):
+    """Bail exclusif d'une tâche planifiée hors PostgreSQL (voir planification.verrou)"""
+    nom = models.CharField(max_length=100, unique=True, verbose_name="Tâche")
+    detenteur = models.CharField(max_length=32, blank=True, verbose_name="Détenteur")
+    expiration = models.DateTimeField(null=True, blank=True, verbose_name="Expiration")
+
+    class Meta:
+        verbose_name = "Verrou de tâche"
+        verbose_name_plural = "Verrous de tâches"
+
+    def __str__(self) -> str:
+        return self.nom
+
+
+class VerificationIntegrite(models.Model):
+    """Vérification d'intégrité du grand livre des caisses (voir integrite.py)"""
+    STATUT_CHOICES = [
+        ('EN_COURS', 'En cours'),
+        ('TERMINEE', 'Terminée'),
+        ('ECHEC', 'Échec'),
+    ]
+
+    statut = models.CharField(max_length=10, choices=STATUT_CHOICES, default='EN_COURS', verbose_name="Statut")
+    incrementale = models.BooleanField(default=True, verbose_name="Incrémentale")
+    date_debut = models.DateTimeField(auto_now_add=True, verbose_name="Début")
+    date_fin = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+    duree_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name="Durée (ms)")
+    processus = models.PositiveSmallIntegerField(default=1, verbose_name="Processus")
+    caisses_verifiees = models.PositiveIntegerField(default=0, verbose_name="Caisses vérifiées")
+    caisses_ignorees = models.PositiveIntegerField(default=0, verbose_name="Caisses inchangées (ignorées)")
+    caisses_en_anomalie = models.PositiveIntegerField(default=0, verbose_name="Caisses en anomalie")
+    anomalies = models.PositiveIntegerField(default=0, verbose_name="Anomalies")
+    utilisateur = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Lancée par"
+    )
+    erreur = models.TextField(blank=True, verbose_name="Erreur")
+
+    class Meta:
+        verbose_name = "Vérification d'intégrité"
+        verbose_name_plural = "Vérifications d'intégrité"
+        ordering = ['-date_debut']
+
+    def __str__(self) -> str:
+        return f"Vérification du {self.date_debut:%d/%m/%Y %H:%M} ({self.get_statut_display()})"
+
+
+class ResultatIntegrite(models.Model):
+    """Résultat de la vérification d'une caisse (ou de la caisse générale), écrit dès qu'il est connu"""
+    STATUT_CHOICES = [
+        ('OK', 'Conforme'),
+        ('ANOMALIE', 'Anomalie'),
+    ]
+
+    verification = models.ForeignKey(
+        VerificationIntegrite, on_delete=models.CASCADE, related_name='resultats', verbose_name="Vérification"
+    )
+    # Caisse nulle: caisse générale (réserve et somme des caisses)
+    caisse = models.ForeignKey(
+        'Caisse', on_delete=models.CASCADE, null=True, blank=True, related_name='resultats_integrite',
+        verbose_name="Caisse",
+    )
+    statut = models.CharField(max_length=10, choices=STATUT_CHOICES, verbose_name="Statut")
+    # Dernière version du journal de synchronisation vue: la vérification incrémentale la compare
+    version_journal = models.BigIntegerField(default=0, verbose_name="Version du journal")
+    fond_disponible = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True, verbose_name="Solde vérifié"
+    )
+    mouvements = models.PositiveIntegerField(default=0, verbose_name="Mouvements rejoués")
+    prets = models.PositiveIntegerField(default=0, verbose_name="Prêts contrôlés")
+    nombre_anomalies = models.PositiveIntegerField(default=0, verbose_name="Anomalies")
+    anomalies = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder, verbose_name="Détail des anomalies")
+    duree_ms = models.PositiveIntegerField(default=0, verbose_name="Durée (ms)")
+
+    class Meta:
+        verbose_name = "Résultat d'intégrité"
+        verbose_name_plural = "Résultats d'intégrité"
+        indexes = [
+            # Dernier résultat de chaque caisse (vérification incrémentale)
+            models.Index(fields=['caisse', '-id'], name='resultat_integrite_caisse_idx'),
+        ]
+
+    def __str__(self) -> str:
+        titulaire = self.caisse.nom_association if self.caisse_id else "Caisse générale"
+        return f"{titulaire}: {self.get_statut_display()} ({self.nombre_anomalies})"
+
+
 class Region(models.Model):
     """Modèle pour les régions du Togo"""
     nom = models.CharField(max_length=100, unique=True)
@@ -312,25 +615,32 @@ class Agent(models.Model):
     def save(self, *args, **kwargs):
         """Génère automatiquement le matricule si il n'existe pas"""
         if not self.matricule:
-            # Génération robuste du matricule avec contrôle d'unicité
-            # Format: AGT + YYYY + 5 chiffres aléatoires (longueur <= 20)
-            year_str = timezone.now().strftime('%Y')
-            for _ in range(50):
-                rand_part = ''.join(random.choice(string.digits) for _ in range(5))
-                candidate = f"AGT{year_str}{rand_part}"
-                if not Agent.objects.filter(matricule=candidate).exists():
-                    self.matricule = candidate
-                    break
-            if not self.matricule:
-                raise ValidationError({
-                    'matricule': "Impossible de générer un matricule unique. Veuillez réessayer."
-                })
+            Agent.attribuer_matricules([self])
         # Normaliser le numéro de carte
         if self.numero_carte_electeur:
             self.numero_carte_electeur = self.numero_carte_electeur.upper()
         
         super().save(*args, **kwargs)
     
+    @staticmethod
+    def attribuer_matricules(agents):
+        """Attribue les matricules manquants en une seule allocation de séquence (utilisable avant bulk_create).
+
+        Format: AGT + YYYY + numéro d'ordre de l'année sur 5 chiffres (longueur <= 20).
+        """
+        sans_matricule = [agent for agent in agents if not agent.matricule]
+        if not sans_matricule:
+            return
+        prefixe = f"AGT{timezone.now().strftime('%Y')}"
+        premier = Sequence.allouer(
+            f'agent_matricule_{prefixe[3:]}', len(sans_matricule),
+            initial=lambda: dernier_suffixe_numerique(
+                Agent.objects.filter(matricule__startswith=prefixe).values_list('matricule', flat=True), prefixe
+            ),
+        )
+        for numero, agent in enumerate(sans_matricule, start=premier):
+            agent.matricule = f"{prefixe}{numero:05d}"
+    
     @property
     def nom_complet(self):
         return f"{self.nom} {self.prenoms}"
@@ -381,8 +691,9 @@ class Agent(models.Model):
                 })
 
 
-class Caisse(models.Model):
+class Caisse(RechercheMixin, SuiviModificationsMixin, models.Model):
     """Modèle principal pour les caisses de femmes"""
+    champs_recherche = ('nom_association', 'code')
     ROLE_CHOICES = [
         ('PRESIDENTE', 'Présidente'),
         ('SECRETAIRE', 'Secrétaire'),
@@ -430,6 +741,8 @@ class Caisse(models.Model):
     # Métadonnées
     description = models.TextField(blank=True)
     notes = models.TextField(blank=True)
+    # Texte de recherche normalisé (sans accents, majuscules), voir recherche.py
+    recherche = models.TextField(blank=True, default='', editable=False)
     
     class Meta:
         """Django model metadata for Caisse."""
@@ -453,56 +766,68 @@ class Caisse(models.Model):
                 })
     
     def save(self, *args, **kwargs):
-        is_new = self.pk is None
-        # Conserver l'ancien fond_initial et fond_disponible pour ajustement post-save
-        old_fond_initial = None
-        old_fond_disponible = None
-        if not is_new:
-            try:
-                previous = Caisse.objects.get(pk=self.pk)
-                old_fond_initial = previous.fond_initial
-                old_fond_disponible = previous.fond_disponible
-            except Caisse.DoesNotExist:
-                pass
-
-        if not self.code:
-            # Générer le code au format: FKM + numéro d'ordre auto-incrémenté (2 chiffres mini) + NOM_CAISSE
-            # Exemple: FKM03FEMMENOVISSI
-            def normalize_name(value: str) -> str:
-                if not value:
-                    return ''
-                nfkd = unicodedata.normalize('NFKD', value)
-                only_letters = ''.join(c for c in nfkd if c.isalpha())
-                return only_letters.upper()
-
-            base_name = normalize_name(self.nom_association)
-
-            # Déterminer le prochain numéro d'ordre, avec gestion de collisions potentielles
-            # On part sur count+1 puis on incrémente jusqu'à unicité si besoin
-            order_num = Caisse.objects.count() + 1
-            while True:
-                order_str = f"{order_num:02d}"
-                candidate = f"FKM{order_str}{base_name}"
-                if not Caisse.objects.filter(code=candidate).exists():
-                    self.code = candidate
-                    break
-                order_num += 1
-        super().save(*args, **kwargs)
-        
-        # Synchronisation des fonds
-        if is_new:
+        if self.pk is None:
+            if not self.code:
+                Caisse.attribuer_codes([self])
             # A la création, si fond initial > 0 alors solde disponible = fond initial
             if self.fond_initial > 0:
                 self.fond_disponible = self.fond_initial
-                super().save(update_fields=['fond_disponible'])
-        else:
-            # En modification, si le fond_initial a changé, ajuster le fond_disponible par le delta
-            if old_fond_initial is not None and self.fond_initial != old_fond_initial:
-                delta = self.fond_initial - old_fond_initial
-                if old_fond_disponible is None:
-                    old_fond_disponible = self.fond_disponible
-                self.fond_disponible = (old_fond_disponible or 0) + delta
-                super().save(update_fields=['fond_disponible'])
+            super().save(*args, **kwargs)
+            return
+
+        # Les sauvegardes limitées aux soldes ne touchent pas au fond initial
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'fond_initial' in update_fields:
+            if self._ajuster_fond_disponible() and update_fields is not None and 'fond_disponible' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'fond_disponible']
+        super().save(*args, **kwargs)
+
+    def _ajuster_fond_disponible(self):
+        """Si le fond_initial a changé, ajuster le fond_disponible par le delta (True si ajusté).
+
+        Un fond_disponible modifié explicitement en même temps que le fond_initial est conservé tel quel.
+        """
+        modifies = self.champs_modifies()
+        if modifies is None or modifies.get('fond_initial', 0) is None:
+            # Instance non chargée depuis la base (ou fond_initial différé): relire les anciens montants
+            anciens = Caisse.objects.filter(pk=self.pk).values('fond_initial', 'fond_disponible').first()
+            if anciens is None or self.fond_initial == anciens['fond_initial']:
+                return False
+            self.fond_disponible = (anciens['fond_disponible'] or 0) + (self.fond_initial - anciens['fond_initial'])
+            return True
+        if 'fond_initial' not in modifies or 'fond_disponible' in modifies:
+            return False
+        self.fond_disponible = (self.fond_disponible or 0) + (self.fond_initial - modifies['fond_initial'])
+        return True
+    
+    @staticmethod
+    def attribuer_codes(caisses):
+        """Attribue les codes manquants en une seule allocation de séquence (utilisable avant bulk_create).
+
+        Format: FKM + numéro d'ordre (2 chiffres mini) + NOM_CAISSE, ex: FKM03FEMMENOVISSI
+        """
+        sans_code = [caisse for caisse in caisses if not caisse.code]
+        if not sans_code:
+            return
+
+        def normalize_name(value: str) -> str:
+            if not value:
+                return ''
+            nfkd = unicodedata.normalize('NFKD', value)
+            only_letters = ''.join(c for c in nfkd if c.isalpha())
+            return only_letters.upper()
+
+        def dernier_numero():
+            # Reprise des codes existants: FKM + chiffres + nom
+            numeros = [
+                int(''.join(itertools.takewhile(str.isdigit, code[3:])) or 0)
+                for code in Caisse.objects.filter(code__startswith='FKM').values_list('code', flat=True)
+            ]
+            return max(numeros, default=0)
+
+        premier = Sequence.allouer('caisse_code', len(sans_code), initial=dernier_numero)
+        for numero, caisse in enumerate(sans_code, start=premier):
+            caisse.code = f"FKM{numero:02d}{normalize_name(caisse.nom_association)}"
     
     @property
     def nombre_membres(self):
@@ -678,8 +1003,9 @@ class ExerciceArchive(models.Model):
     def __str__(self):
         return f"Archive {self.caisse.nom_association} {self.date_debut.strftime('%d/%m/%Y')} - {self.date_fin.strftime('%d/%m/%Y')}"
 
-class Membre(models.Model):
+class Membre(RechercheMixin, models.Model):
     """Modèle pour les membres des caisses"""
+    champs_recherche = ('nom', 'prenoms', 'numero_carte_electeur')
     ROLE_CHOICES = [
         ('PRESIDENTE', 'Présidente'),
         ('SECRETAIRE', 'Secrétaire'),
@@ -757,6 +1083,8 @@ class Membre(models.Model):
     
     # Métadonnées
     notes = models.TextField(blank=True)
+    # Texte de recherche normalisé (sans accents, majuscules), voir recherche.py
+    recherche = models.TextField(blank=True, default='', editable=False)
     
     class Meta:
         verbose_name = "Membre"
@@ -841,8 +1169,9 @@ class Membre(models.Model):
             return 0
 
 
-class Pret(models.Model):
+class Pret(RechercheMixin, models.Model):
     """Modèle pour les prêts accordés aux membres"""
+    champs_recherche = ('numero_pret',)
     STATUT_CHOICES = [
         ('EN_ATTENTE', 'En attente'),
         ('EN_ATTENTE_ADMIN', 'En attente validation admin'),
@@ -890,11 +1219,23 @@ class Pret(models.Model):
     
     # Métadonnées
     notes = models.TextField(blank=True)
+    # Texte de recherche normalisé (sans accents, majuscules), voir recherche.py
+    recherche = models.TextField(blank=True, default='', editable=False)
     
     class Meta:
         verbose_name = "Prêt"
         verbose_name_plural = "Prêts"
         ordering = ['-date_demande']
+        indexes = [
+            models.Index(fields=['caisse', 'statut']),
+            models.Index(fields=['membre', 'statut']),
+            # Index partiel : seuls les prêts en cours sont parcourus par la tâche horaire des retards
+            models.Index(
+                fields=['date_demande'],
+                condition=models.Q(statut='EN_COURS'),
+                name='pret_en_cours_idx',
+            ),
+        ]
     
     def delete(self, *args, **kwargs):
         """Surcharge de la méthode delete pour gérer la suppression des prêts rejetés et bloqués"""
@@ -909,10 +1250,11 @@ class Pret(models.Model):
             # Supprimer les mouvements de fonds liés
             MouvementFond.objects.filter(pret=self).delete()
             
-            # Créer un log d'audit avant la suppression
+            # Créer un log d'audit avant la suppression (utilisateur et IP posés par la vue ou l'admin)
             current_user = getattr(self, '_current_user', None)
             if current_user:
-                AuditLog.objects.create(
+                from .audit import journaliser_audit
+                journaliser_audit(
                     utilisateur=current_user,
                     action='SUPPRESSION',
                     modele='Pret',
@@ -924,7 +1266,7 @@ class Pret(models.Model):
                         'caisse': self.caisse.nom_association,
                         'motif_suppression': f'Prêt {self.statut.lower()} supprimé par admin'
                     },
-                    ip_adresse='127.0.0.1'  # Valeur par défaut pour les tests
+                    ip_adresse=getattr(self, '_current_ip', None)
                 )
             
             # Appeler la méthode delete parent
@@ -1029,9 +1371,28 @@ class Pret(models.Model):
     def save(self, *args, **kwargs):
         if not self.numero_pret:
             # Génération automatique du numéro de prêt
-            self.numero_pret = f"PRT{timezone.now().strftime('%Y%m')}{uuid.uuid4().hex[:8].upper()}"
+            Pret.attribuer_numeros([self])
         super().save(*args, **kwargs)
     
+    @staticmethod
+    def attribuer_numeros(prets):
+        """Attribue les numéros manquants en une seule allocation de séquence (utilisable avant bulk_create).
+
+        Format: PRT + YYYYMM + numéro d'ordre du mois sur 8 chiffres.
+        """
+        sans_numero = [pret for pret in prets if not pret.numero_pret]
+        if not sans_numero:
+            return
+        prefixe = f"PRT{timezone.now().strftime('%Y%m')}"
+        premier = Sequence.allouer(
+            f'pret_numero_{prefixe[3:]}', len(sans_numero),
+            initial=lambda: dernier_suffixe_numerique(
+                Pret.objects.filter(numero_pret__startswith=prefixe).values_list('numero_pret', flat=True), prefixe
+            ),
+        )
+        for numero, pret in enumerate(sans_numero, start=premier):
+            pret.numero_pret = f"{prefixe}{numero:08d}"
+    
     @property
     def montant_restant(self):
         """Calcule le montant restant total (principal + intérêts restants).
@@ -1222,6 +1583,11 @@ class Echeance(models.Model):
         verbose_name_plural = "Échéances"
         ordering = ['pret', 'numero_echeance']
         unique_together = ['pret', 'numero_echeance']
+        indexes = [
+            models.Index(fields=['statut', 'date_echeance']),
+            # Pagination par curseur (date, id)
+            models.Index(fields=['date_echeance', 'id'], name='echeance_date_id_idx'),
+        ]
     
     def __str__(self):
         return f"Échéance {self.numero_echeance} - Prêt {self.pret.numero_pret}"
@@ -1246,6 +1612,9 @@ class MouvementFond(models.Model):
     montant = models.DecimalField(max_digits=15, decimal_places=2)
     solde_avant = models.DecimalField(max_digits=15, decimal_places=2)
     solde_apres = models.DecimalField(max_digits=15, decimal_places=2)
+    # Part d'intérêt d'un remboursement (le principal est montant - interet_rembourse)
+    interet_rembourse = models.DecimalField(max_digits=15, decimal_places=2, default=0,
+                                            verbose_name="Intérêt remboursé")
     
     # Référence au prêt si applicable
     pret = models.ForeignKey(Pret, on_delete=models.SET_NULL, null=True, blank=True, 
@@ -1268,6 +1637,12 @@ class MouvementFond(models.Model):
         verbose_name = "Mouvement de fond"
         verbose_name_plural = "Mouvements de fonds"
         ordering = ['-date_mouvement']
+        indexes = [
+            models.Index(fields=['caisse', 'date_mouvement']),
+            models.Index(fields=['pret', 'type_mouvement']),
+            # Pagination par curseur (date, id)
+            models.Index(fields=['date_mouvement', 'id'], name='mouvement_date_id_idx'),
+        ]
     
     def __str__(self):
         if self.type_mouvement in ['TRANSFERT_VERS_CAISSE', 'TRANSFERT_VERS_GENERALE']:
@@ -1381,7 +1756,8 @@ class Cotisation(models.Model):
         ordering = ['-date_cotisation']
         indexes = [
             models.Index(fields=['caisse', 'membre']),
-            models.Index(fields=['date_cotisation']),
+            # Tri par date et pagination par curseur (date, id)
+            models.Index(fields=['date_cotisation', 'id'], name='cotisation_date_id_idx'),
         ]
 
     def __str__(self):
@@ -1492,12 +1868,87 @@ class AuditLog(models.Model):
         verbose_name = "Journal d'audit"
         verbose_name_plural = "Journaux d'audit"
         ordering = ['-date_action']
+        indexes = [
+            # Tri par date et pagination par curseur (date, id)
+            models.Index(fields=['date_action', 'id'], name='auditlog_date_id_idx'),
+        ]
     
     def __str__(self):
         username = self.utilisateur.username if self.utilisateur else "Utilisateur Anonyme"
         return f"{self.action} - {self.modele} #{self.objet_id} par {username}"
 
 
+class RegleProfilage(models.Model):
+    """Active le profilage des requêtes dont le chemin correspond à un motif (expression régulière)"""
+    motif_url = models.CharField(max_length=255, verbose_name="Motif d'URL",
+                                 help_text="Expression régulière testée sur le chemin, ex: ^/gestion-caisses/api/rapports-caisse/")
+    actif = models.BooleanField(default=True, verbose_name="Actif")
+    nombre_restant = models.PositiveIntegerField(default=10, verbose_name="Profils restants",
+                                                 help_text="Nombre de requêtes encore à profiler avant désactivation")
+    date_expiration = models.DateTimeField(null=True, blank=True, verbose_name="Date d'expiration")
+    cree_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Créée par")
+    date_creation = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+
+    class Meta:
+        verbose_name = "Règle de profilage"
+        verbose_name_plural = "Règles de profilage"
+        ordering = ['-date_creation']
+
+    def __str__(self):
+        return f"{self.motif_url} ({self.nombre_restant} restants)"
+
+    def clean(self):
+        import re
+        try:
+            re.compile(self.motif_url)
+        except re.error as e:
+            raise ValidationError({'motif_url': f"Expression régulière invalide: {e}"})
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .profilage import invalider_regles
+        invalider_regles()
+
+    def delete(self, *args, **kwargs):
+        resultat = super().delete(*args, **kwargs)
+        from .profilage import invalider_regles
+        invalider_regles()
+        return resultat
+
+
+class ProfileRecord(models.Model):
+    """Profil cProfile d'une requête HTTP (statistiques, piles repliées et requêtes SQL)"""
+    DECLENCHEUR_CHOICES = [
+        ('JETON', 'Paramètre signé'),
+        ('REGLE', "Règle d'URL"),
+    ]
+
+    chemin = models.CharField(max_length=500, verbose_name="Chemin")
+    methode = models.CharField(max_length=10, verbose_name="Méthode")
+    endpoint = models.CharField(max_length=200, blank=True, verbose_name="Vue")
+    statut_http = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Statut HTTP")
+    declencheur = models.CharField(max_length=10, choices=DECLENCHEUR_CHOICES, verbose_name="Déclencheur")
+    regle = models.ForeignKey(RegleProfilage, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='profils', verbose_name="Règle")
+    utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Utilisateur")
+    duree_totale_ms = models.FloatField(verbose_name="Durée totale (ms)")
+    duree_db_ms = models.FloatField(default=0, verbose_name="Durée base de données (ms)")
+    nombre_requetes = models.PositiveIntegerField(default=0, verbose_name="Requêtes SQL")
+    fonctions_principales = models.JSONField(default=list, verbose_name="Fonctions (temps cumulé)")
+    requetes_sql = models.JSONField(default=list, verbose_name="Requêtes SQL exécutées")
+    piles_repliees = models.TextField(blank=True, verbose_name="Piles repliées (flame graph)")
+    statistiques = models.TextField(blank=True, verbose_name="Statistiques pstats")
+    date_creation = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+
+    class Meta:
+        verbose_name = "Profil de requête"
+        verbose_name_plural = "Profils de requêtes"
+        ordering = ['-date_creation']
+
+    def __str__(self):
+        return f"{self.methode} {self.chemin} - {self.duree_totale_ms:.0f} ms"
+
+
 class Notification(models.Model):
     """Système de notifications pour les alertes et communications"""
     TYPE_CHOICES = [
@@ -1537,6 +1988,17 @@ class Notification(models.Model):
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
         ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['destinataire', 'statut']),
+            # Index partiel : la cloche ne lit que les notifications non lues, les plus récentes d'abord
+            models.Index(
+                fields=['destinataire', '-date_creation'],
+                condition=models.Q(statut='NON_LU'),
+                name='notification_non_lue_idx',
+            ),
+            # Liste de l'utilisateur paginée par curseur (date, id)
+            models.Index(fields=['destinataire', 'date_creation', 'id'], name='notification_dest_date_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.type_notification} - {self.titre} pour {self.destinataire.username}"
@@ -2047,6 +2509,36 @@ class CaisseGeneraleMouvement(models.Model):
                 pass
 
 
+class BalanceCheckpoint(models.Model):
+    """Solde d'une caisse (ou de la réserve de la caisse générale) en fin de journée (voir soldes.py)"""
+
+    # Caisse nulle: réserve de la caisse générale
+    caisse = models.ForeignKey(
+        Caisse, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='points_solde', verbose_name="Caisse",
+    )
+    date = models.DateField(verbose_name="Date")
+    solde = models.DecimalField(max_digits=15, decimal_places=2, verbose_name="Solde en fin de journée")
+    # Dernier mouvement compris dans le solde: les suivants sont ajoutés par soldes_au()
+    mouvement_id = models.BigIntegerField(null=True, blank=True, verbose_name="Dernier mouvement")
+    date_creation = models.DateTimeField(auto_now=True, verbose_name="Calculé le")
+
+    class Meta:
+        verbose_name = "Point de solde"
+        verbose_name_plural = "Points de solde"
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['caisse', 'date'], name='point_solde_caisse_date_unique'),
+            models.UniqueConstraint(
+                fields=['date'], condition=models.Q(caisse__isnull=True), name='point_solde_reserve_date_unique',
+            ),
+        ]
+
+    def __str__(self):
+        titulaire = self.caisse.nom_association if self.caisse_id else "Caisse générale (réserve)"
+        return f"{titulaire} au {self.date:%d/%m/%Y}: {self.solde} FCFA"
+
+
 class Depense(models.Model):
     """Modèle simplifié pour les dépenses d'une caisse.
     Champs demandés: datedepense, Objectifdepense, montantdepense, observation (optionnel).
@@ -2325,7 +2817,7 @@ class FichePaie(models.Model):
     
     def generer_pdf(self, user=None):
         """Génère le PDF de la fiche de paie"""
-        from .utils import generate_fiche_paie_pdf
+        from .documents import generate_fiche_paie_pdf
         
         if user:
             self.genere_par = user
@@ -0,0 +1,194 @@
+"""
+Pagination des listes volumineuses (mouvements, cotisations, échéances, audit, notifications).
+
+Par défaut, pagination par numéro de page (``?page=``), comme le reste de l'API. Deux options
+à la demande du client:
+
+- ``?curseur=`` (vide pour la première page): pagination par clé (« keyset ») sur le couple
+  (date, id) déclaré par la vue (``champ_curseur``). Chaque page est lue par un
+  ``WHERE (date, id) < (dernière date, dernier id) ORDER BY date, id LIMIT n`` appuyé sur
+  l'index (date, id): ni ``OFFSET`` ni ``COUNT(*)``, la page N coûte autant que la page 1.
+  La réponse contient ``next`` / ``previous`` (liens portant le curseur suivant / précédent).
+- ``?compte=approx``: ``count`` est une estimation du planificateur (``EXPLAIN`` sous
+  PostgreSQL, ``sqlite_stat1`` pour une table non filtrée sous SQLite) au lieu d'un
+  ``COUNT(*)``; la réponse porte alors ``count_approximatif: true``. Faute d'estimation
+  disponible, le compte exact est utilisé.
+"""
+import base64
+import binascii
+import json
+
+from django.core.paginator import InvalidPage, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+PARAMETRE_CURSEUR = 'curseur'
+PARAMETRE_COMPTE = 'compte'
+COMPTE_APPROXIMATIF = 'approx'
+
+
+def compte_approximatif(queryset):
+    """Nombre de lignes estimé par le planificateur (compte exact si aucune estimation n'est disponible)"""
+    connexion = connections[queryset.db]
+    try:
+        if connexion.vendor == 'postgresql':
+            sql, params = queryset.query.sql_with_params()
+            with connexion.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+        if connexion.vendor == 'sqlite' and not queryset.query.where:
+            # Statistiques d'ANALYZE: le premier entier de ``stat`` est le nombre de lignes de la table
+            with connexion.cursor() as cursor:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [queryset.model._meta.db_table])
+                ligne = cursor.fetchone()
+            if ligne:
+                return int(ligne[0].split()[0])
+    except DatabaseError:
+        # Pas de statistiques (base jamais analysée): compte exact
+        pass
+    return queryset.count()
+
+
+class PaginatorApproximatif(Paginator):
+    """Paginator dont le total est estimé; les pages ne sont pas bornées par cette estimation"""
+
+    @cached_property
+    def count(self):
+        return compte_approximatif(self.object_list)
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise InvalidPage("Numéro de page invalide")
+        if number < 1:
+            raise InvalidPage("Numéro de page invalide")
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bas = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bas:bas + self.per_page], number, self)
+
+
+def encoder_curseur(valeur, identifiant, arriere=False):
+    contenu = json.dumps([valeur.isoformat(), identifiant, int(arriere)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(contenu.encode()).decode().rstrip('=')
+
+
+def decoder_curseur(jeton, champ):
+    """(valeur de la date, id, lecture arrière) d'un curseur, ou None pour la première page"""
+    if not jeton:
+        return None
+    try:
+        contenu = base64.urlsafe_b64decode(jeton + '=' * (-len(jeton) % 4))
+        valeur, identifiant, arriere = json.loads(contenu)
+        valeur = champ.to_python(valeur)
+        if valeur is None or not isinstance(identifiant, int):
+            raise ValueError
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError):
+        raise NotFound("Curseur invalide")
+    return valeur, identifiant, bool(arriere)
+
+
+class PaginationCurseurOptionnelle(PageNumberPagination):
+    """
+    ``PageNumberPagination`` complétée par la pagination par clé (``?curseur=``) et le compte
+    approximatif (``?compte=approx``). La vue déclare ``champ_curseur`` (``'-date_mouvement'``:
+    plus récents d'abord); l'identifiant départage les lignes de même date.
+    """
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.approximatif = request.query_params.get(PARAMETRE_COMPTE) == COMPTE_APPROXIMATIF
+        self.champ_curseur = getattr(view, 'champ_curseur', None)
+        self.par_curseur = bool(self.champ_curseur) and PARAMETRE_CURSEUR in request.query_params
+        self.django_paginator_class = PaginatorApproximatif if self.approximatif else Paginator
+        if not self.par_curseur:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.display_page_controls = False
+        taille = self.get_page_size(request)
+        if not taille:
+            return None
+        return self.paginer_par_curseur(queryset, request.query_params.get(PARAMETRE_CURSEUR), taille)
+
+    def paginer_par_curseur(self, queryset, jeton, taille):
+        decroissant = self.champ_curseur.startswith('-')
+        nom = self.champ_curseur.lstrip('-')
+        position = decoder_curseur(jeton, queryset.model._meta.get_field(nom))
+        arriere = bool(position and position[2])
+
+        # Lecture arrière (page précédente): parcourir dans l'autre sens puis remettre dans l'ordre
+        lecture_decroissante = decroissant != arriere
+        if lecture_decroissante:
+            queryset = queryset.order_by(f'-{nom}', '-id')
+        else:
+            queryset = queryset.order_by(nom, 'id')
+        self.queryset_filtre = queryset
+        if position:
+            valeur, identifiant, _arriere = position
+            comparaison = 'lt' if lecture_decroissante else 'gt'
+            # (date, id) au-delà de la position; la borne sur la date seule reste exploitable par l'index
+            queryset = queryset.filter(
+                Q(**{f'{nom}__{comparaison}e': valeur}),
+                Q(**{f'{nom}__{comparaison}': valeur}) | Q(**{f'id__{comparaison}': identifiant}),
+            )
+
+        lignes = list(queryset[:taille + 1])
+        encore = len(lignes) > taille
+        lignes = lignes[:taille]
+        if arriere:
+            lignes.reverse()
+        self.suivant = (encore if not arriere else True) and bool(lignes)
+        self.precedent = (position is not None if not arriere else encore) and bool(lignes)
+        self.lignes = lignes
+        return lignes
+
+    def _curseur_de(self, ligne, arriere):
+        nom = self.champ_curseur.lstrip('-')
+        if isinstance(ligne, dict):
+            # Lignes .values() des listes à plat (voir plats.py)
+            return encoder_curseur(ligne[nom], ligne['id'], arriere)
+        return encoder_curseur(getattr(ligne, nom), ligne.pk, arriere)
+
+    def get_next_link(self):
+        if not self.par_curseur:
+            return super().get_next_link()
+        if not self.suivant:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, PARAMETRE_CURSEUR, self._curseur_de(self.lignes[-1], False))
+
+    def get_previous_link(self):
+        if not self.par_curseur:
+            return super().get_previous_link()
+        if not self.precedent:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, PARAMETRE_CURSEUR, self._curseur_de(self.lignes[0], True))
+
+    def get_paginated_response(self, data):
+        if not self.par_curseur:
+            contenu = {
+                'count': self.page.paginator.count,
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+                'results': data,
+            }
+        else:
+            contenu = {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+            if self.approximatif:
+                # Estimation sur l'ensemble filtré, sans la position du curseur
+                contenu = {'count': compte_approximatif(self.queryset_filtre), **contenu}
+        if self.approximatif:
+            contenu['count_approximatif'] = True
+        return Response(contenu)
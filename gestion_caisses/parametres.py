@@ -0,0 +1,83 @@
+"""
+Paramètres de l'application (identité, contacts, signataires) sous forme de dictionnaire.
+
+Module léger, sans moteur de rendu: utilisé par le processeur de contexte des templates et
+par les générateurs de documents (utils.py).
+"""
+import logging
+
+from .models import Parametre
+
+logger = logging.getLogger(__name__)
+
+
+def get_parametres_application():
+    """
+    Récupère les paramètres actifs de l'application.
+    Retourne un dictionnaire avec les valeurs par défaut si aucun paramètre n'est configuré.
+    """
+    try:
+        parametres = Parametre.get_parametres_actifs()
+        if parametres:
+            return {
+                'nom_application': parametres.nom_application,
+                'logo': parametres.logo,
+                'description_application': parametres.description_application,
+                'version_application': parametres.version_application,
+                'telephone_principal': parametres.telephone_principal,
+                'telephone_secondaire': parametres.telephone_secondaire,
+                'email_contact': parametres.email_contact,
+                'site_web': parametres.site_web,
+                'siege_social': parametres.siege_social,
+                'adresse_postale': parametres.adresse_postale,
+                'boite_postale': parametres.boite_postale,
+                'ville': parametres.ville,
+                'pays': parametres.pays,
+                'nom_president_general': parametres.nom_president_general,
+                'titre_president_general': parametres.titre_president_general,
+                'signature_president_general': parametres.signature_president_general,
+                'nom_directeur_technique': parametres.nom_directeur_technique,
+                'nom_directeur_financier': parametres.nom_directeur_financier,
+                'nom_directeur_administratif': parametres.nom_directeur_administratif,
+                'numero_agrement': parametres.numero_agrement,
+                'date_agrement': parametres.date_agrement,
+                'autorite_agrement': parametres.autorite_agrement,
+                'devise': parametres.devise,
+                'langue_par_defaut': parametres.langue_par_defaut,
+                'fuseau_horaire': parametres.fuseau_horaire,
+                'copyright_text': parametres.copyright_text,
+                'mentions_legales': parametres.mentions_legales,
+            }
+    except Exception as e:
+        logger.warning(f"Erreur lors de la récupération des paramètres: {e}")
+    
+    # Valeurs par défaut si aucun paramètre n'est configuré
+    return {
+        'nom_application': 'CAISSE DE SOLIDARITÉ',
+        'logo': None,
+        'description_application': '',
+        'version_application': '1.0.0',
+        'telephone_principal': '',
+        'telephone_secondaire': '',
+        'email_contact': '',
+        'site_web': '',
+        'siege_social': '',
+        'adresse_postale': '',
+        'boite_postale': '',
+        'ville': '',
+        'pays': 'Togo',
+        'nom_president_general': '',
+        'titre_president_general': 'Président Général',
+        'signature_president_general': None,
+        'nom_directeur_technique': '',
+        'nom_directeur_financier': '',
+        'nom_directeur_administratif': '',
+        'numero_agrement': '',
+        'date_agrement': None,
+        'autorite_agrement': '',
+        'devise': 'FCFA',
+        'langue_par_defaut': 'fr',
+        'fuseau_horaire': 'Africa/Lome',
+        'copyright_text': '',
+        'mentions_legales': '',
+    }
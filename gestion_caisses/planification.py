@@ -0,0 +1,196 @@
+"""
+Tâches planifiées (Celery beat) sans chevauchement, avec historique des exécutions.
+
+``@tache_exclusive()`` (placé sous ``@shared_task``) prend un verrou propre à la tâche avant de
+l'exécuter:
+
+- PostgreSQL: verrou consultatif de session (``pg_try_advisory_lock``), libéré par la base si le
+  worker meurt;
+- autres bases: bail sur la ligne ``VerrouTache`` de la tâche, pris par un ``UPDATE`` conditionnel
+  (atomique quel que soit le nombre de processus) et expiré après ``duree_verrou`` secondes si le
+  worker meurt. ``enregistrer_point`` prolonge le bail d'une tâche longue.
+
+Si une exécution précédente tient le verrou, la nouvelle est ignorée (``chevauchement='ignorer'``)
+ou replanifiée ``delai_report`` secondes plus tard (``'reporter'``). Chaque exécution est inscrite
+au modèle ``TaskRun`` (administration): statut, durée, lignes traitées, résultat ou erreur.
+
+Une tâche par lots reprend où l'exécution précédente a échoué ou a été interrompue::
+
+    dernier_id = point_reprise(0)
+    ...  # traiter le lot suivant dernier_id
+    enregistrer_point(lot[-1].pk, lignes=len(lot))
+
+Hors d'une tâche exclusive (appel direct, tests), ces fonctions sont sans effet.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import hashlib
+import logging
+import time
+import traceback
+import uuid
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+TAILLE_LOT = 500
+
+_execution_courante = ContextVar('execution_tache', default=None)
+# Bail tenu par l'exécution en cours (nom, détenteur, durée), prolongé à chaque point de reprise
+_bail_courant = ContextVar('bail_tache', default=None)
+
+
+def _cle_consultative(nom):
+    # Entier signé 64 bits dérivé du nom de la tâche
+    return int.from_bytes(hashlib.sha256(nom.encode()).digest()[:8], 'big', signed=True)
+
+
+@contextmanager
+def verrou(nom, duree=None):
+    """Verrou exclusif nommé entre workers; produit True s'il est obtenu, False s'il est déjà tenu"""
+    connexion = connections[DEFAULT_DB_ALIAS]
+    if connexion.vendor == 'postgresql':
+        cle = _cle_consultative(nom)
+        with connexion.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [cle])
+            obtenu = cursor.fetchone()[0]
+        try:
+            yield obtenu
+        finally:
+            if obtenu:
+                with connexion.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_unlock(%s)', [cle])
+        return
+
+    from .models import VerrouTache
+
+    duree = duree or getattr(settings, 'TACHES_VERROU_DUREE', 3600)
+    jeton = uuid.uuid4().hex
+    VerrouTache.objects.get_or_create(nom=nom)
+    maintenant = timezone.now()
+    # Un seul UPDATE: deux workers ne peuvent pas prendre le même bail libre ou expiré
+    obtenu = bool(
+        VerrouTache.objects.filter(nom=nom)
+        .filter(Q(expiration__isnull=True) | Q(expiration__lte=maintenant))
+        .update(detenteur=jeton, expiration=maintenant + timedelta(seconds=duree))
+    )
+    bail = _bail_courant.set((nom, jeton, duree)) if obtenu else None
+    try:
+        yield obtenu
+    finally:
+        if obtenu:
+            _bail_courant.reset(bail)
+            # Ne pas libérer un bail expiré puis repris par une autre exécution
+            VerrouTache.objects.filter(nom=nom, detenteur=jeton).update(detenteur='', expiration=None)
+
+
+def _prolonger_bail():
+    bail = _bail_courant.get()
+    if bail is not None:
+        from .models import VerrouTache
+
+        nom, jeton, duree = bail
+        VerrouTache.objects.filter(nom=nom, detenteur=jeton).update(
+            expiration=timezone.now() + timedelta(seconds=duree)
+        )
+
+
+def point_reprise(defaut=None):
+    """Point enregistré par la dernière exécution échouée ou interrompue de la tâche en cours"""
+    execution = _execution_courante.get()
+    if execution is None or execution.point_reprise is None:
+        return defaut
+    return execution.point_reprise
+
+
+def enregistrer_point(valeur, lignes=0):
+    """Enregistre la position atteinte après un lot (écrite tout de suite: survit à l'arrêt du worker)"""
+    execution = _execution_courante.get()
+    if execution is not None:
+        execution.point_reprise = valeur
+        execution.lignes_traitees += lignes
+        execution.save(update_fields=['point_reprise', 'lignes_traitees'])
+        _prolonger_bail()
+
+
+def noter_lignes(nombre):
+    """Ajoute ``nombre`` aux lignes traitées par l'exécution en cours"""
+    execution = _execution_courante.get()
+    if execution is not None:
+        execution.lignes_traitees += nombre
+
+
+def _reporter(args, kwargs, delai):
+    """Replanifie la tâche Celery en cours; False hors d'un worker"""
+    from celery import current_task
+
+    if not current_task or current_task.request.called_directly:
+        return False
+    current_task.apply_async(args=args, kwargs=kwargs, countdown=delai)
+    return True
+
+
+def tache_exclusive(nom=None, chevauchement='ignorer', duree_verrou=None, delai_report=300):
+    """Décorateur: une seule exécution à la fois de la tâche, inscrite dans ``TaskRun``"""
+    if chevauchement not in ('ignorer', 'reporter'):
+        raise ValueError(f"Chevauchement inconnu: {chevauchement}")
+
+    def decorateur(fonction):
+        nom_tache = nom or f'{fonction.__module__}.{fonction.__name__}'
+
+        @wraps(fonction)
+        def executer(*args, **kwargs):
+            from .models import TaskRun
+
+            debut = timezone.now()
+            with verrou(nom_tache, duree_verrou) as obtenu:
+                if not obtenu:
+                    reportee = chevauchement == 'reporter' and _reporter(args, kwargs, delai_report)
+                    TaskRun.objects.create(
+                        nom=nom_tache, statut='REPORTEE' if reportee else 'IGNOREE',
+                        date_debut=debut, date_fin=debut, duree_ms=0,
+                    )
+                    logger.info(f"{nom_tache}: exécution précédente en cours, {'reportée' if reportee else 'ignorée'}")
+                    return None
+
+                # Verrou obtenu: une exécution encore « en cours » a été arrêtée sans se terminer
+                TaskRun.objects.filter(nom=nom_tache, statut='EN_COURS').update(statut='INTERROMPUE')
+                precedente = (
+                    TaskRun.objects.filter(nom=nom_tache, statut__in=['SUCCES', 'ECHEC', 'INTERROMPUE'])
+                    .order_by('-date_debut', '-pk').only('statut', 'point_reprise').first()
+                )
+                execution = TaskRun.objects.create(
+                    nom=nom_tache, date_debut=debut,
+                    point_reprise=precedente.point_reprise if precedente and precedente.statut != 'SUCCES' else None,
+                )
+                jeton = _execution_courante.set(execution)
+                depart = time.perf_counter()
+                try:
+                    resultat = fonction(*args, **kwargs)
+                except Exception:
+                    # Le point de reprise est conservé pour l'exécution suivante
+                    execution.statut, execution.erreur = 'ECHEC', traceback.format_exc()
+                    raise
+                else:
+                    execution.statut, execution.point_reprise, execution.resultat = 'SUCCES', None, resultat
+                    if isinstance(resultat, int) and not execution.lignes_traitees:
+                        # Les tâches de comptage renvoient le nombre de lignes traitées
+                        execution.lignes_traitees = resultat
+                    return resultat
+                finally:
+                    _execution_courante.reset(jeton)
+                    execution.date_fin = timezone.now()
+                    execution.duree_ms = round((time.perf_counter() - depart) * 1000)
+                    execution.save()
+
+        executer.nom_tache = nom_tache
+        return executer
+
+    return decorateur
@@ -0,0 +1,133 @@
+"""
+Sérialisation « à plat » des listes volumineuses (membres, prêts, caisses, notifications).
+
+Un ``SerialiseurPlat`` reproduit la sortie d'un sérialiseur de liste (``reference``) à partir
+d'une seule requête ``.values()``: ni instance de modèle, ni appel de sérialiseur par ligne.
+
+- les champs sont ceux de la référence (restreints par ``?fields=``), dans le même ordre;
+  un champ à ``source`` pointée (``caisse.nom_association``) est lu par le chemin
+  ``caisse__nom_association`` et rendu par le champ DRF de la référence (décimaux, dates, fichiers);
+- les champs calculés (propriétés, ``SerializerMethodField``) sont déclarés dans ``calcules``
+  (colonnes ou ``annotations`` lues) et rendus par la méthode ``valeur_<champ>(ligne)``;
+- comme DRF, un champ lu à travers une relation facultative vide est omis de la ligne.
+
+Les vues l'utilisent pour l'action ``list`` (``ListePlateMixin``); ``LISTES_PLATES = False``
+revient aux sérialiseurs DRF. Les tests comparent les deux sorties champ par champ.
+"""
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models.fields.files import FileField
+from rest_framework import serializers
+from rest_framework.response import Response
+
+
+class SerialiseurPlat:
+    reference = None
+    # colonne calculée par la base -> expression ORM (ajoutée si la requête ne l'a pas déjà)
+    annotations = {}
+    # champ de sortie -> colonnes lues par ``valeur_<champ>(ligne)``
+    calcules = {}
+
+    def __init__(self, champs, context=None):
+        """``champs``: champs d'une instance de la référence (déjà restreints par ``?fields=``)"""
+        self.context = context or {}
+        self.plan = [self.planifier(nom, champ) for nom, champ in champs.items() if not champ.write_only]
+
+    def planifier(self, nom, champ):
+        """(nom, colonnes lues, colonnes de garde, méthode de calcul, champ DRF, champ fichier)"""
+        modele = self.reference.Meta.model
+        parties = champ.source.split('.') if champ.source != '*' else []
+
+        # Relations facultatives traversées: DRF omet le champ lorsqu'elles sont vides
+        gardes, courant = [], modele
+        for position, partie in enumerate(parties[:-1]):
+            try:
+                relation = courant._meta.get_field(partie)
+            except FieldDoesNotExist:
+                break
+            if relation.null:
+                gardes.append('__'.join(parties[:position + 1]))
+            courant = relation.related_model
+
+        if nom in self.calcules:
+            return nom, (*self.calcules[nom], *gardes), tuple(gardes), getattr(self, f'valeur_{nom}'), champ, None
+        chemin = '__'.join(parties)
+        if chemin in self.annotations:
+            return nom, (chemin,), (), None, champ, None
+        try:
+            champ_modele = courant._meta.get_field(parties[-1]) if parties else None
+        except FieldDoesNotExist:
+            champ_modele = None
+        if champ_modele is None or isinstance(champ, serializers.SerializerMethodField):
+            raise ImproperlyConfigured(
+                f"{type(self).__name__}: le champ « {nom} » n'est pas une colonne, le déclarer dans calcules."
+            )
+        fichier = champ_modele if isinstance(champ_modele, FileField) else None
+        return nom, (chemin, *gardes), tuple(gardes), None, champ, fichier
+
+    def colonnes(self, supplementaires=()):
+        colonnes = dict.fromkeys(supplementaires)
+        for _nom, lues, *_reste in self.plan:
+            colonnes.update(dict.fromkeys(lues))
+        return list(colonnes)
+
+    def requete(self, queryset, supplementaires=()):
+        """Requête ``.values()`` de la liste: colonnes du plan et annotations utiles seulement"""
+        colonnes = self.colonnes(supplementaires)
+        annotations = {
+            nom: expression for nom, expression in self.annotations.items()
+            if nom in colonnes and nom not in queryset.query.annotations
+        }
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset.values(*colonnes)
+
+    def precharger(self, lignes):
+        """Chargements groupés pour les lignes de la page (surchargé par les sous-classes)"""
+
+    def representer(self, lignes):
+        lignes = list(lignes)
+        self.precharger(lignes)
+        resultat = []
+        for ligne in lignes:
+            objet = {}
+            for nom, lues, gardes, calcul, champ, fichier in self.plan:
+                if gardes and any(ligne[garde] is None for garde in gardes):
+                    continue
+                if calcul is not None:
+                    valeur = calcul(ligne)
+                    if not isinstance(champ, serializers.SerializerMethodField) and valeur is not None:
+                        valeur = champ.to_representation(valeur)
+                    objet[nom] = valeur
+                    continue
+                valeur = ligne[lues[0]]
+                if valeur is None:
+                    objet[nom] = None
+                    continue
+                if fichier is not None:
+                    valeur = fichier.attr_class(None, fichier, valeur)
+                objet[nom] = champ.to_representation(valeur)
+            resultat.append(objet)
+        return resultat
+
+
+class ListePlateMixin:
+    """Mixin de ViewSet: action ``list`` rendue par ``serialiseur_plat`` (une requête ``.values()``)"""
+    serialiseur_plat = None
+
+    def list(self, request, *args, **kwargs):
+        if self.serialiseur_plat is None or not getattr(settings, 'LISTES_PLATES', True):
+            return super().list(request, *args, **kwargs)
+        plat = self.serialiseur_plat(self.get_serializer().fields, context=self.get_serializer_context())
+        # Colonnes de pagination par clé (voir pagination.py)
+        supplementaires = ['id']
+        champ_curseur = getattr(self, 'champ_curseur', None)
+        if champ_curseur:
+            supplementaires.append(champ_curseur.lstrip('-'))
+        lignes = plat.requete(self.filter_queryset(self.get_queryset()), supplementaires)
+
+        page = self.paginate_queryset(lignes)
+        if page is not None:
+            return self.get_paginated_response(plat.representer(page))
+        return Response(plat.representer(lignes))
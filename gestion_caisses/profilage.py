@@ -0,0 +1,166 @@
+"""
+Profilage à la demande des requêtes HTTP (cProfile).
+
+Un profil est déclenché soit par le paramètre signé ``?_profil=<jeton>`` (jeton émis
+depuis l'admin pour un superutilisateur), soit par une ``RegleProfilage`` active dont le
+motif correspond au chemin. Le résultat est enregistré dans ``ProfileRecord``:
+fonctions triées par temps cumulé, piles échantillonnées au format replié
+(flamegraph.pl / speedscope), sortie pstats et liste des requêtes SQL.
+"""
+from collections import Counter
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+
+
+PARAMETRE = '_profil'
+SEL_JETON = 'gestion_caisses.profilage'
+CLE_CACHE_REGLES = 'gestion_caisses:regles_profilage'
+
+
+def generer_jeton(user):
+    """Jeton signé autorisant le profilage de requêtes pour un superutilisateur."""
+    return signing.dumps({'u': user.pk}, salt=SEL_JETON)
+
+
+def utilisateur_du_jeton(jeton, demandeur):
+    """
+    Demandeur si le jeton lui a été émis et qu'il est superutilisateur, sinon None.
+
+    Le jeton seul n'est pas un titre d'accès: une URL ``?_profil=`` partagée ou journalisée
+    ne permet pas à un autre utilisateur (ou à un anonyme) de déclencher un profil.
+    """
+    if demandeur is None or not demandeur.is_authenticated or not demandeur.is_superuser:
+        return None
+    try:
+        donnees = signing.loads(jeton, salt=SEL_JETON, max_age=getattr(settings, 'PROFILAGE_DUREE_JETON', 3600))
+    except signing.BadSignature:
+        return None
+    return demandeur if donnees.get('u') == demandeur.pk else None
+
+
+def invalider_regles():
+    cache.delete(CLE_CACHE_REGLES)
+
+
+def regles_actives():
+    """Règles actives (mises en cache pour ne pas ajouter de requête SQL à chaque appel)."""
+    regles = cache.get(CLE_CACHE_REGLES)
+    if regles is None:
+        from .models import RegleProfilage
+        regles = list(
+            RegleProfilage.objects.filter(actif=True, nombre_restant__gt=0)
+            .values_list('pk', 'motif_url', 'date_expiration')
+        )
+        cache.set(CLE_CACHE_REGLES, regles, 60)
+    return regles
+
+
+def regle_pour(chemin):
+    """Identifiant de la première règle active correspondant au chemin."""
+    maintenant = timezone.now()
+    for pk, motif, expiration in regles_actives():
+        if expiration and expiration <= maintenant:
+            continue
+        try:
+            if re.search(motif, chemin):
+                return pk
+        except re.error:
+            continue
+    return None
+
+
+def consommer_regle(pk):
+    """Décrémente le quota d'une règle; renvoie False si elle a été épuisée entre-temps."""
+    from django.db.models import F
+    from .models import RegleProfilage
+    mis_a_jour = RegleProfilage.objects.filter(pk=pk, actif=True, nombre_restant__gt=0).update(
+        nombre_restant=F('nombre_restant') - 1
+    )
+    invalider_regles()
+    return bool(mis_a_jour)
+
+
+# ----------------------------------------------------------------------
+# Exploitation des statistiques cProfile
+
+
+def libelle_fonction(fonction):
+    """Libellé lisible d'une entrée pstats ``(fichier, ligne, nom)``."""
+    fichier, ligne, nom = fonction
+    if fichier == '~':
+        # Fonctions natives: « <built-in method time.sleep> »
+        return nom.replace(';', ',')
+    for prefixe in (str(settings.BASE_DIR), sys.prefix, sys.base_prefix):
+        if prefixe and fichier.startswith(prefixe):
+            fichier = os.path.relpath(fichier, prefixe)
+            break
+    return f"{nom} ({fichier}:{ligne})".replace(';', ',')
+
+
+def fonctions_principales(stats, limite=50):
+    """Fonctions triées par temps cumulé décroissant."""
+    lignes = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limite]
+    return [
+        {
+            'fonction': libelle_fonction(fonction),
+            'appels': nc,
+            'appels_primitifs': cc,
+            'temps_propre_ms': round(tt * 1000, 3),
+            'temps_cumule_ms': round(ct * 1000, 3),
+        }
+        for fonction, (cc, nc, tt, ct, _appelants) in lignes
+    ]
+
+
+class EchantillonneurPiles(threading.Thread):
+    """
+    Échantillonne la pile d'appels du thread profilé à intervalle régulier.
+
+    cProfile ne conserve que les arcs appelant → appelé, insuffisant pour un flame graph:
+    les piles complètes sont donc relevées par échantillonnage (``sys._current_frames``)
+    pendant que cProfile mesure les temps par fonction.
+    """
+
+    def __init__(self, cadre_racine, intervalle=0.005):
+        super().__init__(daemon=True)
+        self.thread_cible = threading.get_ident()
+        self.cadre_racine = cadre_racine
+        self.intervalle = intervalle
+        self.piles = Counter()
+        self._arret = threading.Event()
+
+    def run(self):
+        while not self._arret.wait(self.intervalle):
+            cadre = sys._current_frames().get(self.thread_cible)
+            pile = []
+            # Seules les frames sous le middleware (vue, rendu, ORM...) sont conservées
+            while cadre is not None and cadre is not self.cadre_racine:
+                code = cadre.f_code
+                pile.append(libelle_fonction((code.co_filename, code.co_firstlineno, code.co_name)))
+                cadre = cadre.f_back
+            if pile:
+                self.piles[';'.join(reversed(pile))] += 1
+
+    def arreter(self):
+        self._arret.set()
+        self.join()
+
+    def piles_repliees(self):
+        """Piles au format replié « a;b;c microsecondes » (flamegraph.pl, speedscope)."""
+        micro = int(self.intervalle * 1e6)
+        return '\n'.join(f"{pile} {nombre * micro}" for pile, nombre in self.piles.most_common())
+
+
+def sortie_pstats(profileur, limite=80):
+    flux = io.StringIO()
+    pstats.Stats(profileur, stream=flux).sort_stats('cumulative').print_stats(limite)
+    return flux.getvalue()
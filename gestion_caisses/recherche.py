@@ -0,0 +1,168 @@
+"""
+Recherche insensible aux accents et à la casse (membres, prêts, caisses).
+
+Chaque modèle indexé porte une colonne ``recherche``: ses champs de recherche sans accents,
+en majuscules (« Akouélé » → « AKOUELE »), recalculée à l'enregistrement (``RechercheMixin``).
+La colonne est indexée selon la base:
+
+- SQLite: table virtuelle FTS5 (tokenizer ``trigram``) synchronisée par triggers; toute
+  sous-chaîne d'au moins 3 caractères est résolue par l'index;
+- PostgreSQL: index GIN trigramme (``pg_trgm``), utilisé directement par ``LIKE '%...%'``;
+- autres bases: ``LIKE`` sur la colonne normalisée.
+
+``RechercheNormaliseeFilter`` remplace ``SearchFilter`` sur les vues qui déclarent
+``recherche_chemins``: le modèle lui-même (``''``) et/ou des relations vers d'autres
+modèles indexés (``'membre'``, ``'caisse'``).
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+
+# Modèles indexés (nom de table) — index créés par la migration 0036, puis après chaque migrate
+TABLES_INDEXEES = ('gestion_caisses_membre', 'gestion_caisses_pret', 'gestion_caisses_caisse')
+LONGUEUR_TRIGRAMME = 3
+
+
+def normaliser(*valeurs):
+    """Texte de recherche: sans accents, en majuscules, réduit aux lettres et chiffres"""
+    texte = ' '.join(str(valeur) for valeur in valeurs if valeur)
+    texte = ''.join(c for c in unicodedata.normalize('NFKD', texte) if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^0-9A-Z]+', ' ', texte.upper()).split())
+
+
+class RechercheMixin:
+    """Tient à jour la colonne ``recherche`` à partir de ``champs_recherche`` à chaque enregistrement"""
+    champs_recherche = ()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(self.champs_recherche):
+            self.recherche = normaliser(*(getattr(self, champ) for champ in self.champs_recherche))
+            if update_fields is not None and 'recherche' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'recherche']
+        super().save(*args, **kwargs)
+
+
+def table_fts(table):
+    return f'{table}_fts'
+
+
+def installer_index(connexion=None):
+    """Crée (si besoin) les index de recherche de la base; idempotent.
+
+    Sous SQLite, Django reconstruit une table pour certaines modifications de schéma, ce qui
+    supprime ses triggers: la fonction est donc aussi appelée après chaque ``migrate``.
+    """
+    connexion = connexion or connection
+    with connexion.cursor() as cursor:
+        # Tables absentes ou pas encore migrées (colonne ``recherche`` manquante): rien à indexer
+        existantes = set(connexion.introspection.table_names(cursor))
+        tables = [
+            table for table in TABLES_INDEXEES
+            if table in existantes and 'recherche' in {
+                colonne.name for colonne in connexion.introspection.get_table_description(cursor, table)
+            }
+        ]
+        if connexion.vendor == 'postgresql' and tables:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for table in tables:
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {table}_recherche_trgm '
+                    f'ON {table} USING gin (recherche gin_trgm_ops)'
+                )
+        elif connexion.vendor == 'sqlite':
+            for table in tables:
+                fts = table_fts(table)
+                cursor.execute(
+                    "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                    [f'{fts}_%'],
+                )
+                if cursor.fetchone()[0] == 3:
+                    continue
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"recherche, content='{table}', content_rowid='id', tokenize='trigram')"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                    f"INSERT INTO {fts}(rowid, recherche) VALUES (new.id, new.recherche); END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                    f"INSERT INTO {fts}({fts}, rowid, recherche) VALUES ('delete', old.id, old.recherche); END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF recherche ON {table} BEGIN "
+                    f"INSERT INTO {fts}({fts}, rowid, recherche) VALUES ('delete', old.id, old.recherche); "
+                    f"INSERT INTO {fts}(rowid, recherche) VALUES (new.id, new.recherche); END"
+                )
+                # Triggers (re)créés: l'index a pu manquer des écritures, le reconstruire
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def supprimer_index(connexion=None):
+    connexion = connexion or connection
+    with connexion.cursor() as cursor:
+        for table in TABLES_INDEXEES:
+            if connexion.vendor == 'postgresql':
+                cursor.execute(f'DROP INDEX IF EXISTS {table}_recherche_trgm')
+            elif connexion.vendor == 'sqlite':
+                fts = table_fts(table)
+                for suffixe in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffixe}')
+                cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+def condition(modele, terme, chemin=''):
+    """Q sélectionnant les lignes dont le modèle (ou la relation ``chemin``) contient le terme normalisé"""
+    prefixe = f'{chemin}__' if chemin else ''
+    if connection.vendor == 'sqlite' and len(terme) >= LONGUEUR_TRIGRAMME:
+        fts = table_fts(modele._meta.db_table)
+        # Phrase FTS5: le terme normalisé ne contient ni guillemet ni opérateur
+        identifiants = RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [f'"{terme}"'])
+        return Q(**{f'{prefixe}pk__in': identifiants})
+    return Q(**{f'{prefixe}recherche__contains': terme})
+
+
+def filtrer(queryset, texte, chemins=('',)):
+    """Restreint le queryset aux lignes contenant chacun des mots de ``texte`` (dans l'un des chemins)"""
+    for mot in texte.split():
+        terme = normaliser(mot)
+        if not terme:
+            continue
+        q = Q()
+        for chemin in chemins:
+            modele = queryset.model
+            for nom in filter(None, chemin.split('__')):
+                modele = modele._meta.get_field(nom).related_model
+            q |= condition(modele, terme, chemin)
+        queryset = queryset.filter(q)
+    return queryset
+
+
+class RechercheNormaliseeFilter(filters.SearchFilter):
+    """``SearchFilter`` sur la colonne normalisée et son index (vues déclarant ``recherche_chemins``)"""
+
+    def filter_queryset(self, request, queryset, view):
+        chemins = getattr(view, 'recherche_chemins', None)
+        if not chemins:
+            return super().filter_queryset(request, queryset, view)
+        termes = self.get_search_terms(request)
+        if not termes:
+            return queryset
+        return filtrer(queryset, ' '.join(termes), chemins)
+
+
+class RechercheNormaliseeAdminMixin:
+    """Recherche de l'admin sur la colonne normalisée (``recherche_chemins``) au lieu de ``icontains``"""
+    recherche_chemins = ('',)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return filtrer(queryset, search_term, self.recherche_chemins), False
@@ -0,0 +1,119 @@
+"""
+Rendu et lecture JSON rapides pour l'API (orjson si installé, module ``json`` sinon).
+
+- ``Decimal`` est rendu comme un nombre, sans conversion ``float(...)`` préalable dans les vues;
+- ``date`` / ``datetime`` sont rendus aux formats de l'API (``DATE_FORMAT`` / ``DATETIME_FORMAT``
+  de ``REST_FRAMEWORK``: ``%d/%m/%Y`` et ``%d/%m/%Y %H:%M``), les dates-heures dans le fuseau local;
+- le reste suit l'encodeur de DRF (chaînes différées, querysets, ``timedelta``...).
+
+Les champs des sérialiseurs sont déjà convertis par DRF: la sortie ne change que pour les valeurs
+brutes (rapports, statistiques). Sélection par vue::
+
+    renderer_classes = [JSONRapideRenderer, BrowsableAPIRenderer]
+    parser_classes = [JSONRapideParser, FormParser, MultiPartParser]
+
+ou globalement avec ``API_JSON_RAPIDE=True`` (``DEFAULT_RENDERER_CLASSES`` / ``DEFAULT_PARSER_CLASSES``).
+"""
+import datetime
+import decimal
+import json
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    # Dépendance optionnelle: même sortie avec le module json, plus lentement
+    orjson = None
+
+
+def _formater(valeur, format_api):
+    if format_api is None or format_api.lower() == ISO_8601:
+        return valeur.isoformat()
+    return valeur.strftime(format_api)
+
+
+class EncodeurJSON(encoders.JSONEncoder):
+    """Encodeur de DRF avec les conventions de l'API pour les décimaux et les dates"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.format_date = api_settings.DATE_FORMAT
+        self.format_date_heure = api_settings.DATETIME_FORMAT
+        self.fuseau = timezone.get_current_timezone()
+        # Les rapports répètent les mêmes dates: chaque date n'est formatée qu'une fois
+        self.dates = {}
+
+    def default(self, obj):
+        if isinstance(obj, decimal.Decimal):
+            return float(obj)
+        if isinstance(obj, datetime.datetime):
+            if obj.utcoffset() is not None:
+                obj = obj.astimezone(self.fuseau)
+            return _formater(obj, self.format_date_heure)
+        if isinstance(obj, datetime.date):
+            texte = self.dates.get(obj)
+            if texte is None:
+                texte = self.dates[obj] = _formater(obj, self.format_date)
+            return texte
+        return super().default(obj)
+
+
+class JSONRapideRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indentation = self.indentation(accepted_media_type, renderer_context or {})
+        if orjson is not None:
+            options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            if indentation:
+                options |= orjson.OPT_INDENT_2
+            return orjson.dumps(data, default=EncodeurJSON().default, option=options)
+        separateurs = (',', ': ') if indentation else (',', ':')
+        return json.dumps(
+            data, cls=EncodeurJSON, ensure_ascii=False, allow_nan=False,
+            indent=indentation, separators=separateurs,
+        ).encode()
+
+    def indentation(self, accepted_media_type, renderer_context):
+        if accepted_media_type:
+            _base, _sep, parametres = accepted_media_type.partition(';')
+            for parametre in parametres.split(';'):
+                cle, _egal, valeur = parametre.strip().partition('=')
+                if cle == 'indent':
+                    try:
+                        return max(0, min(int(valeur), 8)) or None
+                    except ValueError:
+                        return None
+        return renderer_context.get('indent')
+
+
+class JSONRapideParser(BaseParser):
+    media_type = 'application/json'
+    renderer_class = JSONRapideRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        contenu = stream.read()
+        try:
+            if orjson is not None:
+                return orjson.loads(contenu)
+            encodage = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+            return json.loads(contenu.decode(encodage), parse_constant=_refuser_constante)
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+def _refuser_constante(valeur):
+    # Comme le lecteur de DRF: NaN / Infinity ne sont pas du JSON valide
+    raise ValueError(f'Valeur "{valeur}" invalide')
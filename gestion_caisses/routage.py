@@ -0,0 +1,173 @@
+"""
+Lectures des rapports, exports et tableaux de bord sur une base répliquée (alias ``RAPPORTS_BASE``).
+
+Les vues et fonctions lourdes en lecture s'exécutent dans ``lecture_rapports()`` (gestionnaire de
+contexte ou décorateur). ``RouteurRapports`` y envoie les lectures des modèles de l'application vers
+la réplique; tout le reste va à la base principale:
+
+- les écritures, toujours (même pour un objet lu sur la réplique);
+- les lectures d'une requête HTTP qui a déjà écrit (lecture de ses propres écritures, état
+  réinitialisé par ``RoutageMiddleware``), ou faites dans une transaction;
+- les sessions et utilisateurs (applications hors ``gestion_caisses``);
+- toutes les lectures si la réplique n'est pas configurée, injoignable ou en retard de plus de
+  ``RAPPORTS_RETARD_MAX`` secondes (vérifié au plus toutes les ``RAPPORTS_VERIFICATION_INTERVALLE``).
+
+Le retard est lu sur PostgreSQL (``pg_last_xact_replay_timestamp``). En local, la réplique peut être
+une copie du fichier SQLite (``REPORTING_DB_NAME``): son retard est l'écart entre les dates de
+modification des deux fichiers.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+
+APPLICATIONS_REPLIQUEES = {'gestion_caisses'}
+
+
+class _Etat:
+    def __init__(self):
+        self.rapports = 0
+        self.ecriture = False
+
+
+_etat_courant = ContextVar('routage_etat', default=None)
+# alias -> (instant de la prochaine vérification, réplique utilisable)
+_sante = {}
+
+
+def alias_rapports():
+    return getattr(settings, 'RAPPORTS_BASE', 'reporting')
+
+
+@contextmanager
+def requete():
+    """Portée d'une requête HTTP: les écritures y épinglent les lectures suivantes sur la base principale"""
+    jeton = _etat_courant.set(_Etat())
+    try:
+        yield
+    finally:
+        _etat_courant.reset(jeton)
+
+
+@contextmanager
+def lecture_rapports():
+    """Lectures du bloc servies par la réplique quand c'est possible (utilisable aussi comme décorateur)"""
+    etat = _etat_courant.get()
+    jeton = None
+    if etat is None:
+        # Hors requête HTTP (tâche Celery): portée limitée au bloc
+        etat = _Etat()
+        jeton = _etat_courant.set(etat)
+    etat.rapports += 1
+    try:
+        yield
+    finally:
+        etat.rapports -= 1
+        if jeton is not None:
+            _etat_courant.reset(jeton)
+
+
+def noter_ecriture():
+    """Épingle la suite de la requête sur la base principale (appelé pour toute écriture)"""
+    etat = _etat_courant.get()
+    if etat is not None:
+        etat.ecriture = True
+
+
+def retard_sqlite(principale, replique):
+    """Retard (secondes) d'une copie de fichier SQLite sur l'original"""
+    return max(0.0, os.path.getmtime(principale) - os.path.getmtime(replique))
+
+
+def retard_replique(alias):
+    """Retard de réplication en secondes (None si la base ne le mesure pas)"""
+    connexion = connections[alias]
+    if connexion.vendor == 'postgresql':
+        with connexion.cursor() as cursor:
+            # Réplique à jour (tout ce qui est reçu est rejoué): pas de retard, même sans écriture récente
+            cursor.execute(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+            )
+            retard = cursor.fetchone()[0]
+        return float(retard) if retard is not None else None
+    if connexion.vendor == 'sqlite':
+        principale = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        replique = connexion.settings_dict['NAME']
+        if not os.path.exists(replique):
+            raise FileNotFoundError(replique)
+        if os.path.exists(str(principale)):
+            return retard_sqlite(principale, replique)
+        return None
+    connexion.ensure_connection()
+    return None
+
+
+def replique_utilisable(alias):
+    """Réplique configurée, joignable et à jour (résultat conservé quelques secondes)"""
+    if alias not in settings.DATABASES:
+        return False
+    maintenant = time.monotonic()
+    verification = _sante.get(alias)
+    if verification is not None and verification[0] > maintenant:
+        return verification[1]
+    # Journalisé au changement d'état seulement, pas à chaque vérification
+    etait_utilisable = verification is None or verification[1]
+    try:
+        retard = retard_replique(alias)
+        utilisable = retard is None or retard <= getattr(settings, 'RAPPORTS_RETARD_MAX', 30)
+        if not utilisable and etait_utilisable:
+            logger.warning(f"Réplique {alias} en retard de {retard:.0f} s: lectures sur la base principale")
+    except Exception as e:
+        if etait_utilisable:
+            logger.warning(f"Réplique {alias} indisponible: {e}")
+        utilisable = False
+    if utilisable and not etait_utilisable:
+        logger.info(f"Réplique {alias} de nouveau utilisable pour les rapports")
+    _sante[alias] = (maintenant + getattr(settings, 'RAPPORTS_VERIFICATION_INTERVALLE', 10), utilisable)
+    return utilisable
+
+
+class RouteurRapports:
+    """Routeur de base de données (``DATABASE_ROUTERS``)"""
+
+    def db_for_read(self, model, **hints):
+        etat = _etat_courant.get()
+        if (
+            etat is not None and etat.rapports and not etat.ecriture
+            and model._meta.app_label in APPLICATIONS_REPLIQUEES
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+            and replique_utilisable(alias_rapports())
+        ):
+            return alias_rapports()
+        # Explicite: sans routeur, Django relirait les relations d'un objet sur sa base d'origine
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        noter_ecriture()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mêmes données: un objet lu sur la réplique peut être lié à un objet de la base principale
+        bases = {DEFAULT_DB_ALIAS, alias_rapports()}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class LectureRapportsMixin:
+    """Mixin de vue (ViewSet DRF ou vue Django): toute la vue dans ``lecture_rapports()``"""
+
+    def dispatch(self, request, *args, **kwargs):
+        with lecture_rapports():
+            return super().dispatch(request, *args, **kwargs)
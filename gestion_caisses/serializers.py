@@ -1,7 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
 from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
 from django.utils import timezone
+from .champs_dynamiques import ChampsDynamiquesMixin
+from .plats import SerialiseurPlat
 from .models import (
     Region, Prefecture, Commune, Canton, Village, Quartier,
     Caisse, Membre, Pret, Echeance, MouvementFond, 
@@ -45,6 +50,21 @@ def serialize_exercice_info(exercice):
     }
 
 
+def exercice_actuel_caisse(caisse):
+    """Exercice EN_COURS le plus récent de la caisse, sinon son dernier exercice.
+
+    Utilise le préchargement `exercices_tries` (voir CaisseViewSet) lorsqu'il est présent.
+    """
+    exercices = getattr(caisse, 'exercices_tries', None)
+    if exercices is None:
+        exercice = caisse.exercices.filter(statut='EN_COURS').order_by('-date_debut').first()
+        return exercice or caisse.exercices.order_by('-date_debut', '-date_creation').first()
+    for exercice in exercices:
+        if exercice.statut == 'EN_COURS':
+            return exercice
+    return exercices[0] if exercices else None
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Sérialiseur pour les utilisateurs Django"""
     role = serializers.SerializerMethodField()
@@ -144,8 +164,9 @@ class QuartierSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class MembreSerializer(serializers.ModelSerializer):
+class MembreSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     """Sérialiseur pour les membres"""
+    champs_extensibles = ('quartier',)
     nom_complet = serializers.ReadOnlyField()
     caisse_nom = serializers.CharField(source='caisse.nom_association', read_only=True)
     caisse_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
@@ -163,8 +184,16 @@ class MembreSerializer(serializers.ModelSerializer):
         }
 
 
-class CaisseSerializer(serializers.ModelSerializer):
+class CaisseSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     """Sérialiseur pour les caisses"""
+    champs_extensibles = (
+        'region', 'prefecture', 'commune', 'canton', 'village', 'presidente', 'secretaire', 'tresoriere',
+    )
+    relations_par_champ = {
+        'localisation': ('village', 'canton', 'commune'),
+        'exercice_actuel': ('exercices',),
+        'nombre_membres': (),
+    }
     region = RegionSerializer(read_only=True)
     prefecture = PrefectureSerializer(read_only=True)
     commune = CommuneSerializer(read_only=True)
@@ -179,7 +208,7 @@ class CaisseSerializer(serializers.ModelSerializer):
     village_id = serializers.IntegerField(write_only=True)
     
     # Champs calculés
-    nombre_membres = serializers.ReadOnlyField()
+    nombre_membres = serializers.SerializerMethodField()
     nombre_prets_actifs = serializers.ReadOnlyField()
     solde_disponible = serializers.ReadOnlyField()
     
@@ -230,14 +259,12 @@ class CaisseSerializer(serializers.ModelSerializer):
     
     def get_exercice_actuel(self, obj):
         """Récupère l'exercice en cours ou le dernier exercice clôturé"""
-        # Priorité: exercice EN_COURS, sinon le dernier exercice (le plus récent)
-        exercice = obj.exercices.filter(statut='EN_COURS').order_by('-date_debut').first()
-        if exercice:
-            return serialize_exercice_info(exercice)
+        return serialize_exercice_info(exercice_actuel_caisse(obj))
 
-        # Si aucun exercice en cours, prendre le dernier exercice (même clôturé)
-        exercice = obj.exercices.order_by('-date_debut', '-date_creation').first()
-        return serialize_exercice_info(exercice)
+    def get_nombre_membres(self, obj):
+        # Annotation posée par CaisseViewSet (évite une requête par caisse)
+        nombre = getattr(obj, 'nombre_membres_actifs', None)
+        return obj.nombre_membres if nombre is None else nombre
     
     class Meta:
         model = Caisse
@@ -272,8 +299,10 @@ class EcheanceSerializer(serializers.ModelSerializer):
         }
 
 
-class PretSerializer(serializers.ModelSerializer):
+class PretSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     """Sérialiseur pour les prêts"""
+    champs_extensibles = ('membre', 'caisse', 'echeances')
+    relations_par_champ = {'interet_total': (), 'interet_mensuel': ()}
     membre = MembreSerializer(read_only=True)
     caisse = CaisseSerializer(read_only=True)
     membre_id = serializers.IntegerField(write_only=True)
@@ -649,14 +678,15 @@ class NotificationListSerializer(serializers.ModelSerializer):
 
 
 # Sérialiseurs pour les listes et détails
-class CaisseListSerializer(serializers.ModelSerializer):
+class CaisseListSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     """Sérialiseur simplifié pour la liste des caisses"""
+    relations_par_champ = CaisseSerializer.relations_par_champ
     region_nom = serializers.CharField(source='region.nom', read_only=True)
     prefecture_nom = serializers.CharField(source='prefecture.nom', read_only=True)
     commune_nom = serializers.CharField(source='commune.nom', read_only=True)
     village_nom = serializers.CharField(source='village.nom', read_only=True)
     canton_nom = serializers.CharField(source='canton.nom', read_only=True)
-    nombre_membres = serializers.ReadOnlyField()
+    nombre_membres = serializers.SerializerMethodField()
     solde_disponible = serializers.ReadOnlyField()
     exercice_count = serializers.IntegerField(read_only=True)
     
@@ -690,14 +720,12 @@ class CaisseListSerializer(serializers.ModelSerializer):
     
     def get_exercice_actuel(self, obj):
         """Récupère l'exercice en cours ou le dernier exercice clôturé"""
-        # Priorité: exercice EN_COURS, sinon le dernier exercice (le plus récent)
-        exercice = obj.exercices.filter(statut='EN_COURS').order_by('-date_debut').first()
-        if exercice:
-            return serialize_exercice_info(exercice)
+        return serialize_exercice_info(exercice_actuel_caisse(obj))
 
-        # Si aucun exercice en cours, prendre le dernier exercice (même clôturé)
-        exercice = obj.exercices.order_by('-date_debut', '-date_creation').first()
-        return serialize_exercice_info(exercice)
+    def get_nombre_membres(self, obj):
+        # Annotation posée par CaisseViewSet (évite une requête par caisse)
+        nombre = getattr(obj, 'nombre_membres_actifs', None)
+        return obj.nombre_membres if nombre is None else nombre
     
     class Meta:
         model = Caisse
@@ -726,8 +754,9 @@ class MembreListSerializer(serializers.ModelSerializer):
         ]
 
 
-class PretListSerializer(serializers.ModelSerializer):
+class PretListSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     """Sérialiseur simplifié pour la liste des prêts"""
+    relations_par_champ = PretSerializer.relations_par_champ
     membre_nom = serializers.CharField(source='membre.nom_complet', read_only=True)
     caisse_nom = serializers.CharField(source='caisse.nom_association', read_only=True)
     caisse_code = serializers.CharField(source='caisse.code', read_only=True)
@@ -758,6 +787,156 @@ class PretListSerializer(serializers.ModelSerializer):
             return 0
 
 
+# Sérialiseurs « à plat » des listes (une requête .values(), voir plats.py)
+def _nom_complet(ligne, relation):
+    return f"{ligne[f'{relation}__nom']} {ligne[f'{relation}__prenoms']}"
+
+
+class _PretCalcul(SimpleNamespace):
+    """Colonnes d'un prêt lues par .values(), avec les propriétés de calcul du modèle"""
+    montant_interet_mensuel = Pret.montant_interet_mensuel
+    montant_interet_calcule = Pret.montant_interet_calcule
+    total_a_rembourser = Pret.total_a_rembourser
+
+
+class MembreListePlat(SerialiseurPlat):
+    reference = MembreListSerializer
+    calcules = {'nom_complet': ('nom', 'prenoms')}
+
+    def valeur_nom_complet(self, ligne):
+        return f"{ligne['nom']} {ligne['prenoms']}"
+
+
+class PretListePlat(SerialiseurPlat):
+    reference = PretListSerializer
+    colonnes_calcul = ('montant_accord', 'taux_interet', 'duree_mois')
+    annotations = {
+        # Total encaissé par les mouvements de remboursement (Pret.montant_restant)
+        'total_paye_mouvements': Subquery(
+            MouvementFond.objects.filter(pret=OuterRef('pk'), type_mouvement='REMBOURSEMENT')
+            .values('pret').annotate(total=Sum('montant')).values('total')
+        ),
+    }
+    calcules = {
+        'membre_nom': ('membre__nom', 'membre__prenoms'),
+        'montant_restant': (*colonnes_calcul, 'montant_rembourse', 'total_paye_mouvements'),
+        'total_a_rembourser': colonnes_calcul,
+        'interet_total': colonnes_calcul,
+        'interet_mensuel': colonnes_calcul,
+    }
+
+    def calcul(self, ligne):
+        if '_calcul' not in ligne:
+            ligne['_calcul'] = _PretCalcul(**{colonne: ligne[colonne] for colonne in self.colonnes_calcul})
+        return ligne['_calcul']
+
+    def valeur_membre_nom(self, ligne):
+        return _nom_complet(ligne, 'membre')
+
+    def valeur_montant_restant(self, ligne):
+        # Même règle que Pret.montant_restant, avec le total des mouvements annoté
+        if not ligne['montant_accord']:
+            return 0
+        total = self.calcul(ligne).total_a_rembourser or Decimal('0')
+        total_paye = ligne['total_paye_mouvements'] or Decimal('0')
+        if total_paye <= 0:
+            total_paye = ligne['montant_rembourse'] or Decimal('0')
+        restant = total - total_paye
+        return restant if restant > 0 else Decimal('0')
+
+    def valeur_total_a_rembourser(self, ligne):
+        return self.calcul(ligne).total_a_rembourser
+
+    def valeur_interet_total(self, ligne):
+        try:
+            return self.calcul(ligne).montant_interet_calcule
+        except Exception:
+            return 0
+
+    def valeur_interet_mensuel(self, ligne):
+        try:
+            return self.calcul(ligne).montant_interet_mensuel
+        except Exception:
+            return 0
+
+
+class CaisseListePlat(SerialiseurPlat):
+    reference = CaisseListSerializer
+    annotations = {
+        'exercice_count': Count('exercices', distinct=True),
+        'nombre_membres_actifs': Count('membres', filter=Q(membres__statut='ACTIF'), distinct=True),
+    }
+    calcules = {
+        'nombre_membres': ('nombre_membres_actifs',),
+        'solde_disponible': ('fond_initial', 'fond_disponible'),
+        'agent_nom': ('agent__nom', 'agent__prenoms'),
+        'presidente_nom': ('presidente__nom', 'presidente__prenoms'),
+        'secretaire_nom': ('secretaire__nom', 'secretaire__prenoms'),
+        'tresoriere_nom': ('tresoriere__nom', 'tresoriere__prenoms'),
+        'localisation': ('village', 'village__nom', 'canton', 'canton__nom', 'commune', 'commune__nom'),
+        'exercice_actuel': ('id',),
+    }
+
+    def precharger(self, lignes):
+        # Exercices des caisses de la page, dans l'ordre du préchargement de CaisseViewSet
+        self.exercices = {ligne['id']: [] for ligne in lignes}
+        if 'exercice_actuel' in {nom for nom, *_reste in self.plan}:
+            for exercice in ExerciceCaisse.objects.filter(caisse_id__in=self.exercices).order_by(
+                    '-date_debut', '-date_creation'):
+                self.exercices[exercice.caisse_id].append(exercice)
+
+    def valeur_nombre_membres(self, ligne):
+        return ligne['nombre_membres_actifs']
+
+    def valeur_solde_disponible(self, ligne):
+        return Caisse.solde_disponible.fget(SimpleNamespace(
+            fond_initial=ligne['fond_initial'], fond_disponible=ligne['fond_disponible']
+        ))
+
+    def valeur_agent_nom(self, ligne):
+        return _nom_complet(ligne, 'agent')
+
+    def valeur_presidente_nom(self, ligne):
+        return _nom_complet(ligne, 'presidente')
+
+    def valeur_secretaire_nom(self, ligne):
+        return _nom_complet(ligne, 'secretaire')
+
+    def valeur_tresoriere_nom(self, ligne):
+        return _nom_complet(ligne, 'tresoriere')
+
+    def valeur_localisation(self, ligne):
+        parts = [ligne[f'{niveau}__nom'] for niveau in ('village', 'canton', 'commune') if ligne[niveau] is not None]
+        return ', '.join(parts) if parts else 'Non définie'
+
+    def valeur_exercice_actuel(self, ligne):
+        caisse = SimpleNamespace(exercices_tries=self.exercices[ligne['id']])
+        return serialize_exercice_info(exercice_actuel_caisse(caisse))
+
+
+class NotificationListePlat(SerialiseurPlat):
+    reference = NotificationListSerializer
+    calcules = {
+        'destinataire': ('destinataire__username',),
+        'caisse': ('caisse', 'caisse__code', 'caisse__nom_association'),
+        'pret': ('pret', 'pret__numero_pret', 'pret__membre__nom', 'pret__membre__prenoms'),
+    }
+
+    # Représentations __str__ des modèles liés (StringRelatedField)
+    def valeur_destinataire(self, ligne):
+        return ligne['destinataire__username']
+
+    def valeur_caisse(self, ligne):
+        if ligne['caisse'] is None:
+            return None
+        return f"{ligne['caisse__code']} - {ligne['caisse__nom_association']}"
+
+    def valeur_pret(self, ligne):
+        if ligne['pret'] is None:
+            return None
+        return f"Prêt {ligne['pret__numero_pret']} - {_nom_complet(ligne, 'pret__membre')}"
+
+
 # Sérialiseurs pour les statistiques et tableaux de bord
 class CaisseStatsSerializer(serializers.ModelSerializer):
     """Sérialiseur pour les statistiques des caisses"""
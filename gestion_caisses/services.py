@@ -1,7 +1,15 @@
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q, Sum
 from django.utils import timezone
 from datetime import timedelta
+import logging
+import time
 from .models import Notification, Pret, Caisse, AuditLog, Agent, ExerciceCaisse
+from . import compteurs, conditionnel
+from .audit import journaliser_audit
+
+logger = logging.getLogger(__name__)
 
 
 class AgentService:
@@ -39,7 +47,7 @@ class AgentService:
         
         # Log d'audit
         if utilisateur_creation:
-            AuditLog.objects.create(
+            journaliser_audit(
                 utilisateur=utilisateur_creation,
                 action='CREATION',
                 modele='Agent',
@@ -97,7 +105,7 @@ class AgentService:
         
         # Log d'audit
         if utilisateur_modification:
-            AuditLog.objects.create(
+            journaliser_audit(
                 utilisateur=utilisateur_modification,
                 action='MODIFICATION',
                 modele='Caisse',
@@ -141,6 +149,123 @@ class AgentService:
         return agents.order_by('nom', 'prenoms')
 
 
+class NotificationDispatcher:
+    """
+    Diffusion groupée des notifications: les destinataires sont résolus en une requête,
+    notifications et journaux d'audit sont insérés par ``bulk_create``.
+
+    ``planifier`` diffère la diffusion après le commit de la transaction courante et la
+    confie à la tâche Celery ``diffuser_notifications`` (exécution directe si Celery ou
+    le broker ne sont pas disponibles). Les paramètres restent sérialisables en JSON.
+    """
+
+    ROLES_BUREAU = {
+        'presidente': 'caisses_presidees',
+        'secretaire': 'caisses_secretariees',
+        'tresoriere': 'caisses_tresoriees',
+    }
+
+    @staticmethod
+    def destinataires(superutilisateurs=False, bureau_caisse_id=None, roles_bureau=None):
+        """Liste (id, username) des destinataires, en une seule requête"""
+        filtre = Q()
+        if superutilisateurs:
+            filtre |= Q(is_superuser=True)
+        if bureau_caisse_id:
+            for role in roles_bureau or NotificationDispatcher.ROLES_BUREAU:
+                relation = NotificationDispatcher.ROLES_BUREAU[role]
+                filtre |= Q(**{f'profil_membre__{relation}': bureau_caisse_id})
+        if not filtre:
+            return []
+        return list(User.objects.filter(filtre).distinct().order_by('pk').values_list('pk', 'username'))
+
+    @staticmethod
+    def diffuser(type_notification, titre, message, superutilisateurs=False, bureau_caisse_id=None,
+                 roles_bureau=None, caisse_id=None, pret_id=None, exercice_id=None, lien_action='',
+                 audit_modele=None, audit_objet_id=None, audit_details=None, audit_utilisateur_id=None,
+                 audit_par_destinataire=False, eviter_doublons_jours=None):
+        """
+        Crée la notification pour chaque destinataire et les journaux d'audit associés.
+
+        - ``audit_par_destinataire``: un AuditLog par destinataire (sinon un seul, au nom de ``audit_utilisateur_id``)
+        - ``eviter_doublons_jours``: ignore les destinataires déjà notifiés (même type, même objet) sur la période
+
+        Retourne le nombre de notifications créées.
+        """
+        destinataires = NotificationDispatcher.destinataires(superutilisateurs, bureau_caisse_id, roles_bureau)
+
+        if eviter_doublons_jours and destinataires:
+            deja_notifies = set(Notification.objects.filter(
+                destinataire_id__in=[pk for pk, _ in destinataires],
+                type_notification=type_notification,
+                caisse_id=caisse_id,
+                pret_id=pret_id,
+                exercice_id=exercice_id,
+                date_creation__gte=timezone.now() - timedelta(days=eviter_doublons_jours),
+            ).values_list('destinataire_id', flat=True))
+            destinataires = [(pk, username) for pk, username in destinataires if pk not in deja_notifies]
+
+        with transaction.atomic():
+            Notification.objects.bulk_create([
+                Notification(
+                    destinataire_id=pk,
+                    type_notification=type_notification,
+                    titre=titre,
+                    message=message,
+                    caisse_id=caisse_id,
+                    pret_id=pret_id,
+                    exercice_id=exercice_id,
+                    lien_action=lien_action,
+                )
+                for pk, _ in destinataires
+            ])
+
+            if audit_modele:
+                details = {'type': type_notification, **(audit_details or {})}
+                if audit_par_destinataire:
+                    audits = [
+                        AuditLog(
+                            utilisateur_id=pk,
+                            action='NOTIFICATION',
+                            modele=audit_modele,
+                            objet_id=audit_objet_id,
+                            details={**details, 'destinataire': username},
+                        )
+                        for pk, username in destinataires
+                    ]
+                else:
+                    audits = [AuditLog(
+                        utilisateur_id=audit_utilisateur_id,
+                        action='NOTIFICATION',
+                        modele=audit_modele,
+                        objet_id=audit_objet_id,
+                        details=details,
+                    )]
+                AuditLog.objects.bulk_create(audits)
+
+        # bulk_create n'émet pas de signal: invalider explicitement les compteurs de la cloche
+        ids = [pk for pk, _ in destinataires]
+        compteurs.signaler_utilisateurs(ids)
+        transaction.on_commit(lambda: compteurs.signaler_utilisateurs(ids))
+
+        return len(destinataires)
+
+    @staticmethod
+    def planifier(**parametres):
+        """Diffuse la notification après le commit de la transaction courante, hors du cycle de la requête"""
+        transaction.on_commit(lambda: NotificationDispatcher._envoyer(parametres))
+
+    @staticmethod
+    def _envoyer(parametres):
+        try:
+            from .tasks import diffuser_notifications
+            diffuser_notifications.delay(parametres)
+        except Exception as e:
+            # Celery absent ou broker injoignable: diffusion immédiate
+            logger.warning(f"Diffusion directe des notifications {parametres.get('type_notification')}: {e}")
+            NotificationDispatcher.diffuser(**parametres)
+
+
 class NotificationService:
     """Service pour gérer les notifications du système"""
     
@@ -166,216 +291,88 @@ class NotificationService:
     
     @staticmethod
     def notifier_demande_pret(pret):
-        """Notifier l'administrateur d'une nouvelle demande de prêt"""
-        # Trouver tous les administrateurs
-        admins = User.objects.filter(is_superuser=True)
-        
-        for admin in admins:
-            Notification.objects.create(
-                destinataire=admin,
-                type_notification='DEMANDE_PRET',
-                titre=f'Nouvelle demande de prêt - {pret.membre.nom_complet}',
-                message=f'Une nouvelle demande de prêt de {pret.montant_demande} FCFA a été soumise par {pret.membre.nom_complet} de la caisse {pret.caisse.nom_association}.',
-                caisse=pret.caisse,
-                pret=pret,
-                lien_action=f'/adminsecurelogin/gestion_caisses/pret/{pret.id}/change/'
-            )
-            
-            # Log d'audit (utilisateur doit être un User)
-            AuditLog.objects.create(
-                utilisateur=admin,
-                action='NOTIFICATION',
-                modele='Pret',
-                objet_id=pret.id,
-                details={
-                    'type': 'DEMANDE_PRET',
-                    'destinataire': admin.username,
-                    'montant': str(pret.montant_demande)
-                }
-            )
+        """Notifier les administrateurs d'une nouvelle demande de prêt (diffusion après commit)"""
+        NotificationDispatcher.planifier(
+            type_notification='DEMANDE_PRET',
+            titre=f'Nouvelle demande de prêt - {pret.membre.nom_complet}',
+            message=f'Une nouvelle demande de prêt de {pret.montant_demande} FCFA a été soumise par {pret.membre.nom_complet} de la caisse {pret.caisse.nom_association}.',
+            superutilisateurs=True,
+            caisse_id=pret.caisse_id,
+            pret_id=pret.id,
+            lien_action=f'/adminsecurelogin/gestion_caisses/pret/{pret.id}/change/',
+            audit_modele='Pret',
+            audit_objet_id=pret.id,
+            audit_details={'montant': str(pret.montant_demande)},
+            audit_par_destinataire=True,
+        )
     
     @staticmethod
     def notifier_validation_pret(pret, admin):
-        """Notifier la caisse de la validation d'un prêt"""
-        # Notifier la présidente de la caisse (si elle a un utilisateur associé)
-        if pret.caisse.presidente and pret.caisse.presidente.utilisateur:
-            NotificationService._creer_notification_securisee(
-                destinataire=pret.caisse.presidente.utilisateur,
-                type_notification='VALIDATION_PRET',
-                titre=f'Prêt validé - {pret.membre.nom_complet}',
-                message=f'Le prêt de {pret.montant_demande} FCFA demandé par {pret.membre.nom_complet} a été validé par l\'administrateur. Le prêt peut maintenant être octroyé.',
-                caisse=pret.caisse,
-                pret=pret,
-                lien_action=f'/gestion-caisses/prets/'
-            )
-        
-        # Notifier la secrétaire de la caisse (si elle a un utilisateur associé)
-        if pret.caisse.secretaire and pret.caisse.secretaire.utilisateur:
-            NotificationService._creer_notification_securisee(
-                destinataire=pret.caisse.secretaire.utilisateur,
-                type_notification='VALIDATION_PRET',
-                titre=f'Prêt validé - {pret.membre.nom_complet}',
-                message=f'Le prêt de {pret.montant_demande} FCFA demandé par {pret.membre.nom_complet} a été validé par l\'administrateur. Le prêt peut maintenant être octroyé.',
-                caisse=pret.caisse,
-                pret=pret,
-                lien_action=f'/gestion-caisses/prets/'
-            )
-        
-        # Notifier la trésorière de la caisse (si elle a un utilisateur associé)
-        if pret.caisse.tresoriere and pret.caisse.tresoriere.utilisateur:
-            NotificationService._creer_notification_securisee(
-                destinataire=pret.caisse.tresoriere.utilisateur,
-                type_notification='VALIDATION_PRET',
-                titre=f'Prêt validé - {pret.membre.nom_complet}',
-                message=f'Le prêt de {pret.montant_demande} FCFA demandé par {pret.membre.nom_complet} a été validé par l\'administrateur. Le prêt peut maintenant être octroyé.',
-                caisse=pret.caisse,
-                pret=pret,
-                lien_action=f'/gestion-caisses/prets/'
-            )
-        
-        # Log d'audit
-        AuditLog.objects.create(
-            utilisateur=admin,
-            action='NOTIFICATION',
-            modele='Pret',
-            objet_id=pret.id,
-            details={
-                'type': 'VALIDATION_PRET',
-                'caisse': pret.caisse.nom_association,
-                'montant': str(pret.montant_demande)
-            }
+        """Notifier le bureau de la caisse (présidente, secrétaire, trésorière) de la validation d'un prêt"""
+        NotificationDispatcher.planifier(
+            type_notification='VALIDATION_PRET',
+            titre=f'Prêt validé - {pret.membre.nom_complet}',
+            message=f'Le prêt de {pret.montant_demande} FCFA demandé par {pret.membre.nom_complet} a été validé par l\'administrateur. Le prêt peut maintenant être octroyé.',
+            bureau_caisse_id=pret.caisse_id,
+            caisse_id=pret.caisse_id,
+            pret_id=pret.id,
+            lien_action='/gestion-caisses/prets/',
+            audit_modele='Pret',
+            audit_objet_id=pret.id,
+            audit_details={'caisse': pret.caisse.nom_association, 'montant': str(pret.montant_demande)},
+            audit_utilisateur_id=admin.id,
         )
     
     @staticmethod
     def notifier_rejet_pret(pret, admin, motif_rejet):
-        """Notifier la caisse du rejet d'un prêt"""
-        # Notifier la présidente de la caisse (si elle a un utilisateur associé)
-        if pret.caisse.presidente and pret.caisse.presidente.utilisateur:
-            NotificationService._creer_notification_securisee(
-                destinataire=pret.caisse.presidente.utilisateur,
-                type_notification='REJET_PRET',
-                titre=f'Prêt rejeté - {pret.membre.nom_complet}',
-                message=f'Le prêt de {pret.montant_demande} FCFA demandé par {pret.membre.nom_complet} a été rejeté par l\'administrateur. Motif: {motif_rejet}',
-                caisse=pret.caisse,
-                pret=pret,
-                lien_action=f'/gestion-caisses/prets/'
-            )
-        
-        # Notifier la secrétaire de la caisse (si elle a un utilisateur associé)
-        if pret.caisse.secretaire and pret.caisse.secretaire.utilisateur:
-            NotificationService._creer_notification_securisee(
-                destinataire=pret.caisse.secretaire.utilisateur,
-                type_notification='REJET_PRET',
-                titre=f'Prêt rejeté - {pret.membre.nom_complet}',
-                message=f'Le prêt de {pret.montant_demande} FCFA demandé par {pret.membre.nom_complet} a été rejeté par l\'administrateur. Motif: {motif_rejet}',
-                caisse=pret.caisse,
-                pret=pret,
-                lien_action=f'/gestion-caisses/prets/'
-            )
-        
-        # Notifier la trésorière de la caisse (si elle a un utilisateur associé)
-        if pret.caisse.tresoriere and pret.caisse.tresoriere.utilisateur:
-            NotificationService._creer_notification_securisee(
-                destinataire=pret.caisse.tresoriere.utilisateur,
-                type_notification='REJET_PRET',
-                titre=f'Prêt rejeté - {pret.membre.nom_complet}',
-                message=f'Le prêt de {pret.montant_demande} FCFA demandé par {pret.membre.nom_complet} a été rejeté par l\'administrateur. Motif: {motif_rejet}',
-                caisse=pret.caisse,
-                pret=pret,
-                lien_action=f'/gestion-caisses/prets/'
-            )
-        
-        # Log d'audit
-        AuditLog.objects.create(
-            utilisateur=admin,
-            action='NOTIFICATION',
-            modele='Pret',
-            objet_id=pret.id,
-            details={
-                'type': 'REJET_PRET',
-                'caisse': pret.caisse.nom_association,
-                'motif_rejet': motif_rejet
-            }
+        """Notifier le bureau de la caisse du rejet d'un prêt"""
+        NotificationDispatcher.planifier(
+            type_notification='REJET_PRET',
+            titre=f'Prêt rejeté - {pret.membre.nom_complet}',
+            message=f'Le prêt de {pret.montant_demande} FCFA demandé par {pret.membre.nom_complet} a été rejeté par l\'administrateur. Motif: {motif_rejet}',
+            bureau_caisse_id=pret.caisse_id,
+            caisse_id=pret.caisse_id,
+            pret_id=pret.id,
+            lien_action='/gestion-caisses/prets/',
+            audit_modele='Pret',
+            audit_objet_id=pret.id,
+            audit_details={'caisse': pret.caisse.nom_association, 'motif_rejet': motif_rejet},
+            audit_utilisateur_id=admin.id,
         )
     
     @staticmethod
     def notifier_attente_pret(pret, admin, motif_attente):
-        """Notifier la caisse de la mise en attente d'un prêt"""
-        # Notifier la présidente de la caisse (si elle a un utilisateur associé)
-        if pret.caisse.presidente and pret.caisse.presidente.utilisateur:
-            NotificationService._creer_notification_securisee(
-                destinataire=pret.caisse.presidente.utilisateur,
-                type_notification='ATTENTE_PRET',
-                titre=f'Prêt en attente - {pret.membre.nom_complet}',
-                message=f'Le prêt de {pret.montant_demande} FCFA demandé par {pret.membre.nom_complet} a été mis en attente par l\'administrateur. Motif: {motif_attente}',
-                caisse=pret.caisse,
-                pret=pret,
-                lien_action=f'/gestion-caisses/prets/'
-            )
-        
-        # Notifier la secrétaire de la caisse (si elle a un utilisateur associé)
-        if pret.caisse.secretaire and pret.caisse.secretaire.utilisateur:
-            NotificationService._creer_notification_securisee(
-                destinataire=pret.caisse.secretaire.utilisateur,
-                type_notification='ATTENTE_PRET',
-                titre=f'Prêt en attente - {pret.membre.nom_complet}',
-                message=f'Le prêt de {pret.montant_demande} FCFA demandé par {pret.membre.nom_complet} a été mis en attente par l\'administrateur. Motif: {motif_attente}',
-                caisse=pret.caisse,
-                pret=pret,
-                lien_action=f'/gestion-caisses/prets/'
-            )
-        
-        # Notifier la trésorière de la caisse (si elle a un utilisateur associé)
-        if pret.caisse.tresoriere and pret.caisse.tresoriere.utilisateur:
-            NotificationService._creer_notification_securisee(
-                destinataire=pret.caisse.tresoriere.utilisateur,
-                type_notification='ATTENTE_PRET',
-                titre=f'Prêt en attente - {pret.membre.nom_complet}',
-                message=f'Le prêt de {pret.montant_demande} FCFA demandé par {pret.membre.nom_complet} a été mis en attente par l\'administrateur. Motif: {motif_attente}',
-                caisse=pret.caisse,
-                pret=pret,
-                lien_action=f'/gestion-caisses/prets/'
-            )
-        
-        # Log d'audit
-        AuditLog.objects.create(
-            utilisateur=admin,
-            action='NOTIFICATION',
-            modele='Pret',
-            objet_id=pret.id,
-            details={
-                'type': 'ATTENTE_PRET',
-                'caisse': pret.caisse.nom_association,
-                'motif_attente': motif_attente
-            }
+        """Notifier le bureau de la caisse de la mise en attente d'un prêt"""
+        NotificationDispatcher.planifier(
+            type_notification='ATTENTE_PRET',
+            titre=f'Prêt en attente - {pret.membre.nom_complet}',
+            message=f'Le prêt de {pret.montant_demande} FCFA demandé par {pret.membre.nom_complet} a été mis en attente par l\'administrateur. Motif: {motif_attente}',
+            bureau_caisse_id=pret.caisse_id,
+            caisse_id=pret.caisse_id,
+            pret_id=pret.id,
+            lien_action='/gestion-caisses/prets/',
+            audit_modele='Pret',
+            audit_objet_id=pret.id,
+            audit_details={'caisse': pret.caisse.nom_association, 'motif_attente': motif_attente},
+            audit_utilisateur_id=admin.id,
         )
     
     @staticmethod
     def notifier_octroi_pret(pret, utilisateur_octroi):
-        """Notifier l'octroi d'un prêt"""
-        # Notifier la présidente de la caisse (si elle a un utilisateur associé)
-        if pret.caisse.presidente and pret.caisse.presidente.utilisateur:
-            NotificationService._creer_notification_securisee(
-                destinataire=pret.caisse.presidente.utilisateur,
-                type_notification='OCTROI_PRET',
-                titre=f'Prêt octroyé - {pret.membre.nom_complet}',
-                message=f'Le prêt de {pret.montant_accord:,.0f} FCFA a été octroyé à {pret.membre.nom_complet} par {utilisateur_octroi.username}.',
-                caisse=pret.caisse,
-                pret=pret,
-                lien_action=f'/gestion-caisses/prets/'
-            )
-        
-        # Log d'audit
-        AuditLog.objects.create(
-            utilisateur=utilisateur_octroi,
-            action='NOTIFICATION',
-            modele='Pret',
-            objet_id=pret.id,
-            details={
-                'type': 'OCTROI_PRET',
-                'caisse': pret.caisse.nom_association,
-                'montant': str(pret.montant_accord)
-            }
+        """Notifier la présidente de la caisse de l'octroi d'un prêt"""
+        NotificationDispatcher.planifier(
+            type_notification='OCTROI_PRET',
+            titre=f'Prêt octroyé - {pret.membre.nom_complet}',
+            message=f'Le prêt de {pret.montant_accord:,.0f} FCFA a été octroyé à {pret.membre.nom_complet} par {utilisateur_octroi.username}.',
+            bureau_caisse_id=pret.caisse_id,
+            roles_bureau=['presidente'],
+            caisse_id=pret.caisse_id,
+            pret_id=pret.id,
+            lien_action='/gestion-caisses/prets/',
+            audit_modele='Pret',
+            audit_objet_id=pret.id,
+            audit_details={'caisse': pret.caisse.nom_association, 'montant': str(pret.montant_accord)},
+            audit_utilisateur_id=utilisateur_octroi.id,
         )
     
     @staticmethod
@@ -393,46 +390,25 @@ class NotificationService:
     
     @staticmethod
     def notifier_cloture_exercice_prochaine(exercice):
-        """Notifier l'administrateur qu'un exercice va se clôturer dans un mois"""
-        # Trouver tous les administrateurs
-        admins = User.objects.filter(is_superuser=True)
-        
+        """Notifier les administrateurs qu'un exercice va se clôturer dans un mois"""
         date_fin_str = exercice.date_fin.strftime('%d/%m/%Y') if exercice.date_fin else 'N/A'
         
-        for admin in admins:
-            # Vérifier si une notification n'a pas déjà été envoyée pour cet exercice (dans les 30 derniers jours)
-            date_limite = timezone.now() - timedelta(days=30)
-            notification_existante = Notification.objects.filter(
-                destinataire=admin,
-                type_notification='CLOTURE_EXERCICE_PROCHAIN',
-                exercice=exercice,
-                date_creation__gte=date_limite
-            ).exists()
-            
-            if not notification_existante:
-                Notification.objects.create(
-                    destinataire=admin,
-                    type_notification='CLOTURE_EXERCICE_PROCHAIN',
-                    titre=f'Clôture d\'exercice prochaine - {exercice.caisse.nom_association}',
-                    message=f'L\'exercice de la caisse {exercice.caisse.nom_association} se clôturera le {date_fin_str}. Pensez à préparer le partage des fonds.',
-                    caisse=exercice.caisse,
-                    exercice=exercice,
-                    lien_action=f'/adminsecurelogin/gestion_caisses/exercicecaisse/{exercice.id}/change/'
-                )
-                
-                # Log d'audit
-                AuditLog.objects.create(
-                    utilisateur=admin,
-                    action='NOTIFICATION',
-                    modele='ExerciceCaisse',
-                    objet_id=exercice.id,
-                    details={
-                        'type': 'CLOTURE_EXERCICE_PROCHAIN',
-                        'destinataire': admin.username,
-                        'caisse': exercice.caisse.nom_association,
-                        'date_fin': str(exercice.date_fin)
-                    }
-                )
+        # Appelé depuis une tâche planifiée: diffusion directe, sans renotifier un administrateur
+        # déjà prévenu pour cet exercice dans les 30 derniers jours
+        return NotificationDispatcher.diffuser(
+            type_notification='CLOTURE_EXERCICE_PROCHAIN',
+            titre=f'Clôture d\'exercice prochaine - {exercice.caisse.nom_association}',
+            message=f'L\'exercice de la caisse {exercice.caisse.nom_association} se clôturera le {date_fin_str}. Pensez à préparer le partage des fonds.',
+            superutilisateurs=True,
+            caisse_id=exercice.caisse_id,
+            exercice_id=exercice.id,
+            lien_action=f'/adminsecurelogin/gestion_caisses/exercicecaisse/{exercice.id}/change/',
+            audit_modele='ExerciceCaisse',
+            audit_objet_id=exercice.id,
+            audit_details={'caisse': exercice.caisse.nom_association, 'date_fin': str(exercice.date_fin)},
+            audit_par_destinataire=True,
+            eviter_doublons_jours=30,
+        )
 
 
 class PretService:
@@ -449,7 +425,7 @@ class PretService:
         NotificationService.notifier_demande_pret(pret)
         
         # Log d'audit
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=utilisateur,
             action='CREATION',
             modele='Pret',
@@ -497,7 +473,7 @@ class PretService:
             NotificationService.notifier_fonds_insuffisants(pret, admin)
             
             # Log d'audit
-            AuditLog.objects.create(
+            journaliser_audit(
                 utilisateur=admin,
                 action='BLOQUE',
                 modele='Pret',
@@ -526,7 +502,7 @@ class PretService:
         NotificationService.notifier_validation_pret(pret, admin)
         
         # 7. Log d'audit
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=admin,
             action='VALIDATION',
             modele='Pret',
@@ -554,7 +530,7 @@ class PretService:
         NotificationService.notifier_rejet_pret(pret, admin, motif_rejet)
         
         # Log d'audit
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=admin,
             action='REJET',
             modele='Pret',
@@ -578,7 +554,7 @@ class PretService:
         NotificationService.notifier_attente_pret(pret, admin, motif_attente)
         
         # Log d'audit
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=admin,
             action='MODIFICATION',
             modele='Pret',
@@ -642,7 +618,7 @@ class PretService:
         NotificationService.notifier_octroi_pret(pret, utilisateur_octroi)
         
         # Log d'audit
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=utilisateur_octroi,
             action='MODIFICATION',
             modele='Pret',
@@ -699,6 +675,7 @@ class PretService:
             montant=paiement_total,
             solde_avant=solde_avant,
             solde_apres=pret.caisse.fond_disponible,
+            interet_rembourse=interet,
             pret=pret,
             utilisateur=utilisateur,
             description=f"Remboursement du prêt {pret.numero_pret} (principal: {montant} FCFA, intérêt: {interet} FCFA)"
@@ -714,7 +691,7 @@ class PretService:
         pret.save()
 
         # Audit
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=utilisateur,
             action='MODIFICATION',
             modele='Pret',
@@ -729,3 +706,67 @@ class PretService:
         )
 
         return pret, mouvement
+
+
+class StatistiquesService:
+    """Totaux des caisses recalculés en masse (tâche nocturne ``calculer_statistiques_caisses``)"""
+
+    TAILLE_LOT = 500
+
+    @staticmethod
+    def recalculer_totaux_caisses(taille_lot=TAILLE_LOT):
+        """Recalcule ``montant_total_prets`` / ``montant_total_remboursements`` de toutes les caisses.
+
+        Une agrégation groupée sur les prêts, puis ``bulk_update`` par lots des seules caisses dont
+        un total a changé. Renvoie les totaux, le nombre de caisses écrites et la durée de chaque phase.
+        """
+        durees = {}
+        debut = time.perf_counter()
+
+        def phase(nom):
+            nonlocal debut
+            fin = time.perf_counter()
+            durees[nom] = round((fin - debut) * 1000, 1)
+            debut = fin
+
+        totaux = {
+            ligne['caisse_id']: (ligne['prets'] or 0, ligne['remboursements'] or 0)
+            for ligne in Pret.objects.order_by().values('caisse_id').annotate(
+                prets=Sum('montant_accord', filter=Q(statut__in=['EN_COURS', 'EN_RETARD'])),
+                remboursements=Sum('montant_rembourse', filter=Q(statut='REMBOURSE')),
+            )
+        }
+        phase('agregation')
+
+        modifiees = []
+        total_prets = total_remboursements = 0
+        nombre_caisses = 0
+        caisses = Caisse.objects.order_by('pk').only('id', 'montant_total_prets', 'montant_total_remboursements')
+        for caisse in caisses.iterator(chunk_size=2000):
+            nombre_caisses += 1
+            montant_prets, montant_remboursements = totaux.get(caisse.pk, (0, 0))
+            total_prets += montant_prets
+            total_remboursements += montant_remboursements
+            if (caisse.montant_total_prets != montant_prets
+                    or caisse.montant_total_remboursements != montant_remboursements):
+                caisse.montant_total_prets = montant_prets
+                caisse.montant_total_remboursements = montant_remboursements
+                modifiees.append(caisse)
+        phase('comparaison')
+
+        if modifiees:
+            with transaction.atomic():
+                Caisse.objects.bulk_update(
+                    modifiees, ['montant_total_prets', 'montant_total_remboursements'], batch_size=taille_lot,
+                )
+            # bulk_update n'émet pas post_save: invalider les versions ETag des caisses écrites
+            conditionnel.signaler_caisses([caisse.pk for caisse in modifiees])
+        phase('ecriture')
+
+        return {
+            'total_prets': total_prets,
+            'total_remboursements': total_remboursements,
+            'caisses': nombre_caisses,
+            'caisses_modifiees': len(modifiees),
+            'durees_ms': durees,
+        }
@@ -1,7 +1,15 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Caisse, Membre, Pret, MouvementFond, AuditLog, CaisseGenerale
+from django.db import transaction
+from .models import (
+    Caisse, Membre, Pret, MouvementFond, CaisseGenerale, Notification,
+    Region, Prefecture, Commune, Canton, Village, Quartier,
+    Agent, Echeance, SeanceReunion, Cotisation, VirementBancaire, Depense,
+    ExerciceCaisse, ExerciceArchive, TransfertCaisse, CaisseGeneraleMouvement
+)
+from . import compteurs, conditionnel, geographie, metriques, synchronisation
+from .audit import journaliser_audit
 
 
 @receiver(post_save, sender=Caisse)
@@ -9,7 +17,7 @@ def caisse_post_save(sender, instance, created, **kwargs):
     """Signal post-save pour les caisses"""
     if created:
         # Log de création automatique
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=None,  # Sera mis à jour si disponible
             action='CREATION',
             modele='Caisse',
@@ -28,7 +36,7 @@ def membre_post_save(sender, instance, created, **kwargs):
     """Signal post-save pour les membres"""
     if created:
         # Log de création automatique
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=None,
             action='CREATION',
             modele='Membre',
@@ -47,7 +55,7 @@ def pret_post_save(sender, instance, created, **kwargs):
     """Signal post-save pour les prêts"""
     if created:
         # Log de création automatique
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=None,
             action='CREATION',
             modele='Pret',
@@ -66,7 +74,7 @@ def mouvement_fond_post_save(sender, instance, created, **kwargs):
     """Signal post-save pour les mouvements de fonds"""
     if created:
         # Log de création automatique
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=instance.utilisateur,
             action='CREATION',
             modele='MouvementFond',
@@ -90,7 +98,7 @@ def mouvement_fond_post_save(sender, instance, created, **kwargs):
 @receiver(post_delete, sender=Caisse)
 def caisse_post_delete(sender, instance, **kwargs):
     """Signal post-delete pour les caisses"""
-    AuditLog.objects.create(
+    journaliser_audit(
         utilisateur=None,
         action='SUPPRESSION',
         modele='Caisse',
@@ -105,7 +113,7 @@ def caisse_post_delete(sender, instance, **kwargs):
 @receiver(post_delete, sender=Membre)
 def membre_post_delete(sender, instance, **kwargs):
     """Signal post-delete pour les membres"""
-    AuditLog.objects.create(
+    journaliser_audit(
         utilisateur=None,
         action='SUPPRESSION',
         modele='Membre',
@@ -121,7 +129,7 @@ def membre_post_delete(sender, instance, **kwargs):
 @receiver(post_delete, sender=Pret)
 def pret_post_delete(sender, instance, **kwargs):
     """Signal post-delete pour les prêts"""
-    AuditLog.objects.create(
+    journaliser_audit(
         utilisateur=None,
         action='SUPPRESSION',
         modele='Pret',
@@ -131,3 +139,116 @@ def pret_post_delete(sender, instance, **kwargs):
             'montant_demande': str(instance.montant_demande)
         }
     )
+
+
+def _invalider(fonction, *args):
+    """Invalide tout de suite (lecture de ses propres écritures) et après commit
+    (un compteur recalculé par une autre requête avant le commit ne doit pas survivre)"""
+    fonction(*args)
+    transaction.on_commit(lambda: fonction(*args))
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def notification_compteurs(sender, instance, **kwargs):
+    """Invalide les compteurs de la cloche du destinataire"""
+    _invalider(compteurs.signaler_utilisateurs, [instance.destinataire_id])
+
+
+@receiver(post_save, sender=Pret)
+@receiver(post_delete, sender=Pret)
+def pret_compteurs(sender, instance, **kwargs):
+    """Invalide les compteurs dépendant du statut des prêts"""
+    _invalider(compteurs.signaler_prets)
+
+
+@receiver(post_save, sender=Region)
+@receiver(post_save, sender=Prefecture)
+@receiver(post_save, sender=Commune)
+@receiver(post_save, sender=Canton)
+@receiver(post_save, sender=Village)
+@receiver(post_save, sender=Quartier)
+@receiver(post_delete, sender=Region)
+@receiver(post_delete, sender=Prefecture)
+@receiver(post_delete, sender=Commune)
+@receiver(post_delete, sender=Canton)
+@receiver(post_delete, sender=Village)
+@receiver(post_delete, sender=Quartier)
+def geographie_modifiee(sender, instance, **kwargs):
+    """Invalide la hiérarchie géographique servie par /api/geo/tree/"""
+    _invalider(geographie.invalider)
+
+
+# Modèles rattachés à une caisse: fonction renvoyant les caisses concernées par une instance
+CAISSES_CONCERNEES = {
+    Caisse: lambda instance: [instance.pk],
+    Membre: lambda instance: [instance.caisse_id],
+    Pret: lambda instance: [instance.caisse_id],
+    Echeance: lambda instance: [instance.pret.caisse_id],
+    MouvementFond: lambda instance: [instance.caisse_id],
+    SeanceReunion: lambda instance: [instance.caisse_id],
+    Cotisation: lambda instance: [instance.caisse_id],
+    VirementBancaire: lambda instance: [instance.caisse_id],
+    Depense: lambda instance: [instance.caisse_id],
+    ExerciceCaisse: lambda instance: [instance.caisse_id],
+    ExerciceArchive: lambda instance: [instance.caisse_id],
+    TransfertCaisse: lambda instance: [instance.caisse_source_id, instance.caisse_destination_id],
+    Agent: lambda instance: list(instance.caisses.values_list('id', flat=True)),
+    # Données globales: seule la version globale (périmètre administrateur) change
+    CaisseGenerale: lambda instance: [],
+    CaisseGeneraleMouvement: lambda instance: [instance.caisse_destination_id],
+}
+
+
+def donnees_caisse_modifiees(sender, instance, **kwargs):
+    """Change la version de données des caisses concernées (ETag des lectures, voir conditionnel.py)"""
+    try:
+        caisse_ids = CAISSES_CONCERNEES[sender](instance)
+    except Exception:
+        # Parent déjà supprimé (suppression en cascade): sa propre suppression signale la caisse
+        caisse_ids = []
+    _invalider(conditionnel.signaler_caisses, caisse_ids)
+
+
+for _modele in CAISSES_CONCERNEES:
+    post_save.connect(donnees_caisse_modifiees, sender=_modele, dispatch_uid=f'versions_{_modele.__name__}')
+    post_delete.connect(donnees_caisse_modifiees, sender=_modele, dispatch_uid=f'versions_suppr_{_modele.__name__}')
+
+
+def journal_synchronisation(sender, instance, signal, **kwargs):
+    """Inscrit le changement au journal de synchronisation de l'application hors ligne"""
+    try:
+        caisse_id = CAISSES_CONCERNEES[sender](instance)[0]
+    except Exception:
+        # Suppression en cascade: la caisse sera reprise du journal
+        caisse_id = None
+    operation = 'D' if signal is post_delete else 'U'
+    synchronisation.noter(synchronisation.CLES_PAR_MODELE[sender.__name__], instance.pk, caisse_id, operation)
+
+
+for _modele in (Membre, Pret, Echeance, Cotisation, SeanceReunion, MouvementFond):
+    post_save.connect(journal_synchronisation, sender=_modele, dispatch_uid=f'sync_{_modele.__name__}')
+    post_delete.connect(journal_synchronisation, sender=_modele, dispatch_uid=f'sync_suppr_{_modele.__name__}')
+
+
+# Opérations comptées par les métriques /metrics: modèle -> (type, montant) ou None
+OPERATIONS_METRIQUES = {
+    Cotisation: lambda instance: ('cotisation', instance.montant_total),
+    MouvementFond: lambda instance: (
+        ('remboursement', instance.montant) if instance.type_mouvement == 'REMBOURSEMENT' else None
+    ),
+    TransfertCaisse: lambda instance: ('transfert', instance.montant),
+}
+
+
+def operation_enregistree(sender, instance, created, **kwargs):
+    """Compte les opérations métier créées, une fois la transaction validée"""
+    if not created:
+        return
+    operation = OPERATIONS_METRIQUES[sender](instance)
+    if operation is not None:
+        transaction.on_commit(lambda: metriques.noter_operation(*operation))
+
+
+for _modele in OPERATIONS_METRIQUES:
+    post_save.connect(operation_enregistree, sender=_modele, dispatch_uid=f'metriques_{_modele.__name__}')
@@ -0,0 +1,218 @@
+"""
+Soldes à une date passée: points de solde (``BalanceCheckpoint``) et mouvements postérieurs.
+
+Le solde d'une caisse à un instant est celui de son grand livre: le ``solde_apres`` du dernier
+``MouvementFond`` enregistré avant cet instant (relevé sur ``fond_disponible`` au moment du
+mouvement), ``fond_initial`` si la caisse n'a aucun mouvement. Même règle pour la réserve de la
+caisse générale avec ``CaisseGeneraleMouvement`` (0 sans mouvement).
+
+- ``enregistrer_points(jour)`` (tâche quotidienne ``enregistrer_points_soldes``) écrit le solde de
+  chaque caisse et de la réserve à la fin de ``jour``, avec le dernier mouvement pris en compte
+  (``mouvement_id``);
+- ``soldes_au(instant)`` part du point le plus proche avant ``instant`` et ne lit, pour chaque caisse,
+  que ses mouvements postérieurs à son point: quatre requêtes pour toutes les caisses, quelle que
+  soit la longueur de l'historique;
+- ``historique(...)`` lit directement les points (courbes de solde) et ne calcule que les dates
+  sans point;
+- les points quotidiens de plus de ``SOLDES_JOURS_CONSERVES`` jours sont purgés, sauf ceux de fin
+  de mois (``pas='mois'`` reste servi par les points).
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, OuterRef, Q, Subquery
+from django.utils import timezone
+
+
+def fin_de_journee(jour):
+    """Dernier instant de ``jour`` dans le fuseau local (instant d'un point de solde)"""
+    return timezone.make_aware(datetime.combine(jour, time.max), timezone.get_current_timezone())
+
+
+def _dernier_jour_couvert(instant):
+    """Jour du dernier point de solde entièrement antérieur à ``instant``"""
+    jour = timezone.localdate(instant)
+    return jour if instant >= fin_de_journee(jour) else jour - timedelta(days=1)
+
+
+def _calculer(instant, caisse_ids=None):
+    """{caisse_id: (solde, mouvement_id)} à ``instant`` pour les caisses existant à cette date"""
+    from .models import BalanceCheckpoint, Caisse, MouvementFond
+
+    caisses = Caisse.objects.all()
+    if caisse_ids is not None:
+        caisses = caisses.filter(pk__in=caisse_ids)
+    soldes, posterieures = {}, set()
+    for pk, fond_initial, date_creation in caisses.values_list('pk', 'fond_initial', 'date_creation'):
+        soldes[pk] = (fond_initial, 0)
+        if date_creation > instant:
+            posterieures.add(pk)
+    if not soldes:
+        return {}
+
+    # Point le plus récent de chaque caisse (index unique caisse, date)
+    jour = _dernier_jour_couvert(instant)
+    points = BalanceCheckpoint.objects.filter(
+        caisse_id__in=soldes, date=Subquery(
+            BalanceCheckpoint.objects.filter(caisse_id=OuterRef('caisse_id'), date__lte=jour)
+            .order_by('-date').values('date')[:1]
+        ),
+    )
+    sans_point = set(soldes)
+    caisses_par_date = defaultdict(list)
+    for caisse_id, date_point, solde, mouvement_id in points.values_list('caisse_id', 'date', 'solde', 'mouvement_id'):
+        soldes[caisse_id] = (solde, mouvement_id or 0)
+        sans_point.discard(caisse_id)
+        caisses_par_date[date_point].append(caisse_id)
+
+    # Dernier mouvement postérieur au point de chaque caisse: borne propre à chaque caisse (regroupées par
+    # date de point, index caisse, date_mouvement), une caisse sans point ou inactive n'élargit pas la
+    # lecture des autres
+    bornes = [
+        Q(caisse_id__in=ids, date_mouvement__gt=fin_de_journee(date_point))
+        for date_point, ids in caisses_par_date.items()
+    ]
+    if sans_point:
+        bornes.append(Q(caisse_id__in=sans_point))
+    derniers = {
+        caisse_id: dernier
+        for caisse_id, dernier in MouvementFond.objects.filter(reduce(or_, bornes), date_mouvement__lte=instant)
+        .order_by().values('caisse_id').annotate(dernier=Max('pk')).values_list('caisse_id', 'dernier')
+        if dernier > soldes[caisse_id][1]
+    }
+    if derniers:
+        for pk, caisse_id, solde_apres in MouvementFond.objects.filter(pk__in=derniers.values()).values_list(
+            'pk', 'caisse_id', 'solde_apres'
+        ):
+            soldes[caisse_id] = (solde_apres, pk)
+    # Caisse créée après l'instant, sans mouvement antérieur (historique repris): absente
+    return {
+        caisse_id: solde for caisse_id, solde in soldes.items()
+        if caisse_id not in posterieures or solde[1]
+    }
+
+
+def _calculer_reserve(instant):
+    """(solde, mouvement_id) de la réserve de la caisse générale à ``instant``"""
+    from .models import BalanceCheckpoint, CaisseGeneraleMouvement
+
+    point = (
+        BalanceCheckpoint.objects.filter(caisse__isnull=True, date__lte=_dernier_jour_couvert(instant))
+        .order_by('-date').values_list('solde', 'mouvement_id').first()
+    )
+    solde, depuis = (point[0], point[1] or 0) if point else (Decimal('0'), 0)
+    dernier = (
+        CaisseGeneraleMouvement.objects.filter(pk__gt=depuis, date_mouvement__lte=instant)
+        .order_by('-pk').values_list('pk', 'solde_apres').first()
+    )
+    if dernier:
+        depuis, solde = dernier
+    return solde, depuis
+
+
+def soldes_au(instant=None, caisse_ids=None):
+    """{caisse_id: solde} à ``instant`` (maintenant par défaut), sans les caisses encore inexistantes"""
+    return {caisse_id: solde for caisse_id, (solde, _mouvement) in _calculer(instant or timezone.now(), caisse_ids).items()}
+
+
+def solde_reserve_au(instant=None):
+    """Solde de la réserve de la caisse générale à ``instant``"""
+    return _calculer_reserve(instant or timezone.now())[0]
+
+
+@transaction.atomic
+def enregistrer_points(jour):
+    """Écrit (ou réécrit) les points de solde de la fin de ``jour``; renvoie le nombre de points"""
+    from .models import BalanceCheckpoint
+
+    instant = fin_de_journee(jour)
+    points = [
+        BalanceCheckpoint(caisse_id=caisse_id, date=jour, solde=solde, mouvement_id=mouvement_id or None)
+        for caisse_id, (solde, mouvement_id) in _calculer(instant).items()
+    ]
+    BalanceCheckpoint.objects.bulk_create(
+        points, batch_size=500, update_conflicts=True,
+        unique_fields=['caisse', 'date'], update_fields=['solde', 'mouvement_id'],
+    )
+    # Réserve: caisse nulle, hors de la contrainte (caisse, date) utilisée ci-dessus
+    solde, mouvement_id = _calculer_reserve(instant)
+    BalanceCheckpoint.objects.update_or_create(
+        caisse=None, date=jour, defaults={'solde': solde, 'mouvement_id': mouvement_id or None},
+    )
+    return len(points) + 1
+
+
+def enregistrer_points_manquants(jusqu_au=None):
+    """Points de chaque jour depuis le dernier point enregistré jusqu'à ``jusqu_au`` (hier par défaut)"""
+    from .models import BalanceCheckpoint
+
+    jusqu_au = jusqu_au or timezone.localdate() - timedelta(days=1)
+    # Rattrapage limité à la période de conservation des points quotidiens
+    premier = jusqu_au - timedelta(days=getattr(settings, 'SOLDES_JOURS_CONSERVES', 400) - 1)
+    dernier = BalanceCheckpoint.objects.filter(date__lte=jusqu_au).aggregate(dernier=Max('date'))['dernier']
+    jour = max(premier, dernier + timedelta(days=1)) if dernier else jusqu_au
+    nombre = 0
+    while jour <= jusqu_au:
+        nombre += enregistrer_points(jour)
+        jour += timedelta(days=1)
+    return nombre
+
+
+def _fin_de_mois(jour):
+    return (jour + timedelta(days=1)).day == 1
+
+
+def purger_points(avant=None):
+    """Supprime les points quotidiens antérieurs à ``avant``, sauf ceux de fin de mois"""
+    from .models import BalanceCheckpoint
+
+    avant = avant or timezone.localdate() - timedelta(days=getattr(settings, 'SOLDES_JOURS_CONSERVES', 400))
+    jours = [
+        jour for jour in BalanceCheckpoint.objects.filter(date__lt=avant).values_list('date', flat=True).distinct()
+        if not _fin_de_mois(jour)
+    ]
+    if not jours:
+        return 0
+    return BalanceCheckpoint.objects.filter(date__in=jours).delete()[0]
+
+
+def dates_historique(debut, fin, pas='jour'):
+    """Dates des points d'une courbe: chaque jour, ou chaque fin de mois (et ``fin``)"""
+    if pas not in ('jour', 'mois'):
+        raise ValueError(f"Pas inconnu: {pas}")
+    dates, jour = [], debut
+    while jour <= fin:
+        if pas == 'jour' or _fin_de_mois(jour) or jour == fin:
+            dates.append(jour)
+        jour += timedelta(days=1)
+    return dates
+
+
+def historique(caisse_id, debut, fin, pas='jour'):
+    """[(date, solde)] en fin de journée; ``caisse_id=None`` pour la réserve de la caisse générale"""
+    from .models import BalanceCheckpoint
+
+    dates = dates_historique(debut, fin, pas)
+    points = dict(
+        BalanceCheckpoint.objects.filter(caisse_id=caisse_id, date__in=dates).values_list('date', 'solde')
+        if caisse_id is not None else
+        BalanceCheckpoint.objects.filter(caisse__isnull=True, date__in=dates).values_list('date', 'solde')
+    )
+    maintenant = timezone.now()
+    courbe = []
+    for jour in dates:
+        solde = points.get(jour)
+        if solde is None:
+            # Journée en cours: solde actuel; sinon point le plus proche et mouvements depuis
+            instant = min(fin_de_journee(jour), maintenant)
+            if caisse_id is None:
+                solde = solde_reserve_au(instant)
+            else:
+                solde = soldes_au(instant, [caisse_id]).get(caisse_id)
+        courbe.append((jour, solde))
+    return courbe
@@ -0,0 +1,220 @@
+"""
+Synchronisation différentielle de l'application hors ligne (PWA) des agents de terrain.
+
+Le ``JournalSync`` garde, pour chaque objet synchronisé (membres, prêts, échéances,
+cotisations, séances, mouvements), son dernier changement: caisse, opération (``U`` création /
+modification, ``D`` suppression) et une version tirée de la séquence ``sync_journal``
+(strictement croissante). Une ligne par objet: le journal ne grossit pas avec les modifications.
+
+Le journal est alimenté par les signaux post_save / post_delete après commit (un lot par
+transaction). Les écritures en masse (``QuerySet.update``, ``bulk_create``) n'émettent pas de
+signal: appeler ``noter`` explicitement, ou ``reconstruire_journal`` hors production.
+
+``/api/sync/?marques=<caisse>:<version>,...`` renvoie, pour les caisses de l'utilisateur, les
+objets modifiés depuis la marque de chaque caisse (colonnes + lignes) et les identifiants
+supprimés, avec les nouvelles marques. Une caisse sans marque repart de zéro.
+"""
+from collections import defaultdict
+import logging
+
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.models import Max, Q
+
+
+logger = logging.getLogger(__name__)
+
+CLE_SEQUENCE = 'sync_journal'
+TAILLE_LOT = 2000
+
+# clé transmise au client -> (modèle, chemin vers la caisse, champs transmis)
+MODELES = {
+    'membre': ('Membre', 'caisse_id', (
+        'id', 'caisse_id', 'numero_carte_electeur', 'nom', 'prenoms', 'sexe', 'date_naissance',
+        'numero_telephone', 'role', 'statut', 'quartier_id', 'date_adhesion', 'photo',
+    )),
+    'pret': ('Pret', 'caisse_id', (
+        'id', 'caisse_id', 'numero_pret', 'membre_id', 'montant_demande', 'montant_accord',
+        'taux_interet', 'duree_mois', 'date_demande', 'date_decaissement', 'date_fin_pret',
+        'statut', 'montant_rembourse', 'nombre_echeances', 'nombre_echeances_payees',
+    )),
+    'echeance': ('Echeance', 'pret__caisse_id', (
+        'id', 'pret_id', 'numero_echeance', 'montant_echeance', 'date_echeance', 'montant_paye',
+        'date_paiement', 'statut',
+    )),
+    'cotisation': ('Cotisation', 'caisse_id', (
+        'id', 'caisse_id', 'membre_id', 'seance_id', 'date_cotisation', 'prix_tempon',
+        'frais_solidarite', 'frais_fondation', 'penalite_emprunt_retard', 'montant_total',
+    )),
+    'seance': ('SeanceReunion', 'caisse_id', ('id', 'caisse_id', 'date_seance', 'titre', 'date_creation')),
+    'mouvement': ('MouvementFond', 'caisse_id', (
+        'id', 'caisse_id', 'type_mouvement', 'montant', 'solde_avant', 'solde_apres', 'pret_id',
+        'date_mouvement', 'description',
+    )),
+}
+CLES_PAR_MODELE = {nom: cle for cle, (nom, _chemin, _champs) in MODELES.items()}
+
+
+class _Lot:
+    """Changements d'une transaction, écrits ensemble après son commit"""
+
+    def __init__(self):
+        self.changements = {}
+        self.ecrit = False
+
+    def __call__(self):
+        self.ecrit = True
+        try:
+            ecrire(self.changements)
+        except Exception as e:
+            # Ne jamais faire échouer une requête déjà validée à cause du journal
+            logger.exception(f"Erreur lors de l'écriture du journal de synchronisation: {e}")
+
+
+def noter(cle, objet_id, caisse_id, operation='U'):
+    """Enregistre le changement d'un objet (après le commit de la transaction en cours)"""
+    # Rejoindre le lot déjà prévu au même niveau de savepoint: il disparaît avec lui en cas d'annulation
+    savepoints = set(connection.savepoint_ids)
+    lot = next((
+        fonction for sids, fonction, *_robuste in reversed(connection.run_on_commit)
+        if isinstance(fonction, _Lot) and not fonction.ecrit and sids == savepoints
+    ), None)
+    nouveau = lot is None
+    if nouveau:
+        lot = _Lot()
+    lot.changements[(cle, objet_id)] = (caisse_id, operation)
+    if nouveau:
+        transaction.on_commit(lot)
+
+
+def _derniere_version():
+    from .models import JournalSync
+    return JournalSync.objects.aggregate(derniere=Max('version'))['derniere'] or 0
+
+
+def ecrire(changements):
+    """Insère ou met à jour les lignes du journal, avec des versions consécutives"""
+    from .models import JournalSync, Sequence
+
+    # Suppression en cascade: la caisse n'est plus lisible, reprendre celle du journal
+    inconnues = defaultdict(list)
+    for (cle, objet_id), (caisse_id, _operation) in changements.items():
+        if caisse_id is None:
+            inconnues[cle].append(objet_id)
+    connues = {}
+    for cle, ids in inconnues.items():
+        for objet_id, caisse_id in JournalSync.objects.filter(modele=cle, objet_id__in=ids).values_list(
+                'objet_id', 'caisse_id'):
+            connues[(cle, objet_id)] = caisse_id
+
+    lignes = []
+    for (cle, objet_id), (caisse_id, operation) in changements.items():
+        caisse_id = caisse_id if caisse_id is not None else connues.get((cle, objet_id))
+        if caisse_id is not None:
+            lignes.append(JournalSync(modele=cle, objet_id=objet_id, caisse_id=caisse_id, operation=operation))
+    if not lignes:
+        return
+    # Allocation et écriture dans une même transaction: le verrou posé sur la séquence par
+    # l'allocation est tenu jusqu'au commit des lignes. Un lot concurrent attend donc pour
+    # allouer, et aucune version n'est visible avant une version inférieure (un client ne peut
+    # pas dépasser une version encore en cours d'écriture).
+    with transaction.atomic():
+        premiere = Sequence.allouer(CLE_SEQUENCE, len(lignes), initial=_derniere_version)
+        for decalage, ligne in enumerate(lignes):
+            ligne.version = premiere + decalage
+        JournalSync.objects.bulk_create(
+            lignes, update_conflicts=True, unique_fields=['modele', 'objet_id'],
+            update_fields=['caisse_id', 'version', 'operation', 'date_modification'],
+        )
+
+
+def reconstruire_journal(apps=None, alias=DEFAULT_DB_ALIAS):
+    """Inscrit tous les objets existants au journal avec de nouvelles versions.
+
+    Utilisé par la migration et ``seed_scale``; à exécuter sans écritures concurrentes.
+    """
+    if apps is None:
+        from django.apps import apps
+    JournalSync = apps.get_model('gestion_caisses', 'JournalSync')
+    Sequence = apps.get_model('gestion_caisses', 'Sequence')
+
+    version = max(
+        Sequence.objects.using(alias).filter(nom=CLE_SEQUENCE).values_list('valeur', flat=True).first() or 0,
+        JournalSync.objects.using(alias).aggregate(derniere=Max('version'))['derniere'] or 0,
+    )
+    for cle, (nom_modele, chemin, _champs) in MODELES.items():
+        modele = apps.get_model('gestion_caisses', nom_modele)
+        objets = (
+            modele.objects.using(alias).filter(**{f'{chemin}__isnull': False})
+            .values_list('pk', chemin).order_by('pk')
+        )
+        lot = []
+        for objet_id, caisse_id in objets.iterator(chunk_size=TAILLE_LOT):
+            version += 1
+            lot.append(JournalSync(modele=cle, objet_id=objet_id, caisse_id=caisse_id, version=version, operation='U'))
+            if len(lot) >= TAILLE_LOT:
+                _inserer(JournalSync, alias, lot)
+                lot = []
+        _inserer(JournalSync, alias, lot)
+    Sequence.objects.using(alias).update_or_create(nom=CLE_SEQUENCE, defaults={'valeur': version})
+
+
+def _inserer(JournalSync, alias, lignes):
+    if lignes:
+        JournalSync.objects.using(alias).bulk_create(
+            lignes, update_conflicts=True, unique_fields=['modele', 'objet_id'],
+            update_fields=['caisse_id', 'version', 'operation'],
+        )
+
+
+def analyser_marques(valeur):
+    """``'3:1520,4:0'`` → ``{3: 1520, 4: 0}`` (ValueError si le format est invalide)"""
+    marques = {}
+    for element in filter(None, (valeur or '').split(',')):
+        caisse_id, _sep, version = element.partition(':')
+        marques[int(caisse_id)] = int(version or 0)
+    return marques
+
+
+def changements(marques, limite):
+    """Changements postérieurs aux marques ``{caisse_id: version}``, au plus ``limite`` objets"""
+    from django.apps import apps
+    from .models import JournalSync
+
+    # Une clause par marque distincte (toutes à 0 lors de la première synchronisation)
+    par_version = defaultdict(list)
+    for caisse_id, version in marques.items():
+        par_version[version].append(caisse_id)
+    condition = Q()
+    for version, caisse_ids in par_version.items():
+        condition |= Q(caisse_id__in=caisse_ids, version__gt=version)
+    entrees = []
+    if condition:
+        entrees = list(
+            JournalSync.objects.filter(condition).order_by('version')
+            .values_list('version', 'caisse_id', 'modele', 'objet_id', 'operation')[:limite + 1]
+        )
+    complet = len(entrees) <= limite
+    entrees = entrees[:limite]
+
+    nouvelles_marques = dict(marques)
+    a_charger, suppressions = defaultdict(list), defaultdict(list)
+    for version, caisse_id, cle, objet_id, operation in entrees:
+        nouvelles_marques[caisse_id] = max(nouvelles_marques.get(caisse_id, 0), version)
+        if cle in MODELES:
+            (a_charger if operation == 'U' else suppressions)[cle].append(objet_id)
+
+    modifications = {}
+    for cle, ids in a_charger.items():
+        nom_modele, _chemin, champs = MODELES[cle]
+        modele = apps.get_model('gestion_caisses', nom_modele)
+        lignes = list(modele.objects.filter(pk__in=ids).order_by('pk').values_list(*champs))
+        # Supprimé depuis (journal pas encore écrit): équivaut à une suppression
+        suppressions[cle].extend(sorted(set(ids) - {ligne[0] for ligne in lignes}))
+        modifications[cle] = {'champs': champs, 'lignes': lignes}
+
+    return {
+        'marques': {str(caisse_id): version for caisse_id, version in nouvelles_marques.items()},
+        'complet': complet,
+        'modifications': modifications,
+        'suppressions': {cle: ids for cle, ids in suppressions.items() if ids},
+    }
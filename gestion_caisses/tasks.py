@@ -1,85 +1,77 @@
 from celery import shared_task
 from django.utils import timezone
 from datetime import timedelta
-from .models import Pret, Caisse, Membre, AuditLog, ExerciceCaisse
-from django.db.models import Sum
-from .services import NotificationService
+from .models import Pret, Caisse, Membre, AuditLog, ExerciceCaisse, CleIdempotence
+from .services import NotificationService, NotificationDispatcher, StatistiquesService
+from .audit import journaliser_audit, tampon_audit
+from .routage import lecture_rapports
+from .planification import tache_exclusive, point_reprise, enregistrer_point, noter_lignes, TAILLE_LOT
+from . import integrite, soldes
 
 
 @shared_task
+@tache_exclusive()
+@tampon_audit()
 def verifier_prets_en_retard():
     """Vérifier et marquer les prêts en retard"""
     print("Vérification des prêts en retard...")
     
-    prets_en_cours = Pret.objects.filter(statut='EN_COURS')
     prets_en_retard = 0
-    
-    for pret in prets_en_cours:
-        # Logique pour déterminer si un prêt est en retard
-        # Par exemple, vérifier si une échéance est dépassée
-        if pret.est_en_retard:
-            pret.statut = 'EN_RETARD'
-            pret.save()
-            prets_en_retard += 1
-            
-            # Log de l'action
-            AuditLog.objects.create(
-                action='MODIFICATION',
-                modele='Pret',
-                objet_id=pret.id,
-                details={
-                    'statut_precedent': 'EN_COURS',
-                    'nouveau_statut': 'EN_RETARD',
-                    'raison': 'Échéance dépassée'
-                }
-            )
-    
+    # Par lots de clés croissantes: une exécution interrompue reprend après le dernier lot traité
+    dernier_id = point_reprise(0)
+    while True:
+        lot = list(Pret.objects.filter(statut='EN_COURS', pk__gt=dernier_id).order_by('pk')[:TAILLE_LOT])
+        if not lot:
+            break
+
+        for pret in lot:
+            # Logique pour déterminer si un prêt est en retard
+            # Par exemple, vérifier si une échéance est dépassée
+            if pret.est_en_retard:
+                pret.statut = 'EN_RETARD'
+                pret.save()
+                prets_en_retard += 1
+
+                # Log de l'action
+                journaliser_audit(
+                    action='MODIFICATION',
+                    modele='Pret',
+                    objet_id=pret.id,
+                    details={
+                        'statut_precedent': 'EN_COURS',
+                        'nouveau_statut': 'EN_RETARD',
+                        'raison': 'Échéance dépassée'
+                    }
+                )
+
+        dernier_id = lot[-1].pk
+        enregistrer_point(dernier_id, lignes=len(lot))
+
     print(f"{prets_en_retard} prêts marqués comme en retard")
     return prets_en_retard
 
 
 @shared_task
+@tache_exclusive()
+@tampon_audit()
 def calculer_statistiques_caisses():
     """Calculer et mettre à jour les statistiques des caisses"""
     print("Calcul des statistiques des caisses...")
-    
-    caisses = Caisse.objects.all()
-    total_prets = 0
-    total_remboursements = 0
-    
-    for caisse in caisses:
-        # Calculer le montant total des prêts actifs
-        montant_prets = Pret.objects.filter(
-            caisse=caisse, 
-            statut__in=['EN_COURS', 'EN_RETARD']
-        ).aggregate(
-            total=Sum('montant_accord')
-        )['total'] or 0
-        
-        # Calculer le montant total des remboursements
-        montant_remboursements = Pret.objects.filter(
-            caisse=caisse, 
-            statut='REMBOURSE'
-        ).aggregate(
-            total=Sum('montant_rembourse')
-        )['total'] or 0
-        
-        # Mettre à jour la caisse
-        caisse.montant_total_prets = montant_prets
-        caisse.montant_total_remboursements = montant_remboursements
-        caisse.save()
-        
-        total_prets += montant_prets
-        total_remboursements += montant_remboursements
-    
-    print(f"Statistiques mises à jour: {total_prets} en prêts, {total_remboursements} remboursés")
-    return {
-        'total_prets': total_prets,
-        'total_remboursements': total_remboursements
-    }
+
+    resultat = StatistiquesService.recalculer_totaux_caisses()
+    noter_lignes(resultat['caisses_modifiees'])
+
+    print(
+        f"Statistiques mises à jour: {resultat['total_prets']} en prêts, "
+        f"{resultat['total_remboursements']} remboursés "
+        f"({resultat['caisses_modifiees']}/{resultat['caisses']} caisses modifiées, {resultat['durees_ms']} ms)"
+    )
+    return resultat
 
 
 @shared_task
+@tache_exclusive()
+@tampon_audit()
 def nettoyer_audit_logs():
     """Nettoyer les anciens logs d'audit (garder 1 an)"""
     print("Nettoyage des anciens logs d'audit...")
@@ -94,6 +86,8 @@ def nettoyer_audit_logs():
 
 
 @shared_task
+@tache_exclusive()
+@tampon_audit()
 def verifier_fonds_insuffisants():
     """Vérifier les caisses avec des fonds insuffisants"""
     print("Vérification des fonds insuffisants...")
@@ -105,7 +99,7 @@ def verifier_fonds_insuffisants():
     
     for caisse in caisses_fond_insuffisant:
         # Log de l'alerte
-        AuditLog.objects.create(
+        journaliser_audit(
             action='CONSULTATION',
             modele='Caisse',
             objet_id=caisse.id,
@@ -121,6 +115,9 @@ def verifier_fonds_insuffisants():
 
 
 @shared_task
+@tache_exclusive(chevauchement='reporter')
+@tampon_audit()
+@lecture_rapports()
 def generer_rapport_mensuel():
     """Générer un rapport mensuel des activités"""
     print("Génération du rapport mensuel...")
@@ -158,6 +155,8 @@ def generer_rapport_mensuel():
 
 
 @shared_task
+@tache_exclusive()
+@tampon_audit()
 def envoyer_notifications_retard():
     """Envoyer des notifications pour les prêts en retard"""
     print("Envoi des notifications de retard...")
@@ -169,7 +168,7 @@ def envoyer_notifications_retard():
         # Ici, vous pourriez implémenter l'envoi d'emails/SMS
         # Pour l'instant, on se contente de logger l'action
         
-        AuditLog.objects.create(
+        journaliser_audit(
             action='CONSULTATION',
             modele='Pret',
             objet_id=pret.id,
@@ -187,6 +186,17 @@ def envoyer_notifications_retard():
 
 
 @shared_task
+@tampon_audit()
+def diffuser_notifications(parametres):
+    """Diffuser une notification à tous ses destinataires (planifiée par NotificationDispatcher.planifier)"""
+    nombre = NotificationDispatcher.diffuser(**parametres)
+    print(f"{nombre} notification(s) {parametres.get('type_notification')} diffusée(s)")
+    return nombre
+
+
+@shared_task
+@tache_exclusive()
+@tampon_audit()
 def verifier_cloture_exercices_prochaine():
     """Vérifier les exercices qui se clôtureront dans un mois et envoyer des notifications"""
     print("Vérification des exercices à clôturer prochainement...")
@@ -199,7 +209,7 @@ def verifier_cloture_exercices_prochaine():
         statut='EN_COURS',
         date_fin__lte=date_limite,
         date_fin__gte=today
-    )
+    ).select_related('caisse')
     
     notifications_envoyees = 0
     for exercice in exercices_prochains:
@@ -212,6 +222,8 @@ def verifier_cloture_exercices_prochaine():
 
 
 @shared_task
+@tache_exclusive()
+@tampon_audit()
 def cloturer_exercices_automatiquement():
     """Clôturer automatiquement les exercices dont la date de fin est passée"""
     print("Clôture automatique des exercices...")
@@ -230,7 +242,7 @@ def cloturer_exercices_automatiquement():
         exercice.save(update_fields=['statut'])
         
         # Log d'audit
-        AuditLog.objects.create(
+        journaliser_audit(
             action='MODIFICATION',
             modele='ExerciceCaisse',
             objet_id=exercice.id,
@@ -247,3 +259,47 @@ def cloturer_exercices_automatiquement():
     
     print(f"{exercices_clotures} exercices clôturés automatiquement")
     return exercices_clotures
+
+
+@shared_task
+def enregistrer_audits(lignes):
+    """Insérer en masse des entrées du journal d'audit (AUDIT_MODE = 'celery')"""
+    AuditLog.objects.bulk_create([AuditLog(**ligne) for ligne in lignes])
+    print(f"{len(lignes)} entrée(s) d'audit enregistrée(s)")
+    return len(lignes)
+
+
+@shared_task
+@tache_exclusive()
+def purger_cles_idempotence():
+    """Supprimer les clés d'idempotence expirées (écritures hors ligne)"""
+    supprimees, _detail = CleIdempotence.objects.filter(date_expiration__lte=timezone.now()).delete()
+    print(f"{supprimees} clé(s) d'idempotence expirée(s) supprimée(s)")
+    return supprimees
+
+
+@shared_task
+@tache_exclusive()
+def enregistrer_points_soldes():
+    """Points de solde de fin de journée des caisses et de la réserve (jours manquants jusqu'à hier)"""
+    points = soldes.enregistrer_points_manquants()
+    purges = soldes.purger_points()
+    print(f"{points} point(s) de solde enregistré(s), {purges} point(s) quotidien(s) ancien(s) purgé(s)")
+    return points
+
+
+@shared_task
+@tache_exclusive()
+def verifier_integrite(incrementale=True, utilisateur_id=None):
+    """Vérifier le grand livre des caisses (seulement celles modifiées depuis leur dernière vérification)"""
+    verification = integrite.verifier(incrementale=incrementale, utilisateur_id=utilisateur_id)
+    print(
+        f"Intégrité: {verification.caisses_verifiees} caisse(s) vérifiée(s), {verification.caisses_ignorees} inchangée(s), "
+        f"{verification.anomalies} anomalie(s) dans {verification.caisses_en_anomalie} caisse(s) ({verification.duree_ms} ms)"
+    )
+    noter_lignes(verification.caisses_verifiees)
+    return {
+        'verification': verification.pk,
+        'caisses_verifiees': verification.caisses_verifiees,
+        'anomalies': verification.anomalies,
+    }
@@ -1,12 +1,35 @@
-from django.test import TestCase, Client
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from django.core.management import call_command
+from django.db.models import Sum
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.db import connection
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework.exceptions import ParseError
+from .instrumentation import BudgetRequetesMixin
 from .models import (
     Region, Prefecture, Commune, Canton, Village,
-    Caisse, Membre, Pret
+    Caisse, Membre, Pret, Agent, Echeance, MouvementFond,
+    Notification, AuditLog, RegleProfilage, ProfileRecord, Sequence, JournalSync,
+    CleIdempotence, Cotisation, ExerciceCaisse, SeanceReunion, TaskRun,
+    BalanceCheckpoint, CaisseGeneraleMouvement, VerificationIntegrite, VerrouTache
 )
+from .services import PretService, StatistiquesService
+from . import integrite, metriques, planification, routage, soldes
 
 
 class ModelTestCase(TestCase):
@@ -381,3 +404,1796 @@ class AdminTestCase(TestCase):
         response = self.client.get('/admin/gestion_caisses/prefecture/')
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Préfecture Test')
+
+
+class DonneesTestMixin:
+    """Construit un jeu de données minimal et cohérent (territoire, agent, caisse, membre)"""
+
+    def creer_donnees_de_base(self):
+        self.region = Region.objects.create(nom='Région Test', code='TST')
+        self.prefecture = Prefecture.objects.create(
+            nom='Préfecture Test', code='TST', region=self.region
+        )
+        self.commune = Commune.objects.create(
+            nom='Commune Test', code='TST', prefecture=self.prefecture
+        )
+        self.canton = Canton.objects.create(
+            nom='Canton Test', code='TST', commune=self.commune
+        )
+        self.village = Village.objects.create(
+            nom='Village Test', code='TST', canton=self.canton
+        )
+        self.agent = Agent.objects.create(
+            nom='Agent', prenoms='Test', date_naissance='1985-01-01',
+            adresse='Lomé', numero_telephone='90000000', date_embauche='2020-01-01'
+        )
+        self.caisse = Caisse.objects.create(
+            nom_association='Association Test',
+            region=self.region,
+            prefecture=self.prefecture,
+            commune=self.commune,
+            canton=self.canton,
+            village=self.village,
+            agent=self.agent,
+            fond_initial=100000,
+            statut='ACTIVE'
+        )
+        self.membre = Membre.objects.create(
+            nom='Doe', prenoms='Jane', date_naissance='1990-01-01',
+            adresse='123 Rue Test', numero_telephone='90000001',
+            role='MEMBRE', statut='ACTIF', caisse=self.caisse
+        )
+
+
+class QueryPlanTestCase(DonneesTestMixin, TestCase):
+    """
+    Vérifie via EXPLAIN que les requêtes les plus fréquentes (prêts, grand livre,
+    notifications, audit) restent servies par un index et ne retombent pas sur
+    un parcours complet de table après une évolution du schéma.
+    """
+
+    NB_LIGNES = 300
+
+    def setUp(self):
+        """Alimente les tables concernées avec assez de lignes pour que le planificateur choisisse"""
+        self.creer_donnees_de_base()
+        self.user = User.objects.create_user(username='plan', password='plan123')
+        statuts = ['EN_ATTENTE', 'VALIDE', 'EN_COURS', 'REMBOURSE', 'EN_RETARD', 'REJETE']
+        prets = Pret.objects.bulk_create([
+            Pret(
+                numero_pret=f'PRTPLAN{i:05d}', membre=self.membre, caisse=self.caisse,
+                montant_demande=Decimal('10000'), duree_mois=6, motif='Test',
+                statut=statuts[i % len(statuts)]
+            )
+            for i in range(self.NB_LIGNES)
+        ])
+        self.pret = prets[0]
+        aujourd_hui = date.today()
+        Echeance.objects.bulk_create([
+            Echeance(
+                pret=pret, numero_echeance=1, montant_echeance=Decimal('1000'),
+                date_echeance=aujourd_hui + timedelta(days=i % 60),
+                statut=['A_PAYER', 'PAYE', 'EN_RETARD'][i % 3]
+            )
+            for i, pret in enumerate(prets)
+        ])
+        MouvementFond.objects.bulk_create([
+            MouvementFond(
+                caisse=self.caisse, pret=prets[i % 20], type_mouvement='REMBOURSEMENT',
+                montant=Decimal('100'), solde_avant=Decimal('0'), solde_apres=Decimal('100'),
+                description='Test'
+            )
+            for i in range(self.NB_LIGNES)
+        ])
+        Notification.objects.bulk_create([
+            Notification(
+                destinataire=self.user, type_notification='SYSTEME', titre='T', message='M',
+                statut=['NON_LU', 'LU', 'TRAITE'][i % 3]
+            )
+            for i in range(self.NB_LIGNES)
+        ])
+        AuditLog.objects.bulk_create([
+            AuditLog(action='CREATION', modele='Pret', objet_id=i, details={})
+            for i in range(self.NB_LIGNES)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertPasDeParcoursComplet(self, queryset):
+        """Échoue si le plan d'exécution parcourt toute la table principale"""
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # Sur un petit jeu de données PostgreSQL préfère le parcours séquentiel : on le
+                # désactive pour vérifier qu'un index exploitable existe bien.
+                cursor.execute('SET enable_seqscan = off')
+            plan = queryset.explain()
+            self.assertNotRegex(plan, rf'Seq Scan on {table}\b', f"Parcours complet de {table} :\n{plan}")
+            return
+        plan = queryset.explain()
+        # SQLite : « SCAN table [USING INDEX x] » parcourt toutes les lignes, sauf si x est un
+        # index partiel (il ne contient alors que le sous-ensemble visé).
+        index_partiels = {index.name for index in queryset.model._meta.indexes if index.condition is not None}
+        for match in re.finditer(rf'\bSCAN {table}\b(?: USING (?:COVERING )?INDEX (\w+))?', plan):
+            self.assertIn(match.group(1), index_partiels, f"Parcours complet de {table} :\n{plan}")
+
+    def test_mouvements_par_caisse(self):
+        """Grand livre d'une caisse trié par date"""
+        self.assertPasDeParcoursComplet(
+            MouvementFond.objects.filter(caisse=self.caisse).order_by('-date_mouvement')
+        )
+
+    def test_mouvements_par_pret_et_type(self):
+        """Remboursements d'un prêt"""
+        self.assertPasDeParcoursComplet(
+            MouvementFond.objects.filter(pret=self.pret, type_mouvement='REMBOURSEMENT')
+        )
+
+    def test_prets_par_caisse_et_statut(self):
+        """Prêts en cours d'une caisse"""
+        self.assertPasDeParcoursComplet(
+            Pret.objects.filter(caisse=self.caisse, statut='EN_COURS')
+        )
+
+    def test_prets_par_membre_et_statut(self):
+        """Prêts actifs d'un membre"""
+        self.assertPasDeParcoursComplet(
+            Pret.objects.filter(membre=self.membre, statut='EN_COURS')
+        )
+
+    def test_prets_en_cours_globaux(self):
+        """Parcours horaire des prêts en cours (index partiel)"""
+        self.assertPasDeParcoursComplet(Pret.objects.filter(statut='EN_COURS'))
+
+    def test_echeances_en_retard(self):
+        """Échéances en retard arrivées à terme"""
+        self.assertPasDeParcoursComplet(
+            Echeance.objects.filter(statut='EN_RETARD', date_echeance__lte=date.today())
+        )
+
+    def test_notifications_non_lues(self):
+        """Cloche de notifications d'un utilisateur"""
+        self.assertPasDeParcoursComplet(
+            Notification.objects.filter(destinataire=self.user, statut='NON_LU')
+        )
+
+    def test_purge_audit_logs(self):
+        """Purge hebdomadaire des journaux d'audit"""
+        self.assertPasDeParcoursComplet(
+            AuditLog.objects.filter(date_action__lt=timezone.now() - timedelta(days=365))
+        )
+
+
+class SeedScaleTestCase(TestCase):
+    """Tests de la commande seed_scale et du banc de mesure des endpoints"""
+
+    OPTIONS = {
+        'caisses': 4, 'agents': 2, 'regions': 1, 'membres': 40, 'cotisations': 120,
+        'prets': 30, 'mois': 6, 'date_reference': '2025-06-30', 'stdout': StringIO(),
+    }
+
+    def test_volumes_et_chaine_de_soldes(self):
+        """Les volumes demandés sont respectés et les soldes des mouvements s'enchaînent"""
+        call_command('seed_scale', **self.OPTIONS)
+        self.assertEqual(Caisse.objects.count(), 4)
+        self.assertEqual(Membre.objects.count(), 40)
+        self.assertEqual(Pret.objects.count(), 30)
+        for caisse in Caisse.objects.all():
+            solde = caisse.fond_initial
+            for mouvement in caisse.mouvements_fonds.order_by('date_mouvement', 'pk'):
+                self.assertEqual(mouvement.solde_avant, solde)
+                solde = mouvement.solde_apres
+            self.assertEqual(caisse.fond_disponible, solde)
+            self.assertIsNotNone(caisse.presidente_id)
+
+    def test_grand_livre_verifie(self):
+        """Les données générées passent la vérification d'intégrité (intérêts remboursés compris)"""
+        call_command('seed_scale', **{**self.OPTIONS, 'prets': 80})
+        self.assertTrue(MouvementFond.objects.filter(type_mouvement='REMBOURSEMENT', interet_rembourse__gt=0).exists())
+        verification = integrite.verifier(incrementale=False, processus=1)
+        self.assertEqual((verification.caisses_verifiees, verification.anomalies), (4, 0))
+
+    def test_generation_deterministe(self):
+        """Une même graine produit les mêmes données"""
+        call_command('seed_scale', seed=7, **self.OPTIONS)
+        premier = Caisse.objects.aggregate(total=Sum('fond_disponible'))['total']
+        call_command('seed_scale', seed=7, reset=True, **self.OPTIONS)
+        self.assertEqual(Caisse.objects.aggregate(total=Sum('fond_disponible'))['total'], premier)
+
+    def test_benchmark_ecrit_un_rapport_json(self):
+        """Le banc de mesure produit un fichier JSON exploitable"""
+        call_command('seed_scale', **self.OPTIONS)
+        with tempfile.TemporaryDirectory() as dossier:
+            sortie = os.path.join(dossier, 'bench.json')
+            call_command('benchmark_endpoints', repetitions=1, sortie=sortie, scenarios='caisses',
+                         sans_taches=True, stdout=StringIO())
+            with open(sortie, encoding='utf-8') as fichier:
+                rapport = json.load(fichier)
+        noms = {r['nom']: r for r in rapport['resultats']}
+        self.assertEqual(noms['caisses_liste']['statut'], 200)
+        self.assertGreater(noms['caisses_liste']['requetes'], 0)
+        self.assertEqual(rapport['meta']['volumes']['caisses'], 4)
+
+
+class InstrumentationRepliqueTestCase(DonneesTestMixin, TransactionTestCase):
+    """Instrumentation SQL des lectures routées vers la réplique (hors transaction: le routeur n'y route pas)"""
+
+    def setUp(self):
+        self.creer_donnees_de_base()
+        self.client.force_login(User.objects.create_superuser('replique', 'replique@test.com', 'x'))
+
+    def test_lectures_de_la_replique_comptees(self):
+        """Les requêtes d'une vue de rapports servies par la réplique sont comptées avec celles de la base principale"""
+        from unittest import mock
+        from django.db import connections
+
+        # Seconde connexion SQLite sur la même base de test en mémoire
+        replique = dict(connections['default'].settings_dict)
+        with mock.patch.dict(connections.settings, {'reporting': replique}), \
+                mock.patch.dict(settings.DATABASES, {'reporting': replique}), \
+                mock.patch.object(routage, 'replique_utilisable', return_value=True):
+            try:
+                # Connexion ouverte explicitement (alias absent de la configuration des tests)
+                connections['reporting'].connect()
+                with CaptureQueriesContext(connection) as principale, \
+                        CaptureQueriesContext(connections['reporting']) as lectures:
+                    response = self.client.get('/gestion-caisses/api/soldes/')
+            finally:
+                connections['reporting'].close()
+                del connections['reporting']
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['soldes'][0]['caisse'], self.caisse.pk)
+        self.assertGreater(len(lectures), 0)
+        collecteur = response.wsgi_request.collecteur_sql
+        self.assertEqual(collecteur.nombre, len(principale) + len(lectures))
+        self.assertIn(f'desc="{collecteur.nombre} requetes"', response['Server-Timing'])
+
+
+class InstrumentationSQLTestCase(BudgetRequetesMixin, DonneesTestMixin, TestCase):
+    """Tests du middleware d'instrumentation SQL et des budgets de requêtes"""
+
+    def setUp(self):
+        self.creer_donnees_de_base()
+        for i in range(3):
+            Caisse.objects.create(
+                nom_association=f'Association Budget {i}', region=self.region,
+                prefecture=self.prefecture, commune=self.commune, canton=self.canton,
+                village=self.village, agent=self.agent, fond_initial=1000, statut='ACTIVE'
+            )
+        self.admin = User.objects.create_superuser('budget', 'budget@test.com', 'budget123')
+        self.client.force_login(self.admin)
+
+    def test_server_timing(self):
+        """L'en-tête Server-Timing expose le temps base de données et applicatif"""
+        response = self.client.get('/gestion-caisses/api/caisses/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ requetes", app;dur=[\d.]+$')
+
+    def test_budgets_des_listes(self):
+        """Les listes instrumentées restent dans leur budget quel que soit le nombre de lignes"""
+        for url in ['/gestion-caisses/api/caisses/', '/gestion-caisses/api/membres/',
+                    '/gestion-caisses/api/notifications/non_lues/', '/gestion-caisses/api/dashboard/stats/']:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertRespecteBudget(response)
+
+    def test_doublons_detectes(self):
+        """Les instructions répétées (N+1) sont comptées comme doublons"""
+        from .instrumentation import CollecteurSQL
+        collecteur = CollecteurSQL()
+        with connection.execute_wrapper(collecteur):
+            for caisse in Caisse.objects.all():
+                caisse.membres.count()
+        self.assertEqual(collecteur.nombre, 1 + Caisse.objects.count())
+        self.assertEqual(collecteur.doublons, Caisse.objects.count() - 1)
+
+    @override_settings(SQL_BUDGETS_ALERTE=True, SQL_BUDGETS_REQUETES={'CaisseViewSet.list': 1})
+    def test_alerte_budget_depasse(self):
+        """Un dépassement de budget est journalisé en avertissement"""
+        with self.assertLogs('gestion_caisses.sql', level='WARNING') as logs:
+            self.client.get('/gestion-caisses/api/caisses/')
+        self.assertIn('Budget SQL dépassé', logs.output[0])
+
+
+class ProfilageTestCase(DonneesTestMixin, TestCase):
+    """Tests du profilage à la demande (ProfilageMiddleware)"""
+
+    url = '/gestion-caisses/api/caisses/'
+
+    def setUp(self):
+        from . import profilage
+        self.profilage = profilage
+        profilage.invalider_regles()
+        self.creer_donnees_de_base()
+        self.admin = User.objects.create_superuser('profil', 'profil@test.com', 'profil123')
+        self.client.force_login(self.admin)
+
+    def test_jeton_signe(self):
+        """Un jeton valide produit un ProfileRecord complet"""
+        jeton = self.profilage.generer_jeton(self.admin)
+        response = self.client.get(self.url, {self.profilage.PARAMETRE: jeton})
+        self.assertEqual(response.status_code, 200)
+        record = ProfileRecord.objects.get(pk=response['X-Profil-Id'])
+        self.assertEqual(record.declencheur, 'JETON')
+        self.assertEqual(record.endpoint, 'CaisseViewSet.list')
+        self.assertEqual(record.utilisateur, self.admin)
+        self.assertEqual(record.nombre_requetes, len(record.requetes_sql))
+        self.assertTrue(record.fonctions_principales)
+        self.assertIn('temps_cumule_ms', record.fonctions_principales[0])
+        for pile in record.piles_repliees.splitlines():
+            self.assertRegex(pile, r'^.+ \d+$')
+
+    def test_jeton_refuse(self):
+        """Jeton falsifié ou émis par un non-superutilisateur: aucun profil"""
+        simple = User.objects.create_user('simple', 'simple@test.com', 'simple123')
+        for jeton in ['faux', self.profilage.generer_jeton(simple)]:
+            response = self.client.get(self.url, {self.profilage.PARAMETRE: jeton})
+            self.assertNotIn('X-Profil-Id', response)
+        self.assertFalse(ProfileRecord.objects.exists())
+
+    def test_jeton_lie_au_demandeur(self):
+        """Le jeton d'un superutilisateur ne profile pas les requêtes d'un autre ou d'un anonyme"""
+        jeton = self.profilage.generer_jeton(self.admin)
+        autre = User.objects.create_superuser('autre', 'autre@test.com', 'autre123')
+        self.client.force_login(autre)
+        self.assertNotIn('X-Profil-Id', self.client.get(self.url, {self.profilage.PARAMETRE: jeton}))
+        self.client.logout()
+        self.assertNotIn('X-Profil-Id', self.client.get(self.url, {self.profilage.PARAMETRE: jeton}))
+        self.assertFalse(ProfileRecord.objects.exists())
+
+    def test_regle_url(self):
+        """Une règle d'URL profile le nombre de requêtes demandé puis s'arrête"""
+        regle = RegleProfilage.objects.create(motif_url=r'^/gestion-caisses/api/caisses/', nombre_restant=1)
+        self.assertIn('X-Profil-Id', self.client.get(self.url))
+        self.assertNotIn('X-Profil-Id', self.client.get(self.url))
+        self.assertNotIn('X-Profil-Id', self.client.get('/gestion-caisses/api/membres/'))
+        regle.refresh_from_db()
+        self.assertEqual(regle.nombre_restant, 0)
+        self.assertEqual(regle.profils.count(), 1)
+
+    def test_admin(self):
+        """La fiche d'un profil liste les fonctions et les piles sont téléchargeables"""
+        jeton = self.profilage.generer_jeton(self.admin)
+        record_id = self.client.get(self.url, {self.profilage.PARAMETRE: jeton})['X-Profil-Id']
+        response = self.client.get(reverse('admin:gestion_caisses_profilerecord_change', args=[record_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Cumulé (ms)')
+        response = self.client.get(reverse('admin:gestion_caisses_profilerecord_piles', args=[record_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        response = self.client.get(reverse('admin:gestion_caisses_profilerecord_jeton'))
+        self.assertEqual(response.json()['parametre'], self.profilage.PARAMETRE)
+
+        # Agent (is_staff) non superutilisateur: piles et jeton refusés
+        agent = User.objects.create_user('agent_profil', 'agent@test.com', 'x', is_staff=True)
+        self.client.force_login(agent)
+        response = self.client.get(reverse('admin:gestion_caisses_profilerecord_piles', args=[record_id]))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('admin:gestion_caisses_profilerecord_jeton'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_echantillonneur_piles(self):
+        """Les piles échantillonnées partent du cadre racine et sont au format replié"""
+        import sys
+        import time
+
+        def attendre():
+            time.sleep(0.05)
+
+        echantillonneur = self.profilage.EchantillonneurPiles(sys._getframe(), intervalle=0.002)
+        echantillonneur.start()
+        attendre()
+        echantillonneur.arreter()
+        piles = echantillonneur.piles_repliees().splitlines()
+        self.assertTrue(piles)
+        pile, duree = piles[0].rsplit(' ', 1)
+        self.assertTrue(pile.startswith('attendre ('))
+        self.assertGreater(int(duree), 0)
+
+
+class NotificationDispatcherTestCase(DonneesTestMixin, TestCase):
+    """Tests de la diffusion groupée des notifications"""
+
+    def setUp(self):
+        self.creer_donnees_de_base()
+        self.admins = [
+            User.objects.create_superuser(f'admin{i}', f'admin{i}@test.com', 'admin123') for i in range(3)
+        ]
+        Pret.objects.bulk_create([Pret(
+            numero_pret='PRTNOTIF001', membre=self.membre, caisse=self.caisse,
+            montant_demande=Decimal('10000'), duree_mois=6, motif='Test', statut='EN_ATTENTE_ADMIN'
+        )])
+        self.pret = Pret.objects.select_related('membre', 'caisse').get(numero_pret='PRTNOTIF001')
+
+    def test_demande_pret_apres_commit(self):
+        """La diffusion n'a lieu qu'après commit, avec une notification et un audit par administrateur"""
+        from .services import NotificationService
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            NotificationService.notifier_demande_pret(self.pret)
+            self.assertFalse(Notification.objects.exists())
+        self.assertTrue(callbacks)
+        self.assertEqual(
+            set(Notification.objects.filter(type_notification='DEMANDE_PRET').values_list('destinataire', flat=True)),
+            {admin.pk for admin in self.admins}
+        )
+        audits = AuditLog.objects.filter(action='NOTIFICATION', modele='Pret', objet_id=self.pret.pk)
+        self.assertEqual(sorted(a.details['destinataire'] for a in audits), ['admin0', 'admin1', 'admin2'])
+
+    def test_requetes_constantes(self):
+        """Le nombre de requêtes ne dépend pas du nombre de destinataires"""
+        from .services import NotificationDispatcher
+        parametres = dict(
+            type_notification='DEMANDE_PRET', titre='Titre', message='Message', superutilisateurs=True,
+            pret_id=self.pret.pk, audit_modele='Pret', audit_objet_id=self.pret.pk, audit_par_destinataire=True,
+        )
+        with self.assertNumQueries(5):
+            self.assertEqual(NotificationDispatcher.diffuser(**parametres), 3)
+        for i in range(3, 10):
+            User.objects.create_superuser(f'admin{i}', f'admin{i}@test.com', 'admin123')
+        with self.assertNumQueries(5):
+            self.assertEqual(NotificationDispatcher.diffuser(**parametres), 10)
+
+    def test_bureau_et_doublons(self):
+        """Le bureau de la caisse est résolu en une requête et les doublons récents sont ignorés"""
+        from .services import NotificationDispatcher
+        presidente = User.objects.create_user('presidente', 'p@test.com', 'pass12345')
+        tresoriere = User.objects.create_user('tresoriere', 't@test.com', 'pass12345')
+        autre = Membre.objects.create(
+            nom='Doe', prenoms='Ann', date_naissance='1990-01-01', adresse='Lomé',
+            numero_telephone='90000002', role='MEMBRE', statut='ACTIF', caisse=self.caisse
+        )
+        Membre.objects.filter(pk=self.membre.pk).update(utilisateur=presidente)
+        Membre.objects.filter(pk=autre.pk).update(utilisateur=tresoriere)
+        Caisse.objects.filter(pk=self.caisse.pk).update(presidente=self.membre, tresoriere=autre)
+
+        with self.assertNumQueries(1):
+            destinataires = NotificationDispatcher.destinataires(bureau_caisse_id=self.caisse.pk)
+        self.assertEqual([username for _, username in destinataires], ['presidente', 'tresoriere'])
+        self.assertEqual(
+            NotificationDispatcher.destinataires(bureau_caisse_id=self.caisse.pk, roles_bureau=['presidente']),
+            [(presidente.pk, 'presidente')]
+        )
+
+        parametres = dict(type_notification='SYSTEME', titre='T', message='M', bureau_caisse_id=self.caisse.pk,
+                          caisse_id=self.caisse.pk, eviter_doublons_jours=30)
+        self.assertEqual(NotificationDispatcher.diffuser(**parametres), 2)
+        self.assertEqual(NotificationDispatcher.diffuser(**parametres), 0)
+
+
+class CompteursNotificationsTestCase(DonneesTestMixin, TestCase):
+    """Tests des compteurs de la cloche (cache) et du flux SSE / long-poll"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.creer_donnees_de_base()
+        self.admin = User.objects.create_superuser('cloche', 'cloche@test.com', 'cloche123')
+        self.client.force_login(self.admin)
+        self.pret = Pret.objects.create(
+            numero_pret='PRTCLOCHE01', membre=self.membre, caisse=self.caisse,
+            montant_demande=Decimal('10000'), duree_mois=6, motif='Test', statut='EN_ATTENTE_ADMIN'
+        )
+        for type_notification in ['DEMANDE_PRET', 'ATTENTE_PRET']:
+            Notification.objects.create(
+                destinataire=self.admin, type_notification=type_notification, titre='Demande',
+                message='Demande de prêt', caisse=self.caisse, pret=self.pret
+            )
+
+    def test_compteurs_en_cache(self):
+        """Les compteurs sont servis depuis le cache et invalidés par les changements"""
+        from . import compteurs
+        etat = compteurs.etat(self.admin)
+        self.assertEqual((etat['non_lues'], etat['demandes_pret_en_attente'], etat['prets_en_attente']), (2, 1, 1))
+        with self.assertNumQueries(0):
+            self.assertEqual(compteurs.etat(self.admin), etat)
+
+        Notification.objects.filter(destinataire=self.admin).first().marquer_comme_lu()
+        self.assertEqual(compteurs.etat(self.admin)['non_lues'], 1)
+
+        self.pret.statut = 'VALIDE'
+        self.pret.save()
+        etat_apres = compteurs.etat(self.admin)
+        self.assertEqual((etat_apres['demandes_pret_en_attente'], etat_apres['prets_en_attente']), (0, 0))
+        self.assertNotEqual(etat_apres['version'], etat['version'])
+
+    def test_demandes_une_par_pret(self):
+        """Une seule notification (la plus récente) par prêt en attente, en une requête"""
+        response = self.client.get('/gestion-caisses/api/notifications/demandes_pret_en_attente/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['type_notification'], 'ATTENTE_PRET')
+        self.assertEqual(response.data[0]['pret_id'], self.pret.pk)
+
+    @override_settings(NOTIFICATIONS_LONG_POLL_ATTENTE=0.05, NOTIFICATIONS_FLUX_INTERVALLE=0.01)
+    def test_long_poll(self):
+        """Le long-poll (ASGI) rend la main à l'échéance et renvoie les compteurs"""
+        from asgiref.sync import async_to_sync
+        url = '/gestion-caisses/api/notifications/flux/'
+        self.async_client.force_login(self.admin)
+        etat = async_to_sync(self.async_client.get)(url).json()
+        self.assertEqual(etat['non_lues'], 2)
+        response = async_to_sync(self.async_client.get)(url, {'version': etat['version']})
+        self.assertEqual(response.json(), etat)
+
+    @override_settings(NOTIFICATIONS_FLUX_DUREE=0.05, NOTIFICATIONS_FLUX_INTERVALLE=0.01)
+    def test_flux_sse(self):
+        """Le flux SSE (ASGI) envoie un évènement compteurs à l'ouverture"""
+        from asgiref.sync import async_to_sync
+        self.async_client.force_login(self.admin)
+
+        async def lire():
+            response = await self.async_client.get('/gestion-caisses/api/notifications/flux/', ACCEPT='text/event-stream')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            return b''.join([morceau async for morceau in response.streaming_content])
+
+        contenu = async_to_sync(lire)().decode()
+        self.assertIn('event: compteurs', contenu)
+        donnees = json.loads(re.search(r'^data: (.*)$', contenu, re.M).group(1))
+        self.assertEqual(donnees['prets_en_attente'], 1)
+
+    @override_settings(NOTIFICATIONS_LONG_POLL_ATTENTE=30)
+    def test_flux_sous_wsgi(self):
+        """Sous WSGI, ni le flux ni le long-poll ne retiennent le worker"""
+        url = '/gestion-caisses/api/notifications/flux/'
+        debut = time.monotonic()
+        response = self.client.get(url, HTTP_ACCEPT='text/event-stream')
+        self.assertFalse(response.streaming)
+        contenu = response.content.decode()
+        self.assertIn('retry: 30000', contenu)
+        etat = json.loads(re.search(r'^data: (.*)$', contenu, re.M).group(1))
+        self.assertEqual(self.client.get(url, {'version': etat['version']}).json(), etat)
+        self.assertLess(time.monotonic() - debut, 5)
+
+    def test_flux_anonyme(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/gestion-caisses/api/notifications/flux/').status_code, 403)
+
+
+class TamponAuditTestCase(DonneesTestMixin, TestCase):
+    """Tests de l'écriture groupée du journal d'audit"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('auditeur', 'audit@test.com', 'audit123')
+
+    def journaliser(self, objet_id, **champs):
+        from .audit import journaliser_audit
+        journaliser_audit(utilisateur=self.user, action='MODIFICATION', modele='Pret',
+                          objet_id=objet_id, details={'n': objet_id}, ip_adresse='10.0.0.1', **champs)
+
+    def test_un_insert_par_tampon(self):
+        """Les entrées d'un tampon sont écrites en un seul INSERT, à sa fermeture"""
+        from .audit import tampon_audit
+        with self.assertNumQueries(1):
+            with tampon_audit():
+                for i in range(5):
+                    self.journaliser(i)
+        entrees = AuditLog.objects.order_by('objet_id')
+        self.assertEqual([e.objet_id for e in entrees], [0, 1, 2, 3, 4])
+        self.assertEqual({(e.utilisateur_id, e.ip_adresse) for e in entrees}, {(self.user.pk, '10.0.0.1')})
+        self.assertEqual(entrees[3].details, {'n': 3})
+
+    def test_transaction_annulee(self):
+        """Une entrée écrite dans une transaction annulée n'est pas conservée"""
+        from django.db import transaction
+        from .audit import tampon_audit
+        with tampon_audit():
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    self.journaliser(1)
+                try:
+                    with transaction.atomic():
+                        self.journaliser(2)
+                        raise ValueError('annulation')
+                except ValueError:
+                    pass
+        self.assertEqual(list(AuditLog.objects.values_list('objet_id', flat=True)), [1])
+
+    def test_sans_tampon(self):
+        """Hors tampon, l'écriture reste immédiate"""
+        self.journaliser(7)
+        self.assertTrue(AuditLog.objects.filter(objet_id=7).exists())
+
+    def test_middleware(self):
+        """Une requête HTTP écrit ses entrées d'audit en une fois"""
+        from django.test import RequestFactory
+        from .middleware import AuditTamponMiddleware
+
+        def vue(request):
+            for i in range(3):
+                self.journaliser(i)
+            self.assertFalse(AuditLog.objects.exists())
+            return HttpResponse('ok')
+
+        from django.http import HttpResponse
+        AuditTamponMiddleware(vue)(RequestFactory().get('/'))
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+    def test_suppression_pret(self):
+        """La suppression d'un prêt rejeté passe par le tampon, avec l'IP de la requête"""
+        from .audit import tampon_audit
+        self.creer_donnees_de_base()
+        pret = Pret.objects.create(
+            membre=self.membre, caisse=self.caisse, montant_demande=Decimal('5000'),
+            duree_mois=6, motif='Test', statut='REJETE',
+        )
+        pret_id = pret.pk
+        pret._current_user, pret._current_ip = self.user, '10.0.0.9'
+        with tampon_audit():
+            pret.delete()
+            self.assertFalse(AuditLog.objects.filter(action='SUPPRESSION', objet_id=pret_id).exists())
+        entree = AuditLog.objects.get(action='SUPPRESSION', modele='Pret', objet_id=pret_id)
+        self.assertEqual((entree.utilisateur, entree.ip_adresse), (self.user, '10.0.0.9'))
+
+    @override_settings(AUDIT_MODE='celery')
+    def test_mode_celery(self):
+        """En mode celery, l'envoi a lieu après commit (écriture directe si Celery est indisponible)"""
+        from .audit import tampon_audit
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with tampon_audit():
+                self.journaliser(1)
+                self.journaliser(2)
+            self.assertFalse(AuditLog.objects.exists())
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+    def test_echec_journalise(self):
+        """Un échec d'écriture du tampon est journalisé sans faire échouer l'appelant"""
+        from unittest import mock
+        from .audit import tampon_audit
+        with mock.patch('gestion_caisses.audit.ecrire_audits', side_effect=RuntimeError('base indisponible')):
+            with self.assertLogs('gestion_caisses.audit', level='ERROR') as journaux:
+                with tampon_audit():
+                    self.journaliser(1)
+        self.assertIn('base indisponible', journaux.output[0])
+        self.assertIn('Traceback', journaux.output[0])
+
+
+class SequenceTestCase(DonneesTestMixin, TestCase):
+    """Tests de l'allocation des codes, matricules et numéros de prêt"""
+
+    def test_allocation_consecutive_et_par_bloc(self):
+        self.assertEqual(Sequence.allouer('essai'), 1)
+        self.assertEqual(Sequence.allouer('essai'), 2)
+        self.assertEqual(Sequence.allouer('essai', 10), 3)
+        self.assertEqual(Sequence.allouer('essai'), 13)
+        self.assertEqual(Sequence.allouer('autre', initial=lambda: 41), 42)
+
+    def test_une_requete_par_allocation(self):
+        """Une séquence existante est incrémentée en un seul aller-retour"""
+        Sequence.allouer('essai')
+        with self.assertNumQueries(1):
+            self.assertEqual(Sequence.allouer('essai', 5), 2)
+
+    def test_reprise_des_codes_existants(self):
+        """La séquence des caisses repart après le plus grand numéro déjà attribué"""
+        self.creer_donnees_de_base()
+        Caisse.objects.filter(pk=self.caisse.pk).update(code='FKM07ASSOCIATIONTEST')
+        Sequence.objects.filter(nom='caisse_code').delete()
+        caisses = [Caisse(nom_association='Les Étoiles'), Caisse(nom_association='Union'), Caisse(code='LIBRE')]
+        Caisse.attribuer_codes(caisses)
+        self.assertEqual([c.code for c in caisses], ['FKM08LESETOILES', 'FKM09UNION', 'LIBRE'])
+
+    def test_formats_matricule_et_numero_pret(self):
+        self.creer_donnees_de_base()
+        annee = timezone.now().strftime('%Y')
+        self.assertRegex(self.agent.matricule, rf'^AGT{annee}\d{{5}}$')
+        agents = [Agent(nom='A'), Agent(nom='B')]
+        Agent.attribuer_matricules(agents)
+        suivants = [int(self.agent.matricule[-5:]) + 1, int(self.agent.matricule[-5:]) + 2]
+        self.assertEqual([int(a.matricule[-5:]) for a in agents], suivants)
+
+        prets = [Pret(), Pret()]
+        Pret.attribuer_numeros(prets)
+        prefixe = f"PRT{timezone.now().strftime('%Y%m')}"
+        self.assertEqual([p.numero_pret for p in prets], [f'{prefixe}00000001', f'{prefixe}00000002'])
+
+
+class SuiviModificationsCaisseTestCase(DonneesTestMixin, TestCase):
+    """Tests du suivi des champs modifiés de Caisse"""
+
+    def setUp(self):
+        self.creer_donnees_de_base()
+        self.caisse = Caisse.objects.get(pk=self.caisse.pk)
+
+    def test_creation(self):
+        self.assertEqual(self.caisse.fond_disponible, Decimal('100000'))
+
+    def test_sauvegarde_du_solde_seul(self):
+        """Un seul UPDATE, limité au champ modifié, sans relecture de la caisse"""
+        self.caisse.fond_disponible = Decimal('95000')
+        with self.assertNumQueries(1) as requetes:
+            self.caisse.save()
+        sql = requetes.captured_queries[0]['sql']
+        self.assertIn('fond_disponible', sql)
+        self.assertNotIn('nom_association', sql)
+        self.assertEqual(Caisse.objects.get(pk=self.caisse.pk).fond_disponible, Decimal('95000'))
+
+    def test_aucune_modification(self):
+        with self.assertNumQueries(0):
+            self.caisse.save()
+
+    def test_modification_du_fond_initial(self):
+        """Le fond disponible suit le delta du fond initial, dans le même UPDATE"""
+        self.caisse.fond_initial = Decimal('150000')
+        with self.assertNumQueries(1):
+            self.caisse.save()
+        caisse = Caisse.objects.get(pk=self.caisse.pk)
+        self.assertEqual((caisse.fond_initial, caisse.fond_disponible), (Decimal('150000'), Decimal('150000')))
+
+        # Sauvegardes successives: l'état mémorisé est celui de la dernière écriture
+        caisse.fond_initial = Decimal('120000')
+        caisse.save(update_fields=['fond_initial'])
+        self.assertEqual(Caisse.objects.get(pk=self.caisse.pk).fond_disponible, Decimal('120000'))
+
+    def test_fond_disponible_explicite(self):
+        """Un fond disponible fixé en même temps que le fond initial est conservé"""
+        self.caisse.fond_initial = Decimal('0')
+        self.caisse.fond_disponible = Decimal('2500')
+        self.caisse.save(update_fields=['fond_initial', 'fond_disponible'])
+        caisse = Caisse.objects.get(pk=self.caisse.pk)
+        self.assertEqual((caisse.fond_initial, caisse.fond_disponible), (Decimal('0'), Decimal('2500')))
+
+
+class GeoArbreTestCase(DonneesTestMixin, TestCase):
+    """Tests de la hiérarchie géographique /api/geo/tree/"""
+
+    url = '/gestion-caisses/api/geo/tree/'
+
+    def setUp(self):
+        self.creer_donnees_de_base()
+        self.user = User.objects.create_user('geo', 'geo@test.com', 'geo123')
+        self.client.force_login(self.user)
+
+    def test_arbre_complet_et_sous_arbre(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age=', response['Cache-Control'])
+        region = next(r for r in response.json() if r['id'] == self.region.pk)
+        village = region['prefectures'][0]['communes'][0]['cantons'][0]['villages'][0]
+        self.assertEqual((village['id'], village['nom'], village['quartiers']), (self.village.pk, 'Village Test', []))
+
+        response = self.client.get(self.url, {'commune': self.commune.pk})
+        self.assertEqual(response.json()['cantons'][0]['id'], self.canton.pk)
+        self.assertEqual(self.client.get(self.url, {'canton': 0}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'canton': 'x'}).status_code, 400)
+
+    def test_revalidation_et_invalidation(self):
+        """Un client à jour reçoit un 304; une modification géographique change l'ETag"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        self.village.nom = 'Village Renommé'
+        self.village.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Village Renommé', response.content.decode())
+
+    def test_arbre_en_cache(self):
+        """Une fois construit, l'arbre est servi sans requête sur les tables géographiques"""
+        from . import geographie
+        geographie.document()
+        with self.assertNumQueries(0):
+            geographie.document('region', self.region.pk)
+
+
+class GetConditionnelTestCase(DonneesTestMixin, TestCase):
+    """Tests des GET conditionnels (ETag / Last-Modified) pilotés par les versions de caisse"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.creer_donnees_de_base()
+        self.admin = User.objects.create_superuser('etag', 'etag@test.com', 'etag123')
+        self.client.force_login(self.admin)
+        self.url = f'/gestion-caisses/api/caisses/{self.caisse.pk}/'
+
+    def test_304_avant_les_requetes_de_la_vue(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        with self.assertNumQueries(2):  # session + utilisateur
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(self.url, {'format': 'json'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_invalidation_par_caisse(self):
+        """Seules les modifications de la caisse concernée changent l'ETag"""
+        etag = self.client.get(self.url)['ETag']
+        autre = Caisse.objects.create(
+            nom_association='Autre Association', region=self.region, prefecture=self.prefecture,
+            commune=self.commune, canton=self.canton, village=self.village, agent=self.agent
+        )
+        autre.notes = 'modifiée'
+        autre.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Membre.objects.create(
+            nom='Nouveau', prenoms='Membre', date_naissance='1991-01-01', adresse='Lomé',
+            numero_telephone='90000002', role='MEMBRE', statut='ACTIF', caisse=self.caisse
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_vue_fonction(self):
+        url = '/gestion-caisses/api/rapports-caisse/'
+        self.client.get(url, {'type': 'general'})  # crée la caisse générale au premier appel
+        response = self.client.get(url, {'type': 'general'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, {'type': 'general'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_desactive_sans_cache_partage(self):
+        """Sans cache partagé, aucune réponse ne porte de validateur ni n'est servie en 304"""
+        etag = self.client.get(self.url)['ETag']
+        with override_settings(GET_CONDITIONNEL=False):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.has_header('ETag'))
+            url = '/gestion-caisses/api/rapports-caisse/'
+            self.assertFalse(self.client.get(url, {'type': 'general'}).has_header('ETag'))
+
+
+class RechercheNormaliseeTestCase(DonneesTestMixin, TestCase):
+    """Tests de la recherche insensible aux accents (colonne normalisée + index plein texte)"""
+
+    def setUp(self):
+        self.creer_donnees_de_base()
+        self.membre.nom, self.membre.prenoms = 'Mensah', 'Akouélé'
+        self.membre.save()
+        self.pret = Pret.objects.create(
+            membre=self.membre, caisse=self.caisse, montant_demande=Decimal('10000'),
+            duree_mois=6, motif='Commerce', statut='EN_ATTENTE'
+        )
+        self.admin = User.objects.create_superuser('cherche', 'cherche@test.com', 'cherche123')
+        self.client.force_login(self.admin)
+
+    def test_normalisation(self):
+        from .recherche import normaliser
+        self.assertEqual(normaliser('Akouélé', "N'Djéna-Bawa", None), 'AKOUELE N DJENA BAWA')
+        self.assertEqual(Membre.objects.get(pk=self.membre.pk).recherche, 'MENSAH AKOUELE')
+
+    def test_recherche_sans_accents(self):
+        from .recherche import filtrer
+        for texte in ['akouele', 'AKOUÉLÉ', 'ouel mens', 'Ak']:
+            self.assertEqual(list(filtrer(Membre.objects.all(), texte)), [self.membre], texte)
+        self.assertFalse(filtrer(Membre.objects.all(), 'akouele kodjo').exists())
+
+        # Le texte de recherche suit les modifications
+        self.membre.prenoms = 'Kossiwa'
+        self.membre.save(update_fields=['prenoms'])
+        self.assertFalse(filtrer(Membre.objects.all(), 'akouele').exists())
+        self.assertTrue(filtrer(Membre.objects.all(), 'kossiwa').exists())
+
+    def test_filtre_api(self):
+        response = self.client.get('/gestion-caisses/api/membres/', {'search': 'akouele'})
+        self.assertEqual([m['id'] for m in response.data['results']], [self.membre.pk])
+        response = self.client.get('/gestion-caisses/api/prets/', {'search': 'Akouele'})
+        self.assertEqual([p['id'] for p in response.data['results']], [self.pret.pk])
+        response = self.client.get('/gestion-caisses/api/prets/', {'search': self.pret.numero_pret.lower()})
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class PaginationCurseurTestCase(TestCase):
+    """Tests de la pagination par curseur (date, id) et du compte approximatif"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('pagine', 'pagine@test.com', 'pagine123')
+        self.client.force_login(self.admin)
+        AuditLog.objects.bulk_create([
+            AuditLog(utilisateur=self.admin, action='MODIFICATION', modele='Caisse', objet_id=i)
+            for i in range(45)
+        ])
+        # Dates identiques par paquets: l'identifiant doit départager
+        maintenant = timezone.now()
+        for i, pk in enumerate(AuditLog.objects.order_by('id').values_list('id', flat=True)):
+            AuditLog.objects.filter(pk=pk).update(date_action=maintenant - timedelta(minutes=i // 10))
+        self.attendus = list(AuditLog.objects.order_by('-date_action', '-id').values_list('id', flat=True))
+
+    def test_parcours_complet(self):
+        vus, url = [], '/gestion-caisses/api/audit-logs/?curseur='
+        while url:
+            with CaptureQueriesContext(connection) as requetes:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            self.assertFalse(any('COUNT(' in q['sql'].upper() or 'OFFSET' in q['sql'].upper()
+                                 for q in requetes.captured_queries))
+            vus += [ligne['id'] for ligne in response.data['results']]
+            dernier, url = response.data, response.data['next']
+        self.assertEqual(vus, self.attendus)
+
+        # Page précédente depuis la dernière page
+        response = self.client.get(dernier['previous'])
+        self.assertEqual([ligne['id'] for ligne in response.data['results']], self.attendus[20:40])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_compte_approximatif_et_curseur_invalide(self):
+        response = self.client.get('/gestion-caisses/api/audit-logs/', {'compte': 'approx'})
+        self.assertTrue(response.data['count_approximatif'])
+        self.assertEqual(response.data['count'], 45)
+        response = self.client.get('/gestion-caisses/api/audit-logs/', {'curseur': '', 'compte': 'approx'})
+        self.assertEqual(response.data['count'], 45)
+        self.assertEqual(len(response.data['results']), 20)
+
+        self.assertEqual(self.client.get('/gestion-caisses/api/audit-logs/', {'curseur': 'x!'}).status_code, 404)
+        # Sans le paramètre, pagination par numéro de page inchangée
+        response = self.client.get('/gestion-caisses/api/audit-logs/', {'page': 3})
+        self.assertEqual(response.data['count'], 45)
+        self.assertNotIn('count_approximatif', response.data)
+
+
+class ChampsDynamiquesTestCase(DonneesTestMixin, TestCase):
+    """Tests de ?fields= / ?expand= sur les caisses et les prêts"""
+
+    def setUp(self):
+        self.creer_donnees_de_base()
+        self.caisse.presidente = self.membre
+        self.caisse.save()
+        self.pret = Pret.objects.create(
+            membre=self.membre, caisse=self.caisse, montant_demande=Decimal('10000'),
+            duree_mois=6, motif='Commerce', statut='EN_ATTENTE'
+        )
+        self.admin = User.objects.create_superuser('champs', 'champs@test.com', 'champs123')
+        self.client.force_login(self.admin)
+
+    def test_champs_et_extension(self):
+        url = f'/gestion-caisses/api/caisses/{self.caisse.pk}/'
+        complet = self.client.get(url).json()
+        self.assertEqual(complet['presidente']['nom'], 'Doe')
+
+        response = self.client.get(url, {'fields': 'id,presidente,region_nom'})
+        self.assertEqual(response.json(), {'id': self.caisse.pk, 'presidente': self.membre.pk, 'region_nom': 'Région Test'})
+
+        response = self.client.get(url, {'fields': 'id,presidente.nom_complet', 'expand': 'region'})
+        self.assertEqual(response.json()['presidente'], {'nom_complet': 'Doe Jane'})
+        self.assertEqual(response.json()['region']['code'], 'TST')
+
+        response = self.client.get(f'/gestion-caisses/api/prets/{self.pret.pk}/', {'fields': 'id,caisse,echeances'})
+        self.assertEqual(response.json(), {'id': self.pret.pk, 'caisse': self.caisse.pk, 'echeances': []})
+
+        # Liste: mêmes paramètres sur le sérialiseur simplifié
+        response = self.client.get('/gestion-caisses/api/caisses/', {'fields': 'id,nom_association'})
+        self.assertEqual(response.json()['results'], [{'id': self.caisse.pk, 'nom_association': 'Association Test'}])
+
+    def test_queryset_reduit(self):
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.get('/gestion-caisses/api/caisses/', {'fields': 'id,nom_association'})
+        sql = ' '.join(q['sql'] for q in requetes.captured_queries)
+        self.assertNotIn('gestion_caisses_region', sql)
+        self.assertNotIn('gestion_caisses_exercicecaisse', sql)
+        self.assertNotIn('COUNT(DISTINCT', sql.upper())
+
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.get('/gestion-caisses/api/caisses/', {'fields': 'id,region_nom'})
+        self.assertIn('gestion_caisses_region', ' '.join(q['sql'] for q in requetes.captured_queries))
+
+    def test_ecriture_inchangee(self):
+        # Les paramètres ne concernent que les lectures
+        response = self.client.patch(
+            f'/gestion-caisses/api/caisses/{self.caisse.pk}/?fields=id',
+            {'nom_association': 'Association Renommée'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('presidente', response.json())
+
+
+class SynchronisationTestCase(DonneesTestMixin, TestCase):
+    """Tests du journal de synchronisation et de /api/sync/"""
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.creer_donnees_de_base()
+        self.admin = User.objects.create_superuser('sync', 'sync@test.com', 'sync123')
+        self.client.force_login(self.admin)
+
+    def synchroniser(self, marques=None):
+        parametres = {'caisse': self.caisse.pk}
+        if marques:
+            parametres['marques'] = ','.join(f'{caisse}:{version}' for caisse, version in marques.items())
+        response = self.client.get('/gestion-caisses/api/sync/', parametres)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_journal_ecrit_apres_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            membre = Membre.objects.create(
+                nom='Ama', prenoms='Koffi', date_naissance='1991-01-01', adresse='Lomé',
+                numero_telephone='90000002', statut='ACTIF', caisse=self.caisse
+            )
+            membre.notes = 'Deuxième enregistrement, même transaction'
+            membre.save()
+        entree = JournalSync.objects.get(modele='membre', objet_id=membre.pk)
+        self.assertEqual((entree.caisse_id, entree.operation), (self.caisse.pk, 'U'))
+
+        version = entree.version
+        with self.captureOnCommitCallbacks(execute=True):
+            membre.delete()
+        entree.refresh_from_db()
+        self.assertEqual(entree.operation, 'D')
+        self.assertGreater(entree.version, version)
+
+    def test_synchronisation_differentielle(self):
+        initiale = self.synchroniser()
+        self.assertTrue(initiale['complet'])
+        champs = initiale['modifications']['membre']['champs']
+        self.assertEqual([ligne[champs.index('id')] for ligne in initiale['modifications']['membre']['lignes']],
+                         [self.membre.pk])
+        marques = {int(caisse): version for caisse, version in initiale['marques'].items()}
+
+        # Rien de nouveau: réponse vide
+        self.assertEqual(self.synchroniser(marques)['modifications'], {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.membre.prenoms = 'Janet'
+            self.membre.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            supprime = Membre.objects.create(
+                nom='Temp', prenoms='Temp', date_naissance='1990-01-01', adresse='Lomé',
+                numero_telephone='90000003', caisse=self.caisse
+            )
+        supprime_id = supprime.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            supprime.delete()
+
+        delta = self.synchroniser(marques)
+        lignes = delta['modifications']['membre']['lignes']
+        self.assertEqual(len(lignes), 1)
+        self.assertIn('Janet', lignes[0])
+        self.assertEqual(delta['suppressions'], {'membre': [supprime_id]})
+
+    def test_limite_et_perimetre(self):
+        # Objets insérés sans signal: reconstruction du journal
+        from .synchronisation import reconstruire_journal
+        Echeance.objects.bulk_create([
+            Echeance(pret=Pret.objects.create(
+                membre=self.membre, caisse=self.caisse, montant_demande=Decimal('10000'),
+                duree_mois=6, motif='Commerce', statut='EN_ATTENTE'
+            ), numero_echeance=1, montant_echeance=Decimal('1000'), date_echeance=date.today())
+        ])
+        reconstruire_journal()
+        self.assertTrue(JournalSync.objects.filter(modele='echeance').exists())
+
+        response = self.client.get('/gestion-caisses/api/sync/', {'limite': 1})
+        self.assertFalse(json.loads(response.content)['complet'])
+        self.assertEqual(self.client.get('/gestion-caisses/api/sync/', {'marques': 'abc'}).status_code, 400)
+
+        # Utilisateur sans caisse: aucune donnée
+        self.client.force_login(User.objects.create_user('sans_caisse', password='x'))
+        response = self.client.get('/gestion-caisses/api/sync/')
+        self.assertEqual(json.loads(response.content)['modifications'], {})
+
+
+class JournalSyncConcurrenceTestCase(TransactionTestCase):
+    """Deux lots écrits en parallèle: les versions deviennent visibles dans l'ordre"""
+
+    def test_version_invisible_tant_que_la_precedente_est_en_cours(self):
+        import threading
+        from unittest import mock
+        from django.db import OperationalError, connections
+        from . import synchronisation
+
+        alloue, reprise = threading.Event(), threading.Event()
+        bulk_create = JournalSync.objects.bulk_create
+
+        def ecriture_lente(*args, **kwargs):
+            # Le premier lot s'arrête entre l'allocation de sa version et l'écriture de sa ligne
+            if threading.current_thread().name == 'premier':
+                alloue.set()
+                reprise.wait(5)
+            return bulk_create(*args, **kwargs)
+
+        def ecrire(objet_id):
+            try:
+                fin = time.monotonic() + 5
+                while True:
+                    try:
+                        synchronisation.ecrire({('membre', objet_id): (1, 'U')})
+                        return
+                    except OperationalError:
+                        # SQLite (cache partagé) refuse au lieu d'attendre le verrou comme PostgreSQL
+                        if time.monotonic() > fin:
+                            raise
+                        time.sleep(0.01)
+            finally:
+                connections.close_all()
+
+        with mock.patch.object(JournalSync.objects, 'bulk_create', side_effect=ecriture_lente):
+            premier = threading.Thread(target=ecrire, args=(1,), name='premier')
+            premier.start()
+            self.assertTrue(alloue.wait(5))
+            second = threading.Thread(target=ecrire, args=(2,), name='second')
+            second.start()
+            second.join(0.5)
+            # Le second lot ne peut rien publier tant que la version du premier n'est pas écrite
+            self.assertEqual(list(JournalSync.objects.values_list('objet_id', 'version')), [])
+            reprise.set()
+            premier.join(5)
+            second.join(5)
+        self.assertEqual(list(JournalSync.objects.order_by('version').values_list('objet_id', 'version')), [(1, 1), (2, 2)])
+
+
+class IdempotenceTestCase(DonneesTestMixin, TestCase):
+    """Tests des écritures rejouables (Idempotency-Key) et de l'envoi groupé /api/outbox/"""
+
+    def setUp(self):
+        self.creer_donnees_de_base()
+        self.pret = Pret.objects.create(
+            membre=self.membre, caisse=self.caisse, montant_demande=Decimal('10000'),
+            montant_accord=Decimal('10000'), duree_mois=6, motif='Commerce', statut='EN_COURS'
+        )
+        self.admin = User.objects.create_superuser('idem', 'idem@test.com', 'idem123')
+        self.client.force_login(self.admin)
+
+    def rembourser(self, cle, montant='1000'):
+        return self.client.post(
+            f'/gestion-caisses/api/prets/{self.pret.pk}/rembourser/', {'montant': montant},
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY=cle
+        )
+
+    def test_remboursement_rejoue_sans_double_credit(self):
+        premiere = self.rembourser('remb-1')
+        self.assertEqual(premiere.status_code, 200)
+        renvoi = self.rembourser('remb-1')
+        self.assertEqual(renvoi.status_code, 200)
+        self.assertEqual(renvoi['Idempotent-Replay'], 'true')
+        self.assertEqual(renvoi.json()['mouvement_id'], premiere.json()['mouvement_id'])
+
+        self.caisse.refresh_from_db()
+        self.assertEqual(self.caisse.fond_disponible, Decimal('101000'))
+        self.assertEqual(MouvementFond.objects.filter(caisse=self.caisse, type_mouvement='REMBOURSEMENT').count(), 1)
+
+        # Même clé, autre montant: refusé sans écriture
+        self.assertEqual(self.rembourser('remb-1', montant='2000').status_code, 422)
+        # Échec: la clé n'est pas conservée, l'opération corrigée peut être renvoyée
+        self.assertEqual(self.rembourser('remb-2', montant='999999').status_code, 400)
+        self.assertFalse(CleIdempotence.objects.filter(cle='remb-2').exists())
+
+    def test_outbox_resultats_par_operation(self):
+        ExerciceCaisse.objects.create(caisse=self.caisse, date_debut=date.today())
+        seance = SeanceReunion.objects.create(caisse=self.caisse, date_seance=date.today())
+        operations = [
+            {'cle': 'cot-1', 'type': 'cotisation', 'donnees': {
+                'membre_id': self.membre.pk, 'caisse_id': self.caisse.pk, 'seance_id': seance.pk,
+                'prix_tempon': '500',
+            }},
+            {'cle': 'remb-1', 'type': 'remboursement', 'pret_id': self.pret.pk, 'donnees': {'montant': 1000}},
+            {'cle': 'remb-2', 'type': 'remboursement', 'pret_id': self.pret.pk, 'donnees': {'montant': 999999}},
+            {'cle': 'inconnu', 'type': 'depense', 'donnees': {}},
+        ]
+        response = self.client.post('/gestion-caisses/api/outbox/', {'operations': operations}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        statuts = [resultat['statut'] for resultat in response.json()['resultats']]
+        self.assertEqual(statuts, [201, 200, 400, 400])
+
+        # Lot renvoyé (réponse perdue): les opérations acceptées sont rejouées sans nouvelle écriture
+        response = self.client.post('/gestion-caisses/api/outbox/', {'operations': operations[:2]}, content_type='application/json')
+        self.assertEqual([resultat['rejoue'] for resultat in response.json()['resultats']], [True, True])
+        self.assertEqual(Cotisation.objects.filter(seance=seance).count(), 1)
+        self.pret.refresh_from_db()
+        self.assertEqual(self.pret.montant_rembourse, Decimal('1000'))
+
+    def test_cle_directe_reprise_par_la_file(self):
+        """Formulaire hors ligne: la file renvoie la clé de l'envoi direct, déjà reçu, sans double écriture"""
+        ExerciceCaisse.objects.create(caisse=self.caisse, date_debut=date.today())
+        seance = SeanceReunion.objects.create(caisse=self.caisse, date_seance=date.today())
+        cotisation = {'membre_id': self.membre.pk, 'caisse_id': self.caisse.pk, 'seance_id': seance.pk, 'prix_tempon': 500}
+        response = self.client.post('/gestion-caisses/api/cotisations/', cotisation,
+                                    content_type='application/json', HTTP_IDEMPOTENCY_KEY='form-cot')
+        self.assertEqual(response.status_code, 201)
+        self.client.post(f'/gestion-caisses/api/prets/{self.pret.pk}/rembourser/', {'montant': 1000},
+                         content_type='application/json', HTTP_IDEMPOTENCY_KEY='form-remb')
+
+        operations = [
+            {'cle': 'form-cot', 'type': 'cotisation', 'donnees': cotisation},
+            {'cle': 'form-remb', 'type': 'remboursement', 'pret_id': self.pret.pk, 'donnees': {'montant': 1000, 'interet': 0}},
+        ]
+        response = self.client.post('/gestion-caisses/api/outbox/', {'operations': operations}, content_type='application/json')
+        self.assertEqual([(r['statut'], r['rejoue']) for r in response.json()['resultats']], [(201, True), (200, True)])
+        self.assertEqual(Cotisation.objects.filter(seance=seance).count(), 1)
+        self.pret.refresh_from_db()
+        self.assertEqual(self.pret.montant_rembourse, Decimal('1000'))
+
+
+class TempsImportTestCase(SimpleTestCase):
+    """Démarrage d'un worker (django.setup() + URLconf) mesuré par ``python -X importtime``"""
+
+    # Plafond large (machine de CI lente); sans ReportLab le démarrage mesure ~0,4 s ici, ~0,8 s avec
+    PLAFOND_MS = 2500
+    MOTEURS_DIFFERES = ('reportlab', 'openpyxl')
+
+    def test_demarrage_sans_moteurs_de_rendu(self):
+        code = 'import django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns'
+        environnement = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'caisses_femmes.test_settings'}
+        resultat = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=settings.BASE_DIR, env=environnement, capture_output=True, text=True, timeout=120,
+        )
+        self.assertEqual(resultat.returncode, 0, resultat.stderr[-2000:])
+
+        modules, total_us = [], 0
+        for ligne in resultat.stderr.splitlines():
+            correspondance = re.match(r'import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)', ligne)
+            if correspondance:
+                modules.append(correspondance.group(3))
+                # Imports de premier niveau: leur temps cumulé couvre tout le démarrage
+                if len(correspondance.group(2)) == 1:
+                    total_us += int(correspondance.group(1))
+
+        charges = sorted({nom for nom in modules if nom.split('.')[0] in self.MOTEURS_DIFFERES})
+        self.assertEqual(charges, [], "Moteurs de rendu importés au démarrage (passer par documents.py)")
+        self.assertLess(total_us / 1000, self.PLAFOND_MS)
+
+
+class RendusJSONTestCase(SimpleTestCase):
+    """Tests du rendu / de la lecture JSON rapides (orjson si installé, module json sinon)"""
+
+    def moteurs(self):
+        from . import rendus
+        return [rendus.orjson, None] if rendus.orjson is not None else [None]
+
+    def test_decimaux_et_dates_aux_formats_de_l_api(self):
+        from unittest import mock
+        from . import rendus
+
+        donnees = {
+            'montant': Decimal('1500.50'),
+            'echeances': [{'date': date(2025, 1, 31), 'paiement': datetime(2025, 1, 31, 23, 30, tzinfo=dt_timezone.utc)}],
+            'statut': 'PAYE',
+        }
+        for moteur in self.moteurs():
+            with self.subTest(orjson=moteur is not None), mock.patch.object(rendus, 'orjson', moteur):
+                contenu = rendus.JSONRapideRenderer().render(donnees, 'application/json')
+                # Africa/Lome (UTC): même heure locale
+                self.assertEqual(json.loads(contenu), {
+                    'montant': 1500.5,
+                    'echeances': [{'date': '31/01/2025', 'paiement': '31/01/2025 23:30'}],
+                    'statut': 'PAYE',
+                })
+                self.assertEqual(rendus.JSONRapideParser().parse(BytesIO(b'{"a": [1, "\xc3\xa9"]}')), {'a': [1, 'é']})
+                with self.assertRaises(ParseError):
+                    rendus.JSONRapideParser().parse(BytesIO(b'{"a": NaN'))
+
+
+class ListesPlatesTestCase(DonneesTestMixin, TestCase):
+    """Tests des listes à plat (.values()): sortie identique aux sérialiseurs de liste"""
+
+    def setUp(self):
+        self.creer_donnees_de_base()
+        ExerciceCaisse.objects.create(caisse=self.caisse, date_debut=date.today())
+        self.pret = Pret.objects.create(
+            membre=self.membre, caisse=self.caisse, montant_demande=Decimal('10000'),
+            montant_accord=Decimal('10000'), taux_interet=Decimal('2.50'), duree_mois=6,
+            motif='Commerce', statut='EN_COURS', montant_rembourse=Decimal('1000')
+        )
+        Pret.objects.create(membre=self.membre, caisse=self.caisse, montant_demande=Decimal('5000'), duree_mois=3, motif='Test')
+        MouvementFond.objects.create(
+            caisse=self.caisse, type_mouvement='REMBOURSEMENT', montant=Decimal('1500'),
+            solde_avant=Decimal('0'), solde_apres=Decimal('1500'), pret=self.pret
+        )
+        self.admin = User.objects.create_superuser('plat', 'plat@test.com', 'plat123')
+        Notification.objects.create(destinataire=self.admin, type_notification='DEMANDE_PRET', titre='Sans lien', message='m')
+        Notification.objects.create(
+            destinataire=self.admin, type_notification='DEMANDE_PRET', titre='Liée', message='m',
+            caisse=self.caisse, pret=self.pret
+        )
+        self.client.force_login(self.admin)
+
+    def lister(self, url, plat):
+        with override_settings(LISTES_PLATES=plat):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_sortie_identique_champ_par_champ(self):
+        for url in [
+            '/gestion-caisses/api/caisses/', '/gestion-caisses/api/membres/', '/gestion-caisses/api/prets/',
+            '/gestion-caisses/api/notifications/', '/gestion-caisses/api/notifications/?curseur=',
+            '/gestion-caisses/api/prets/?fields=id,montant_restant,membre_nom',
+        ]:
+            with self.subTest(url=url):
+                reference, plate = self.lister(url, False), self.lister(url, True)
+                self.assertEqual(plate.keys(), reference.keys())
+                self.assertEqual(len(plate['results']), len(reference['results']))
+                self.assertTrue(reference['results'])
+                for attendu, obtenu in zip(reference['results'], plate['results']):
+                    self.assertEqual(list(obtenu), list(attendu))
+                    for champ, valeur in attendu.items():
+                        self.assertEqual(obtenu[champ], valeur, champ)
+
+    def test_montants_sans_requete_par_pret(self):
+        for _ in range(3):
+            Pret.objects.create(
+                membre=self.membre, caisse=self.caisse, montant_demande=Decimal('1000'),
+                montant_accord=Decimal('1000'), duree_mois=2, motif='Test', statut='EN_COURS'
+            )
+        compte = {}
+        for plat in (False, True):
+            with override_settings(LISTES_PLATES=plat), CaptureQueriesContext(connection) as requetes:
+                self.client.get('/gestion-caisses/api/prets/')
+            compte[plat] = len(requetes.captured_queries)
+        # montant_restant: une agrégation par prêt avec le sérialiseur, une sous-requête à plat
+        self.assertLessEqual(compte[True] + 4, compte[False])
+
+
+class StatistiquesCaissesTestCase(DonneesTestMixin, TestCase):
+    """Tests du recalcul en masse des totaux des caisses"""
+
+    def setUp(self):
+        self.creer_donnees_de_base()
+        for statut, accord, rembourse in [
+            ('EN_COURS', '10000', '2000'), ('EN_RETARD', '5000', '0'),
+            ('REMBOURSE', '8000', '8400'), ('EN_ATTENTE', '3000', '0'),
+        ]:
+            Pret.objects.create(
+                membre=self.membre, caisse=self.caisse, montant_demande=Decimal(accord),
+                montant_accord=Decimal(accord), duree_mois=6, motif='Test', statut=statut,
+                montant_rembourse=Decimal(rembourse)
+            )
+        self.caisse_vide = Caisse.objects.create(
+            nom_association='Caisse sans prêt', region=self.region, prefecture=self.prefecture,
+            commune=self.commune, canton=self.canton, village=self.village, agent=self.agent,
+            fond_initial=50000, statut='ACTIVE'
+        )
+
+    def test_totaux_et_seules_caisses_modifiees_ecrites(self):
+        resultat = StatistiquesService.recalculer_totaux_caisses()
+        self.caisse.refresh_from_db()
+        self.assertEqual(self.caisse.montant_total_prets, Decimal('15000'))
+        self.assertEqual(self.caisse.montant_total_remboursements, Decimal('8400'))
+        self.assertEqual(resultat['total_prets'], Decimal('15000'))
+        self.assertEqual(resultat['caisses'], 2)
+        self.assertEqual(resultat['caisses_modifiees'], 1)
+        self.assertEqual(set(resultat['durees_ms']), {'agregation', 'comparaison', 'ecriture'})
+
+        # Rien n'a changé: aucune écriture
+        with CaptureQueriesContext(connection) as requetes:
+            resultat = StatistiquesService.recalculer_totaux_caisses()
+        self.assertEqual(resultat['caisses_modifiees'], 0)
+        self.assertEqual(len(requetes.captured_queries), 2)
+
+    def test_nombre_de_requetes_independant_des_caisses(self):
+        Caisse.objects.update(montant_total_prets=1, montant_total_remboursements=1)
+        with CaptureQueriesContext(connection) as requetes:
+            resultat = StatistiquesService.recalculer_totaux_caisses(taille_lot=1)
+        self.assertEqual(resultat['caisses_modifiees'], 2)
+        # agrégation, lecture des caisses, un UPDATE par lot (+ savepoint)
+        self.assertLessEqual(len(requetes.captured_queries), 6)
+        self.caisse_vide.refresh_from_db()
+        self.assertEqual(self.caisse_vide.montant_total_prets, 0)
+
+
+class TachesExclusivesTestCase(TestCase):
+    """Tests du verrou des tâches planifiées et de l'historique TaskRun"""
+
+    def test_execution_inscrite(self):
+        @planification.tache_exclusive(nom='test.compter')
+        def compter():
+            return 7
+
+        self.assertEqual(compter(), 7)
+        execution = TaskRun.objects.get(nom='test.compter')
+        self.assertEqual(execution.statut, 'SUCCES')
+        self.assertEqual(execution.lignes_traitees, 7)
+        self.assertIsNotNone(execution.duree_ms)
+        self.assertIsNotNone(execution.date_fin)
+
+    def test_chevauchement_ignore(self):
+        appels = []
+
+        @planification.tache_exclusive(nom='test.occupee')
+        def tache():
+            appels.append(1)
+
+        with planification.verrou('test.occupee') as obtenu:
+            self.assertTrue(obtenu)
+            self.assertIsNone(tache())
+        self.assertEqual(appels, [])
+        self.assertEqual(TaskRun.objects.get(nom='test.occupee').statut, 'IGNOREE')
+
+        # Verrou libéré: l'exécution suivante a lieu
+        tache()
+        self.assertEqual(appels, [1])
+
+    def test_reprise_apres_echec(self):
+        vus = []
+
+        @planification.tache_exclusive(nom='test.lots')
+        def traiter(echouer_apres=None):
+            position = planification.point_reprise(0)
+            for lot in range(position + 1, 5):
+                if lot == echouer_apres:
+                    raise RuntimeError('arrêt')
+                vus.append(lot)
+                planification.enregistrer_point(lot, lignes=10)
+            return len(vus)
+
+        with self.assertRaises(RuntimeError):
+            traiter(echouer_apres=3)
+        echec = TaskRun.objects.get(nom='test.lots')
+        self.assertEqual((echec.statut, echec.point_reprise, echec.lignes_traitees), ('ECHEC', 2, 20))
+        self.assertIn('RuntimeError', echec.erreur)
+
+        traiter()
+        self.assertEqual(vus, [1, 2, 3, 4])
+        reprise = TaskRun.objects.filter(nom='test.lots').latest('pk')
+        self.assertEqual((reprise.statut, reprise.point_reprise, reprise.lignes_traitees), ('SUCCES', None, 20))
+
+    def test_execution_abandonnee_marquee_interrompue(self):
+        TaskRun.objects.create(nom='test.abandon', date_debut=timezone.now(), point_reprise=42)
+
+        @planification.tache_exclusive(nom='test.abandon')
+        def tache():
+            return planification.point_reprise()
+
+        self.assertEqual(tache(), 42)
+        self.assertEqual(
+            list(TaskRun.objects.filter(nom='test.abandon').order_by('pk').values_list('statut', flat=True)),
+            ['INTERROMPUE', 'SUCCES'],
+        )
+
+    def test_bail_tenu_par_un_autre_worker(self):
+        """Le bail est en base: un autre processus le voit, jusqu'à son expiration"""
+        VerrouTache.objects.create(nom='test.bail', detenteur='autre', expiration=timezone.now() + timedelta(minutes=5))
+        with planification.verrou('test.bail') as obtenu:
+            self.assertFalse(obtenu)
+        self.assertEqual(VerrouTache.objects.get(nom='test.bail').detenteur, 'autre')
+
+        VerrouTache.objects.filter(nom='test.bail').update(expiration=timezone.now() - timedelta(seconds=1))
+        with planification.verrou('test.bail', duree=60) as obtenu:
+            self.assertTrue(obtenu)
+            with planification.verrou('test.bail') as deuxieme:
+                self.assertFalse(deuxieme)
+        self.assertEqual(VerrouTache.objects.get(nom='test.bail').detenteur, '')
+
+    def test_bail_prolonge_par_les_points_de_reprise(self):
+        @planification.tache_exclusive(nom='test.longue', duree_verrou=60)
+        def longue():
+            bail = VerrouTache.objects.get(nom='test.longue')
+            VerrouTache.objects.filter(pk=bail.pk).update(expiration=timezone.now() + timedelta(seconds=1))
+            planification.enregistrer_point(1)
+            return VerrouTache.objects.get(pk=bail.pk).expiration
+
+        self.assertGreater(longue(), timezone.now() + timedelta(seconds=30))
+
+
+class MetriquesTestCase(DonneesTestMixin, TestCase):
+    """Tests de l'endpoint /metrics (format texte Prometheus)"""
+
+    def setUp(self):
+        self.creer_donnees_de_base()
+
+    def valeur(self, texte, serie):
+        for ligne in texte.splitlines():
+            if ligne.startswith(serie + ' '):
+                return float(ligne.rsplit(' ', 1)[1])
+        return 0.0
+
+    def test_latence_par_vue_et_acces_interne(self):
+        serie = 'gestion_caisses_http_duree_secondes_count{vue="login_view",methode="GET",statut="200"}'
+        avant = self.valeur(self.client.get('/metrics').content.decode(), serie)
+        self.client.get('/gestion-caisses/login/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texte = response.content.decode()
+        self.assertEqual(self.valeur(texte, serie), avant + 1)
+        self.assertIn('# TYPE gestion_caisses_http_duree_secondes histogram', texte)
+        self.assertIn('gestion_caisses_http_duree_secondes_bucket{vue="login_view",methode="GET",statut="200",le="+Inf"}', texte)
+        self.assertIn('gestion_caisses_sql_requetes_total{vue="login_view"}', texte)
+
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5').status_code, 403)
+
+    def test_acces_proxy_refuse_et_jeton(self):
+        """Le proxy (adresse privée) n'est pas autorisé par défaut; le jeton s'ajoute à l'adresse"""
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='172.18.0.5').status_code, 403)
+        with override_settings(METRIQUES_RESEAUX=['10.0.0.7/32'], METRIQUES_JETON='secret'):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.7').status_code, 403)
+            self.assertEqual(self.client.get(
+                '/metrics', REMOTE_ADDR='10.0.0.7', HTTP_AUTHORIZATION='Bearer faux').status_code, 403)
+            self.assertEqual(self.client.get(
+                '/metrics', REMOTE_ADDR='10.0.0.7', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+            self.assertEqual(self.client.get(
+                '/metrics', REMOTE_ADDR='10.0.0.8', HTTP_AUTHORIZATION='Bearer secret').status_code, 403)
+
+    def test_operations_comptees_apres_commit(self):
+        serie = 'gestion_caisses_operations_total{type="remboursement"}'
+        avant = self.valeur(metriques.exposer(), serie)
+        with self.captureOnCommitCallbacks(execute=True):
+            for type_mouvement in ('REMBOURSEMENT', 'FRAIS'):
+                MouvementFond.objects.create(
+                    caisse=self.caisse, type_mouvement=type_mouvement, montant=Decimal('2500'),
+                    solde_avant=Decimal('0'), solde_apres=Decimal('2500')
+                )
+        self.assertEqual(self.valeur(metriques.exposer(), serie), avant + 1)
+
+    def test_mode_repertoire_additionne_les_processus(self):
+        serie = 'gestion_caisses_operations_total{type="cotisation"}'
+        with tempfile.TemporaryDirectory() as repertoire, \
+                override_settings(METRIQUES_MODE='repertoire', METRIQUES_REPERTOIRE=repertoire):
+            # Totaux écrits par un autre worker
+            with open(os.path.join(repertoire, '1.json'), 'w') as fichier:
+                json.dump({json.dumps(['gestion_caisses_operations_total', ['cotisation']]): 3}, fichier)
+            metriques.noter_operation('cotisation', 100)
+            texte = metriques.exposer()
+            self.assertTrue(os.path.exists(os.path.join(repertoire, f'{os.getpid()}.json')))
+        self.assertEqual(self.valeur(texte, serie), 4)
+        # Revenir au stockage mémoire: le répertoire temporaire est supprimé
+        metriques.exposer()
+
+
+class RoutageRapportsTestCase(SimpleTestCase):
+    """Tests du routeur des lectures de rapports vers la réplique"""
+
+    def setUp(self):
+        from unittest import mock
+
+        self.routeur = routage.RouteurRapports()
+        disponible = mock.patch.object(routage, 'replique_utilisable', return_value=True)
+        disponible.start()
+        self.addCleanup(disponible.stop)
+
+    def test_lectures_des_rapports_sur_la_replique(self):
+        self.assertEqual(self.routeur.db_for_read(Pret), 'default')
+        with routage.lecture_rapports():
+            self.assertEqual(self.routeur.db_for_read(Pret), 'reporting')
+            # Sessions et utilisateurs restent sur la base principale
+            self.assertEqual(self.routeur.db_for_read(User), 'default')
+            self.assertEqual(self.routeur.db_for_write(Pret), 'default')
+        self.assertEqual(self.routeur.db_for_read(Pret), 'default')
+
+    def test_lecture_de_ses_propres_ecritures(self):
+        with routage.requete():
+            with routage.lecture_rapports():
+                self.assertEqual(self.routeur.db_for_read(Pret), 'reporting')
+            self.routeur.db_for_write(Cotisation)
+            with routage.lecture_rapports():
+                self.assertEqual(self.routeur.db_for_read(Pret), 'default')
+        # Requête suivante: la réplique sert de nouveau les rapports
+        with routage.requete(), routage.lecture_rapports():
+            self.assertEqual(self.routeur.db_for_read(Pret), 'reporting')
+
+
+class RepliqueRapportsTestCase(SimpleTestCase):
+    """Disponibilité de la réplique: absente, ou copie SQLite en retard"""
+
+    def test_replique_absente(self):
+        self.assertFalse(routage.replique_utilisable('reporting'))
+        with routage.lecture_rapports():
+            self.assertEqual(routage.RouteurRapports().db_for_read(Pret), 'default')
+
+    def test_retard_copie_sqlite(self):
+        with tempfile.TemporaryDirectory() as repertoire:
+            principale = os.path.join(repertoire, 'db.sqlite3')
+            replique = os.path.join(repertoire, 'replique.sqlite3')
+            for chemin in (principale, replique):
+                open(chemin, 'wb').close()
+            maintenant = time.time()
+            os.utime(principale, (maintenant, maintenant))
+            os.utime(replique, (maintenant - 120, maintenant - 120))
+            self.assertEqual(round(routage.retard_sqlite(principale, replique)), 120)
+            os.utime(replique, (maintenant + 1, maintenant + 1))
+            self.assertEqual(routage.retard_sqlite(principale, replique), 0)
+
+    @override_settings(RAPPORTS_VERIFICATION_INTERVALLE=0, RAPPORTS_RETARD_MAX=30)
+    def test_journalise_aux_changements_etat(self):
+        """Une réplique en retard n'est journalisée qu'au passage en retard puis au rétablissement"""
+        from unittest import mock
+        with mock.patch.dict(settings.DATABASES, {'essai': settings.DATABASES['default']}), \
+                mock.patch.dict(routage._sante, clear=True), \
+                mock.patch.object(routage, 'retard_replique', side_effect=[120, 200, 300, 0, 0]):
+            with self.assertLogs('gestion_caisses.routage', level='INFO') as journaux:
+                etats = [routage.replique_utilisable('essai') for _ in range(5)]
+        self.assertEqual(etats, [False, False, False, True, True])
+        self.assertEqual([ligne.split(':')[0] for ligne in journaux.output], ['WARNING', 'INFO'])
+
+
+class SoldesTestCase(DonneesTestMixin, TestCase):
+    """Soldes à une date passée: points de solde et mouvements postérieurs"""
+
+    def setUp(self):
+        self.creer_donnees_de_base()
+        self.aujourdhui = timezone.localdate()
+        Caisse.objects.filter(pk=self.caisse.pk).update(
+            date_creation=soldes.fin_de_journee(self.aujourdhui - timedelta(days=30))
+        )
+        solde = Decimal('100000')
+        for jours, type_mouvement, montant in [
+            (10, 'ALIMENTATION', '1000'), (5, 'DECAISSEMENT', '500'), (1, 'REMBOURSEMENT', '200'),
+        ]:
+            mouvement = MouvementFond.objects.create(
+                caisse=self.caisse, type_mouvement=type_mouvement, montant=Decimal(montant),
+                solde_avant=solde, solde_apres=solde, description='Test',
+            )
+            solde = mouvement.solde_apres
+            MouvementFond.objects.filter(pk=mouvement.pk).update(
+                date_mouvement=soldes.fin_de_journee(self.aujourdhui - timedelta(days=jours)) - timedelta(hours=12)
+            )
+
+    def fin(self, jours):
+        return soldes.fin_de_journee(self.aujourdhui - timedelta(days=jours))
+
+    def test_soldes_sans_point(self):
+        self.assertEqual(soldes.soldes_au(self.fin(20)), {self.caisse.pk: Decimal('100000')})
+        self.assertEqual(soldes.soldes_au(self.fin(7))[self.caisse.pk], Decimal('101000'))
+        self.assertEqual(soldes.soldes_au()[self.caisse.pk], Decimal('100700'))
+        # Caisse inexistante à cette date
+        self.assertEqual(soldes.soldes_au(self.fin(40)), {})
+
+    def test_point_puis_mouvements_posterieurs(self):
+        self.assertEqual(soldes.enregistrer_points(self.aujourdhui - timedelta(days=7)), 2)
+        point = BalanceCheckpoint.objects.get(caisse=self.caisse)
+        self.assertEqual(point.solde, Decimal('101000'))
+        # Le point est lu tel quel: seuls les mouvements postérieurs sont ajoutés
+        BalanceCheckpoint.objects.filter(pk=point.pk).update(solde=1)
+        self.assertEqual(soldes.soldes_au(self.fin(6))[self.caisse.pk], 1)
+        self.assertEqual(soldes.soldes_au(self.fin(3))[self.caisse.pk], Decimal('100500'))
+
+        with CaptureQueriesContext(connection) as requetes:
+            soldes.soldes_au()
+        self.assertLessEqual(len(requetes.captured_queries), 4)
+
+    def test_mouvements_posterieurs_bornes_par_caisse(self):
+        """Une caisse sans mouvement ne ramène pas la lecture des autres caisses au début du grand livre"""
+        vide = Caisse.objects.create(
+            nom_association='Association Vide', region=self.region, prefecture=self.prefecture,
+            commune=self.commune, canton=self.canton, village=self.village, agent=self.agent,
+            fond_initial=5000, statut='ACTIVE',
+        )
+        Caisse.objects.filter(pk=vide.pk).update(date_creation=self.fin(30))
+        soldes.enregistrer_points(self.aujourdhui - timedelta(days=7))
+        self.assertIsNone(BalanceCheckpoint.objects.get(caisse=vide).mouvement_id)
+        self.assertIsNotNone(BalanceCheckpoint.objects.get(caisse=self.caisse).mouvement_id)
+
+        with CaptureQueriesContext(connection) as requetes:
+            valeurs = soldes.soldes_au(self.fin(3))
+        self.assertEqual(valeurs, {self.caisse.pk: Decimal('100500'), vide.pk: Decimal('5000')})
+        delta = next(
+            requete['sql'] for requete in requetes.captured_queries
+            if 'MAX(' in requete['sql'] and 'mouvementfond' in requete['sql']
+        )
+        self.assertNotIn('"id" >', delta)
+        self.assertIn('"date_mouvement" >', delta)
+
+    def test_points_manquants_et_historique(self):
+        with self.settings(SOLDES_JOURS_CONSERVES=12):
+            # Premier passage: hier seulement; ensuite, les jours manqués depuis le dernier point
+            self.assertEqual(soldes.enregistrer_points_manquants(self.aujourdhui - timedelta(days=12)), 2)
+            self.assertEqual(soldes.enregistrer_points_manquants(), 2 * 11)
+        courbe = soldes.historique(self.caisse.pk, self.aujourdhui - timedelta(days=11), self.aujourdhui)
+        self.assertEqual(len(courbe), 12)
+        self.assertEqual(courbe[0][1], Decimal('100000'))
+        self.assertEqual(courbe[5][1], Decimal('101000'))
+        self.assertEqual(courbe[6][1], Decimal('100500'))
+        self.assertEqual(courbe[-1][1], Decimal('100700'))
+
+    def test_reserve_caisse_generale(self):
+        mouvement = CaisseGeneraleMouvement.objects.create(type_mouvement='ENTREE', montant=Decimal('5000'))
+        CaisseGeneraleMouvement.objects.filter(pk=mouvement.pk).update(date_mouvement=self.fin(4))
+        self.assertEqual(soldes.solde_reserve_au(self.fin(5)), 0)
+        soldes.enregistrer_points(self.aujourdhui - timedelta(days=2))
+        self.assertEqual(BalanceCheckpoint.objects.get(caisse__isnull=True).solde, Decimal('5000'))
+        self.assertEqual(soldes.solde_reserve_au(), Decimal('5000'))
+
+    def test_rapport_financier_soldes_periode(self):
+        from .views import generer_rapport_financier_caisse, generer_rapport_financier_global
+
+        debut, fin = self.aujourdhui - timedelta(days=6), self.aujourdhui - timedelta(days=2)
+        rapport = generer_rapport_financier_caisse(self.caisse, debut, fin)
+        self.assertEqual(rapport['soldes_periode'], {'ouverture': 101000.0, 'cloture': 100500.0})
+        self.assertEqual([ligne['solde'] for ligne in rapport['mouvements']['evolution']], [100500.0])
+        rapport = generer_rapport_financier_global(debut, fin)
+        self.assertEqual(rapport['soldes_periode'], {'ouverture': 101000.0, 'cloture': 100500.0})
+        self.assertEqual(rapport['par_caisse'][0]['solde_ouverture'], 101000.0)
+
+    def test_api_soldes(self):
+        admin = User.objects.create_superuser('admin_soldes', 'a@test.com', 'x')
+        self.client.force_login(admin)
+        reponse = self.client.get('/gestion-caisses/api/soldes/', {'date': str(self.aujourdhui - timedelta(days=7))})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.json()['soldes'][0]['solde'], 101000.0)
+        self.assertEqual(reponse.json()['reserve'], 0)
+        reponse = self.client.get('/gestion-caisses/api/soldes/historique/', {'caisse': self.caisse.pk, 'pas': 'mois'})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.json()['points'][-1]['solde'], 100700.0)
+        reponse = self.client.get('/gestion-caisses/api/soldes/', {'date': '07/2025'})
+        self.assertEqual(reponse.status_code, 400)
+
+
+class IntegriteTestCase(DonneesTestMixin, TestCase):
+    """Vérification d'intégrité du grand livre: chaîne des soldes, fond disponible, prêts"""
+
+    def setUp(self):
+        # Journal de synchronisation écrit au commit (vérification incrémentale)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.creer_donnees_de_base()
+            self.pret = Pret.objects.create(
+                membre=self.membre, caisse=self.caisse, montant_demande=Decimal('5000'),
+                montant_accord=Decimal('5000'), duree_mois=6, motif='Test', statut='EN_COURS',
+                montant_rembourse=Decimal('5000'),
+            )
+            solde = Decimal('100000')
+            for type_mouvement, montant, interet, description in [
+                ('DECAISSEMENT', '5000', '0', 'Décaissement'),
+                ('REMBOURSEMENT', '5500', '500', 'Remboursement du prêt'),
+            ]:
+                mouvement = MouvementFond.objects.create(
+                    caisse=self.caisse, type_mouvement=type_mouvement, montant=Decimal(montant),
+                    interet_rembourse=Decimal(interet), solde_avant=solde, solde_apres=solde,
+                    pret=self.pret, description=description,
+                )
+                solde = mouvement.solde_apres
+        Caisse.objects.filter(pk=self.caisse.pk).update(fond_disponible=solde)
+
+    def resultat(self, verification):
+        return verification.resultats.get(caisse=self.caisse)
+
+    def test_grand_livre_conforme(self):
+        verification = integrite.verifier(incrementale=False)
+        self.assertEqual(verification.statut, 'TERMINEE')
+        self.assertEqual(verification.caisses_verifiees, 1)
+        resultat = self.resultat(verification)
+        self.assertEqual((resultat.statut, resultat.mouvements, resultat.prets), ('OK', 2, 1))
+        # Caisse générale vérifiée à part
+        self.assertTrue(verification.resultats.filter(caisse__isnull=True).exists())
+
+    def test_remboursement_avec_interet(self):
+        self.caisse.refresh_from_db()
+        pret = Pret.objects.create(
+            membre=self.membre, caisse=self.caisse, montant_demande=Decimal('10000'),
+            montant_accord=Decimal('10000'), taux_interet=Decimal('10'), duree_mois=6, motif='Test',
+            statut='EN_COURS',
+        )
+        PretService.rembourser_pret(pret, None, Decimal('4000'), interet=Decimal('500'))
+        mouvement = MouvementFond.objects.get(pret=pret)
+        self.assertEqual((mouvement.montant, mouvement.interet_rembourse), (Decimal('4500'), Decimal('500')))
+        self.assertEqual(self.resultat(integrite.verifier(incrementale=False)).statut, 'OK')
+
+    def test_anomalies_detectees(self):
+        MouvementFond.objects.filter(type_mouvement='REMBOURSEMENT').update(solde_avant=Decimal('96000'))
+        Caisse.objects.filter(pk=self.caisse.pk).update(fond_disponible=Decimal('1'))
+        Pret.objects.filter(pk=self.pret.pk).update(montant_rembourse=Decimal('4000'))
+        resultat = self.resultat(integrite.verifier(incrementale=False))
+        self.assertEqual(resultat.statut, 'ANOMALIE')
+        self.assertEqual(
+            sorted(anomalie['type'] for anomalie in resultat.anomalies),
+            ['CALCUL_MOUVEMENT', 'CHAINE_SOLDES', 'FOND_DISPONIBLE', 'REMBOURSEMENTS_PRET'],
+        )
+
+    def test_incrementale_caisses_modifiees(self):
+        integrite.verifier()
+        verification = integrite.verifier()
+        self.assertEqual((verification.caisses_verifiees, verification.caisses_ignorees), (0, 1))
+
+        # Nouveau mouvement: le journal de synchronisation de la caisse avance
+        with self.captureOnCommitCallbacks(execute=True):
+            MouvementFond.objects.create(
+                caisse=self.caisse, type_mouvement='FRAIS', montant=Decimal('100'),
+                solde_avant=Decimal('100500'), solde_apres=0, description='Frais',
+            )
+        verification = integrite.verifier()
+        self.assertEqual(verification.caisses_verifiees, 1)
+        self.assertEqual(self.resultat(verification).statut, 'ANOMALIE')
+
+        # Fond disponible corrigé hors journal: revérifiée aussi
+        Caisse.objects.filter(pk=self.caisse.pk).update(fond_disponible=Decimal('100400'))
+        verification = integrite.verifier()
+        self.assertEqual(verification.caisses_verifiees, 1)
+        self.assertEqual(self.resultat(verification).statut, 'OK')
+
+    def test_vue_verifier_integrite(self):
+        admin = User.objects.create_superuser('admin_integrite', 'a@test.com', 'x')
+        self.client.force_login(admin)
+        reponse = self.client.get('/gestion-caisses/admin/verifier-integrite/', {'mode': 'complete'})
+        self.assertEqual(reponse.status_code, 302)
+        verification = VerificationIntegrite.objects.get()
+        self.assertFalse(verification.incrementale)
+        self.assertEqual(verification.utilisateur, admin)
+
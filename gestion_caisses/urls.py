@@ -115,6 +115,16 @@ urlpatterns = [
     path('attestation-remboursement/<int:pret_id>/pdf/', views.generate_attestation_remboursement_pdf, name='attestation_remboursement_pdf'),
     path('guide-application.pdf', views.generate_application_guide, name='guide_application_pdf'),
     
+    # Hiérarchie géographique complète (cache + ETag)
+    path('api/geo/tree/', views.geo_arbre, name='geo_arbre'),
+    # Synchronisation différentielle de l'application hors ligne (PWA)
+    path('api/sync/', views.synchronisation_api, name='synchronisation_api'),
+    path('api/outbox/', views.outbox_api, name='outbox_api'),
+    path('api/soldes/', views.soldes_api, name='soldes_api'),
+    path('api/soldes/historique/', views.soldes_historique_api, name='soldes_historique_api'),
+
     # API REST (inclut toutes les routes du routeur)
+    # Flux SSE / long-poll des compteurs de la cloche (avant le routeur: 'flux' n'est pas un identifiant)
+    path('api/notifications/flux/', views.notifications_flux, name='notifications_flux'),
     path('api/', include(router.urls)),
 ]
@@ -12,7 +12,7 @@ from datetime import datetime
 from reportlab.pdfgen import canvas
 import logging
 from django.utils import timezone
-from .models import Parametre
+from .parametres import get_parametres_application
 from reportlab.platypus import Table as RLTable, TableStyle as RLTableStyle
 from reportlab.graphics.shapes import Drawing
 from reportlab.graphics.charts.barcharts import VerticalBarChart
@@ -52,78 +52,6 @@ def validate_image_file(image_field):
         return False
 
 
-def get_parametres_application():
-    """
-    Récupère les paramètres actifs de l'application.
-    Retourne un dictionnaire avec les valeurs par défaut si aucun paramètre n'est configuré.
-    """
-    try:
-        parametres = Parametre.get_parametres_actifs()
-        if parametres:
-            return {
-                'nom_application': parametres.nom_application,
-                'logo': parametres.logo,
-                'description_application': parametres.description_application,
-                'version_application': parametres.version_application,
-                'telephone_principal': parametres.telephone_principal,
-                'telephone_secondaire': parametres.telephone_secondaire,
-                'email_contact': parametres.email_contact,
-                'site_web': parametres.site_web,
-                'siege_social': parametres.siege_social,
-                'adresse_postale': parametres.adresse_postale,
-                'boite_postale': parametres.boite_postale,
-                'ville': parametres.ville,
-                'pays': parametres.pays,
-                'nom_president_general': parametres.nom_president_general,
-                'titre_president_general': parametres.titre_president_general,
-                'signature_president_general': parametres.signature_president_general,
-                'nom_directeur_technique': parametres.nom_directeur_technique,
-                'nom_directeur_financier': parametres.nom_directeur_financier,
-                'nom_directeur_administratif': parametres.nom_directeur_administratif,
-                'numero_agrement': parametres.numero_agrement,
-                'date_agrement': parametres.date_agrement,
-                'autorite_agrement': parametres.autorite_agrement,
-                'devise': parametres.devise,
-                'langue_par_defaut': parametres.langue_par_defaut,
-                'fuseau_horaire': parametres.fuseau_horaire,
-                'copyright_text': parametres.copyright_text,
-                'mentions_legales': parametres.mentions_legales,
-            }
-    except Exception as e:
-        logger.warning(f"Erreur lors de la récupération des paramètres: {e}")
-    
-    # Valeurs par défaut si aucun paramètre n'est configuré
-    return {
-        'nom_application': 'CAISSE DE SOLIDARITÉ',
-        'logo': None,
-        'description_application': '',
-        'version_application': '1.0.0',
-        'telephone_principal': '',
-        'telephone_secondaire': '',
-        'email_contact': '',
-        'site_web': '',
-        'siege_social': '',
-        'adresse_postale': '',
-        'boite_postale': '',
-        'ville': '',
-        'pays': 'Togo',
-        'nom_president_general': '',
-        'titre_president_general': 'Président Général',
-        'signature_president_general': None,
-        'nom_directeur_technique': '',
-        'nom_directeur_financier': '',
-        'nom_directeur_administratif': '',
-        'numero_agrement': '',
-        'date_agrement': None,
-        'autorite_agrement': '',
-        'devise': 'FCFA',
-        'langue_par_defaut': 'fr',
-        'fuseau_horaire': 'Africa/Lome',
-        'copyright_text': '',
-        'mentions_legales': '',
-    }
-
-
 def get_signature_president_general():
     """
     Récupère les informations de signature du Président Général depuis les paramètres.
@@ -1230,22 +1158,8 @@ def generate_remboursement_pdf(pret, mouvement):
     # Montants liés au remboursement courant
     from decimal import Decimal
     paiement_total = Decimal(str(mouvement.montant or 0))  # principal + intérêts
-
-    # Essayer de récupérer la part d'intérêt depuis un attribut dédié ou via la description
-    interet_attr = getattr(mouvement, 'interet_rembourse', None)
-    if interet_attr is not None:
-        interet_rembourse = Decimal(str(interet_attr or 0))
-    else:
-        interet_rembourse = Decimal('0')
-        try:
-            # Description : "Remboursement du prêt ... (principal: X FCFA, intérêt: Y FCFA)"
-            import re
-            match = re.search(r"intér(?:e|ê)t:\s*([\d\s]+)", (mouvement.description or ""), re.IGNORECASE)
-            if match:
-                interet_val = match.group(1).replace(' ', '')
-                interet_rembourse = Decimal(interet_val)
-        except Exception:
-            interet_rembourse = Decimal('0')
+    # Part d'intérêt enregistrée sur le mouvement
+    interet_rembourse = Decimal(str(mouvement.interet_rembourse or 0))
 
     montant_rembourse = paiement_total - interet_rembourse
     if montant_rembourse < 0:
@@ -3359,6 +3273,12 @@ def generate_rapport_pdf(rapport):
     elif rapport.type_rapport == 'financier':
          if 'fonds_actuels' in data:
              add_dict_section('Fonds Actuels', data['fonds_actuels'])
+         soldes_periode = data.get('soldes_periode') or {}
+         if soldes_periode:
+             add_dict_section('Soldes de la période', {
+                 'solde_ouverture': '-' if soldes_periode.get('ouverture') is None else f"{soldes_periode['ouverture']:,.0f}".replace(',', ' ') + ' FCFA',
+                 'solde_cloture': '-' if soldes_periode.get('cloture') is None else f"{soldes_periode['cloture']:,.0f}".replace(',', ' ') + ' FCFA',
+             })
          # Synthèse des prêts (par caisse)
          prets_syn = data.get('prets_synthese')
          if prets_syn:
@@ -3,14 +3,15 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
+from django.views.decorators.gzip import gzip_page
 from django.views.decorators.http import require_http_methods
 from rest_framework import viewsets, status, filters
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import APIException, NotFound, PermissionDenied, ValidationError
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Sum, Q, F, Prefetch
+from django.db.models import Count, Sum, Q, F, Prefetch, OuterRef, Subquery
 from django.utils import timezone
 from datetime import datetime, timedelta, time
 from types import SimpleNamespace
@@ -34,22 +35,31 @@ from .serializers import (
     TransfertCaisseSerializer, SeanceReunionSerializer, CotisationSerializer,
     DepenseSerializer, DepenseListSerializer, ExerciceCaisseSerializer,
     SalaireAgentSerializer, FichePaieSerializer, AgentListSerializer,
+    CaisseListePlat, MembreListePlat, PretListePlat, NotificationListePlat,
     serialize_exercice_info,
 )
 from .services import PretService, NotificationService
-from .utils import (
+from . import compteurs, idempotence, integrite, metriques, soldes
+from .routage import LectureRapportsMixin, lecture_rapports
+from .audit import journaliser_audit
+from .champs_dynamiques import ChampsDynamiquesVueMixin
+from .conditionnel import GetConditionnelMixin, get_conditionnel, signaler_caisses
+from .pagination import PaginationCurseurOptionnelle
+from .plats import ListePlateMixin
+from .recherche import RechercheNormaliseeFilter
+from .documents import (
     generate_pret_octroi_pdf,
     generate_remboursement_pdf,
     generate_remboursement_complet_pdf,
     generate_membres_liste_pdf,
     generate_membre_individual_pdf,
     generate_partage_fonds_pdf,
-    get_parametres_application,
     generate_application_guide_pdf,
     generate_rapport_pdf,
     export_rapport_excel,
     export_rapport_csv,
 )
+from .parametres import get_parametres_application
 from datetime import date
 from .permissions import AgentPermissions
 from django.http import HttpResponse, JsonResponse
@@ -61,8 +71,11 @@ from django.shortcuts import get_object_or_404
 from django.core.files.base import ContentFile
 from django.utils import timezone
 import json
+import logging
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
 
 def auto_close_expired_exercices():
     """
@@ -73,10 +86,15 @@ def auto_close_expired_exercices():
     comme « Clôturé » et non « En cours ».
     """
     today = timezone.now().date()
-    ExerciceCaisse.objects.filter(
-        statut="EN_COURS",
-        date_fin__lt=today,
-    ).update(statut="CLOTURE")
+    caisses_ids = list(
+        ExerciceCaisse.objects.filter(statut="EN_COURS", date_fin__lt=today).values_list('caisse_id', flat=True)
+    )
+    if caisses_ids:
+        ExerciceCaisse.objects.filter(
+            statut="EN_COURS",
+            date_fin__lt=today,
+        ).update(statut="CLOTURE")
+        signaler_caisses(caisses_ids)
 
 
 def ensure_caisse_has_active_exercice(caisse):
@@ -207,7 +225,8 @@ def get_user_caisses(user):
 
 
 # API: Séances de réunion
-class SeanceReunionViewSet(viewsets.ModelViewSet):
+class SeanceReunionViewSet(GetConditionnelMixin, viewsets.ModelViewSet):
+    parametre_caisse = 'caisse'
     queryset = SeanceReunion.objects.select_related('caisse').all()
     serializer_class = SeanceReunionSerializer
     permission_classes = [IsAuthenticated]
@@ -230,10 +249,13 @@ class SeanceReunionViewSet(viewsets.ModelViewSet):
 
 
 # API: Cotisations
-class CotisationViewSet(viewsets.ModelViewSet):
+class CotisationViewSet(GetConditionnelMixin, viewsets.ModelViewSet):
+    parametre_caisse = 'caisse'
     queryset = Cotisation.objects.select_related('caisse', 'membre', 'seance').all()
     serializer_class = CotisationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginationCurseurOptionnelle
+    champ_curseur = '-date_cotisation'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['caisse', 'membre', 'seance']
     search_fields = ['membre__nom', 'membre__prenoms', 'caisse__nom_association']
@@ -251,25 +273,50 @@ class CotisationViewSet(viewsets.ModelViewSet):
                 qs = qs.none()
         return qs
 
+    def create(self, request, *args, **kwargs):
+        def creer():
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            self.perform_create(serializer)
+            return status.HTTP_201_CREATED, serializer.data
+
+        # Avec Idempotency-Key, un renvoi (réponse perdue, file hors ligne) ne crédite pas deux fois la caisse
+        response = idempotence.reponse_idempotente(request, 'cotisation', creer)
+        for en_tete, valeur in self.get_success_headers(response.data).items():
+            response[en_tete] = valeur
+        return response
+
     def perform_create(self, serializer):
-        """
-        Création de cotisation : interdite si la caisse n'a pas d'exercice EN_COURS.
-        """
-        caisse = serializer.validated_data.get('caisse')
-        caisse_id = serializer.validated_data.get('caisse_id')
-        if not caisse and caisse_id:
-            try:
-                caisse = Caisse.objects.get(pk=caisse_id)
-                serializer.validated_data['caisse'] = caisse
-            except Caisse.DoesNotExist:
-                raise ValidationError({'caisse_id': "Caisse introuvable."})
-        if not caisse:
-            raise ValidationError({'caisse': "La caisse est obligatoire pour enregistrer une cotisation."})
+        sauver_cotisation(serializer, self.request.user)
 
-        # Vérifier l'existence d'un exercice en cours pour cette caisse
-        ensure_caisse_has_active_exercice(caisse)
 
-        serializer.save(utilisateur=self.request.user)
+def sauver_cotisation(serializer, utilisateur):
+    """
+    Création de cotisation : interdite si la caisse n'a pas d'exercice EN_COURS.
+    """
+    caisse = serializer.validated_data.get('caisse')
+    caisse_id = serializer.validated_data.get('caisse_id')
+    if not caisse and caisse_id:
+        try:
+            caisse = Caisse.objects.get(pk=caisse_id)
+            serializer.validated_data['caisse'] = caisse
+        except Caisse.DoesNotExist:
+            raise ValidationError({'caisse_id': "Caisse introuvable."})
+    if not caisse:
+        raise ValidationError({'caisse': "La caisse est obligatoire pour enregistrer une cotisation."})
+
+    # Vérifier l'existence d'un exercice en cours pour cette caisse
+    ensure_caisse_has_active_exercice(caisse)
+
+    serializer.save(utilisateur=utilisateur)
+
+
+def enregistrer_cotisation(request, donnees):
+    """Valide et enregistre une cotisation; renvoie (statut HTTP, représentation)"""
+    serializer = CotisationSerializer(data=donnees, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    sauver_cotisation(serializer, request.user)
+    return status.HTTP_201_CREATED, serializer.data
 
 
 # API: Statistiques des cotisations
@@ -514,6 +561,7 @@ def login_view(request):
 
 # Vue pour le dashboard après connexion
 @login_required
+@lecture_rapports()
 def dashboard_view(request):
     """Vue du dashboard principal après connexion"""
     # Rediriger seulement les administrateurs vers l'admin Django sécurisé
@@ -741,6 +789,246 @@ class CommuneViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ['nom']
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def geo_arbre(request):
+    """
+    Hiérarchie géographique complète en un seul document, ou sous-arbre d'un noeud
+    (``?region=<id>``, ``?prefecture=<id>``, ``?commune=<id>``, ``?canton=<id>`` ou ``?village=<id>``).
+
+    Servie depuis le cache avec un ETag fort: un client à jour reçoit un 304 sans corps.
+    """
+    from django.conf import settings
+    from django.utils.cache import get_conditional_response, patch_cache_control
+    from . import geographie
+
+    niveau = identifiant = None
+    for parametre, _modele, _parent, _enfants in geographie.NIVEAUX:
+        if parametre in request.query_params:
+            niveau = parametre
+            try:
+                identifiant = int(request.query_params[parametre])
+            except (TypeError, ValueError):
+                raise ValidationError({parametre: "Identifiant invalide."})
+            break
+
+    etag = geographie.etag(niveau, identifiant)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        contenu = geographie.document(niveau, identifiant)
+        if contenu is None:
+            return Response({'detail': "Élément géographique introuvable."}, status=status.HTTP_404_NOT_FOUND)
+        response = HttpResponse(contenu, content_type='application/json; charset=utf-8')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=getattr(settings, 'GEO_ARBRE_MAX_AGE', 86400))
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@gzip_page
+def synchronisation_api(request):
+    """
+    Synchronisation différentielle de l'application hors ligne (voir synchronisation.py).
+
+    ``?marques=<caisse>:<version>,...``: dernières versions reçues par caisse. La réponse contient
+    les objets modifiés depuis (``modifications``: colonnes + lignes par modèle), les identifiants
+    supprimés (``suppressions``) et les nouvelles ``marques``; rappeler tant que ``complet`` est faux.
+    """
+    from django.conf import settings
+    from . import synchronisation
+
+    try:
+        marques = synchronisation.analyser_marques(request.query_params.get('marques'))
+        restriction = [int(caisse_id) for caisse_id in request.query_params.get('caisse', '').split(',') if caisse_id]
+    except ValueError:
+        raise ValidationError({'marques': "Format attendu: ?marques=<caisse>:<version>,... et ?caisse=<id>,..."})
+    try:
+        limite = int(request.query_params.get('limite', 0)) or settings.SYNC_LIMITE
+    except ValueError:
+        raise ValidationError({'limite': "Nombre entier attendu."})
+    limite = max(1, min(limite, settings.SYNC_LIMITE))
+
+    # Périmètre: caisses de l'utilisateur (éventuellement restreintes par ?caisse=), marque 0 par défaut
+    caisses = get_user_caisses(request.user)
+    if restriction:
+        caisses = caisses.filter(pk__in=restriction)
+    perimetre = {caisse_id: marques.get(caisse_id, 0) for caisse_id in caisses.values_list('id', flat=True)}
+
+    donnees = synchronisation.changements(perimetre, limite)
+    donnees['utilisateur'] = request.user.pk
+    return JsonResponse(donnees, json_dumps_params={'separators': (',', ':')})
+
+
+def _date_parametre(request, nom, defaut=None):
+    valeur = request.query_params.get(nom)
+    if not valeur:
+        return defaut
+    try:
+        return datetime.strptime(valeur, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError({nom: "Format de date attendu: AAAA-MM-JJ."})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@lecture_rapports()
+def soldes_api(request):
+    """
+    Soldes des caisses de l'utilisateur à une date passée (voir soldes.py).
+
+    ``?date=AAAA-MM-JJ``: solde en fin de journée (solde actuel par défaut); ``?caisse=<id>,...``
+    restreint les caisses. Les superutilisateurs reçoivent aussi la réserve de la caisse générale.
+    """
+    jour = _date_parametre(request, 'date')
+    try:
+        restriction = [int(caisse_id) for caisse_id in request.query_params.get('caisse', '').split(',') if caisse_id]
+    except ValueError:
+        raise ValidationError({'caisse': "Format attendu: ?caisse=<id>,..."})
+    instant = min(soldes.fin_de_journee(jour), timezone.now()) if jour else timezone.now()
+
+    caisses = get_user_caisses(request.user)
+    if restriction:
+        caisses = caisses.filter(pk__in=restriction)
+    caisses = dict(caisses.values_list('pk', 'nom_association'))
+    valeurs = soldes.soldes_au(instant, list(caisses))
+    donnees = {
+        'date': timezone.localdate(instant).strftime('%d/%m/%Y'),
+        'soldes': [
+            {'caisse': caisse_id, 'nom': caisses[caisse_id], 'solde': float(solde)}
+            for caisse_id, solde in sorted(valeurs.items())
+        ],
+        'total': float(sum(valeurs.values())),
+    }
+    if request.user.is_superuser and not restriction:
+        donnees['reserve'] = float(soldes.solde_reserve_au(instant))
+    return Response(donnees)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@lecture_rapports()
+def soldes_historique_api(request):
+    """
+    Courbe de solde d'une caisse en fin de journée, lue sur les points de solde (voir soldes.py).
+
+    ``?caisse=<id>`` (ou ``reserve`` pour la caisse générale, superutilisateurs), ``?debut=`` et
+    ``?fin=`` (AAAA-MM-JJ, 30 derniers jours par défaut), ``?pas=jour|mois``.
+    """
+    fin = _date_parametre(request, 'fin', timezone.localdate())
+    debut = _date_parametre(request, 'debut', fin - timedelta(days=29))
+    pas = request.query_params.get('pas', 'jour')
+    if pas not in ('jour', 'mois'):
+        raise ValidationError({'pas': "Valeurs possibles: jour, mois."})
+    if debut > fin:
+        raise ValidationError({'debut': "La date de début doit précéder la date de fin."})
+    if pas == 'jour' and (fin - debut).days >= 366:
+        raise ValidationError({'debut': "366 jours au plus par pas quotidien (utiliser ?pas=mois)."})
+
+    caisse = request.query_params.get('caisse')
+    if caisse == 'reserve':
+        if not request.user.is_superuser:
+            raise PermissionDenied("Réservé aux administrateurs.")
+        caisse_id = None
+    else:
+        try:
+            caisse_id = int(caisse)
+        except (TypeError, ValueError):
+            raise ValidationError({'caisse': "Identifiant de caisse ou « reserve » attendu."})
+        if not get_user_caisses(request.user).filter(pk=caisse_id).exists():
+            raise NotFound("Caisse introuvable.")
+
+    return Response({
+        'caisse': caisse_id,
+        'pas': pas,
+        'points': [
+            {'date': jour.strftime('%d/%m/%Y'), 'solde': float(solde) if solde is not None else None}
+            for jour, solde in soldes.historique(caisse_id, debut, fin, pas)
+        ],
+    })
+
+
+def _operation_outbox(request, operation):
+    """(type, données pour l'empreinte, fonction) d'une opération de la file hors ligne"""
+    type_operation = operation.get('type')
+    donnees = operation.get('donnees') or {}
+    if not isinstance(donnees, dict):
+        raise ValidationError({'donnees': "Objet attendu."})
+    if type_operation == 'cotisation':
+        return type_operation, donnees, lambda: enregistrer_cotisation(request, donnees)
+    if type_operation == 'remboursement':
+        pret_id = operation.get('pret_id')
+        try:
+            montant = float(donnees.get('montant'))
+            interet = float(donnees.get('interet', 0) or 0)
+        except (TypeError, ValueError):
+            raise ValidationError({'error': 'Montant (et intérêt) invalides'})
+
+        def rembourser():
+            prets = Pret.objects.select_related('caisse')
+            if not request.user.is_superuser:
+                prets = prets.filter(caisse__in=get_user_caisses(request.user))
+            pret = prets.filter(pk=pret_id).first() if isinstance(pret_id, int) else None
+            if pret is None:
+                raise NotFound("Prêt introuvable.")
+            pret, mouvement = PretService.rembourser_pret(pret, request.user, montant, interet)
+            return status.HTTP_200_OK, {
+                'pret_id': pret.pk, 'statut': pret.statut,
+                'montant_rembourse': pret.montant_rembourse, 'mouvement_id': mouvement.id,
+            }
+        # Même empreinte que PretViewSet.rembourser: la clé d'un envoi direct peut être reprise par la file
+        return type_operation, {'pret_id': pret_id, 'montant': montant, 'interet': interet}, rembourser
+    raise ValidationError({'type': "Type d'opération inconnu (cotisation ou remboursement)."})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def outbox_api(request):
+    """
+    Envoi groupé de la file d'écritures hors ligne (cotisations, remboursements).
+
+    Body: ``{"operations": [{"cle": "...", "type": "cotisation", "donnees": {...}},
+    {"cle": "...", "type": "remboursement", "pret_id": 12, "donnees": {"montant": ..., "interet": ...}}]}``
+
+    Le lot est appliqué dans une seule transaction, chaque opération dans son propre savepoint:
+    une opération refusée n'annule pas les autres. Chaque ``cle`` est une clé d'idempotence
+    (voir idempotence.py): renvoyer un lot déjà reçu ne réécrit rien. Réponse:
+    ``{"resultats": [{"cle", "statut", "rejoue", "corps"}]}`` dans l'ordre des opérations.
+    """
+    from django.conf import settings
+    from django.db import transaction
+
+    operations = request.data.get('operations') if isinstance(request.data, dict) else None
+    if not isinstance(operations, list):
+        raise ValidationError({'operations': "Liste d'opérations attendue."})
+    if len(operations) > settings.OUTBOX_TAILLE_MAX:
+        raise ValidationError({'operations': f"{settings.OUTBOX_TAILLE_MAX} opérations au plus par lot."})
+
+    resultats = []
+    with transaction.atomic():
+        for operation in operations:
+            cle = operation.get('cle') if isinstance(operation, dict) else None
+            rejoue = False
+            try:
+                if not isinstance(operation, dict):
+                    raise ValidationError({'operation': "Objet attendu."})
+                type_operation, donnees, fonction = _operation_outbox(request, operation)
+                statut, corps, rejoue = idempotence.executer(request.user, cle, type_operation, donnees, fonction)
+            except APIException as e:
+                statut, corps = e.status_code, e.detail
+            except Exception as e:
+                statut, corps = status.HTTP_400_BAD_REQUEST, {'error': str(e)}
+            resultats.append({'cle': cle, 'statut': statut, 'rejoue': rejoue, 'corps': corps})
+    return Response({'resultats': resultats})
+
+
+def metriques_view(request):
+    """Métriques d'exploitation au format texte Prometheus, réservées au collecteur (adresse et jeton)"""
+    if not metriques.acces_autorise(request):
+        return HttpResponse(status=403)
+    return HttpResponse(metriques.exposer(), content_type=metriques.TYPE_CONTENU)
+
+
 class AgentViewSet(viewsets.ReadOnlyModelViewSet):
     """Liste en lecture seule des agents pour les formulaires"""
     queryset = Agent.objects.all().order_by('nom', 'prenoms')
@@ -785,14 +1073,21 @@ class QuartierViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['nom', 'code']
     ordering = ['nom']
 
-class CaisseViewSet(viewsets.ModelViewSet):
+class CaisseViewSet(ListePlateMixin, ChampsDynamiquesVueMixin, GetConditionnelMixin, viewsets.ModelViewSet):
     """Vue pour la gestion des caisses"""
+    serialiseur_plat = CaisseListePlat
+    actions_conditionnelles = ('list', 'retrieve', 'stats', 'total_stats')
+    caisse_depuis_pk = True
     queryset = Caisse.objects.select_related(
         'region', 'prefecture', 'commune', 'canton', 'village',
         'agent', 'presidente', 'secretaire', 'tresoriere'
     ).prefetch_related(
         'membres',
-        Prefetch('exercices', queryset=ExerciceCaisse.objects.filter(statut='EN_COURS').order_by('-date_debut'))
+        Prefetch(
+            'exercices',
+            queryset=ExerciceCaisse.objects.order_by('-date_debut', '-date_creation'),
+            to_attr='exercices_tries'
+        )
     ).all()
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -809,7 +1104,14 @@ class CaisseViewSet(viewsets.ModelViewSet):
         return CaisseSerializer
 
     def get_queryset(self):
-        qs = super().get_queryset().annotate(exercice_count=Count('exercices'))
+        # Sous ?fields=, ne calculer que les compteurs demandés
+        champs = self.champs_serialises()
+        annotations = {}
+        if champs is None or 'exercice_count' in champs:
+            annotations['exercice_count'] = Count('exercices', distinct=True)
+        if champs is None or 'nombre_membres' in champs:
+            annotations['nombre_membres_actifs'] = Count('membres', filter=Q(membres__statut='ACTIF'), distinct=True)
+        qs = super().get_queryset().annotate(**annotations)
         # Les non-admins voient uniquement leurs caisses (membre) ou les caisses assignées (agent)
         if not self.request.user.is_superuser:
             user_caisses = get_user_caisses(self.request.user)
@@ -822,7 +1124,7 @@ class CaisseViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         caisse = serializer.save()
         # Log de création
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=self.request.user,
             action='CREATION',
             modele='Caisse',
@@ -834,7 +1136,7 @@ class CaisseViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         caisse = serializer.save()
         # Log de modification
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=self.request.user,
             action='MODIFICATION',
             modele='Caisse',
@@ -919,6 +1221,7 @@ class CaisseViewSet(viewsets.ModelViewSet):
         )
         # Recharger l'objet depuis la base de données
         caisse.refresh_from_db()
+        signaler_caisses([caisse.pk])
 
         # Mettre à jour la CaisseGenerale si elle existe
         try:
@@ -935,7 +1238,7 @@ class CaisseViewSet(viewsets.ModelViewSet):
         )
 
         # Log d'audit pour la création de l'exercice
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=request.user,
             action='CREATION',
             modele='ExerciceCaisse',
@@ -979,7 +1282,7 @@ class CaisseViewSet(viewsets.ModelViewSet):
         exercice.statut = 'CLOTURE'
         exercice.save()
 
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=request.user,
             action='MODIFICATION',
             modele='ExerciceCaisse',
@@ -1045,7 +1348,7 @@ class CaisseViewSet(viewsets.ModelViewSet):
             }
         )
 
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=request.user,
             action='ARCHIVE',
             modele='ExerciceArchive',
@@ -1069,7 +1372,7 @@ class CaisseViewSet(viewsets.ModelViewSet):
     def echeances_retard_pdf(self, request, pk=None):
         """Télécharger le PDF des échéances en retard d'une caisse"""
         caisse = self.get_object()
-        from .echeances_utils import generate_echeances_retard_pdf
+        from .documents import generate_echeances_retard_pdf
         pdf = generate_echeances_retard_pdf(caisse)
         response = HttpResponse(pdf, content_type='application/pdf')
         response['Content-Disposition'] = f"attachment; filename=echeances_retard_{caisse.code}_{datetime.now().strftime('%Y%m%d')}.pdf"
@@ -1084,20 +1387,25 @@ class CaisseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        from .echeances_utils import generate_echeances_retard_pdf
+        from .documents import generate_echeances_retard_pdf
         pdf = generate_echeances_retard_pdf()  # Sans caisse spécifique
         response = HttpResponse(pdf, content_type='application/pdf')
         response['Content-Disposition'] = f"attachment; filename=echeances_retard_global_{datetime.now().strftime('%Y%m%d')}.pdf"
         return response
 
 
-class MembreViewSet(viewsets.ModelViewSet):
+class MembreViewSet(ListePlateMixin, GetConditionnelMixin, viewsets.ModelViewSet):
     """Vue pour la gestion des membres"""
+    serialiseur_plat = MembreListePlat
+    actions_conditionnelles = ('list', 'retrieve', 'cotisations_total', 'par_caisse')
+    parametre_caisse = 'caisse'
     queryset = Membre.objects.select_related('caisse').all()
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RechercheNormaliseeFilter, filters.OrderingFilter]
     filterset_fields = ['statut', 'role', 'caisse']
     search_fields = ['nom', 'prenoms', 'numero_carte_electeur']
+    # Recherche sans accents sur la colonne normalisée et son index (voir recherche.py)
+    recherche_chemins = ('',)
     ordering_fields = ['nom', 'prenoms', 'date_adhesion']
     ordering = ['nom', 'prenoms']
     
@@ -1198,7 +1506,7 @@ class MembreViewSet(viewsets.ModelViewSet):
         else:
             serializer.save()
         # Log de modification
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=self.request.user,
             action='MODIFICATION',
             modele='Membre',
@@ -1244,13 +1552,18 @@ class MembreViewSet(viewsets.ModelViewSet):
         return response
 
 
-class PretViewSet(viewsets.ModelViewSet):
+class PretViewSet(ListePlateMixin, ChampsDynamiquesVueMixin, GetConditionnelMixin, viewsets.ModelViewSet):
     """Vue pour la gestion des prêts"""
+    serialiseur_plat = PretListePlat
+    actions_conditionnelles = ('list', 'retrieve', 'en_retard')
+    parametre_caisse = 'caisse'
     queryset = Pret.objects.select_related('membre', 'caisse').prefetch_related('echeances').all()
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RechercheNormaliseeFilter, filters.OrderingFilter]
     filterset_fields = ['statut', 'caisse', 'membre']
     search_fields = ['numero_pret', 'membre__nom', 'membre__prenoms']
+    # Recherche sans accents sur la colonne normalisée et son index (voir recherche.py)
+    recherche_chemins = ('', 'membre')
     ordering_fields = ['date_demande', 'montant_demande', 'statut']
     ordering = ['-date_demande']
     
@@ -1318,7 +1631,7 @@ class PretViewSet(viewsets.ModelViewSet):
                 PretService.soumettre_demande_pret(pret, self.request.user)
             
             # Log de création
-            AuditLog.objects.create(
+            journaliser_audit(
                 utilisateur=self.request.user,
                 action='CREATION',
                 modele='Pret',
@@ -1343,7 +1656,7 @@ class PretViewSet(viewsets.ModelViewSet):
 
         pret = serializer.save()
         # Log de modification
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=self.request.user,
             action='MODIFICATION',
             modele='Pret',
@@ -1521,12 +1834,20 @@ class PretViewSet(viewsets.ModelViewSet):
         except (TypeError, ValueError):
             return Response({'error': 'Montant (et intérêt) invalides'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            pret, mouvement = PretService.rembourser_pret(pret, request.user, montant, interet)
-            serializer = self.get_serializer(pret)
-            data = serializer.data
+        def rembourser():
+            pret_rembourse, mouvement = PretService.rembourser_pret(pret, request.user, montant, interet)
+            data = self.get_serializer(pret_rembourse).data
             data.update({'mouvement_id': mouvement.id})
-            return Response(data)
+            return status.HTTP_200_OK, data
+
+        try:
+            # Avec Idempotency-Key, un renvoi du même remboursement n'est pas encaissé deux fois
+            return idempotence.reponse_idempotente(
+                request, 'remboursement', rembourser,
+                donnees={'pret_id': pret.pk, 'montant': montant, 'interet': interet},
+            )
+        except APIException:
+            raise
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -1645,6 +1966,7 @@ class PretViewSet(viewsets.ModelViewSet):
         try:
             # Passer l'utilisateur courant au modèle pour le log d'audit
             pret._current_user = request.user
+            pret._current_ip = request.META.get('REMOTE_ADDR')
             
             # Supprimer le prêt (la logique est maintenant dans le modèle)
             pret.delete()
@@ -1658,11 +1980,13 @@ class PretViewSet(viewsets.ModelViewSet):
             )
 
 
-class EcheanceViewSet(viewsets.ModelViewSet):
+class EcheanceViewSet(GetConditionnelMixin, viewsets.ModelViewSet):
     """Vue pour la gestion des échéances"""
     queryset = Echeance.objects.select_related('pret').all()
     serializer_class = EcheanceSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginationCurseurOptionnelle
+    champ_curseur = 'date_echeance'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['statut', 'pret']
     search_fields = ['pret__numero_pret']
@@ -1681,11 +2005,14 @@ class EcheanceViewSet(viewsets.ModelViewSet):
         return qs
 
 
-class MouvementFondViewSet(viewsets.ModelViewSet):
+class MouvementFondViewSet(GetConditionnelMixin, viewsets.ModelViewSet):
     """Vue pour la gestion des mouvements de fonds"""
+    parametre_caisse = 'caisse'
     queryset = MouvementFond.objects.select_related('caisse', 'pret', 'utilisateur').all()
     serializer_class = MouvementFondSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginationCurseurOptionnelle
+    champ_curseur = '-date_mouvement'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['type_mouvement', 'caisse']
     search_fields = ['description']
@@ -1732,7 +2059,7 @@ class VirementBancaireViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         virement = serializer.save()
         # Log de création
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=self.request.user,
             action='CREATION',
             modele='VirementBancaire',
@@ -1774,6 +2101,8 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = AuditLog.objects.select_related('utilisateur').all()
     serializer_class = AuditLogSerializer
     permission_classes = [IsAdminUser]  # Seuls les administrateurs peuvent consulter les logs
+    pagination_class = PaginationCurseurOptionnelle
+    champ_curseur = '-date_action'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['action', 'modele', 'utilisateur']
     search_fields = ['modele', 'details']
@@ -1781,7 +2110,7 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ['-date_action']
 
 
-class DashboardViewSet(viewsets.ViewSet):
+class DashboardViewSet(LectureRapportsMixin, viewsets.ViewSet):
     """Vue pour le tableau de bord et les statistiques"""
     permission_classes = [IsAuthenticated]
     
@@ -1931,10 +2260,13 @@ class DashboardViewSet(viewsets.ViewSet):
         return Response({'alertes': alertes})
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(ListePlateMixin, viewsets.ModelViewSet):
     """Vue pour la gestion des notifications"""
+    serialiseur_plat = NotificationListePlat
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginationCurseurOptionnelle
+    champ_curseur = '-date_creation'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['type_notification', 'statut']
     search_fields = ['titre', 'message']
@@ -1969,59 +2301,44 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def non_lues(self, request):
         """Obtenir le nombre de notifications non lues"""
-        count = self.get_queryset().filter(statut='NON_LU').count()
-        return Response({'count': count})
+        return Response({'count': compteurs.etat(request.user, ['non_lues'])['non_lues']})
+    
+    @action(detail=False, methods=['get'])
+    def etat_cloche(self, request):
+        """Tous les compteurs de la cloche en un appel (servis depuis le cache)"""
+        return Response(compteurs.etat(request.user))
     
     @action(detail=False, methods=['get'])
     def demandes_pret_en_attente(self, request):
         """Obtenir uniquement les demandes de prêt en attente"""
         # Inclure les notifications liées aux prêts non validés, qu'elles soient lues ou non,
-        # et couvrir les types DEMANDE_PRET (soumission) et ATTENTE_PRET (mise en attente)
+        # et couvrir les types DEMANDE_PRET (soumission) et ATTENTE_PRET (mise en attente).
+        # Une seule notification par prêt (la plus récente), sélectionnée par la base:
+        # équivalent portable d'un DISTINCT ON (pret_id) ... ORDER BY date_creation DESC
+        derniere_par_pret = (
+            self.get_queryset()
+            .filter(pret=OuterRef('pret'), type_notification__in=compteurs.TYPES_DEMANDE_PRET)
+            .order_by('-date_creation', '-pk')
+            .values('pk')[:1]
+        )
         queryset = (
             self.get_queryset()
-            .filter(type_notification__in=['DEMANDE_PRET', 'ATTENTE_PRET'])
-            .select_related('pret')
+            .filter(
+                type_notification__in=compteurs.TYPES_DEMANDE_PRET,
+                pret__statut__in=compteurs.STATUTS_PRET_EN_ATTENTE,
+                pk=Subquery(derniere_par_pret),
+            )
+            .select_related('destinataire', 'caisse', 'pret__membre')
             .order_by('-date_creation')
         )
         
-        # Garder une seule notification par prêt, pour les statuts non validés
-        # (EN_ATTENTE_ADMIN = en attente de validation admin, EN_ATTENTE = mis en attente)
-        notifications_filtrees = []
-        prets_vus = set()
-        for notification in queryset:
-            pret = notification.pret
-            if not pret:
-                continue
-            if pret.id in prets_vus:
-                continue
-            if pret.statut in ['EN_ATTENTE_ADMIN', 'EN_ATTENTE']:
-                notifications_filtrees.append(notification)
-                prets_vus.add(pret.id)
-        
-        serializer = NotificationListSerializer(notifications_filtrees, many=True)
+        serializer = NotificationListSerializer(queryset, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def count_demandes_pret_en_attente(self, request):
         """Obtenir le nombre de demandes de prêt en attente"""
-        queryset = (
-            self.get_queryset()
-            .filter(type_notification__in=['DEMANDE_PRET', 'ATTENTE_PRET'])
-            .select_related('pret')
-            .order_by('-date_creation')
-        )
-        
-        prets_vus = set()
-        for notification in queryset:
-            pret = notification.pret
-            if not pret:
-                continue
-            if pret.id in prets_vus:
-                continue
-            if pret.statut in ['EN_ATTENTE_ADMIN', 'EN_ATTENTE']:
-                prets_vus.add(pret.id)
-        
-        return Response({'count': len(prets_vus)})
+        return Response({'count': compteurs.etat(request.user, ['demandes_pret_en_attente'])['demandes_pret_en_attente']})
 
     @action(detail=False, methods=['get'])
     def prets_en_attente_items(self, request):
@@ -2063,8 +2380,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
         if not request.user.is_superuser:
             return Response({'count': 0})
 
-        count = Pret.objects.filter(statut__in=['EN_ATTENTE_ADMIN', 'EN_ATTENTE']).distinct().count()
-        return Response({'count': count})
+        return Response({'count': compteurs.etat(request.user, ['prets_en_attente'])['prets_en_attente']})
 
 
 class UserManagementViewSet(viewsets.ModelViewSet):
@@ -2087,7 +2403,7 @@ class UserManagementViewSet(viewsets.ModelViewSet):
         user = serializer.save()
         
         # Log de création
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=self.request.user,
             action='CREATION',
             modele='User',
@@ -2104,7 +2420,7 @@ class UserManagementViewSet(viewsets.ModelViewSet):
         user = serializer.save()
         
         # Log de modification
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=self.request.user,
             action='MODIFICATION',
             modele='User',
@@ -2119,7 +2435,7 @@ class UserManagementViewSet(viewsets.ModelViewSet):
             raise ValidationError({'detail': 'Seuls les administrateurs peuvent supprimer des utilisateurs.'})
         
         # Log de suppression
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=self.request.user,
             action='SUPPRESSION',
             modele='User',
@@ -2194,7 +2510,7 @@ class UserManagementViewSet(viewsets.ModelViewSet):
         caisse.save()
         
         # Log de création
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=request.user,
             action='CREATION',
             modele='User',
@@ -2293,6 +2609,7 @@ def admin_frontend_view(request):
 
 
 @login_required
+@lecture_rapports()
 def rapports_global_api(request):
     """API JSON de rapports globaux (admin)."""
     if not request.user.is_superuser:
@@ -2331,6 +2648,7 @@ def rapports_global_api(request):
 
 
 @login_required
+@lecture_rapports()
 def admin_report_pdf(request):
     """Génère un PDF de rapport (global ou par caisse) pour l'admin."""
     if not request.user.is_superuser:
@@ -2404,7 +2722,7 @@ def admin_report_pdf(request):
     )
 
     try:
-        from .utils import generate_rapport_pdf
+        from .documents import generate_rapport_pdf
         pdf_bytes = generate_rapport_pdf(rapport)
         response = HttpResponse(pdf_bytes, content_type='application/pdf')
         label = caisse.code if caisse else 'GLOBAL'
@@ -2413,6 +2731,7 @@ def admin_report_pdf(request):
     except Exception as e:
         return HttpResponse(f'Erreur génération PDF: {e}', status=500)
 @login_required
+@lecture_rapports()
 def agent_dashboard(request):
     """Tableau de bord personnalisé pour les agents"""
     
@@ -2532,6 +2851,7 @@ def agent_caisse_detail(request, caisse_id):
 
 
 @login_required
+@get_conditionnel
 def agent_stats_api(request):
     """API pour les statistiques en temps réel"""
     
@@ -2621,6 +2941,7 @@ def caisses_cards_view(request):
     return render(request, 'gestion_caisses/caisses_cards.html', context)
 
 @login_required
+@get_conditionnel
 def rapports_caisse_api(request):
     """API pour les rapports de caisse"""
     try:
@@ -2900,7 +3221,7 @@ def rapports_caisse_api(request):
             }
         elif type_rapport in ['membres_systeme_pdf', 'agents_systeme_pdf', 'prets_evaluation_pdf', 'prets_par_motif']:
             # Ces types renvoient directement un PDF global
-            from .utils import generate_membres_systeme_pdf, generate_agents_systeme_pdf, generate_prets_evaluation_pdf, generate_prets_par_motif_pdf
+            from .documents import generate_membres_systeme_pdf, generate_agents_systeme_pdf, generate_prets_evaluation_pdf, generate_prets_par_motif_pdf
             if type_rapport == 'membres_systeme_pdf':
                 pdf_bytes = generate_membres_systeme_pdf()
                 response = HttpResponse(pdf_bytes, content_type='application/pdf')
@@ -2971,7 +3292,7 @@ def rapports_caisse_api(request):
         output_format = request.GET.get('format')
         if output_format == 'pdf':
             from types import SimpleNamespace
-            from .utils import generate_rapport_pdf
+            from .documents import generate_rapport_pdf
 
             # Pour les agents en mode "toutes mes caisses", on ne doit pas afficher une caisse unique dans l'en-tête
             caisse_for_pdf = None if (is_admin or multi_caisses_scope) else caisse
@@ -3005,6 +3326,7 @@ def rapports_caisse_api(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@lecture_rapports()
 def generer_rapport_general_caisse(caisse, date_debut=None, date_fin=None):
     """Génère un rapport général de la caisse"""
     from django.db.models import Count, Sum, Avg, Q
@@ -3083,6 +3405,7 @@ def generer_rapport_general_caisse(caisse, date_debut=None, date_fin=None):
     }
 
 
+@lecture_rapports()
 def generer_rapport_general_global(date_debut=None, date_fin=None, caisses_qs=None):
     """Rapport général agrégé pour un ensemble de caisses (toutes par défaut),
     même structure que le frontend.
@@ -3214,6 +3537,7 @@ def generer_rapport_general_global(date_debut=None, date_fin=None, caisses_qs=No
         }
     }
 
+@lecture_rapports()
 def generer_rapport_financier_caisse(caisse, date_debut=None, date_fin=None):
     """Génère un rapport financier détaillé de la caisse"""
     from django.db.models import Sum, Q
@@ -3241,25 +3565,18 @@ def generer_rapport_financier_caisse(caisse, date_debut=None, date_fin=None):
         nombre=Count('id')
     )
     
-    # Évolution des fonds
+    # Soldes d'ouverture et de clôture de la période (points de solde + mouvements depuis)
+    ouverture = soldes.soldes_au(start_dt - timedelta(microseconds=1), [caisse.pk]).get(caisse.pk) if start_dt else None
+    cloture = soldes.soldes_au(min(end_dt, timezone.now()) if end_dt else None, [caisse.pk]).get(caisse.pk)
+
+    # Évolution des fonds: solde relevé après chaque mouvement
     evolution_fonds = []
-    fond_courant = float(caisse.fond_initial)
-    
-    for mouvement in mouvements.order_by('date_mouvement'):
-        if mouvement.type_mouvement == 'ALIMENTATION':
-            fond_courant += float(mouvement.montant)
-        elif mouvement.type_mouvement == 'DECAISSEMENT':
-            fond_courant -= float(mouvement.montant)
-        elif mouvement.type_mouvement == 'REMBOURSEMENT':
-            fond_courant += float(mouvement.montant)
-        elif mouvement.type_mouvement == 'FRAIS':
-            fond_courant -= float(mouvement.montant)
-        
+    for mouvement in mouvements.order_by('date_mouvement', 'pk'):
         evolution_fonds.append({
             'date': mouvement.date_mouvement.strftime('%d/%m/%Y'),
             'type': mouvement.type_mouvement,
             'montant': float(mouvement.montant),
-            'solde': fond_courant,
+            'solde': float(mouvement.solde_apres),
             'description': mouvement.description
         })
     
@@ -3338,6 +3655,10 @@ def generer_rapport_financier_caisse(caisse, date_debut=None, date_fin=None):
             'total_mouvements': mouvements.count(),
         },
         'prets_membres': prets_membres,
+        'soldes_periode': {
+            'ouverture': float(ouverture) if ouverture is not None else None,
+            'cloture': float(cloture) if cloture is not None else None,
+        },
         'periode': {
             'debut': date_debut.strftime('%d/%m/%Y') if date_debut else None,
             'fin': date_fin.strftime('%d/%m/%Y') if date_fin else None,
@@ -3345,6 +3666,7 @@ def generer_rapport_financier_caisse(caisse, date_debut=None, date_fin=None):
     }
 
 
+@lecture_rapports()
 def generer_rapport_financier_global(date_debut=None, date_fin=None, caisses_qs=None):
     """Rapport financier agrégé pour un ensemble de caisses (toutes par défaut)."""
     from django.db.models import Sum, Q
@@ -3379,7 +3701,6 @@ def generer_rapport_financier_global(date_debut=None, date_fin=None, caisses_qs=
         })
 
     from django.db.models import Sum as DSum, F, ExpressionWrapper, DecimalField
-    from .models import Caisse, Pret
     # Agrégations robustes (montant_total_prets = EN_COURS + REMBOURSE + EN_RETARD)
     total_fond_initial = caisses.aggregate(total=DSum('fond_initial'))['total'] or 0
     total_fond_disponible = caisses.aggregate(total=DSum('fond_disponible'))['total'] or 0
@@ -3400,6 +3721,11 @@ def generer_rapport_financier_global(date_debut=None, date_fin=None, caisses_qs=
         'solde_disponible': float((total_fond_initial or 0) + (total_fond_disponible or 0)),
     }
 
+    # Soldes d'ouverture et de clôture de chaque caisse (points de solde + mouvements depuis)
+    caisse_ids = list(caisses.values_list('pk', flat=True))
+    ouvertures = soldes.soldes_au(start_dt - timedelta(microseconds=1), caisse_ids) if start_dt else {}
+    clotures = soldes.soldes_au(min(end_dt, timezone.now()) if end_dt else None, caisse_ids)
+
     # Synthèse par caisse (pour affichage détaillé dans le PDF)
     par_caisse = []
     for c in caisses.order_by('nom_association'):
@@ -3414,6 +3740,8 @@ def generer_rapport_financier_global(date_debut=None, date_fin=None, caisses_qs=
             'fond_disponible': float(c.fond_disponible or 0),
             'montant_total_prets': float(total_prets_caisse),
             'solde_disponible': float((c.fond_initial or 0) + (c.fond_disponible or 0)),
+            'solde_ouverture': float(ouvertures[c.pk]) if c.pk in ouvertures else None,
+            'solde_cloture': float(clotures[c.pk]) if c.pk in clotures else None,
         })
 
     prets_financiers = {
@@ -3448,12 +3776,17 @@ def generer_rapport_financier_global(date_debut=None, date_fin=None, caisses_qs=
         'par_caisse': par_caisse,
         'prets_financiers': prets_financiers,
         'prets_membres': prets_membres,
+        'soldes_periode': {
+            'ouverture': float(sum(ouvertures.values())) if start_dt else None,
+            'cloture': float(sum(clotures.values())),
+        },
         'periode': {
             'debut': date_debut.strftime('%d/%m/%Y') if date_debut else None,
             'fin': date_fin.strftime('%d/%m/%Y') if date_fin else None,
         }
     }
 
+@lecture_rapports()
 def generer_rapport_prets_caisse(caisse, date_debut=None, date_fin=None):
     """Génère un rapport détaillé des prêts de la caisse"""
     from django.db.models import Sum, Avg, Q
@@ -3528,6 +3861,7 @@ def generer_rapport_prets_caisse(caisse, date_debut=None, date_fin=None):
     }
 
 
+@lecture_rapports()
 def generer_rapport_prets_global(date_debut=None, date_fin=None, caisses_qs=None):
     """Rapport des prêts agrégé pour un ensemble de caisses (toutes par défaut)."""
     from django.db.models import Sum, Avg, Q
@@ -3575,6 +3909,7 @@ def generer_rapport_prets_global(date_debut=None, date_fin=None, caisses_qs=None
         }
     }
 
+@lecture_rapports()
 def generer_rapport_membres_caisse(caisse, date_debut=None, date_fin=None):
     """Génère un rapport détaillé des membres de la caisse"""
     from django.db.models import Count, Sum, Q
@@ -3645,6 +3980,7 @@ def generer_rapport_membres_caisse(caisse, date_debut=None, date_fin=None):
     }
 
 
+@lecture_rapports()
 def generer_rapport_membres_global(date_debut=None, date_fin=None, caisses_qs=None):
     """Rapport membres agrégé pour un ensemble de caisses (toutes par défaut)."""
     from django.db.models import Count, Sum, Q
@@ -3696,6 +4032,7 @@ def generer_rapport_membres_global(date_debut=None, date_fin=None, caisses_qs=No
         }
     }
 
+@lecture_rapports()
 def generer_rapport_echeances_caisse(caisse, date_debut=None, date_fin=None):
     """Génère un rapport détaillé des échéances de la caisse"""
     from django.db.models import Sum, Q
@@ -3776,6 +4113,7 @@ def generer_rapport_echeances_caisse(caisse, date_debut=None, date_fin=None):
     }
 
 
+@lecture_rapports()
 def generer_rapport_echeances_global(date_debut=None, date_fin=None, caisses_qs=None):
     """Rapport échéances agrégé pour un ensemble de caisses (toutes par défaut)."""
     from django.db.models import Sum, Q
@@ -4045,6 +4383,8 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = AuditLog.objects.select_related('utilisateur').all()
     serializer_class = AuditLogSerializer
     permission_classes = [IsAdminUser]  # Seuls les administrateurs peuvent consulter les logs
+    pagination_class = PaginationCurseurOptionnelle
+    champ_curseur = '-date_action'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['action', 'modele', 'utilisateur']
     search_fields = ['modele', 'details']
@@ -4640,6 +4980,7 @@ def etat_transferts_print_view(request):
 # ============================================================================
 
 @login_required
+@lecture_rapports()
 def export_rapport_pdf_view(request, type_rapport):
     """Vue pour exporter un rapport en PDF"""
     if not request.user.is_superuser:
@@ -4675,15 +5016,34 @@ def synchroniser_systeme_view(request):
 
 @login_required
 def verifier_integrite_view(request):
-    """Vue pour vérifier l'intégrité du système"""
+    """Vue pour vérifier l'intégrité du grand livre (voir integrite.py).
+
+    Vérification incrémentale (caisses modifiées depuis leur dernier résultat), complète avec
+    ``?mode=complete``. Lancée en tâche Celery; sans Celery, exécutée immédiatement.
+    """
     if not request.user.is_superuser:
         return redirect('gestion_caisses:dashboard')
-    
-    # Logique de vérification d'intégrité
-    # À implémenter selon les besoins
-    
-    messages.info(request, "Vérification d'intégrité en cours de développement")
-    return redirect('admin:gestion_caisses_admindashboard_changelist')
+
+    incrementale = request.GET.get('mode') != 'complete'
+    try:
+        from .tasks import verifier_integrite
+        verifier_integrite.delay(incrementale=incrementale, utilisateur_id=request.user.pk)
+        messages.info(request, "Vérification d'intégrité lancée: résultats dans « Vérifications d'intégrité ».")
+    except Exception as e:
+        # Celery absent ou broker injoignable: vérification immédiate
+        logger.warning(f"Vérification d'intégrité directe: {e}")
+        verification = integrite.verifier(incrementale=incrementale, utilisateur_id=request.user.pk)
+        resume = (
+            f"{verification.caisses_verifiees} caisse(s) vérifiée(s), "
+            f"{verification.caisses_ignorees} inchangée(s) depuis la dernière vérification"
+        )
+        if verification.anomalies:
+            messages.warning(
+                request, f"{verification.anomalies} anomalie(s) dans {verification.caisses_en_anomalie} caisse(s) ({resume})."
+            )
+        else:
+            messages.success(request, f"Aucune anomalie ({resume}).")
+    return redirect('admin:gestion_caisses_verificationintegrite_changelist')
 
 
 @login_required
@@ -4721,6 +5081,7 @@ def sauvegarder_systeme_view(request):
 # ============================================================================
 
 @staff_member_required
+@lecture_rapports()
 def generer_rapport_pdf_admin(request):
     """Vue admin pour générer des rapports PDF"""
     if request.method != 'POST':
@@ -4880,6 +5241,7 @@ def lister_caisses_rapport(request):
 
 @login_required
 @user_passes_test(lambda u: u.is_staff)
+@lecture_rapports()
 def export_rapport_excel_view(request, type_rapport):
     """Vue pour exporter un rapport en Excel - Accepte GET avec paramètres de requête"""
     if not request.user.is_superuser:
@@ -4996,6 +5358,7 @@ def export_rapport_excel_view(request, type_rapport):
 
 @login_required
 @user_passes_test(lambda u: u.is_staff)
+@lecture_rapports()
 def export_rapport_csv_view(request, type_rapport):
     """Vue pour exporter un rapport en CSV - Accepte GET avec paramètres de requête"""
     if not request.user.is_superuser:
@@ -5111,8 +5474,9 @@ def export_rapport_csv_view(request, type_rapport):
         return HttpResponse(f'Erreur lors de l\'export CSV: {str(e)}', status=500)
 
 # API: Gestion des dépenses
-class DepenseViewSet(viewsets.ModelViewSet):
+class DepenseViewSet(GetConditionnelMixin, viewsets.ModelViewSet):
     """ViewSet pour la gestion des dépenses des caisses"""
+    parametre_caisse = 'caisse'
     serializer_class = DepenseSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -5532,8 +5896,9 @@ def agents_salaires_stats(request):
         )
 
 
-class ExerciceCaisseViewSet(viewsets.ModelViewSet):
+class ExerciceCaisseViewSet(GetConditionnelMixin, viewsets.ModelViewSet):
     """ViewSet pour gérer les exercices de caisse"""
+    parametre_caisse = 'caisse'
     queryset = ExerciceCaisse.objects.all()
     serializer_class = ExerciceCaisseSerializer
     permission_classes = [IsAuthenticated]
@@ -5812,7 +6177,7 @@ class ExerciceCaisseViewSet(viewsets.ModelViewSet):
             pass
 
         # Enregistrer dans l'audit log
-        AuditLog.objects.create(
+        journaliser_audit(
             utilisateur=request.user,
             action='MODIFICATION',
             modele='Caisse',
@@ -5839,4 +6204,79 @@ class ExerciceCaisseViewSet(viewsets.ModelViewSet):
                 'fond_disponible': str(caisse.fond_disponible),
                 'frais_fondation_conserves': str(total_frais_fondation)
             }
-        })
\ No newline at end of file
+        })
+
+async def notifications_flux(request):
+    """
+    Pousse les compteurs de la cloche au lieu de les faire interroger en boucle.
+
+    - ``Accept: text/event-stream``: flux Server-Sent Events; un évènement ``compteurs`` est
+      envoyé à l'ouverture puis à chaque changement (la connexion est fermée au bout de
+      NOTIFICATIONS_FLUX_DUREE secondes, EventSource se reconnecte seul).
+    - sinon, long-poll: ``?version=<version reçue>`` attend jusqu'à NOTIFICATIONS_LONG_POLL_ATTENTE
+      secondes qu'elle change, puis renvoie les compteurs.
+
+    Vue asynchrone: servie sans bloquer de worker par ``caisses_femmes/asgi.py`` (workers uvicorn,
+    voir Dockerfile). Sous WSGI, chaque requête occuperait un worker pendant toute l'attente: le flux
+    SSE n'envoie alors que l'état courant (EventSource se reconnecte après
+    NOTIFICATIONS_LONG_POLL_ATTENTE secondes) et le long-poll répond sans attendre.
+    """
+    import asyncio
+    from asgiref.sync import sync_to_async
+    from django.conf import settings
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'detail': "Informations d'authentification non fournies."}, status=403)
+
+    intervalle = getattr(settings, 'NOTIFICATIONS_FLUX_INTERVALLE', 1.0)
+    lire_version = sync_to_async(compteurs.version)
+    lire_etat = sync_to_async(compteurs.etat)
+    attente_possible = isinstance(request, ASGIRequest)
+
+    if 'text/event-stream' in request.headers.get('Accept', '') and not attente_possible:
+        etat = await lire_etat(user)
+        reconnexion = int(getattr(settings, 'NOTIFICATIONS_LONG_POLL_ATTENTE', 25) * 1000)
+        response = HttpResponse(
+            f"retry: {reconnexion}\n\nevent: compteurs\nid: {etat['version']}\ndata: {json.dumps(etat)}\n\n",
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        duree = getattr(settings, 'NOTIFICATIONS_FLUX_DUREE', 300)
+
+        async def evenements():
+            fin = asyncio.get_running_loop().time() + duree
+            derniere_version = None
+            dernier_envoi = 0
+            # Indique à EventSource le délai de reconnexion
+            yield f"retry: {int(intervalle * 1000)}\n\n"
+            while asyncio.get_running_loop().time() < fin:
+                version = await lire_version(user.pk)
+                maintenant = asyncio.get_running_loop().time()
+                if version != derniere_version:
+                    etat = await lire_etat(user)
+                    derniere_version = etat['version']
+                    dernier_envoi = maintenant
+                    yield f"event: compteurs\nid: {derniere_version}\ndata: {json.dumps(etat)}\n\n"
+                elif maintenant - dernier_envoi >= 15:
+                    # Commentaire de maintien pour les proxys qui coupent les connexions inactives
+                    dernier_envoi = maintenant
+                    yield ": ping\n\n"
+                await asyncio.sleep(intervalle)
+
+        response = StreamingHttpResponse(evenements(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    version_client = request.GET.get('version')
+    if version_client and attente_possible:
+        fin = asyncio.get_running_loop().time() + getattr(settings, 'NOTIFICATIONS_LONG_POLL_ATTENTE', 25)
+        while await lire_version(user.pk) == version_client and asyncio.get_running_loop().time() < fin:
+            await asyncio.sleep(intervalle)
+    return JsonResponse(await lire_etat(user))
@@ -5,6 +5,23 @@ const OFFLINE_URLS = [
   '/static/jazzmin/overrides.css'
 ];
 
+// Réplique locale (IndexedDB) des données des caisses, tenue à jour par /api/sync/
+const SYNC_URL = '/gestion-caisses/api/sync/';
+const SYNC_DB = 'caisses-sync';
+const SYNC_STORES = {
+  membre: ['caisse_id'],
+  pret: ['caisse_id', 'membre_id'],
+  echeance: ['pret_id'],
+  cotisation: ['caisse_id', 'membre_id'],
+  seance: ['caisse_id'],
+  mouvement: ['caisse_id']
+};
+const SYNC_PAGES_MAX = 50;
+
+// File d'écritures hors ligne (cotisations, remboursements), envoyée par lots à /api/outbox/
+const OUTBOX_URL = '/gestion-caisses/api/outbox/';
+const OUTBOX_LOT = 50;
+
 self.addEventListener('install', (event) => {
   event.waitUntil(
     caches.open(CACHE_NAME).then((cache) => cache.addAll(OFFLINE_URLS))
@@ -25,4 +42,220 @@ self.addEventListener('fetch', (event) => {
   );
 });
 
+// Demandes des pages: synchronisation ({type: 'sync'}), écritures hors ligne ({type: 'outbox-ajouter' | 'outbox-envoyer'})
+self.addEventListener('message', (event) => {
+  if (!event.data) return;
+  const repondre = (message) => event.source && event.source.postMessage(message);
+  if (event.data.type === 'sync') {
+    event.waitUntil(
+      synchroniser()
+        .then((resultat) => repondre({ type: 'sync-termine', ...resultat }))
+        .catch((err) => repondre({ type: 'sync-erreur', message: String(err) }))
+    );
+  } else if (event.data.type === 'outbox-ajouter' || event.data.type === 'outbox-envoyer') {
+    event.waitUntil((async () => {
+      await enregistrerSession(event.data);
+      if (event.data.type === 'outbox-ajouter') {
+        const cle = await ajouterOutbox(event.data.operation, event.data.utilisateur);
+        repondre({ type: 'outbox-ajoute', cle });
+      }
+      try {
+        repondre({ type: 'outbox-termine', ...(await envoyerOutbox()) });
+      } catch (err) {
+        // Hors ligne: la file est conservée et renvoyée plus tard (Background Sync 'outbox')
+        repondre({ type: 'outbox-erreur', message: String(err) });
+      }
+    })());
+  }
+});
+
+self.addEventListener('sync', (event) => {
+  if (event.tag === 'sync-caisses') event.waitUntil(synchroniser());
+  if (event.tag === 'outbox') event.waitUntil(envoyerOutbox());
+});
+
+self.addEventListener('periodicsync', (event) => {
+  if (event.tag === 'sync-caisses') event.waitUntil(synchroniser());
+});
+
+function requeteIDB(requete) {
+  return new Promise((resolve, reject) => {
+    requete.onsuccess = () => resolve(requete.result);
+    requete.onerror = () => reject(requete.error);
+  });
+}
+
+function finTransaction(transaction) {
+  return new Promise((resolve, reject) => {
+    transaction.oncomplete = () => resolve();
+    transaction.onerror = transaction.onabort = () => reject(transaction.error);
+  });
+}
+
+function ouvrirBase() {
+  const requete = indexedDB.open(SYNC_DB, 2);
+  requete.onupgradeneeded = () => {
+    const db = requete.result;
+    for (const [nom, index] of Object.entries(SYNC_STORES)) {
+      if (db.objectStoreNames.contains(nom)) continue;
+      const store = db.createObjectStore(nom, { keyPath: 'id' });
+      index.forEach((champ) => store.createIndex(champ, champ));
+    }
+    // Marques de synchronisation par caisse et utilisateur de la réplique
+    if (!db.objectStoreNames.contains('meta')) db.createObjectStore('meta', { keyPath: 'cle' });
+    // Écritures en attente d'envoi, indexées par leur clé d'idempotence
+    if (!db.objectStoreNames.contains('outbox')) db.createObjectStore('outbox', { keyPath: 'cle' });
+  };
+  return requeteIDB(requete);
+}
+
+async function lireMeta(db, cle, defaut) {
+  const entree = await requeteIDB(db.transaction('meta').objectStore('meta').get(cle));
+  return entree ? entree.valeur : defaut;
+}
+
+async function appliquer(db, donnees, vider) {
+  const transaction = db.transaction([...Object.keys(SYNC_STORES), 'meta'], 'readwrite');
+  if (vider) {
+    // Autre utilisateur sur l'appareil: repartir d'une réplique vide
+    Object.keys(SYNC_STORES).forEach((nom) => transaction.objectStore(nom).clear());
+  }
+  for (const [nom, bloc] of Object.entries(donnees.modifications)) {
+    const store = transaction.objectStore(nom);
+    for (const ligne of bloc.lignes) {
+      const objet = {};
+      bloc.champs.forEach((champ, i) => { objet[champ] = ligne[i]; });
+      store.put(objet);
+    }
+  }
+  for (const [nom, ids] of Object.entries(donnees.suppressions)) {
+    const store = transaction.objectStore(nom);
+    ids.forEach((id) => store.delete(id));
+  }
+  const meta = transaction.objectStore('meta');
+  meta.put({ cle: 'marques', valeur: donnees.marques });
+  meta.put({ cle: 'utilisateur', valeur: donnees.utilisateur });
+  meta.put({ cle: 'derniere_sync', valeur: new Date().toISOString() });
+  return finTransaction(transaction);
+}
+
+let syncEnCours = null;
+
+function synchroniser() {
+  // Une seule synchronisation à la fois, les demandes suivantes attendent la même
+  if (!syncEnCours) {
+    syncEnCours = (async () => {
+      const db = await ouvrirBase();
+      let utilisateur = await lireMeta(db, 'utilisateur', null);
+      let objets = 0;
+      for (let page = 0; page < SYNC_PAGES_MAX; page++) {
+        const marques = await lireMeta(db, 'marques', {});
+        const parametre = Object.entries(marques).map(([caisse, version]) => `${caisse}:${version}`).join(',');
+        const reponse = await fetch(`${SYNC_URL}?marques=${encodeURIComponent(parametre)}`, {
+          credentials: 'same-origin',
+          headers: { 'Accept': 'application/json' }
+        });
+        if (!reponse.ok) throw new Error(`Synchronisation refusée (${reponse.status})`);
+        const donnees = await reponse.json();
+        const vider = utilisateur !== null && utilisateur !== donnees.utilisateur;
+        if (vider) {
+          // Marques de l'ancien utilisateur sans valeur: tout recharger
+          await appliquer(db, { modifications: {}, suppressions: {}, marques: {}, utilisateur: donnees.utilisateur }, true);
+          utilisateur = donnees.utilisateur;
+          continue;
+        }
+        await appliquer(db, donnees, false);
+        utilisateur = donnees.utilisateur;
+        objets += Object.values(donnees.modifications).reduce((total, bloc) => total + bloc.lignes.length, 0);
+        if (donnees.complet) break;
+      }
+      db.close();
+      return { objets };
+    })().finally(() => { syncEnCours = null; });
+  }
+  return syncEnCours;
+}
+
+async function enregistrerSession(message) {
+  // Jeton CSRF et utilisateur de la page, réutilisés par les envois en arrière-plan
+  if (!message.csrf) return;
+  const db = await ouvrirBase();
+  const transaction = db.transaction('meta', 'readwrite');
+  transaction.objectStore('meta').put({ cle: 'session', valeur: { csrf: message.csrf, utilisateur: message.utilisateur } });
+  await finTransaction(transaction);
+  db.close();
+}
+
+async function ajouterOutbox(operation, utilisateur) {
+  const db = await ouvrirBase();
+  const entree = {
+    cle: operation.cle || self.crypto.randomUUID(),
+    type: operation.type,
+    pret_id: operation.pret_id,
+    donnees: operation.donnees || {},
+    utilisateur,
+    date_ajout: new Date().toISOString(),
+    statut: 'en_attente'
+  };
+  const transaction = db.transaction('outbox', 'readwrite');
+  transaction.objectStore('outbox').put(entree);
+  await finTransaction(transaction);
+  db.close();
+  return entree.cle;
+}
+
+let envoiEnCours = null;
 
+function envoyerOutbox() {
+  // Un seul envoi à la fois; une erreur réseau laisse la file intacte (nouvel essai plus tard)
+  if (!envoiEnCours) {
+    envoiEnCours = (async () => {
+      const db = await ouvrirBase();
+      try {
+        const session = await lireMeta(db, 'session', null);
+        if (!session) return { envoyees: 0, erreurs: 0 };
+        // Les écritures d'un autre utilisateur de l'appareil attendent sa prochaine session
+        const enAttente = (await requeteIDB(db.transaction('outbox').objectStore('outbox').getAll()))
+          .filter((entree) => entree.statut === 'en_attente' && entree.utilisateur === session.utilisateur)
+          .sort((a, b) => a.date_ajout.localeCompare(b.date_ajout));
+        let envoyees = 0;
+        let erreurs = 0;
+        for (let debut = 0; debut < enAttente.length; debut += OUTBOX_LOT) {
+          const lot = enAttente.slice(debut, debut + OUTBOX_LOT);
+          const reponse = await fetch(OUTBOX_URL, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: { 'Content-Type': 'application/json', 'Accept': 'application/json', 'X-CSRFToken': session.csrf },
+            body: JSON.stringify({
+              operations: lot.map(({ cle, type, pret_id, donnees }) => ({ cle, type, pret_id, donnees }))
+            })
+          });
+          if (!reponse.ok) throw new Error(`Envoi refusé (${reponse.status})`);
+          const { resultats } = await reponse.json();
+          const transaction = db.transaction('outbox', 'readwrite');
+          const store = transaction.objectStore('outbox');
+          resultats.forEach((resultat, index) => {
+            const entree = lot[index];
+            if (resultat.statut < 300) {
+              store.delete(entree.cle);
+              envoyees++;
+            } else if (resultat.statut < 500) {
+              // Refus définitif (validation, droits): conservé pour correction par l'utilisateur
+              store.put({ ...entree, statut: 'erreur', erreur: resultat.corps });
+              erreurs++;
+            }
+          });
+          await finTransaction(transaction);
+        }
+        return { envoyees, erreurs };
+      } finally {
+        db.close();
+      }
+    })().then((resultat) => {
+      // Récupérer l'état à jour (soldes, échéances) après les écritures acceptées
+      if (resultat.envoyees) synchroniser().catch(() => {});
+      return resultat;
+    }).finally(() => { envoiEnCours = null; });
+  }
+  return envoiEnCours;
+}